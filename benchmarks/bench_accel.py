@@ -0,0 +1,119 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Benchmarks of the native accel module, that don't need blender's data or a GL context
+
+import numpy as np
+
+from painticle import accel
+from painticle import numpyutils
+
+from . import harness
+from . import synthetic
+
+IDENTITY = (1, 0, 0, 0,
+            0, 1, 0, 0,
+            0, 0, 1, 0,
+            0, 0, 0, 1)
+
+
+def bench_bvh_build(bench: harness.Benchmark, mesh: synthetic.GridMesh):
+    points = mesh.points.reshape(-1)
+    triangles = mesh.triangles.reshape(-1)
+    normals = mesh.corner_normals
+    bench.measure("bvh.build", lambda: accel.build_bvh(points, triangles, normals), 0, mesh.num_triangles)
+
+
+def bench_adjacency_build(bench: harness.Benchmark, mesh: synthetic.GridMesh):
+    triangles = mesh.triangles.reshape(-1).astype(np.uintc)
+    bench.measure("adjacency.build", lambda: accel.build_mesh_adjacency(triangles, len(mesh.points)), 0,
+                  mesh.num_triangles)
+
+
+def bench_build_quality(bench: harness.Benchmark, mesh: synthetic.GridMesh, num_particles: int,
+                        rng: np.random.Generator):
+    """ Compare the build time of each BVH build quality against the time of the closest point queries """
+    points = mesh.points.reshape(-1)
+    triangles = mesh.triangles.reshape(-1)
+    normals = mesh.corner_normals
+    queries, _ = mesh.random_points(num_particles, rng, offset=0.01)
+    queries = numpyutils.to_structured(queries, numpyutils.vec3_dtype)
+    for name, quality in accel.BuildQuality.__members__.items():
+        stage = "bvh.quality." + name.lower()
+        bench.measure(stage + ".build", lambda: accel.build_bvh(points, triangles, normals, quality), 0,
+                      mesh.num_triangles)
+        bvh = mesh.build_bvh(quality)
+        bench.measure(stage + ".closest_points", lambda: bvh.closest_points(queries), num_particles,
+                      mesh.num_triangles)
+
+
+def bench_closest_points(bench: harness.Benchmark, mesh: synthetic.GridMesh, bvh, num_particles: int,
+                         rng: np.random.Generator):
+    points, _ = mesh.random_points(num_particles, rng, offset=0.01)
+    points = numpyutils.to_structured(points, numpyutils.vec3_dtype)
+    bench.measure("bvh.closest_points", lambda: bvh.closest_points(points), num_particles, mesh.num_triangles)
+
+
+def bench_shoot_rays(bench: harness.Benchmark, mesh: synthetic.GridMesh, bvh, num_particles: int,
+                     rng: np.random.Generator):
+    targets, _ = mesh.random_points(num_particles, rng)
+    origins = np.ascontiguousarray(targets + np.array([0, 0, 1], dtype=numpyutils.float32_dtype))
+    directions = np.tile(np.array([0, 0, -1], dtype=numpyutils.float32_dtype), (num_particles, 1))
+    bench.measure("bvh.shoot_rays", lambda: bvh.shoot_rays(origins, directions, IDENTITY), num_particles,
+                  mesh.num_triangles)
+
+
+def bench_hashed_grid(bench: harness.Benchmark, particles: accel.ParticleData, voxel_size: float):
+    locations = np.ascontiguousarray(numpyutils.unstructured(particles.location))
+    grid = accel.HashedGrid(voxel_size)
+    if bench.measure("hashed_grid.build", lambda: grid.build(locations), particles.num_particles) is None:
+        # The grid is still needed for the neighbourhood queries
+        grid.build(locations)
+    return grid
+
+
+def bench_repel_forces(bench: harness.Benchmark, particles: accel.ParticleData, grid: accel.HashedGrid):
+    bench.measure("repel_forces", lambda: accel.repel_forces(grid, particles, 1.0, 0.01), particles.num_particles)
+
+
+def bench_emission(bench: harness.Benchmark, mesh: synthetic.GridMesh, bvh, num_particles: int,
+                   rng: np.random.Generator):
+    targets, _ = mesh.random_points(num_particles, rng)
+    origins = np.ascontiguousarray(targets + np.array([0, 0, 1], dtype=numpyutils.float32_dtype))
+    directions = np.tile(np.array([0, 0, -1], dtype=numpyutils.float32_dtype), (num_particles, 1))
+
+    def emit(particles):
+        particles.add_particles_from_rays(origins, directions, IDENTITY, bvh,
+                                          [0.5, 0.5], [0.1, 0.1, 0.1], [0.02, 0.04], [0.3, 0.5], [1, 3],
+                                          [1, 0, 0], [0.1, 0.1, 0.1])
+    bench.measure("particles.add_from_rays", emit, num_particles, mesh.num_triangles, setup=accel.ParticleData)
+
+
+def run(bench: harness.Benchmark, mesh: synthetic.GridMesh, sizes: list, seed: int = 0):
+    """ Run all accel benchmarks on the given mesh for each particle count in sizes """
+    rng = np.random.default_rng(seed)
+    bench_bvh_build(bench, mesh)
+    bench_adjacency_build(bench, mesh)
+    bvh = mesh.build_bvh()
+    for num_particles in sizes:
+        particles = synthetic.create_particles(mesh, num_particles, rng)
+        bench_closest_points(bench, mesh, bvh, num_particles, rng)
+        bench_shoot_rays(bench, mesh, bvh, num_particles, rng)
+        grid = bench_hashed_grid(bench, particles, 0.06)
+        bench_repel_forces(bench, particles, grid)
+        bench_emission(bench, mesh, bvh, num_particles, rng)
+        bench_build_quality(bench, mesh, num_particles, rng)
@@ -0,0 +1,150 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Benchmarks of the simulation and painting stages as they're run by the paint operator
+
+import bpy
+import mathutils
+import numpy as np
+
+from painticle import accel
+from painticle import headless
+from painticle import meshdata
+from painticle import trianglemesh
+from painticle.interaction import Interactions, SourceInput
+from painticle.sim import particle_simulator
+from painticle.sim import particle_simulator_cpu
+
+from . import harness
+from . import synthetic
+
+
+def _copy_particles(particles: accel.ParticleData):
+    result = accel.ParticleData()
+    result.append(particles)
+    return result
+
+
+class PipelineSetup:
+    """ The blender side of the benchmark: a painted object, its scene settings and a headless context """
+
+    def __init__(self, mesh: synthetic.GridMesh, image_size: int):
+        self.obj = mesh.create_blender_object("painticle_benchmark", image_size)
+        bpy.context.view_layer.objects.active = self.obj
+        self.obj.select_set(True)
+        bpy.ops.object.mode_set(mode="TEXTURE_PAINT")
+        self.context = headless.HeadlessContext(self.obj)
+        self.settings = self.context.scene.painticle_settings
+        self.paint_mesh = trianglemesh.TriangleMesh(self.context)
+
+    def source_input(self, interactions: Interactions):
+        # Shoot straight down onto the center of the height field
+        return SourceInput(mathutils.Vector((0, 0, 2)), mathutils.Vector((0, 0, -1)), 0.05, interactions, 1)
+
+
+def bench_simulation(bench: harness.Benchmark, setup: PipelineSetup, particles: accel.ParticleData,
+                     num_triangles: int, delta_t: float):
+    simulator = particle_simulator_cpu.ParticleSimulatorCPU(setup.context)
+    simulator.setup_steps()
+
+    def reset():
+        simulator._particles = _copy_particles(particles)
+        simulator.update_hashed_grid()
+        emit_settings = simulator.emit_settings()
+        return particle_simulator.SimulationData(delta_t, emit_settings, setup.settings, setup.paint_mesh,
+                                                 setup.context, setup.source_input(Interactions.EMIT_PARTICLES))
+
+    bench.measure("sim.tick", simulator.simulate, particles.num_particles, num_triangles, setup=reset)
+    return simulator
+
+
+def bench_painting(bench: harness.Benchmark, setup: PipelineSetup, simulator, glcontext, num_triangles: int,
+                   delta_t: float):
+    from painticle import particle_painter_gpu
+    painter = particle_painter_gpu.ParticlePainterGPU(setup.context, simulator, glcontext)
+    particles = simulator._particles
+    num_particles = particles.num_particles
+    painter.update_paintbuffer()
+
+    def finished(func):
+        """ GPU calls are asynchronous, so we need to wait for them to have comparable timings """
+        def run():
+            func()
+            glcontext.finish()
+        return run
+
+    bench.measure("paint.upload_particles", finished(lambda: painter.update_particles_buffer(particles)),
+                  num_particles, num_triangles)
+    painter.update_particles_buffer(particles)
+    bench.measure("paint.upload_uniforms", finished(lambda: painter.update_paint_shader_uniforms(delta_t)),
+                  num_particles, num_triangles)
+    painter.update_paint_shader_uniforms(delta_t)
+    bench.measure("paint.draw", finished(painter.paint_pass), num_particles, num_triangles)
+    bench.measure("paint.write_image", finished(painter.write_blender_image), num_particles, num_triangles)
+    painter.shutdown()
+
+
+def bench_overbake(bench: harness.Benchmark, mesh: synthetic.GridMesh, glcontext, image_sizes: list,
+                   gutter_width: int = 16):
+    """ Measure the gutter filling of each overbake mode on square images of the given edge lengths. The stages count
+        texels, so the rate is the throughput in texels per second. """
+    import moderngl
+    from painticle import meshbuffer
+    from painticle import overbaker
+    # The uvs are shrunk a bit, so there's a gutter around the mesh's uv island
+    loop_vertices = mesh.triangles.reshape(-1).astype(np.uintc)
+    mesh_data = meshdata.MeshData({"points": mesh.points,
+                                   "loop_vertices": loop_vertices,
+                                   "triangle_loops": np.arange(len(loop_vertices), dtype=np.uintc).reshape(-1, 3),
+                                   "split_normals": mesh.corner_normals.reshape(-1, 3),
+                                   "uvs": 0.05 + 0.9 * mesh.vertex_uvs[loop_vertices]})
+    mesh_buffer = meshbuffer.MeshBuffer(glcontext, None)
+    mesh_buffer.build_mesh_vbo(mesh_data)
+    baker = overbaker.Overbaker(mesh_buffer, glcontext)
+    max_size = glcontext.info["GL_MAX_TEXTURE_SIZE"]
+    for size in image_sizes:
+        stages = [f"overbake.{mode}" for mode in overbaker.OVERBAKE_MODES]
+        if not any(bench.wants(stage) for stage in stages):
+            continue
+        if size > max_size:
+            print(f"Skipping overbake of {size}x{size}: larger than the maximum texture size {max_size}")
+            continue
+        try:
+            texture = glcontext.texture((size, size), 4, dtype='f4')
+        except moderngl.Error as e:
+            print(f"Skipping overbake of {size}x{size}: {e}")
+            continue
+        for mode, stage in zip(overbaker.OVERBAKE_MODES, stages):
+            bench.measure(stage, lambda: baker.overbake(texture, gutter_width, mode), size*size, unit="texels")
+        texture.release()
+
+
+def run(bench: harness.Benchmark, mesh: synthetic.GridMesh, sizes: list, image_size: int, glcontext=None,
+        delta_t: float = 0.01, seed: int = 0, overbake_sizes: list = ()):
+    """ Run the simulation benchmarks and, if a GL context is given, the painting benchmarks """
+    rng = np.random.default_rng(seed)
+    setup = PipelineSetup(mesh, image_size)
+    bench.measure("mesh.extract", lambda: meshdata.MeshData.extract(setup.obj.data), 0, mesh.num_triangles)
+    for num_particles in sizes:
+        particles = synthetic.create_particles(mesh, num_particles, rng)
+        simulator = bench_simulation(bench, setup, particles, mesh.num_triangles, delta_t)
+        if glcontext is not None:
+            simulator._particles = _copy_particles(particles)
+            simulator.update_hashed_grid()
+            bench_painting(bench, setup, simulator, glcontext, mesh.num_triangles, delta_t)
+    if glcontext is not None:
+        bench_overbake(bench, mesh, glcontext, overbake_sizes)
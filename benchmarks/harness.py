@@ -0,0 +1,167 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Timing, memory tracking and reporting for the benchmarks
+
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows. We'll just not report the process' peak memory there.
+    resource = None
+
+
+REPORT_VERSION = 1
+
+
+def _process_peak_bytes():
+    """ Return the peak resident set size of the process in bytes or None, if the platform doesn't tell us """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak*1024
+
+
+class StageResult:
+    """ The measurements of a single benchmark stage for a given problem size """
+
+    def __init__(self, stage: str, num_particles: int, num_triangles: int, times: list, python_peak_bytes: int,
+                 process_peak_bytes: int, unit: str = "particles"):
+        """ unit names, what num_particles counts, e.g. texels for image processing stages """
+        self.stage = stage
+        self.num_particles = num_particles
+        self.num_triangles = num_triangles
+        self.times = times
+        self.python_peak_bytes = python_peak_bytes
+        self.process_peak_bytes = process_peak_bytes
+        self.unit = unit
+
+    @property
+    def key(self):
+        """ The identifier used to match results against a baseline """
+        return f"{self.stage}@{self.num_particles}"
+
+    @property
+    def median(self):
+        return statistics.median(self.times)
+
+    @property
+    def particles_per_second(self):
+        median = self.median
+        return self.num_particles / median if median > 0 else None
+
+    def to_dict(self):
+        return {"stage": self.stage,
+                "particles": self.num_particles,
+                "triangles": self.num_triangles,
+                "repeat": len(self.times),
+                "times_s": self.times,
+                "median_s": self.median,
+                "min_s": min(self.times),
+                "mean_s": statistics.mean(self.times),
+                "particles_per_s": self.particles_per_second,
+                "unit": self.unit,
+                "python_peak_bytes": self.python_peak_bytes,
+                "process_peak_bytes": self.process_peak_bytes}
+
+
+class Benchmark:
+    """ Collects the timings of all stages run through measure() """
+
+    def __init__(self, repeat: int = 5, stage_filter=None, verbose: bool = True):
+        self.repeat = repeat
+        self.stage_filter = stage_filter
+        self.verbose = verbose
+        self.results = []
+
+    def wants(self, stage: str) -> bool:
+        """ Returns True, if the given stage shall be run """
+        return self.stage_filter is None or any(f in stage for f in self.stage_filter)
+
+    def measure(self, stage: str, func, num_particles: int, num_triangles: int = 0, setup=None,
+                unit: str = "particles"):
+        """ Run func repeat times and record its timings. If setup is given, it's called before each run outside of
+            the timed region and its result is passed to func. unit names, what num_particles counts. The python
+            peak memory is measured in an additional untimed run, since tracing the allocations slows down python
+            code a lot more than native code. """
+        if not self.wants(stage):
+            return None
+        times = []
+        for _ in range(self.repeat):
+            args = (setup(),) if setup is not None else ()
+            start = time.perf_counter()
+            func(*args)
+            times.append(time.perf_counter() - start)
+        args = (setup(),) if setup is not None else ()
+        tracemalloc.start()
+        try:
+            func(*args)
+            _, python_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result = StageResult(stage, num_particles, num_triangles, times, python_peak, _process_peak_bytes(), unit)
+        self.results.append(result)
+        if self.verbose:
+            rate = result.particles_per_second
+            rate_text = f"{rate:14.0f} {unit}/s" if rate is not None else ""
+            print(f"{result.key:40s} {1000*result.median:10.3f} ms {rate_text}")
+        return result
+
+    def report(self, metadata: dict = None) -> dict:
+        """ Create the machine readable report of all measured stages """
+        machine = {"platform": platform.platform(),
+                   "processor": platform.processor(),
+                   "python": platform.python_version()}
+        if metadata is not None:
+            machine.update(metadata)
+        return {"version": REPORT_VERSION,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "machine": machine,
+                "results": [r.to_dict() for r in self.results]}
+
+
+def write_report(report: dict, filename: str):
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def read_report(filename: str) -> dict:
+    with open(filename) as f:
+        report = json.load(f)
+    if report.get("version") != REPORT_VERSION:
+        raise ValueError(f"Unsupported benchmark report version in {filename}")
+    return report
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float):
+    """ Compare the median timings of the report with the baseline. Returns a list of (key, baseline_s, current_s)
+        tuples for all stages, that got slower than the baseline by more than the given relative tolerance. """
+    baseline_medians = {f"{r['stage']}@{r['particles']}": r["median_s"] for r in baseline["results"]}
+    regressions = []
+    for r in report["results"]:
+        key = f"{r['stage']}@{r['particles']}"
+        reference = baseline_medians.get(key)
+        if reference is not None and r["median_s"] > reference * (1 + tolerance):
+            regressions.append((key, reference, r["median_s"]))
+    return regressions
@@ -0,0 +1,99 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Entry point of the benchmark suite. It needs to run inside of blender, e.g.:
+#   blender --background --factory-startup --python benchmarks/run.py -- --output report.json
+# Use scripts/benchmark_addon.py to get the environment setup right.
+
+import argparse
+import os
+import sys
+
+import bpy
+import addon_utils
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+# Makes the benchmarks package importable. The add-on itself is found through blender's script directories.
+sys.path.append(os.path.join(script_dir, ".."))
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index("--")+1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Benchmark suite of the PAINTicle add-on.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="Particle counts to benchmark")
+    parser.add_argument("--mesh-resolution", type=int, default=256,
+                        help="Number of quads along each side of the synthetic mesh")
+    parser.add_argument("--image-size", type=int, default=2048, help="Edge length of the painted image")
+    parser.add_argument("--overbake-sizes", type=int, nargs="*", default=[1024, 2048, 4096, 8192, 16384],
+                        help="Edge lengths of the images to benchmark the overbaking with. Sizes, that don't fit "
+                             "into the GPU's memory, are skipped.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per stage")
+    parser.add_argument("--stages", nargs="+", default=None,
+                        help="Only run stages containing one of the given strings (e.g. bvh paint)")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="Compare the timings to a previously written report")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed relative slowdown against the baseline before failing (default=0.1)")
+    parser.add_argument("--no-gpu", action="store_true", help="Skip all stages, that need a GL context")
+    parser.add_argument("--backend", default=None,
+                        help="moderngl backend for the standalone GL context (e.g. egl on machines without display)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    addon_utils.enable("painticle", default_set=True)
+
+    from benchmarks import bench_accel, bench_pipeline, harness, synthetic
+    from painticle import headless
+    from painticle.ops.createdefaultbrushtree import create_default_brush_tree
+
+    bench = harness.Benchmark(repeat=args.repeat, stage_filter=args.stages)
+    mesh = synthetic.GridMesh(args.mesh_resolution)
+    bench_accel.run(bench, mesh, args.sizes)
+
+    create_default_brush_tree()
+    if bpy.context.scene.tool_settings.image_paint.brush is None:
+        bpy.context.scene.tool_settings.image_paint.brush = bpy.data.brushes.new("painticle_benchmark",
+                                                                                  mode="TEXTURE_PAINT")
+    glcontext = None
+    if not args.no_gpu:
+        glcontext = headless.create_standalone_glcontext(args.backend)
+    bench_pipeline.run(bench, mesh, args.sizes, args.image_size, glcontext, overbake_sizes=args.overbake_sizes)
+
+    metadata = {"blender": bpy.app.version_string,
+                "mesh_resolution": args.mesh_resolution,
+                "image_size": args.image_size}
+    if glcontext is not None:
+        metadata["gl_renderer"] = glcontext.info["GL_RENDERER"]
+        metadata["gl_version"] = glcontext.info["GL_VERSION"]
+    report = bench.report(metadata)
+    if args.output is not None:
+        harness.write_report(report, args.output)
+
+    if args.baseline is not None:
+        regressions = harness.compare_to_baseline(report, harness.read_report(args.baseline), args.tolerance)
+        for key, reference, current in regressions:
+            print(f"REGRESSION {key}: {1000*reference:.3f} ms -> {1000*current:.3f} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
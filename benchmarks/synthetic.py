@@ -0,0 +1,137 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Synthetic meshes and particle populations for the benchmarks
+
+import numpy as np
+
+from painticle import accel
+from painticle import numpyutils
+
+# The height field used for the synthetic mesh. It's wavy, so the closest point queries don't degenerate to a plane.
+WAVE_AMPLITUDE = 0.1
+WAVE_FREQUENCY = 3.0
+
+
+def _height(x, y):
+    return WAVE_AMPLITUDE * np.sin(WAVE_FREQUENCY*x) * np.cos(WAVE_FREQUENCY*y)
+
+
+def _normal(x, y):
+    dx = WAVE_AMPLITUDE * WAVE_FREQUENCY * np.cos(WAVE_FREQUENCY*x) * np.cos(WAVE_FREQUENCY*y)
+    dy = -WAVE_AMPLITUDE * WAVE_FREQUENCY * np.sin(WAVE_FREQUENCY*x) * np.sin(WAVE_FREQUENCY*y)
+    n = np.stack((-dx, -dy, np.ones_like(dx)), axis=-1)
+    return n / np.linalg.norm(n, axis=-1)[..., np.newaxis]
+
+
+class GridMesh:
+    """ A wavy height field covering [-1,1]x[-1,1] with resolution x resolution quads, split into triangles """
+
+    def __init__(self, resolution: int):
+        self.resolution = resolution
+        n = resolution + 1
+        coords = np.linspace(-1, 1, n, dtype=numpyutils.float32_dtype)
+        x, y = np.meshgrid(coords, coords, indexing="xy")
+        self.points = np.stack((x, y, _height(x, y)), axis=-1).reshape(-1, 3).astype(numpyutils.float32_dtype)
+        self.vertex_normals = _normal(x, y).reshape(-1, 3).astype(numpyutils.float32_dtype)
+        self.vertex_uvs = np.stack(((x+1)/2, (y+1)/2), axis=-1).reshape(-1, 2).astype(numpyutils.float32_dtype)
+        row, col = np.meshgrid(np.arange(resolution), np.arange(resolution), indexing="ij")
+        v00 = (row*n + col).ravel()
+        v01 = v00 + 1
+        v10 = v00 + n
+        v11 = v10 + 1
+        self.quads = np.stack((v00, v01, v11, v10), axis=-1).astype(np.uintc)
+        self.triangles = np.concatenate((np.stack((v00, v01, v11), axis=-1),
+                                         np.stack((v00, v11, v10), axis=-1))).astype(np.uintc)
+
+    @property
+    def num_triangles(self):
+        return len(self.triangles)
+
+    @property
+    def corner_normals(self):
+        """ The normals for each triangle corner as needed by accel.build_bvh """
+        return self.vertex_normals[self.triangles].reshape(-1)
+
+    @property
+    def corner_uvs(self):
+        """ The uvs for each triangle corner as needed by BVH.set_uvs """
+        return self.vertex_uvs[self.triangles].reshape(-1)
+
+    def build_bvh(self, quality: accel.BuildQuality = accel.BuildQuality.MEDIUM):
+        bvh = accel.build_bvh(self.points.reshape(-1), self.triangles.reshape(-1), self.corner_normals, quality)
+        bvh.set_uvs(self.corner_uvs)
+        return bvh
+
+    def random_points(self, num_points: int, rng: np.random.Generator, offset: float = 0.0):
+        """ Sample points above the surface. offset moves them along the surface normal. """
+        xy = rng.uniform(-1, 1, (num_points, 2)).astype(numpyutils.float32_dtype)
+        x, y = xy[:, 0], xy[:, 1]
+        points = np.column_stack((x, y, _height(x, y)))
+        points += offset * _normal(x, y)
+        return points.astype(numpyutils.float32_dtype), _normal(x, y).astype(numpyutils.float32_dtype)
+
+    def create_blender_object(self, name: str, image_size: int):
+        """ Create a blender object of this mesh with a UV layout and a material with a paintable image """
+        import bpy
+        mesh = bpy.data.meshes.new(name)
+        num_quads = len(self.quads)
+        mesh.vertices.add(len(self.points))
+        mesh.vertices.foreach_set("co", self.points.reshape(-1))
+        mesh.loops.add(4*num_quads)
+        mesh.loops.foreach_set("vertex_index", self.quads.reshape(-1).astype(np.intc))
+        mesh.polygons.add(num_quads)
+        mesh.polygons.foreach_set("loop_start", np.arange(0, 4*num_quads, 4, dtype=np.intc))
+        mesh.polygons.foreach_set("loop_total", np.full(num_quads, 4, dtype=np.intc))
+        mesh.update()
+        mesh.validate()
+        uv_layer = mesh.uv_layers.new(name="UVMap")
+        uv_layer.data.foreach_set("uv", self.vertex_uvs[self.quads.reshape(-1)].reshape(-1))
+
+        image = bpy.data.images.new(name, image_size, image_size, alpha=True)
+        material = bpy.data.materials.new(name)
+        material.use_nodes = True
+        texture_node = material.node_tree.nodes.new("ShaderNodeTexImage")
+        texture_node.image = image
+        bsdf = material.node_tree.nodes["Principled BSDF"]
+        material.node_tree.links.new(bsdf.inputs["Base Color"], texture_node.outputs["Color"])
+        mesh.materials.append(material)
+
+        obj = bpy.data.objects.new(name, mesh)
+        bpy.context.scene.collection.objects.link(obj)
+        return obj
+
+
+def create_particles(mesh: GridMesh, num_particles: int, rng: np.random.Generator, particle_size: float = 0.03):
+    """ Create a particle population lying on the surface of the given mesh """
+    particles = accel.ParticleData()
+    particles.resize(num_particles)
+    locations, normals = mesh.random_points(num_particles, rng)
+    vec3 = numpyutils.vec3_dtype
+    particles.location = numpyutils.to_structured(locations, vec3)
+    particles.normal = numpyutils.to_structured(normals, vec3)
+    particles.acceleration = numpyutils.to_structured(np.zeros((num_particles, 3), numpyutils.float32_dtype), vec3)
+    speed = rng.normal(0, 0.1, (num_particles, 3)).astype(numpyutils.float32_dtype)
+    particles.speed = numpyutils.to_structured(numpyutils.project_vector_onto_plane(speed, normals), vec3)
+    particles.size = rng.uniform(0.5*particle_size, 1.5*particle_size, num_particles).astype(numpyutils.float32_dtype)
+    particles.mass = rng.uniform(0.3, 0.5, num_particles).astype(numpyutils.float32_dtype)
+    max_age = rng.uniform(1, 3, num_particles).astype(numpyutils.float32_dtype)
+    particles.max_age = max_age
+    particles.age = (max_age * rng.uniform(0, 0.5, num_particles)).astype(numpyutils.float32_dtype)
+    colors = rng.uniform(0, 1, (num_particles, 3)).astype(numpyutils.float32_dtype)
+    particles.color = numpyutils.to_structured(colors, vec3)
+    return particles
@@ -18,6 +18,8 @@ from . import settings
 from . import sim
 from . import ops
 from . import ui
+from . import meshcache
+from . import particles
 
 import bpy
 
@@ -48,9 +50,15 @@ def register():
     bpy.types.Scene.painticle_settings = bpy.props.PointerProperty(type=settings.core.Settings)
     ops.paintop.add_menu()
     ui.brushnodes.register_node_categories()
+    meshcache.register()
+    particles.register()
+    settings.snapshot.register()
 
 
 def unregister():
+    settings.snapshot.unregister()
+    particles.unregister()
+    meshcache.unregister()
     ui.brushnodes.unregister_node_categories()
     ops.paintop.remove_menu()
     for cls in reversed(classes):
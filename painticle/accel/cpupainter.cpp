@@ -0,0 +1,251 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#include "cpupainter.h"
+#include "parallel.h"
+#include "profiling.h"
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+#include <string>
+
+BEGIN_PAINTICLE_NAMESPACE
+
+namespace {
+
+//! The edge length of the square texel tiles processed in parallel
+const size_t TILE_SIZE = 32;
+
+//! A triangle in texel space, oriented counter clockwise
+struct RasterTriangle {
+    ID triId;
+    Vec2f corners[3];
+    ID loops[3];
+    float area;
+};
+
+//! Twice the signed area of the triangle a, b, p. Positive, if p is left of the edge from a to b.
+inline float edgeFunction(const Vec2f& a, const Vec2f& b, const Vec2f& p)
+{
+    return (b.x-a.x)*(p.y-a.y) - (b.y-a.y)*(p.x-a.x);
+}
+
+//! Texels exactly on an edge belong to the triangle, if it's a top or left edge. This way texels on a shared edge
+//! are only covered by one of the triangles like with the GPU's rasterization rules.
+inline bool isTopLeft(const Vec2f& a, const Vec2f& b)
+{
+    const float dx = b.x-a.x;
+    const float dy = b.y-a.y;
+    return dy<0 || (dy==0 && dx<0);
+}
+
+inline bool covers(float edge, bool topLeft)
+{
+    return edge>0 || (edge==0 && topLeft);
+}
+
+//! The smoothstep function with GLSL semantics, i.e. also working for edge0>edge1
+inline float smoothstep(float edge0, float edge1, float x)
+{
+    float t = (x-edge0) / (edge1-edge0);
+    t = std::min(std::max(t, 0.0f), 1.0f);
+    return t*t*(3-2*t);
+}
+
+//! Sort the mesh's triangles into the texel tiles their bounding box overlaps, keeping the triangle order
+std::vector<std::vector<RasterTriangle>> binTriangles(const PaintMesh& mesh, size_t width, size_t height,
+                                                      const Vec2f& uvOffset, size_t numTilesX, size_t numTilesY)
+{
+    std::vector<std::vector<RasterTriangle>> bins(numTilesX*numTilesY);
+    for(size_t triId=0; triId<mesh.numTriangles(); ++triId) {
+        RasterTriangle tri;
+        tri.triId = static_cast<ID>(triId);
+        const Vec3u& loops = mesh.triangle(tri.triId);
+        for(ID corner=0; corner<3; ++corner) {
+            const Vec2f uv = mesh.uv(loops[corner]) - uvOffset;
+            tri.corners[corner] = Vec2f(uv.x*width, uv.y*height);
+            tri.loops[corner] = loops[corner];
+        }
+        tri.area = edgeFunction(tri.corners[0], tri.corners[1], tri.corners[2]);
+        if(!(std::abs(tri.area)>0))
+            continue;  // Degenerated in uv space, the GPU doesn't draw any texel either
+        if(tri.area<0) {
+            std::swap(tri.corners[1], tri.corners[2]);
+            std::swap(tri.loops[1], tri.loops[2]);
+            tri.area = -tri.area;
+        }
+        float minX = std::min({tri.corners[0].x, tri.corners[1].x, tri.corners[2].x});
+        float maxX = std::max({tri.corners[0].x, tri.corners[1].x, tri.corners[2].x});
+        float minY = std::min({tri.corners[0].y, tri.corners[1].y, tri.corners[2].y});
+        float maxY = std::max({tri.corners[0].y, tri.corners[1].y, tri.corners[2].y});
+        if(maxX<0 || maxY<0 || minX>=width || minY>=height)
+            continue;
+        const size_t tileX0 = static_cast<size_t>(std::max(minX, 0.0f)) / TILE_SIZE;
+        const size_t tileY0 = static_cast<size_t>(std::max(minY, 0.0f)) / TILE_SIZE;
+        const size_t tileX1 = std::min(static_cast<size_t>(std::min(maxX, float(width))) / TILE_SIZE, numTilesX-1);
+        const size_t tileY1 = std::min(static_cast<size_t>(std::min(maxY, float(height))) / TILE_SIZE, numTilesY-1);
+        for(size_t tileY=tileY0; tileY<=tileY1; ++tileY) {
+            for(size_t tileX=tileX0; tileX<=tileX1; ++tileX)
+                bins[tileY*numTilesX+tileX].push_back(tri);
+        }
+    }
+    return bins;
+}
+
+//! Call texelFunc(x, y, triangle, barycentrics) for all texel centers covered by the mesh's uv triangles
+/**! The tiles are processed in parallel, the triangles of one tile in the mesh's order. */
+template<class TexelFunc>
+void rasterizeUV(size_t width, size_t height, const PaintMesh& mesh, const Vec2f& uvOffset, TexelFunc texelFunc)
+{
+    if(width==0 || height==0)
+        return;
+    const size_t numTilesX = (width+TILE_SIZE-1) / TILE_SIZE;
+    const size_t numTilesY = (height+TILE_SIZE-1) / TILE_SIZE;
+    const auto bins = binTriangles(mesh, width, height, uvOffset, numTilesX, numTilesY);
+
+    BEGIN_PARALLEL_FOR(tile, bins.size()) {
+        const size_t tileX = tile % numTilesX;
+        const size_t tileY = tile / numTilesX;
+        const size_t endX = std::min((tileX+1)*TILE_SIZE, width);
+        const size_t endY = std::min((tileY+1)*TILE_SIZE, height);
+        for(const RasterTriangle& tri : bins[tile]) {
+            const Vec2f& a = tri.corners[0];
+            const Vec2f& b = tri.corners[1];
+            const Vec2f& c = tri.corners[2];
+            const bool topLeftA = isTopLeft(b, c);
+            const bool topLeftB = isTopLeft(c, a);
+            const bool topLeftC = isTopLeft(a, b);
+            // Clip the triangle's bounding box to the tile
+            const float minX = std::min({a.x, b.x, c.x});
+            const float maxX = std::max({a.x, b.x, c.x});
+            const float minY = std::min({a.y, b.y, c.y});
+            const float maxY = std::max({a.y, b.y, c.y});
+            const size_t x0 = std::max(tileX*TILE_SIZE, static_cast<size_t>(std::max(minX, 0.0f)));
+            const size_t y0 = std::max(tileY*TILE_SIZE, static_cast<size_t>(std::max(minY, 0.0f)));
+            const size_t x1 = std::min(endX, static_cast<size_t>(std::min(maxX, float(endX)))+1);
+            const size_t y1 = std::min(endY, static_cast<size_t>(std::min(maxY, float(endY)))+1);
+            for(size_t y=y0; y<y1; ++y) {
+                for(size_t x=x0; x<x1; ++x) {
+                    const Vec2f p(x+0.5f, y+0.5f);
+                    const float edgeA = edgeFunction(b, c, p);
+                    const float edgeB = edgeFunction(c, a, p);
+                    const float edgeC = edgeFunction(a, b, p);
+                    if(!covers(edgeA, topLeftA) || !covers(edgeB, topLeftB) || !covers(edgeC, topLeftC))
+                        continue;
+                    texelFunc(x, y, tri, Vec3f(edgeA/tri.area, edgeB/tri.area, edgeC/tri.area));
+                }
+            }
+        }
+    } END_PARALLEL_FOR
+}
+
+}
+
+PaintMesh::PaintMesh()
+{}
+
+PaintMesh::PaintMesh(const Vec3f* loopPoints, const Vec2f* uvs, size_t numLoops, const Vec3u* triangles,
+                     size_t numTriangles)
+: m_points(loopPoints, loopPoints+numLoops),
+  m_uvs(uvs, uvs+numLoops),
+  m_triangles(triangles, triangles+numTriangles)
+{
+    for(const Vec3u& tri : m_triangles) {
+        if(tri.x>=numLoops || tri.y>=numLoops || tri.z>=numLoops)
+            throw std::out_of_range("Triangle references a loop out of range");
+    }
+}
+
+void PaintMesh::updatePoints(const Vec3f* loopPoints, size_t numLoops)
+{
+    if(numLoops!=m_points.size())
+        throw std::runtime_error("The number of loops changed from " + std::to_string(m_points.size()) + " to " +
+                                 std::to_string(numLoops));
+    std::copy(loopPoints, loopPoints+numLoops, m_points.begin());
+}
+
+void paintParticles(float* rgba, size_t width, size_t height, const PaintMesh& mesh, const HashedGrid& grid,
+                    const ParticleData& particles, float strength, float timeStep, float sizeAgeFactor,
+                    const Vec2f& uvOffset)
+{
+    if(grid.numParticles() != particles.numParticles()) {
+        throw std::runtime_error("Incompatible grid and particles. Both need to represent the same particles: "+
+                                 std::to_string(grid.numParticles()) + " vs. " +
+                                 std::to_string(particles.numParticles()));
+    }
+    PAINTICLE_PROFILE_SCOPE("accel.paint_particles");
+    const size_t numParticles = grid.numParticles();
+    const auto& cellOffsets = grid.cellOffsets();
+    const auto& sortedParticleIDs = grid.sortedParticleIDs();
+    // Default timestep is 1/25th of a second. Normalize the brush strength to that value.
+    const float colorScale = 25 * timeStep * strength;
+
+    rasterizeUV(width, height, mesh, uvOffset, [&](size_t x, size_t y, const RasterTriangle& tri,
+                                                   const Vec3f& barycentrics) {
+        const Vec3f texelPos = barycentrics[0]*mesh.point(tri.loops[0]) + barycentrics[1]*mesh.point(tri.loops[1]) +
+                               barycentrics[2]*mesh.point(tri.loops[2]);
+        const Vec3i texelCoord = grid.gridCoord(texelPos);
+        float color[4] = {0, 0, 0, 0};
+        size_t numFound = 0;
+        for(int dx=-1; dx<=1; ++dx) {
+            for(int dy=-1; dy<=1; ++dy) {
+                for(int dz=-1; dz<=1; ++dz) {
+                    const uint32_t hash = grid.hashGrid(texelCoord + Vec3i(dx, dy, dz));
+                    ID offset = cellOffsets[hash];
+                    if(offset==ID_NONE)
+                        continue;
+
+                    while(offset<numParticles && sortedParticleIDs[offset].cellID == hash) {
+                        const ID particleID = sortedParticleIDs[offset].particleID;
+                        const float dist = texelPos.distance(particles.location[particleID]);
+                        const float normAge = particles.age[particleID] / particles.max_age[particleID];
+                        const float particleSize = particles.size[particleID] * ((1-normAge) + sizeAgeFactor*normAge);
+                        if(dist<particleSize) {
+                            const float normDist = 2*dist/particleSize;
+                            const float factor = (1-normAge)*smoothstep(1, 0, normDist);
+                            const Vec3f& particleColor = particles.color[particleID];
+                            for(ID i=0; i<3; ++i)
+                                color[i] = (1-factor)*color[i] + factor*particleColor[i];
+                            color[3] = (1-factor)*color[3] + factor;
+                            ++numFound;
+                        }
+                        ++offset;
+                    }
+                }
+            }
+        }
+        if(numFound==0)
+            return;
+
+        // Blend like the GPU painter: premultiplied alpha for the color, additive alpha
+        float* texel = rgba + 4*(y*width+x);
+        for(ID i=0; i<4; ++i)
+            color[i] *= colorScale;
+        for(ID i=0; i<3; ++i)
+            texel[i] = color[i] + texel[i]*(1-color[3]);
+        texel[3] = color[3] + texel[3];
+    });
+}
+
+void rasterizeUVMask(Byte* mask, size_t width, size_t height, const PaintMesh& mesh, const Vec2f& uvOffset)
+{
+    PAINTICLE_PROFILE_SCOPE("accel.rasterize_uv_mask");
+    rasterizeUV(width, height, mesh, uvOffset, [&](size_t x, size_t y, const RasterTriangle&, const Vec3f&) {
+        mask[y*width+x] = 255;
+    });
+}
+
+END_PAINTICLE_NAMESPACE
@@ -0,0 +1,95 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#pragma once
+
+#include "painticle.h"
+#include "hashedgrid.h"
+#include "particledata.h"
+#include "vec2.h"
+#include "vec3.h"
+
+#include <vector>
+
+BEGIN_PAINTICLE_NAMESPACE
+
+//! The mesh as drawn by the GPU painter: one object space point and one uv per loop and the loop triangles
+class PaintMesh
+{
+public:
+    //! Constructor
+    PaintMesh();
+
+    //! Construct from the points and uvs of numLoops loops and the loop indices of numTriangles triangles
+    PaintMesh(const Vec3f* loopPoints, const Vec2f* uvs, size_t numLoops, const Vec3u* triangles,
+              size_t numTriangles);
+
+    //! Take moved points of an unchanged topology
+    void updatePoints(const Vec3f* loopPoints, size_t numLoops);
+
+    //! Query the number of loops
+    inline size_t numLoops() const;
+
+    //! Query the number of triangles
+    inline size_t numTriangles() const;
+
+    //! Access the object space point of a loop
+    inline const Vec3f& point(ID loop) const;
+
+    //! Access the uv of a loop
+    inline const Vec2f& uv(ID loop) const;
+
+    //! Access the loop indices of a triangle
+    inline const Vec3u& triangle(ID triId) const;
+
+private:
+    std::vector<Vec3f> m_points;
+    std::vector<Vec2f> m_uvs;
+    std::vector<Vec3u> m_triangles;
+};
+
+//! Paint the particles into an image like the texel_gather paint mode of the GPU painter
+/**! The mesh's triangles are rasterized in uv space at the texel centers of the width x height RGBA float image, whose
+     lower left corner is at uvOffset. Each covered texel gathers the particles of the hashed grid's neighbouring
+     cells at its interpolated object space position and accumulates them with the rules of particle2d_frag.glsl.
+     The result is blended onto the image with premultiplied alpha for the color and additive alpha, just like the
+     GPU painter's blend function. Texels are processed in parallel tiles, overlapping triangles of one tile are
+     painted in triangle order. The hashed grid needs to be built from the particles' locations. */
+void paintParticles(float* rgba, size_t width, size_t height, const PaintMesh& mesh, const HashedGrid& grid,
+                    const ParticleData& particles, float strength, float timeStep, float sizeAgeFactor,
+                    const Vec2f& uvOffset);
+
+//! Mark the texels covered by the mesh's uv triangles with 255
+/**! The mask uses the same rasterization rules as paintParticles, so it marks the texels, the gutter filling of the
+     overbake needs to keep. */
+void rasterizeUVMask(Byte* mask, size_t width, size_t height, const PaintMesh& mesh, const Vec2f& uvOffset);
+
+
+inline size_t PaintMesh::numLoops() const
+{ return m_points.size(); }
+
+inline size_t PaintMesh::numTriangles() const
+{ return m_triangles.size(); }
+
+inline const Vec3f& PaintMesh::point(ID loop) const
+{ return m_points[loop]; }
+
+inline const Vec2f& PaintMesh::uv(ID loop) const
+{ return m_uvs[loop]; }
+
+inline const Vec3u& PaintMesh::triangle(ID triId) const
+{ return m_triangles[triId]; }
+
+END_PAINTICLE_NAMESPACE
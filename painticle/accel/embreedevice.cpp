@@ -0,0 +1,71 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#include "embreedevice.h"
+
+#include <stdexcept>
+#include <string>
+
+BEGIN_PAINTICLE_NAMESPACE
+
+std::mutex EmbreeDevice::m_mutex;
+RTCDevice EmbreeDevice::m_device = nullptr;
+size_t EmbreeDevice::m_refCount = 0;
+unsigned int EmbreeDevice::m_numThreads = 0;
+
+RTCDevice EmbreeDevice::acquire()
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    if(m_device==nullptr) {
+        std::string config = m_numThreads>0 ? "threads="+std::to_string(m_numThreads) : "";
+        m_device = rtcNewDevice(config.c_str());
+        if(m_device==nullptr)
+            throw std::runtime_error("Couldn't create embree device");
+    }
+    ++m_refCount;
+    return m_device;
+}
+
+void EmbreeDevice::release()
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    if(m_refCount==0)
+        return;
+    --m_refCount;
+    if(m_refCount==0) {
+        rtcReleaseDevice(m_device);
+        m_device = nullptr;
+    }
+}
+
+size_t EmbreeDevice::refCount()
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    return m_refCount;
+}
+
+void EmbreeDevice::setNumThreads(unsigned int numThreads)
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    m_numThreads = numThreads;
+}
+
+unsigned int EmbreeDevice::numThreads()
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    return m_numThreads;
+}
+
+END_PAINTICLE_NAMESPACE
@@ -0,0 +1,55 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#pragma once
+
+#include "embree3/rtcore.h"
+
+#include "painticle.h"
+
+#include <mutex>
+
+BEGIN_PAINTICLE_NAMESPACE
+
+//! The process wide embree device shared by all BVHs
+/**! Each device brings its own thread pool and memory allocators, so sharing it avoids duplicating them per mesh.
+     The device is created on the first acquire and released, when the last reference is given back. */
+class EmbreeDevice
+{
+public:
+    //! Get a reference to the shared device, creating it if necessary
+    static RTCDevice acquire();
+
+    //! Give back a reference obtained by acquire
+    static void release();
+
+    //! Get the number of references to the shared device
+    static size_t refCount();
+
+    //! Set the number of threads embree may use for building, 0 means all hardware threads
+    /**! Only takes effect when the device is created, i.e. if no BVH exists at the moment. */
+    static void setNumThreads(unsigned int numThreads);
+
+    //! Get the number of threads used by the next created device
+    static unsigned int numThreads();
+
+private:
+    static std::mutex m_mutex;
+    static RTCDevice m_device;
+    static size_t m_refCount;
+    static unsigned int m_numThreads;
+};
+
+END_PAINTICLE_NAMESPACE
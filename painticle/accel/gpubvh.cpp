@@ -15,12 +15,15 @@
 
 #include "gpubvh.h"
 
+#include <algorithm>
 #include <cstring>
 #include <iostream>
 #include <iterator>
 #include <limits>
 
+#include "embreedevice.h"
 #include "parallel.h"
+#include "profiling.h"
 #include "vec3.h"
 
 BEGIN_PAINTICLE_NAMESPACE
@@ -103,12 +106,23 @@ bool queryFunc(struct RTCPointQueryFunctionArguments* args)
     return false;
 }
 
+RTCBuildQuality toEmbreeBuildQuality(BVH::BuildQuality quality)
+{
+    switch(quality) {
+        case BVH::BuildQuality::LOW: return RTC_BUILD_QUALITY_LOW;
+        case BVH::BuildQuality::MEDIUM: return RTC_BUILD_QUALITY_MEDIUM;
+        case BVH::BuildQuality::HIGH: return RTC_BUILD_QUALITY_HIGH;
+    }
+    throw std::runtime_error("Unknown build quality");
+}
+
 }
 
 
 BVH::BVH()
+    : m_points(nullptr), m_numPoints(0), m_triangles(nullptr), m_numTriangles(0)
 {
-    m_device = rtcNewDevice("");
+    m_device = EmbreeDevice::acquire();
     m_scene = rtcNewScene(m_device);
 }
 
@@ -121,16 +135,26 @@ std::ostream& operator<<(std::ostream& o, const std::array<T, N>& arr)
 }
 
 BVH::BVH(const Vec3f* points, size_t numPoints, const Vec3u* triangles, size_t numTriangles,
-         const Vec3f* normals, size_t numNormals)
-    : m_normals(numNormals)
+         const Vec3f* normals, size_t numNormals, const BuildOptions& options)
+    : m_numPoints(numPoints), m_numTriangles(numTriangles), m_normals(numNormals)
 {
     assert(normals!=nullptr || numNormals==0);
     assert(numNormals==3*numTriangles || numNormals==0);
-    
-    m_device = rtcNewDevice("");
+
+    PAINTICLE_PROFILE_SCOPE("accel.bvh_build");
+    m_device = EmbreeDevice::acquire();
     m_scene = rtcNewScene(m_device);
+    RTCBuildQuality quality = toEmbreeBuildQuality(options.quality);
+    rtcSetSceneBuildQuality(m_scene, quality);
+    int flags = RTC_SCENE_FLAG_NONE;
+    if(options.compact)
+        flags |= RTC_SCENE_FLAG_COMPACT;
+    if(options.robust)
+        flags |= RTC_SCENE_FLAG_ROBUST;
+    rtcSetSceneFlags(m_scene, static_cast<RTCSceneFlags>(flags));
 
     RTCGeometry mesh = rtcNewGeometry(m_device, RTC_GEOMETRY_TYPE_TRIANGLE);
+    rtcSetGeometryBuildQuality(mesh, quality);
     m_points = static_cast<Vec3f*>(rtcSetNewGeometryBuffer(mesh, RTC_BUFFER_TYPE_VERTEX, 0,
                                                            RTC_FORMAT_FLOAT3, sizeof(Vec3f), numPoints));
     memcpy(m_points, points, numPoints*sizeof(Vec3f));
@@ -150,9 +174,91 @@ BVH::BVH(const Vec3f* points, size_t numPoints, const Vec3u* triangles, size_t n
     rtcCommitScene(m_scene);
 }
 
+BVH::BVH(BVH&& other)
+    : m_device(other.m_device), m_scene(other.m_scene), m_points(other.m_points), m_numPoints(other.m_numPoints),
+      m_triangles(other.m_triangles), m_numTriangles(other.m_numTriangles), m_normals(std::move(other.m_normals)), m_uvs(std::move(other.m_uvs)),
+      m_uvScales(std::move(other.m_uvScales))
+{
+    other.m_device = nullptr;
+    other.m_scene = nullptr;
+    other.m_points = nullptr;
+    other.m_numPoints = 0;
+    other.m_triangles = nullptr;
+    other.m_numTriangles = 0;
+}
+
 BVH::~BVH()
 {
-    rtcReleaseDevice(m_device);
+    if(m_scene!=nullptr)
+        rtcReleaseScene(m_scene);
+    if(m_device!=nullptr)
+        EmbreeDevice::release();
+}
+
+void BVH::updateGeometry(const Vec3f* points, size_t numPoints, const Vec3f* normals, size_t numNormals)
+{
+    if(m_points==nullptr)
+        throw std::runtime_error("Can't update the geometry of an empty BVH");
+    if(numPoints!=m_numPoints)
+        throw std::runtime_error("The number of points needs to stay the same");
+    if(numNormals!=0 && numNormals!=3*m_numTriangles)
+        throw std::runtime_error("Need 3 normals per triangle");
+
+    PAINTICLE_PROFILE_SCOPE("accel.bvh_refit");
+    RTCGeometry mesh = rtcGetGeometry(m_scene, 0);
+    memcpy(m_points, points, numPoints*sizeof(Vec3f));
+    if(normals!=nullptr && numNormals>0) {
+        m_normals.assign(normals, normals+numNormals);
+    }
+    rtcSetGeometryBuildQuality(mesh, RTC_BUILD_QUALITY_REFIT);
+    rtcUpdateGeometryBuffer(mesh, RTC_BUFFER_TYPE_VERTEX, 0);
+    rtcCommitGeometry(mesh);
+    rtcCommitScene(m_scene);
+    updateUVScales();
+}
+
+void BVH::setUVs(const Vec2f* uvs, size_t numUVs)
+{
+    assert(uvs!=nullptr || numUVs==0);
+    if(numUVs==0) {
+        m_uvs.clear();
+        m_uvScales.clear();
+        return;
+    }
+    size_t numTriangles = numUVs/3;
+    if(numUVs%3!=0 || numTriangles!=m_numTriangles)
+        throw std::runtime_error("Need 3 uvs per triangle");
+    m_uvs.assign(uvs, uvs+numUVs);
+    updateUVScales();
+}
+
+void BVH::updateUVScales()
+{
+    if(m_uvs.empty())
+        return;
+    m_uvScales.resize(m_numTriangles);
+    BEGIN_PARALLEL_FOR(primId, m_numTriangles) {
+        float scale = 0;
+        for(ID corner=0; corner<3; ++corner) {
+            ID next = (corner+1)%3;
+            float length3d = point(primId, corner).distance(point(primId, next));
+            if(length3d > 0)
+                scale = std::max(scale, uv(primId, corner).distance(uv(primId, next)) / length3d);
+        }
+        m_uvScales[primId] = scale;
+    } END_PARALLEL_FOR
+}
+
+void BVH::textureCoordinates(MemView<SurfaceInfo> surfaceInfos, MemView<Vec2f> uvs, MemView<float> uvScales) const
+{
+    if(surfaceInfos.size() != uvs.size() || surfaceInfos.size() != uvScales.size())
+        throw std::runtime_error("surfaceInfos, uvs and uvScales need to have same size");
+
+    BEGIN_PARALLEL_FOR(i, surfaceInfos.size()) {
+        const SurfaceInfo& info = surfaceInfos[i];
+        uvs[i] = interpolateUV(info.tri_index, info.barycentrics);
+        uvScales[i] = uvScale(info.tri_index);
+    } END_PARALLEL_FOR
 }
 
 BVH::SurfaceInfo BVH::closestPoint(float x, float y, float z) const
@@ -188,7 +294,8 @@ void BVH::closestPoints(MemView<Vec3f> points, MemView<SurfaceInfo> results) con
 {
     if(points.size() != results.size())
         throw std::runtime_error("points and results need to have same size");
-    
+
+    PAINTICLE_PROFILE_SCOPE("accel.closest_points");
     BEGIN_PARALLEL_FOR(i, points.size()) {
         const Vec3f& point = points[i];
         results[i] = closestPoint(point.x, point.y, point.z);
@@ -240,6 +347,7 @@ void BVH::shootRays(MemView<Vec3f> origins, MemView<Vec3f> directions, const Mat
     if(origins.size() != results.size())
         throw std::runtime_error("Origins and results need to be of equal size");
 
+    PAINTICLE_PROFILE_SCOPE("accel.shoot_rays");
     BEGIN_PARALLEL_FOR(i, origins.size()) {
         const Vec3f& origin = origins[i];
         const Vec3f& direction = directions[i];
@@ -23,6 +23,7 @@
 #include <iostream>
 
 #include "painticle.h"
+#include "vec2.h"
 #include "vec3.h"
 #include "mat4.h"
 #include "memview.h"
@@ -52,16 +53,50 @@ public:
     };
 
 
+    //! The quality of the built hierarchy. Higher quality takes longer to build, but speeds up the queries.
+    enum class BuildQuality {
+        LOW,
+        MEDIUM,
+        HIGH
+    };
+
+    //! Options controlling how embree builds the hierarchy
+    struct BuildOptions {
+        BuildOptions()
+        : quality(BuildQuality::MEDIUM), compact(false), robust(false)
+        {}
+
+        //! The build quality
+        BuildQuality quality;
+        //! Use a more compact data layout, trading query speed for memory
+        bool compact;
+        //! Avoid optimizations reducing the arithmetic accuracy
+        bool robust;
+    };
+
     //! Default constructor
     BVH();
 
     //! Constructor for a mesh 
     BVH(const Vec3f* points, size_t numPoints, const Vec3u* triangles, size_t numTriangles,
-        const Vec3f* normals, size_t numNormals);
+        const Vec3f* normals, size_t numNormals, const BuildOptions& options = BuildOptions());
+
+    //! The embree scene can't be shared, so a BVH can only be moved
+    BVH(const BVH&) = delete;
+    BVH& operator=(const BVH&) = delete;
+
+    //! Move constructor
+    BVH(BVH&& other);
 
     //! Destructor
     ~BVH();
 
+    //! Move the points of the mesh without changing its topology, e.g. for deforming meshes
+    /**! Instead of building a new hierarchy, embree refits the bounding boxes of the existing one. This is much faster,
+         but the query performance degrades, if the points moved a lot compared to the original build.
+         @param normals 3 per triangle, or none to keep the current ones */
+    void updateGeometry(const Vec3f* points, size_t numPoints, const Vec3f* normals, size_t numNormals);
+
     //! Compute the closest point on the mesh for given point p
     /**! @returns location, normal, tri_index, barycentrics */
     SurfaceInfo closestPoint(float x, float y, float z) const;
@@ -79,14 +114,46 @@ public:
     void shootRays(MemView<Vec3f> origins, MemView<Vec3f> directions, const Mat4f& toObjectTransform,
                    MemView<SurfaceInfo> results) const;
 
+    //! Get the number of triangles
+    size_t numTriangles() const
+    { return m_numTriangles; }
+
+    //! Check if split normals have been given
+    bool hasNormals() const
+    { return !m_normals.empty(); }
+
     //! Get the coordinates of a corner of a triangle
     inline Vec3f point(const ID& primId, const ID& corner) const;
 
     //! Get the coordinates of a corner of a triangle
     inline Vec3f normal(const ID& primId, const ID& corner) const;
 
+    //! Set the texture coordinates of the triangle corners
+    /**! @param uvs 3 uvs per triangle in the same order as the triangles */
+    void setUVs(const Vec2f* uvs, size_t numUVs);
+
+    //! Check if texture coordinates have been set
+    bool hasUVs() const
+    { return !m_uvs.empty(); }
+
+    //! Get the texture coordinate of a corner of a triangle
+    inline Vec2f uv(const ID& primId, const ID& corner) const;
+
+    //! Interpolate the texture coordinate inside a triangle, (0,0) if no uvs have been set
+    inline Vec2f interpolateUV(const ID& primId, const Vec3f& barycentrics) const;
+
+    //! Get the length in texture space of a unit length in object space on the given triangle
+    /**! Since the mapping is usually not isotropic, this is the maximum over the triangle's edges. */
+    inline float uvScale(const ID& primId) const;
+
+    //! Compute texture coordinates and uv scales for the given points on the surface
+    void textureCoordinates(MemView<SurfaceInfo> surfaceInfos, MemView<Vec2f> uvs, MemView<float> uvScales) const;
+
 private:
-    //! The embree device to use
+    //! Compute the uv scale of each triangle from the current points and uvs
+    void updateUVScales();
+
+    //! The embree device to use, shared with all other BVHs
     RTCDevice m_device;
 
     //! The scene representation
@@ -95,11 +162,23 @@ private:
     //! The points buffer, if filled, else nullptr (managed by embree)
     Vec3f* m_points;
 
+    //! The number of points in the points buffer
+    size_t m_numPoints;
+
     //! The triangles buffer, if filled, else nullptr (managed by embree)
     Vec3u* m_triangles;
 
+    //! The number of triangles in the triangles buffer
+    size_t m_numTriangles;
+
     //! The normal indices of the mesh
     std::vector<Vec3f> m_normals;
+
+    //! The texture coordinates of the triangle corners
+    std::vector<Vec2f> m_uvs;
+
+    //! The uv scale of each triangle
+    std::vector<float> m_uvScales;
 };
 
 
@@ -119,5 +198,26 @@ inline Vec3f BVH::normal(const ID& primId, const ID& corner) const
     return m_normals[primId*3+corner];
 }
 
+inline Vec2f BVH::uv(const ID& primId, const ID& corner) const
+{
+    assert(corner<3);
+    assert(m_uvs.size() > primId*3);
+    return m_uvs[primId*3+corner];
+}
+
+inline Vec2f BVH::interpolateUV(const ID& primId, const Vec3f& barycentrics) const
+{
+    if(m_uvs.empty() || primId==ID_NONE)
+        return Vec2f(0,0);
+    return uv(primId, 0)*barycentrics[0] + uv(primId, 1)*barycentrics[1] + uv(primId, 2)*barycentrics[2];
+}
+
+inline float BVH::uvScale(const ID& primId) const
+{
+    if(m_uvScales.empty() || primId==ID_NONE)
+        return 0;
+    return m_uvScales[primId];
+}
+
 
 END_PAINTICLE_NAMESPACE
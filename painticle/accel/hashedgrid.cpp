@@ -15,6 +15,7 @@
 
 #include "hashedgrid.h"
 #include "parallel.h"
+#include "profiling.h"
 
 #include <algorithm>
 #include <cassert>
@@ -31,6 +32,7 @@ HashedGrid::~HashedGrid()
 
 void HashedGrid::build(MemView<Vec3f> positions)
 {
+    PAINTICLE_PROFILE_SCOPE("accel.hashed_grid_build");
     m_sortedParticleIDs.resize(positions.size());
 
     BEGIN_PARALLEL_FOR(i, positions.size()) {
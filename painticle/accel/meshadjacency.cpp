@@ -0,0 +1,106 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#include "meshadjacency.h"
+#include "parallel.h"
+#include "profiling.h"
+
+#include <tbb/parallel_sort.h>
+
+#include <algorithm>
+#include <stdexcept>
+
+BEGIN_PAINTICLE_NAMESPACE
+
+namespace {
+
+//! A corner of a triangle, sorted by vertex to build the vertex triangles
+struct VertexTriangle {
+    ID vertex;
+    ID triangle;
+
+    bool operator<(const VertexTriangle& other) const
+    { return vertex<other.vertex || (vertex==other.vertex && triangle<other.triangle); }
+};
+
+}
+
+MeshAdjacency::MeshAdjacency()
+{}
+
+MeshAdjacency::MeshAdjacency(const Vec3u* triangles, size_t numTriangles, size_t numPoints)
+: m_triangles(triangles, triangles+numTriangles),
+  m_vertexOffsets(numPoints+1, 0),
+  m_vertexTriangles(3*numTriangles),
+  m_neighbours(3*numTriangles, ID_NONE)
+{
+    PAINTICLE_PROFILE_SCOPE("accel.mesh_adjacency_build");
+    for(const Vec3u& tri : m_triangles) {
+        if(tri.x>=numPoints || tri.y>=numPoints || tri.z>=numPoints)
+            throw std::runtime_error("Triangle refers to a point, that doesn't exist");
+    }
+
+    // Sorting the corners by vertex gives the vertex triangles without any synchronization between threads
+    std::vector<VertexTriangle> corners(3*numTriangles);
+    BEGIN_PARALLEL_FOR(i, corners.size()) {
+        corners[i].vertex = m_triangles[i/3][i%3];
+        corners[i].triangle = static_cast<ID>(i/3);
+    } END_PARALLEL_FOR
+    tbb::parallel_sort(corners.begin(), corners.end());
+
+    BEGIN_PARALLEL_FOR(i, corners.size()) {
+        m_vertexTriangles[i] = corners[i].triangle;
+        // The first corner of each vertex sets the offsets of itself and all preceding vertices without triangles
+        ID previous = i>0 ? corners[i-1].vertex : ID_NONE;
+        if(previous!=corners[i].vertex) {
+            for(ID vertex=previous+1; vertex<=corners[i].vertex; ++vertex)
+                m_vertexOffsets[vertex] = static_cast<ID>(i);
+        }
+    } END_PARALLEL_FOR
+    ID lastVertex = corners.empty() ? ID_NONE : corners.back().vertex;
+    for(size_t vertex=lastVertex+1; vertex<=numPoints; ++vertex)
+        m_vertexOffsets[vertex] = static_cast<ID>(corners.size());
+
+    BEGIN_PARALLEL_FOR(triId, numTriangles) {
+        const Vec3u& tri = m_triangles[triId];
+        for(ID edge=0; edge<3; ++edge) {
+            ID start = tri[edge];
+            ID end = tri[(edge+1)%3];
+            auto range = vertexTriangles(start);
+            for(const ID* other=range.first; other!=range.second; ++other) {
+                const Vec3u& otherTri = m_triangles[*other];
+                if(*other!=triId && (otherTri.x==end || otherTri.y==end || otherTri.z==end)) {
+                    m_neighbours[3*triId+edge] = *other;
+                    break;
+                }
+            }
+        }
+    } END_PARALLEL_FOR
+}
+
+void MeshAdjacency::triangleRing(const ID& triId, std::vector<ID>& ring) const
+{
+    ring.clear();
+    const Vec3u& tri = triangle(triId);
+    for(ID corner=0; corner<3; ++corner) {
+        auto range = vertexTriangles(tri[corner]);
+        ring.insert(ring.end(), range.first, range.second);
+    }
+    std::sort(ring.begin(), ring.end());
+    ring.erase(std::unique(ring.begin(), ring.end()), ring.end());
+    ring.erase(std::remove(ring.begin(), ring.end(), triId), ring.end());
+}
+
+END_PAINTICLE_NAMESPACE
@@ -0,0 +1,132 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#pragma once
+
+#include "painticle.h"
+#include "vec3.h"
+
+#include <assert.h>
+#include <utility>
+#include <vector>
+
+BEGIN_PAINTICLE_NAMESPACE
+
+//! The connectivity of a triangle mesh
+/**! The triangles of each vertex are stored in compressed sparse row layout: the triangles of vertex v are
+     vertexTriangles()[vertexOffsets()[v] .. vertexOffsets()[v+1]], sorted by their index. Additionally the neighbour
+     across each edge of a triangle is stored. Edge k of a triangle connects its corners k and (k+1)%3. */
+class MeshAdjacency
+{
+public:
+    //! Default constructor
+    MeshAdjacency();
+
+    //! Build the adjacency of the given triangles
+    /**! @param numPoints the number of points, the triangles' vertex indices refer to */
+    MeshAdjacency(const Vec3u* triangles, size_t numTriangles, size_t numPoints);
+
+    //! Query the number of triangles
+    inline size_t numTriangles() const;
+
+    //! Query the number of points
+    inline size_t numPoints() const;
+
+    //! Get the vertex indices of a triangle
+    inline const Vec3u& triangle(const ID& triId) const;
+
+    //! Get the range of the triangles using the given vertex
+    inline std::pair<const ID*, const ID*> vertexTriangles(const ID& vertex) const;
+
+    //! Get the triangle sharing the given edge of a triangle or ID_NONE for border edges
+    /**! For non-manifold edges, this is the one with the lowest index. */
+    inline ID neighbour(const ID& triId, const ID& edge) const;
+
+    //! Get the edge of triangle triId, which is shared with triangle other, or ID_NONE if they aren't neighbours
+    inline ID sharedEdge(const ID& triId, const ID& other) const;
+
+    //! Collect all triangles sharing at least one vertex with the given one, excluding the triangle itself
+    /**! @param ring gets cleared and filled with the sorted triangle indices */
+    void triangleRing(const ID& triId, std::vector<ID>& ring) const;
+
+    //! Access the offsets into the vertex triangles, one more than the number of points
+    inline const std::vector<ID>& vertexOffsets() const;
+
+    //! Access the triangles of all vertices
+    inline const std::vector<ID>& vertexTriangles() const;
+
+    //! Access the edge neighbours, 3 per triangle
+    inline const std::vector<ID>& neighbours() const;
+
+private:
+    //! The vertex indices of the triangles
+    std::vector<Vec3u> m_triangles;
+
+    //! The offset of each vertex' triangles in m_vertexTriangles
+    std::vector<ID> m_vertexOffsets;
+
+    //! The triangles of all vertices
+    std::vector<ID> m_vertexTriangles;
+
+    //! The neighbour across each edge, 3 per triangle
+    std::vector<ID> m_neighbours;
+};
+
+
+inline size_t MeshAdjacency::numTriangles() const
+{ return m_triangles.size(); }
+
+inline size_t MeshAdjacency::numPoints() const
+{ return m_vertexOffsets.empty() ? 0 : m_vertexOffsets.size()-1; }
+
+inline const Vec3u& MeshAdjacency::triangle(const ID& triId) const
+{
+    assert(triId<m_triangles.size());
+    return m_triangles[triId];
+}
+
+inline std::pair<const ID*, const ID*> MeshAdjacency::vertexTriangles(const ID& vertex) const
+{
+    assert(vertex+1<m_vertexOffsets.size());
+    const ID* data = m_vertexTriangles.data();
+    return std::make_pair(data+m_vertexOffsets[vertex], data+m_vertexOffsets[vertex+1]);
+}
+
+inline ID MeshAdjacency::neighbour(const ID& triId, const ID& edge) const
+{
+    assert(edge<3);
+    assert(triId*3+edge<m_neighbours.size());
+    return m_neighbours[triId*3+edge];
+}
+
+inline ID MeshAdjacency::sharedEdge(const ID& triId, const ID& other) const
+{
+    for(ID edge=0; edge<3; ++edge) {
+        if(neighbour(triId, edge)==other)
+            return edge;
+    }
+    return ID_NONE;
+}
+
+inline const std::vector<ID>& MeshAdjacency::vertexOffsets() const
+{ return m_vertexOffsets; }
+
+inline const std::vector<ID>& MeshAdjacency::vertexTriangles() const
+{ return m_vertexTriangles; }
+
+inline const std::vector<ID>& MeshAdjacency::neighbours() const
+{ return m_neighbours; }
+
+END_PAINTICLE_NAMESPACE
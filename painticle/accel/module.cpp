@@ -14,14 +14,19 @@
 // along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
 
 
+#include "embreedevice.h"
 #include "gpubvh.h"
 #include "hashedgrid.h"
+#include "meshadjacency.h"
 #include "color_conversion.h"
+#include "cpupainter.h"
 #include "vec3.h"
 #include "mat4.h"
 #include "particledata.h"
 #include "memview.h"
 #include "parallel.h"
+#include "profiling.h"
+#include "surfacewalk.h"
 
 #include "pybind11/pybind11.h"
 #include "pybind11/stl.h"
@@ -37,7 +42,7 @@ namespace {
 
 /** Factory function to create a BVH from numpy arrays specifying the geometry. */
 BVH buildBVH_py(pybind11::array_t<float> points, pybind11::array_t<unsigned int> triangles,
-                pybind11::array_t<float> normals)
+                pybind11::array_t<float> normals, BVH::BuildQuality quality, bool compact, bool robust)
 {
     if(points.size() %3 != 0)
         throw std::runtime_error("Points buffer needs 3-dimensional coordinates");
@@ -50,9 +55,13 @@ BVH buildBVH_py(pybind11::array_t<float> points, pybind11::array_t<unsigned int>
     pybind11::buffer_info triangles_buf = triangles.request();
     pybind11::buffer_info normals_buf = normals.request();
 
+    BVH::BuildOptions options;
+    options.quality = quality;
+    options.compact = compact;
+    options.robust = robust;
     return BVH(static_cast<Vec3f*>(points_buf.ptr), points.size()/3,
                static_cast<Vec3u*>(triangles_buf.ptr), triangles.size()/3,
-               static_cast<Vec3f*>(normals_buf.ptr), normals.size()/3);
+               static_cast<Vec3f*>(normals_buf.ptr), normals.size()/3, options);
 }
 
 template<class T>
@@ -84,31 +93,102 @@ inline MemView<Vec3f> toMemView3D(const pybind11::array_t<float>& data)
 	return MemView<Vec3f>(dataBuf.ptr, length, stride);
 }
 
+/** Get the array, results are written into. A new array is allocated, if out is None, otherwise out is checked to
+    provide room for exactly size elements of T. out may be a structured array with a compatible item size or an
+    unstructured array with one row per element, e.g. a scratch buffer reused on every time step. */
+template<class T>
+pybind11::array resultArray(pybind11::object out, size_t size)
+{
+    if(out.is_none())
+        return pybind11::array_t<T>(size);
+    if(!pybind11::isinstance<pybind11::array>(out))
+        throw std::runtime_error("Error. out needs to be a numpy array.");
+    auto result = pybind11::reinterpret_borrow<pybind11::array>(out);
+    if(!result.writeable())
+        throw std::runtime_error("Error. out needs to be writeable.");
+    if(result.ndim()==0 || static_cast<size_t>(result.shape(0))!=size)
+        throw std::runtime_error("Error. out needs to have " + std::to_string(size) + " rows.");
+    size_t rowSize = result.itemsize();
+    if(result.ndim()==2 && result.strides(1)==static_cast<pybind11::ssize_t>(result.itemsize()))
+        rowSize *= result.shape(1);
+    else if(result.ndim()!=1)
+        throw std::runtime_error("Error. out needs to be one or two dimensional with contiguous rows.");
+    if(rowSize!=sizeof(T))
+        throw std::runtime_error("Error. The rows of out need " + std::to_string(sizeof(T)) + " bytes.");
+    return result;
+}
+
+template<class T>
+inline MemView<T> toResultMemView(pybind11::array& data)
+{
+    return MemView<T>(data.mutable_data(), data.shape(0), data.strides(0));
+}
+
 /** A parallel numpy supported version of the closest_point function of the BVH. */
-pybind11::array_t<BVH::SurfaceInfo> closest_points_bvh(BVH& bvh, pybind11::array_t<Vec3f> points)
+pybind11::array closest_points_bvh(BVH& bvh, pybind11::array_t<Vec3f> points, pybind11::object out)
 {
     auto points_view = toMemView(points);
-    pybind11::array_t<BVH::SurfaceInfo> results(points_view.size());
-    auto results_view = toMemView(results);
+    pybind11::array results = resultArray<BVH::SurfaceInfo>(out, points_view.size());
+    auto results_view = toResultMemView<BVH::SurfaceInfo>(results);
 
     bvh.closestPoints(points_view, results_view);
     return results;
 }
 
 /** A parallel numpy supported version of the shoot_ray function of the BVH. */
-pybind11::array_t<BVH::SurfaceInfo>
+pybind11::array
 shootRays_bvh(BVH& bvh, pybind11::array_t<float> origins, pybind11::array_t<float> directions,
-              const Mat4f& toObjectTransform)
+              const Mat4f& toObjectTransform, pybind11::object out)
 {
     auto origins_view = toMemView3D(origins);
     auto directions_view = toMemView3D(directions);
-    pybind11::array_t<BVH::SurfaceInfo> results(origins_view.size());
-    auto results_view = toMemView(results);
+    pybind11::array results = resultArray<BVH::SurfaceInfo>(out, origins_view.size());
+    auto results_view = toResultMemView<BVH::SurfaceInfo>(results);
 
     bvh.shootRays(origins_view, directions_view, toObjectTransform, results_view);
     return results;
 }
 
+/** Refit the BVH to new point positions given as numpy arrays. */
+void updateGeometry_bvh(BVH& bvh, pybind11::array_t<float> points, pybind11::array_t<float> normals)
+{
+    if(points.size() %3 != 0)
+        throw std::runtime_error("Points buffer needs 3-dimensional coordinates");
+    if(normals.size() %3 != 0)
+        throw std::runtime_error("Normals buffer needs 3-dimensional indices");
+    pybind11::buffer_info points_buf = points.request();
+    pybind11::buffer_info normals_buf = normals.request();
+    bvh.updateGeometry(static_cast<Vec3f*>(points_buf.ptr), points.size()/3,
+                       static_cast<Vec3f*>(normals_buf.ptr), normals.size()/3);
+}
+
+/** Set the uvs of the triangle corners from a numpy array. */
+void setUVs_bvh(BVH& bvh, pybind11::array_t<float> uvs)
+{
+    if(uvs.size() %2 != 0)
+        throw std::runtime_error("UV buffer needs 2-dimensional coordinates");
+    pybind11::buffer_info uvs_buf = uvs.request();
+    bvh.setUVs(static_cast<Vec2f*>(uvs_buf.ptr), uvs.size()/2);
+}
+
+/** A parallel numpy supported version of the texture_coordinates function of the BVH. */
+std::tuple<pybind11::array, pybind11::array>
+textureCoordinates_bvh(BVH& bvh, pybind11::array_t<BVH::SurfaceInfo> surface_infos, pybind11::object out)
+{
+    auto surface_infos_view = toMemView(surface_infos);
+    pybind11::object uvs_out = pybind11::none();
+    pybind11::object uv_scales_out = pybind11::none();
+    if(!out.is_none()) {
+        auto outs = out.cast<std::tuple<pybind11::object, pybind11::object>>();
+        uvs_out = std::get<0>(outs);
+        uv_scales_out = std::get<1>(outs);
+    }
+    pybind11::array uvs = resultArray<Vec2f>(uvs_out, surface_infos_view.size());
+    pybind11::array uv_scales = resultArray<float>(uv_scales_out, surface_infos_view.size());
+    bvh.textureCoordinates(surface_infos_view, toResultMemView<Vec2f>(uvs), toResultMemView<float>(uv_scales));
+    return std::make_tuple(uvs, uv_scales);
+}
+
 void build_hashedGrid(HashedGrid& hashedGrid, pybind11::array_t<float> positions)
 {
     auto positions_view = toMemView3D(positions);
@@ -116,33 +196,34 @@ void build_hashedGrid(HashedGrid& hashedGrid, pybind11::array_t<float> positions
 }
 
 /** A parallel numpy supported version of the rgb2hsv function. */
-pybind11::array_t<Vec3f> rgb2hsv_py(pybind11::array_t<Vec3f> rgb)
+pybind11::array rgb2hsv_py(pybind11::array_t<Vec3f> rgb, pybind11::object out)
 {
     auto rgb_view = toMemView(rgb);
-    pybind11::array_t<Vec3f> results(rgb_view.size());
-    auto results_view = toMemView(results);
+    pybind11::array results = resultArray<Vec3f>(out, rgb_view.size());
+    auto results_view = toResultMemView<Vec3f>(results);
     rgb2hsv(rgb_view, results_view);
     return results;
 }
 
 /** A parallel numpy supported version of the hsv2rgb function. */
-pybind11::array_t<Vec3f> hsv2rgb_py(pybind11::array_t<Vec3f> hsv)
+pybind11::array hsv2rgb_py(pybind11::array_t<Vec3f> hsv, pybind11::object out)
 {
     auto hsv_view = toMemView(hsv);
-    pybind11::array_t<Vec3f> results(hsv_view.size());
-    auto results_view = toMemView(results);
+    pybind11::array results = resultArray<Vec3f>(out, hsv_view.size());
+    auto results_view = toResultMemView<Vec3f>(results);
     hsv2rgb(hsv_view, results_view);
     return results;
 }
 
 /** A parallel numpy supported version of the hsv2rgb function. */
-pybind11::array_t<Vec3f> apply_hsv_offset_py(pybind11::array_t<float> rgb, pybind11::array_t<float> hsv_offsets)
+pybind11::array apply_hsv_offset_py(pybind11::array_t<float> rgb, pybind11::array_t<float> hsv_offsets,
+                                    pybind11::object out)
 {
     auto rgb_view = toMemView3D(rgb);
     auto hsvOffsets_view = toMemView3D(hsv_offsets);
 
-    pybind11::array_t<Vec3f> results(hsvOffsets_view.size());
-    auto results_view = toMemView(results);
+    pybind11::array results = resultArray<Vec3f>(out, hsvOffsets_view.size());
+    auto results_view = toResultMemView<Vec3f>(results);
     applyHsvOffset(rgb_view, hsvOffsets_view, results_view);
 
     return results;
@@ -159,6 +240,15 @@ void add_particles_from_rays(ParticleData& p,
                            speed_range, speed_random, size_range, mass_range, age_range, avg_color, hsv_color_range);
 }
 
+/** Get the recorded timings of a native stage as numpy array with fields start and duration. */
+pybind11::array_t<TimingSample> profiling_samples_py(const std::string& stage)
+{
+    auto samples = Profiler::instance().stage(stage).samples();
+    pybind11::array_t<TimingSample> result(samples.size());
+    std::copy(samples.begin(), samples.end(), result.mutable_data());
+    return result;
+}
+
 template<typename T>
 inline
 pybind11::array getVector(const std::vector<T>& v)
@@ -169,6 +259,43 @@ pybind11::array getVector(const std::vector<T>& v)
 }
 
 
+/** Get a numpy view of a vector, that's owned by the python object owner. The view keeps its owner alive. */
+template<typename T>
+inline
+pybind11::array getOwnedVector(const std::vector<T>& v, pybind11::handle owner)
+{
+    auto dtype = pybind11::dtype::of<T>();
+    return pybind11::array(dtype, {v.size()}, {sizeof(T)}, v.data(), owner);
+}
+
+/** Factory function to create the adjacency of triangles given as numpy array of vertex indices. */
+MeshAdjacency buildMeshAdjacency_py(pybind11::array_t<unsigned int> triangles, size_t numPoints)
+{
+    if(triangles.size() %3 != 0)
+        throw std::runtime_error("Triangles buffer needs 3-dimensional indices");
+    pybind11::buffer_info triangles_buf = triangles.request();
+    return MeshAdjacency(static_cast<Vec3u*>(triangles_buf.ptr), triangles.size()/3, numPoints);
+}
+
+/** Get the triangles using a vertex as numpy array. */
+pybind11::array_t<ID> vertexTriangles_adjacency(const MeshAdjacency& adjacency, ID vertex)
+{
+    if(vertex>=adjacency.numPoints())
+        throw std::out_of_range("Vertex index out of range");
+    auto range = adjacency.vertexTriangles(vertex);
+    return pybind11::array_t<ID>(range.second-range.first, range.first);
+}
+
+/** Get the triangle 1-ring of a triangle as numpy array. */
+pybind11::array_t<ID> triangleRing_adjacency(const MeshAdjacency& adjacency, ID triId)
+{
+    if(triId>=adjacency.numTriangles())
+        throw std::out_of_range("Triangle index out of range");
+    std::vector<ID> ring;
+    adjacency.triangleRing(triId, ring);
+    return pybind11::array_t<ID>(ring.size(), ring.data());
+}
+
 template<typename T>
 inline
 pybind11::array getParticleFieldData(ParticleField<T>& f)
@@ -202,6 +329,66 @@ void setParticleFieldData(ParticleField<T>& f, pybind11::array_t<T> other)
     }
 }
 
+/** Factory function to create the paint mesh from numpy arrays of loop points, loop uvs and loop triangles. */
+PaintMesh buildPaintMesh_py(pybind11::array_t<float> loop_points, pybind11::array_t<float> uvs,
+                            pybind11::array_t<unsigned int> triangle_loops)
+{
+    if(loop_points.size() %3 != 0)
+        throw std::runtime_error("Points buffer needs 3-dimensional coordinates");
+    if(uvs.size() %2 != 0)
+        throw std::runtime_error("UV buffer needs 2-dimensional coordinates");
+    if(triangle_loops.size() %3 != 0)
+        throw std::runtime_error("Triangles buffer needs 3-dimensional indices");
+    if(uvs.size()/2 != loop_points.size()/3)
+        throw std::runtime_error("Need one uv per loop point");
+    pybind11::buffer_info points_buf = loop_points.request();
+    pybind11::buffer_info uvs_buf = uvs.request();
+    pybind11::buffer_info triangles_buf = triangle_loops.request();
+    return PaintMesh(static_cast<Vec3f*>(points_buf.ptr), static_cast<Vec2f*>(uvs_buf.ptr), loop_points.size()/3,
+                     static_cast<Vec3u*>(triangles_buf.ptr), triangle_loops.size()/3);
+}
+
+/** Refit the paint mesh to new loop points given as numpy array. */
+void updatePoints_paintMesh(PaintMesh& mesh, pybind11::array_t<float> loop_points)
+{
+    if(loop_points.size() %3 != 0)
+        throw std::runtime_error("Points buffer needs 3-dimensional coordinates");
+    pybind11::buffer_info points_buf = loop_points.request();
+    mesh.updatePoints(static_cast<Vec3f*>(points_buf.ptr), loop_points.size()/3);
+}
+
+/** Check, that image is a writeable, C contiguous (height x width x components) numpy array. */
+template<typename T>
+void checkImage(const pybind11::array_t<T>& image, pybind11::ssize_t components)
+{
+    if(!image.writeable())
+        throw std::runtime_error("Error. The image needs to be writeable.");
+    if(image.ndim()!=3 || image.shape(2)!=components)
+        throw std::runtime_error("Error. The image needs the shape (height, width, " + std::to_string(components) +
+                                 ").");
+    if(!(image.flags() & pybind11::array::c_style))
+        throw std::runtime_error("Error. The image needs to be C contiguous.");
+}
+
+/** Paint the particles into a numpy RGBA float image like the texel_gather paint mode of the GPU painter. */
+void paintParticles_py(pybind11::array_t<float> image, const PaintMesh& mesh, const HashedGrid& grid,
+                       const ParticleData& particles, float strength, float timeStep, float sizeAgeFactor,
+                       const Vec2f& uvOffset)
+{
+    checkImage(image, 4);
+    paintParticles(image.mutable_data(), image.shape(1), image.shape(0), mesh, grid, particles, strength, timeStep,
+                   sizeAgeFactor, uvOffset);
+}
+
+/** Get a (height x width) numpy array being 255 for the texels covered by the mesh's uv triangles. */
+pybind11::array_t<Byte> rasterizeUVMask_py(const PaintMesh& mesh, size_t width, size_t height, const Vec2f& uvOffset)
+{
+    pybind11::array_t<Byte> mask({height, width});
+    std::fill(mask.mutable_data(), mask.mutable_data()+mask.size(), 0);
+    rasterizeUVMask(mask.mutable_data(), width, height, mesh, uvOffset);
+    return mask;
+}
+
 inline float smoothstep(float edge0, float edge1, float x)
 {
     // Scale, bias and saturate x to 0..1 range
@@ -215,18 +402,19 @@ inline float smoothstep(float edge0, float edge1, float x)
 
 #define COULOMB_FORCE
 
-pybind11::array_t<Vec3f> repelForces_py(const HashedGrid& grid, ParticleData& particles,
-                                        float repulsionFactor, float timeStep)
+pybind11::array repelForces_py(const HashedGrid& grid, ParticleData& particles,
+                               float repulsionFactor, float timeStep, pybind11::object out)
 {
     if(grid.numParticles() != particles.location.length()) {
         throw std::runtime_error("Incompatible grid and particles. Both need to represent the same particles: "+
                                  std::to_string(grid.numParticles()) + " vs. " +
                                  std::to_string(particles.location.length()));
     }
-    
+
+    PAINTICLE_PROFILE_SCOPE("accel.repel_forces");
     size_t numParticles = grid.numParticles();
-    pybind11::array_t<Vec3f> result(numParticles);
-    auto forces = toMemView(result);
+    pybind11::array result = resultArray<Vec3f>(out, numParticles);
+    auto forces = toResultMemView<Vec3f>(result);
     const auto& cellOffsets = grid.cellOffsets();
     const auto& sortedParticleIDs = grid.sortedParticleIDs();
     BEGIN_PARALLEL_FOR(i, grid.numParticles()) {
@@ -318,6 +506,8 @@ PYBIND11_MODULE(accel, m) {
     PYBIND11_NUMPY_DTYPE(Vec2f, x,y);
     PYBIND11_NUMPY_DTYPE(Vec3f, x,y,z);
     PYBIND11_NUMPY_DTYPE(BVH::SurfaceInfo, location, normal, tri_index, barycentrics);
+    PYBIND11_NUMPY_DTYPE(TimingSample, start, duration);
+    m.attr("surface_info_dtype") = py::dtype::of<BVH::SurfaceInfo>();
 
     // Class definitions
     py::class_<BVH::SurfaceInfo>(m, "SurfaceInfo")
@@ -327,12 +517,48 @@ PYBIND11_MODULE(accel, m) {
         .def_readonly("barycentrics", &BVH::SurfaceInfo::barycentrics);
 
 
+    py::enum_<BVH::BuildQuality>(m, "BuildQuality")
+        .value("LOW", BVH::BuildQuality::LOW)
+        .value("MEDIUM", BVH::BuildQuality::MEDIUM)
+        .value("HIGH", BVH::BuildQuality::HIGH);
+
     py::class_<BVH>(m, "BVH")
         .def(py::init<>())
         .def("closest_point", &BVH::closestPoint)
-        .def("closest_points", &closest_points_bvh)
+        .def("closest_points", &closest_points_bvh, py::arg("points"), py::arg("out")=py::none())
         .def("shoot_ray", &BVH::shootRay)
-        .def("shoot_rays", &shootRays_bvh);
+        .def("shoot_rays", &shootRays_bvh, py::arg("origins"), py::arg("directions"),
+             py::arg("to_object_transform"), py::arg("out")=py::none())
+        .def("update_geometry", &updateGeometry_bvh,
+             "Refit the BVH to moved points of an unchanged topology. Pass an empty normals array to keep them.")
+        .def("set_uvs", &setUVs_bvh, "Set the uvs of the triangle corners, 3 per triangle")
+        .def_property_readonly("has_uvs", &BVH::hasUVs)
+        .def("texture_coordinates", &textureCoordinates_bvh,
+             "Get the uvs and uv scales of the surface points returned by closest_points or shoot_rays. "
+             "out may be a tuple of the arrays to write the uvs and uv scales into.",
+             py::arg("surface_infos"), py::arg("out")=py::none());
+
+    py::class_<MeshAdjacency>(m, "MeshAdjacency")
+        .def(py::init<>())
+        .def_property_readonly("num_triangles", &MeshAdjacency::numTriangles)
+        .def_property_readonly("num_points", &MeshAdjacency::numPoints)
+        .def("vertex_triangles", &vertexTriangles_adjacency, "Get the triangles using the given vertex")
+        .def("neighbour", [](const MeshAdjacency& a, ID triId, ID edge) {
+                 if(triId>=a.numTriangles() || edge>=3)
+                     throw std::out_of_range("Triangle or edge index out of range");
+                 return a.neighbour(triId, edge);
+             }, "Get the triangle across edge (corner edge to corner edge+1) of a triangle or id_none")
+        .def("triangle_ring", &triangleRing_adjacency,
+             "Get all triangles sharing at least one vertex with the given triangle")
+        .def_property_readonly("vertex_offsets", [](py::object self)
+                               { return getOwnedVector(self.cast<const MeshAdjacency&>().vertexOffsets(), self); },
+                               "The offsets of each vertex' triangles in vertex_triangle_ids, one more than points")
+        .def_property_readonly("vertex_triangle_ids", [](py::object self)
+                               { return getOwnedVector(self.cast<const MeshAdjacency&>().vertexTriangles(), self); },
+                               "The triangles of all vertices in compressed sparse row layout")
+        .def_property_readonly("neighbours", [](py::object self)
+                               { return getOwnedVector(self.cast<const MeshAdjacency&>().neighbours(), self); },
+                               "The neighbours across the edges of all triangles, 3 per triangle");
 
     py::class_<HashedGrid>(m, "HashedGrid")
         .def(py::init<float>())
@@ -348,14 +574,57 @@ PYBIND11_MODULE(accel, m) {
         .def_property_readonly("cell_offsets",
                                [](HashedGrid& g) -> py::array
                                { return getVector(g.cellOffsets()); } );
+    py::class_<PaintMesh>(m, "PaintMesh")
+        .def(py::init<>())
+        .def_property_readonly("num_loops", &PaintMesh::numLoops)
+        .def_property_readonly("num_triangles", &PaintMesh::numTriangles)
+        .def("update_points", &updatePoints_paintMesh,
+             "Move the loop points of an unchanged topology", py::arg("loop_points"));
     m.attr("num_hashed_grid_entries") = py::int_(HashedGrid::NUM_HASHED_GRID_ENTRIES);
     m.attr("id_none") = py::int_(ID_NONE);
 
-    m.def("repel_forces", &repelForces_py, "Calculate repulsion forces between the particles");
-    m.def("build_bvh", &buildBVH_py, "Build the BVH acceleration structure");
-    m.def("rgb2hsv", &rgb2hsv_py, "Convert a numpy array of colors from rgb to hsv");
-    m.def("hsv2rgb", &hsv2rgb_py, "Convert a numpy array of colors from rgb to hsv");
-    m.def("apply_hsv_offsets", &apply_hsv_offset_py, "Apply an offset to a color in HSV color space");
+    m.def("repel_forces", &repelForces_py, "Calculate repulsion forces between the particles",
+          py::arg("grid"), py::arg("particles"), py::arg("repulsion_factor"), py::arg("timestep"),
+          py::arg("out")=py::none());
+    m.def("build_bvh", &buildBVH_py, "Build the BVH acceleration structure",
+          py::arg("points"), py::arg("triangles"), py::arg("normals"),
+          py::arg("quality")=BVH::BuildQuality::MEDIUM, py::arg("compact")=false, py::arg("robust")=false);
+    m.def("walk_particles", &walkParticles,
+          "Move the particles from their surface points along the surface towards their locations. Returns the number "
+          "of particles, which needed a closest point query.",
+          py::arg("particles"), py::arg("bvh"), py::arg("adjacency"), py::arg("max_crossings")=32);
+    m.def("build_mesh_adjacency", &buildMeshAdjacency_py, "Build the adjacency of a triangle mesh",
+          py::arg("triangles"), py::arg("num_points"));
+    m.def("build_paint_mesh", &buildPaintMesh_py, "Build the mesh painted by paint_particles",
+          py::arg("loop_points"), py::arg("uvs"), py::arg("triangle_loops"));
+    m.def("paint_particles", &paintParticles_py,
+          "Paint the particles into a (height, width, 4) float32 image like the texel_gather paint mode of the GPU "
+          "painter. The grid needs to be built from the particles' locations.",
+          py::arg("image").noconvert(), py::arg("mesh"), py::arg("grid"), py::arg("particles"), py::arg("strength"),
+          py::arg("time_step"), py::arg("particle_size_age_factor"), py::arg("uv_offset")=Vec2f(0, 0));
+    m.def("rasterize_uv_mask", &rasterizeUVMask_py,
+          "Get a (height, width) uint8 array being 255 for the texels covered by the mesh's uv triangles",
+          py::arg("mesh"), py::arg("width"), py::arg("height"), py::arg("uv_offset")=Vec2f(0, 0));
+    m.def("set_embree_threads", &EmbreeDevice::setNumThreads,
+          "Set the number of threads used for building BVHs, 0 means all hardware threads. Only takes effect, "
+          "when no BVH exists.");
+    m.def("embree_threads", &EmbreeDevice::numThreads, "The number of threads used for building BVHs");
+    m.def("embree_device_users", &EmbreeDevice::refCount, "The number of BVHs sharing the embree device");
+    m.def("rgb2hsv", &rgb2hsv_py, "Convert a numpy array of colors from rgb to hsv",
+          py::arg("rgb"), py::arg("out")=py::none());
+    m.def("hsv2rgb", &hsv2rgb_py, "Convert a numpy array of colors from rgb to hsv",
+          py::arg("hsv"), py::arg("out")=py::none());
+    m.def("apply_hsv_offsets", &apply_hsv_offset_py, "Apply an offset to a color in HSV color space",
+          py::arg("rgb"), py::arg("hsv_offsets"), py::arg("out")=py::none());
+
+    // Profiling
+    m.def("profiling_clock", &Profiler::now, "The current time of the clock used for native timings in seconds");
+    m.def("profiling_stages", []() { return Profiler::instance().stageNames(); },
+          "The names of all natively timed stages");
+    m.def("profiling_samples", &profiling_samples_py, "Get the recorded timings of a natively timed stage");
+    m.def("profiling_clear", []() { Profiler::instance().clear(); }, "Forget all native timings");
+    m.def("profiling_set_enabled", [](bool enabled) { Profiler::instance().setEnabled(enabled); },
+          "Switch native timings on or off");
 
 // This macro allows numpy access to a particle field. Unfortunately it's not clear how to bass the ParticleData
 // object as a base, so it's lifetime is bound to the last accessed field being destroyed. We need to ensure, that
@@ -368,20 +637,32 @@ PYBIND11_MODULE(accel, m) {
                       { setParticleFieldData(p.field, other); })
 
 
+    py::enum_<ParticleData::StorageMode>(m, "StorageMode")
+        .value("UNORDERED", ParticleData::StorageMode::UNORDERED)
+        .value("LIFETIME_ORDERED", ParticleData::StorageMode::LIFETIME_ORDERED);
+
     py::class_<ParticleData>(m, "ParticleData", py::buffer_protocol())
         .def(py::init<>())
         .def("reserve", &ParticleData::reserve)
         .def("resize", &ParticleData::resize)
         .def("append", &ParticleData::append)
         .def_property_readonly("num_particles", &ParticleData::numParticles)
-        .def("del_dead", &ParticleData::delDead)
+        .def("del_dead", &ParticleData::delDead, "Delete the dead particles, returns their number")
+        .def_property("storage_mode", &ParticleData::storageMode, &ParticleData::setStorageMode)
+        .def("sort_by_lifetime", &ParticleData::sortByLifetime,
+             "Restore the order of the LIFETIME_ORDERED mode after changing age or max_age other than by aging")
         .def("add_particles_from_rays", &add_particles_from_rays,
              "Create particles by shooting the rays to given geometry")
+        .def_static("seed_random", &ParticleData::seedRandom,
+                    "Seed the random number generator used by add_particles_from_rays")
         PARTICLE_DATA_ACCESS(location)
         PARTICLE_DATA_ACCESS(acceleration)
         PARTICLE_DATA_ACCESS(speed)
         PARTICLE_DATA_ACCESS(normal)
         PARTICLE_DATA_ACCESS(uv)
+        PARTICLE_DATA_ACCESS(uv_scale)
+        PARTICLE_DATA_ACCESS(tri_index)
+        PARTICLE_DATA_ACCESS(barycentrics)
         PARTICLE_DATA_ACCESS(size)
         PARTICLE_DATA_ACCESS(mass)
         PARTICLE_DATA_ACCESS(age)
@@ -15,22 +15,35 @@
 
 #include "particledata.h"
 #include "color_conversion.h"
+#include "profiling.h"
+
+#include <algorithm>
+#include <iterator>
+#include <numeric>
 
 BEGIN_PAINTICLE_NAMESPACE
 
 std::default_random_engine ParticleData::m_generator;
 
+// Rounding errors of the ages can swap particles dying at almost the same time in LIFETIME_ORDERED mode, so all
+// particles with less remaining lifetime are checked for being dead.
+const float LIFETIME_ORDER_TOLERANCE = 1e-3f;
+
 ParticleData::ParticleData()
 : location("location"),
   acceleration("acceleration"),
   speed("speed"),
   normal("normal"),
   uv("uv"),
+  uv_scale("uv_scale"),
+  tri_index("tri_index"),
+  barycentrics("barycentrics"),
   size("size"),
   mass("mass"),
   age("age"),
   max_age("max_age"),
-  color("color")
+  color("color"),
+  m_storageMode(StorageMode::UNORDERED)
 {
 }
 
@@ -46,6 +59,9 @@ void ParticleData::resize(size_t numParticles)
     speed.resize(numParticles);
     normal.resize(numParticles);
     uv.resize(numParticles);
+    uv_scale.resize(numParticles);
+    tri_index.resize(numParticles, ID_NONE);
+    barycentrics.resize(numParticles);
     size.resize(numParticles);
     mass.resize(numParticles);
     age.resize(numParticles);
@@ -60,6 +76,9 @@ void ParticleData::reserve(size_t numParticles)
     speed.reserve(numParticles);
     normal.reserve(numParticles);
     uv.reserve(numParticles);
+    uv_scale.reserve(numParticles);
+    tri_index.reserve(numParticles);
+    barycentrics.reserve(numParticles);
     size.reserve(numParticles);
     mass.reserve(numParticles);
     age.reserve(numParticles);
@@ -74,20 +93,30 @@ size_t ParticleData::numParticles() const
 
 void ParticleData::append(const ParticleData& other)
 {
+    size_t numOld = numParticles();
     location.append(other.location);
     acceleration.append(other.acceleration);
     speed.append(other.speed);
     normal.append(other.normal);
     uv.append(other.uv);
+    uv_scale.append(other.uv_scale);
+    tri_index.append(other.tri_index);
+    barycentrics.append(other.barycentrics);
     size.append(other.size);
     mass.append(other.mass);
     age.append(other.age);
     max_age.append(other.max_age);
     color.append(other.color);
+    if(m_storageMode == StorageMode::LIFETIME_ORDERED)
+        sortNewParticles(numOld);
 }
 
-void ParticleData::delDead()
+size_t ParticleData::delDead()
 {
+    PAINTICLE_PROFILE_SCOPE("accel.del_dead");
+    if(m_storageMode == StorageMode::LIFETIME_ORDERED)
+        return delDeadFront();
+    size_t numOld = numParticles();
     size_t i=0;
     while(i<numParticles()) {
         if(age[i]>=max_age[i]) {
@@ -96,6 +125,9 @@ void ParticleData::delDead()
             speed.del(i);
             normal.del(i);
             uv.del(i);
+            uv_scale.del(i);
+            tri_index.del(i);
+            barycentrics.del(i);
             size.del(i);
             mass.del(i);
             age.del(i);
@@ -106,6 +138,87 @@ void ParticleData::delDead()
             ++i;
         }
     }
+    return numOld - numParticles();
+}
+
+size_t ParticleData::delDeadFront()
+{
+    size_t numOld = numParticles();
+    size_t numChecked = 0;
+    while(numChecked<numOld && remainingLifetime(numChecked)<=LIFETIME_ORDER_TOLERANCE)
+        ++numChecked;
+    // Move the living particles among the checked ones behind the dead ones keeping their order
+    std::vector<ID> sources;
+    sources.reserve(numChecked);
+    for(ID i=0; i<numChecked; ++i) {
+        if(age[i]>=max_age[i])
+            sources.push_back(i);
+    }
+    size_t numDead = sources.size();
+    for(ID i=0; i<numChecked; ++i) {
+        if(age[i]<max_age[i])
+            sources.push_back(i);
+    }
+    if(numDead>0 && numDead<numChecked)
+        permute(0, sources);
+    forEachField([numDead](auto& field) { field.popFront(numDead); });
+    return numDead;
+}
+
+void ParticleData::setStorageMode(StorageMode mode)
+{
+    m_storageMode = mode;
+    if(mode == StorageMode::LIFETIME_ORDERED)
+        sortByLifetime();
+}
+
+void ParticleData::sortByLifetime()
+{
+    PAINTICLE_PROFILE_SCOPE("accel.sort_by_lifetime");
+    std::vector<ID> sources(numParticles());
+    std::iota(sources.begin(), sources.end(), 0);
+    std::stable_sort(sources.begin(), sources.end(),
+                     [this](ID a, ID b) { return remainingLifetime(a) < remainingLifetime(b); });
+    permute(0, sources);
+}
+
+void ParticleData::sortNewParticles(size_t numOld)
+{
+    auto diesBefore = [this](ID a, ID b) { return remainingLifetime(a) < remainingLifetime(b); };
+    std::vector<ID> newSources(numParticles()-numOld);
+    std::iota(newSources.begin(), newSources.end(), static_cast<ID>(numOld));
+    std::stable_sort(newSources.begin(), newSources.end(), diesBefore);
+    // The particles dying no later than all new ones keep their index, only the ones after them are merged with the
+    // new ones. New particles usually live longest, so this is a small part of the particles.
+    size_t firstMoved = numOld;
+    if(!newSources.empty()) {
+        float firstNewLifetime = remainingLifetime(newSources.front());
+        size_t low = 0;
+        while(low<firstMoved) {
+            size_t mid = (low+firstMoved)/2;
+            if(firstNewLifetime<remainingLifetime(mid))
+                firstMoved = mid;
+            else
+                low = mid+1;
+        }
+    }
+    std::vector<ID> oldSources(numOld-firstMoved);
+    std::iota(oldSources.begin(), oldSources.end(), static_cast<ID>(firstMoved));
+    std::vector<ID> sources;
+    sources.reserve(oldSources.size()+newSources.size());
+    std::merge(oldSources.begin(), oldSources.end(), newSources.begin(), newSources.end(),
+               std::back_inserter(sources), diesBefore);
+    permute(firstMoved, sources);
+}
+
+void ParticleData::permute(size_t first, const std::vector<ID>& sources)
+{
+    forEachField([first, &sources](auto& field) { field.permute(first, sources); });
+}
+
+void ParticleData::seedRandom(unsigned int seed)
+{
+    m_generator.seed(seed);
 }
 
 void ParticleData::addParticlesFromRays(MemView<Vec3f> rayOrigins, MemView<Vec3f> rayDirections,
@@ -118,9 +231,14 @@ void ParticleData::addParticlesFromRays(MemView<Vec3f> rayOrigins, MemView<Vec3f
         throw std::runtime_error("rayOrigins and rayDirections need to have same size");
   
     size_t numRays = rayOrigins.size();
+    size_t numOld = numParticles();
 
-    if(numRays == 0)
-        return; // Nothing to do
+    if(numRays == 0) {
+        // Nothing to do, but the order is kept like when appending no particles
+        if(m_storageMode == StorageMode::LIFETIME_ORDERED)
+            sortNewParticles(numOld);
+        return;
+    }
 
     std::vector<BVH::SurfaceInfo> surface_infos;
     surface_infos.resize(numRays);
@@ -153,7 +271,10 @@ void ParticleData::addParticlesFromRays(MemView<Vec3f> rayOrigins, MemView<Vec3f
                            speedZDistribution(m_generator));
             speed.push_back(particleSpeed + speedRnd);
             normal.push_back(surface_info.normal);
-            uv.emplace_back(0,0);
+            uv.push_back(bvh.interpolateUV(surface_info.tri_index, surface_info.barycentrics));
+            uv_scale.push_back(bvh.uvScale(surface_info.tri_index));
+            tri_index.push_back(surface_info.tri_index);
+            barycentrics.push_back(surface_info.barycentrics);
             size.emplace_back(sizeDistribution(m_generator));
             mass.emplace_back(massDistribution(m_generator));
             age.emplace_back(0);
@@ -163,6 +284,8 @@ void ParticleData::addParticlesFromRays(MemView<Vec3f> rayOrigins, MemView<Vec3f
             color.push_back(particleColor);
         }
     }
+    if(m_storageMode == StorageMode::LIFETIME_ORDERED)
+        sortNewParticles(numOld);
 }
 
 
@@ -22,6 +22,7 @@
 #include "memview.h"
 
 #include <random>
+#include <vector>
 
 BEGIN_PAINTICLE_NAMESPACE
 
@@ -29,13 +30,24 @@ BEGIN_PAINTICLE_NAMESPACE
 class ParticleData
 {
 public:
+    //! How the particles are ordered
+    enum class StorageMode {
+        //! Any order. Deleting dead particles moves the last particles into their place.
+        UNORDERED,
+        //! Sorted by the remaining lifetime max_age-age, so the dead particles are at the front and deleting them
+        //! doesn't depend on the number of living ones. This requires all particles to age by the same amount, other
+        //! changes of age or max_age need sortByLifetime to be called before deleting the dead particles. The living
+        //! particles keep their order.
+        LIFETIME_ORDERED
+    };
+
     //! Constructor
     ParticleData();
 
     //! Destructor
     ~ParticleData();
 
-    //! Set the number of particles
+    //! Set the number of particles. New particles aren't sorted in LIFETIME_ORDERED mode.
     void resize(size_t numParticles);
 
     //! Reserve a minimum number of particles
@@ -47,8 +59,18 @@ public:
     //! Append another set of particles
     void append(const ParticleData& other);
 
-    //! Delete the dead particles
-    void delDead();
+    //! Delete the dead particles, returns the number of deleted particles
+    size_t delDead();
+
+    //! Get the storage mode
+    StorageMode storageMode() const
+    { return m_storageMode; }
+
+    //! Set the storage mode, switching to LIFETIME_ORDERED sorts the particles
+    void setStorageMode(StorageMode mode);
+
+    //! Sort the particles by their remaining lifetime, e.g. after changing their age in LIFETIME_ORDERED mode
+    void sortByLifetime();
 
     //! Create particles from the given rays
     void addParticlesFromRays(MemView<Vec3f> rayOrigins, MemView<Vec3f> rayDirections,
@@ -57,6 +79,9 @@ public:
                               const Vec2f& sizeRange, const Vec2f& massRange, const Vec2f& ageRange,
                               const Vec3f& avgColor, const Vec3f& hsvColorRange);
 
+    //! Seed the random number generator used when adding particles to get reproducible results
+    static void seedRandom(unsigned int seed);
+
     //! The location of the particles
     ParticleField<Vec3f> location;
 
@@ -72,6 +97,15 @@ public:
     //! The uv of the particles
     ParticleField<Vec2f> uv;
 
+    //! The length in uv space of a unit length in object space at the particles' location
+    ParticleField<float> uv_scale;
+
+    //! The triangle the particles are located on, ID_NONE if unknown
+    ParticleField<ID> tri_index;
+
+    //! The barycentric coordinates of the particles' location inside their triangle
+    ParticleField<Vec3f> barycentrics;
+
     //! The size of the particles
     ParticleField<float> size;
 
@@ -90,7 +124,46 @@ public:
 private:
     //! The randon number generator to use when adding particles
     static std::default_random_engine m_generator;
+
+    //! How the particles are ordered
+    StorageMode m_storageMode;
+
+    //! The remaining lifetime of the i-th particle
+    float remainingLifetime(size_t i) const
+    { return max_age[i] - age[i]; }
+
+    //! Delete the dead particles at the front in LIFETIME_ORDERED mode
+    size_t delDeadFront();
+
+    //! Sort the particles starting at numOld in LIFETIME_ORDERED mode into the sorted ones before
+    void sortNewParticles(size_t numOld);
+
+    //! Reorder all fields like ParticleField::permute
+    void permute(size_t first, const std::vector<ID>& sources);
+
+    //! Call f for each field
+    template<class F>
+    void forEachField(F&& f);
 };
 
 
+template<class F>
+void ParticleData::forEachField(F&& f)
+{
+    f(location);
+    f(acceleration);
+    f(speed);
+    f(normal);
+    f(uv);
+    f(uv_scale);
+    f(tri_index);
+    f(barycentrics);
+    f(size);
+    f(mass);
+    f(age);
+    f(max_age);
+    f(color);
+}
+
+
 END_PAINTICLE_NAMESPACE
@@ -17,6 +17,7 @@
 
 #include "painticle.h"
 
+#include <algorithm>
 #include <vector>
 #include <string>
 #include <cassert>
@@ -47,23 +48,23 @@ public:
     
     //! Get length of the field's data
     size_t length() const
-    { return m_data.size(); }
+    { return m_data.size() - m_begin; }
 
     //! Append the data of another field
     void append(const ParticleField& other)
-    { m_data.insert(m_data.end(), other.m_data.begin(), other.m_data.end()); }
+    { m_data.insert(m_data.end(), other.m_data.begin()+other.m_begin, other.m_data.end()); }
 
     //! Assign a constant value
     void assignConstant(const ElementType value)
-    { m_data.assign(length(), value); }
+    { std::fill(m_data.begin()+m_begin, m_data.end(), value); }
 
     //! Access the i-th element
     const T& operator[](size_t i) const
-    { return m_data[i]; }
+    { return m_data[m_begin+i]; }
 
     //! Access the i-th element
     T& operator[](size_t i)
-    { return m_data[i]; }
+    { return m_data[m_begin+i]; }
 
     //! Access the last element
     const T& back() const
@@ -71,24 +72,35 @@ public:
 
     //! Access the data of the field
     const T* data() const
-    { return &m_data.front(); }
+    { return m_data.data() + m_begin; }
 
     //! Access the data of the field
     T* data()
-    { return &m_data.front(); }
+    { return m_data.data() + m_begin; }
 
 protected:
     //! Reservea new size for the the field (only allowed through ParticleData to prevent field size divergence)
     void reserve(size_t newSize)
-    { m_data.reserve(newSize); }
+    { m_data.reserve(m_begin+newSize); }
 
     //! Resize the field (only allowed through ParticleData to prevent field size divergence)
     void resize(size_t newSize)
-    { m_data.resize(newSize); }
+    { m_data.resize(m_begin+newSize); }
+
+    //! Resize the field, initializing new elements with the given value
+    void resize(size_t newSize, const T& value)
+    { m_data.resize(m_begin+newSize, value); }
 
     //! Delete the i-th element
     void del(size_t i);
 
+    //! Delete the first n elements. Their memory is only reclaimed, once it exceeds the one of the remaining elements,
+    //! so deleting is O(n) amortized.
+    void popFront(size_t n);
+
+    //! Reorder the elements starting at first, so that element first+k is taken from element sources[k]
+    void permute(size_t first, const std::vector<ID>& sources);
+
     void push_back(const T& element)
     { m_data.push_back(element); }
 
@@ -100,6 +112,9 @@ private:
     //! The data of the field
     std::vector<T> m_data;
 
+    //! The index of the first element in m_data, the ones before have been deleted by popFront
+    size_t m_begin;
+
     //! The name of the field
     std::string m_name;
 };
@@ -107,14 +122,37 @@ private:
 
 template<class T>
 ParticleField<T>::ParticleField(const std::string& name)
-: m_name(name)
+: m_begin(0),
+  m_name(name)
 {}
 
 template<class T>
 void ParticleField<T>::del(size_t i)
 {
-    assert(i<m_data.size());
-    m_data[i] = m_data.back(); m_data.resize(m_data.size()-1);
+    assert(i<length());
+    m_data[m_begin+i] = m_data.back(); m_data.resize(m_data.size()-1);
+}
+
+template<class T>
+void ParticleField<T>::popFront(size_t n)
+{
+    assert(n<=length());
+    m_begin += n;
+    if(m_begin > length()) {
+        m_data.erase(m_data.begin(), m_data.begin()+m_begin);
+        m_begin = 0;
+    }
+}
+
+template<class T>
+void ParticleField<T>::permute(size_t first, const std::vector<ID>& sources)
+{
+    assert(first+sources.size()<=length());
+    std::vector<T> permuted;
+    permuted.reserve(sources.size());
+    for(ID source : sources)
+        permuted.push_back((*this)[source]);
+    std::copy(permuted.begin(), permuted.end(), m_data.begin()+m_begin+first);
 }
 
 
@@ -0,0 +1,95 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#include "profiling.h"
+
+#include <algorithm>
+
+BEGIN_PAINTICLE_NAMESPACE
+
+StageTimings::StageTimings(size_t capacity)
+: m_samples(capacity),
+  m_next(0),
+  m_count(0)
+{}
+
+void StageTimings::add(const TimingSample& sample)
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    m_samples[m_next] = sample;
+    m_next = (m_next+1) % m_samples.size();
+    m_count = std::min(m_count+1, m_samples.size());
+}
+
+std::vector<TimingSample> StageTimings::samples() const
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    std::vector<TimingSample> result;
+    result.reserve(m_count);
+    size_t first = (m_next+m_samples.size()-m_count) % m_samples.size();
+    for(size_t i=0; i<m_count; ++i)
+        result.push_back(m_samples[(first+i) % m_samples.size()]);
+    return result;
+}
+
+void StageTimings::clear()
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    m_next = 0;
+    m_count = 0;
+}
+
+Profiler::Profiler()
+: m_enabled(true)
+{}
+
+Profiler& Profiler::instance()
+{
+    static Profiler profiler;
+    return profiler;
+}
+
+double Profiler::now()
+{
+    using namespace std::chrono;
+    return duration<double>(steady_clock::now().time_since_epoch()).count();
+}
+
+StageTimings& Profiler::stage(const std::string& name)
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    auto& timings = m_stages[name];
+    if(!timings)
+        timings = std::make_unique<StageTimings>(DEFAULT_CAPACITY);
+    return *timings;
+}
+
+std::vector<std::string> Profiler::stageNames() const
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    std::vector<std::string> result;
+    for(const auto& entry : m_stages)
+        result.push_back(entry.first);
+    return result;
+}
+
+void Profiler::clear()
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    for(auto& entry : m_stages)
+        entry.second->clear();
+}
+
+END_PAINTICLE_NAMESPACE
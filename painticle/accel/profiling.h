@@ -0,0 +1,136 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#pragma once
+
+#include "painticle.h"
+
+#include <atomic>
+#include <chrono>
+#include <map>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <vector>
+
+BEGIN_PAINTICLE_NAMESPACE
+
+//! A single timing measurement. Times are given in seconds of the profiling clock.
+struct TimingSample {
+    double start;
+    double duration;
+};
+
+//! A fixed size ring buffer keeping the most recent timings of one stage
+class StageTimings
+{
+public:
+    //! Constructor
+    explicit StageTimings(size_t capacity);
+
+    //! Record a new timing, overwriting the oldest one, if the buffer is full
+    void add(const TimingSample& sample);
+
+    //! Get the recorded timings ordered from oldest to newest
+    std::vector<TimingSample> samples() const;
+
+    //! Forget all recorded timings
+    void clear();
+
+private:
+    mutable std::mutex m_mutex;
+    std::vector<TimingSample> m_samples;
+    size_t m_next;
+    size_t m_count;
+};
+
+//! The registry of all native stage timings
+class Profiler
+{
+public:
+    //! The number of samples kept per stage
+    static const size_t DEFAULT_CAPACITY = 1024;
+
+    //! Access the process wide profiler
+    static Profiler& instance();
+
+    //! The current time of the profiling clock in seconds
+    static double now();
+
+    //! Get the timings of the given stage. The returned reference stays valid for the lifetime of the process.
+    StageTimings& stage(const std::string& name);
+
+    //! The names of all stages, that have been registered so far
+    std::vector<std::string> stageNames() const;
+
+    //! Clear the timings of all stages
+    void clear();
+
+    //! Query, if timings are being recorded
+    inline bool enabled() const;
+
+    //! Switch recording of timings on or off
+    inline void setEnabled(bool enabled);
+
+private:
+    Profiler();
+
+    mutable std::mutex m_mutex;
+    std::map<std::string, std::unique_ptr<StageTimings>> m_stages;
+    //! Read by the worker threads, while python might switch it
+    std::atomic<bool> m_enabled;
+};
+
+//! Measures the time between construction and destruction and records it into the given stage
+class ScopedTimer
+{
+public:
+    //! Constructor
+    inline explicit ScopedTimer(StageTimings& timings);
+
+    //! Destructor
+    inline ~ScopedTimer();
+
+private:
+    StageTimings& m_timings;
+    double m_start;
+    bool m_enabled;
+};
+
+//! Time the remainder of the current scope as the given stage
+#define PAINTICLE_PROFILE_SCOPE(name)                                                                  \
+    static painticle::StageTimings& profiledStageTimings = painticle::Profiler::instance().stage(name); \
+    painticle::ScopedTimer profiledStageTimer(profiledStageTimings)
+
+
+inline bool Profiler::enabled() const
+{ return m_enabled.load(std::memory_order_relaxed); }
+
+inline void Profiler::setEnabled(bool enabled)
+{ m_enabled.store(enabled, std::memory_order_relaxed); }
+
+inline ScopedTimer::ScopedTimer(StageTimings& timings)
+: m_timings(timings),
+  m_start(Profiler::now()),
+  m_enabled(Profiler::instance().enabled())
+{}
+
+inline ScopedTimer::~ScopedTimer()
+{
+    if(m_enabled)
+        m_timings.add({m_start, Profiler::now()-m_start});
+}
+
+END_PAINTICLE_NAMESPACE
@@ -0,0 +1,197 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#include "surfacewalk.h"
+#include "parallel.h"
+#include "profiling.h"
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <stdexcept>
+#include <vector>
+
+BEGIN_PAINTICLE_NAMESPACE
+
+namespace {
+
+Vec3f cross(const Vec3f& a, const Vec3f& b)
+{
+    return Vec3f(a.y*b.z - a.z*b.y, a.z*b.x - a.x*b.z, a.x*b.y - a.y*b.x);
+}
+
+Vec3f surfacePoint(const BVH& bvh, const ID& triId, const Vec3f& barycentrics)
+{
+    return barycentrics[0]*bvh.point(triId, 0) + barycentrics[1]*bvh.point(triId, 1) +
+           barycentrics[2]*bvh.point(triId, 2);
+}
+
+//! Remove small negative values caused by rounding and make the coordinates sum up to one
+void clampBarycentrics(Vec3f& barycentrics)
+{
+    for(ID corner=0; corner<3; ++corner)
+        barycentrics[corner] = std::max(barycentrics[corner], 0.0f);
+    float sum = barycentrics[0] + barycentrics[1] + barycentrics[2];
+    if(sum>0)
+        barycentrics = barycentrics / sum;
+}
+
+//! Compute the change of the barycentric coordinates, when moving by a displacement in the triangle's plane
+/**! @returns false for degenerated triangles */
+bool barycentricsDelta(const Vec3f& a, const Vec3f& b, const Vec3f& c, const Vec3f& displacement, Vec3f& delta)
+{
+    const Vec3f v0 = b - a;
+    const Vec3f v1 = c - a;
+    const float d00 = v0.dot(v0);
+    const float d01 = v0.dot(v1);
+    const float d11 = v1.dot(v1);
+    const float d20 = displacement.dot(v0);
+    const float d21 = displacement.dot(v1);
+    const float denom = d00*d11 - d01*d01;
+    if(!(std::abs(denom) > std::numeric_limits<float>::min()))
+        return false;
+    const float v = (d11*d20 - d01*d21) / denom;
+    const float w = (d00*d21 - d01*d20) / denom;
+    delta = Vec3f(-v-w, v, w);
+    return true;
+}
+
+//! Walk a single particle from its surface point by the displacement
+/**! @returns false, if the walk failed and a closest point query is needed */
+bool walk(const BVH& bvh, const MeshAdjacency& adjacency, size_t maxCrossings, ID& triId, Vec3f& barycentrics,
+          Vec3f displacement)
+{
+    // The length is kept when moving onto the next triangle, so walking over a curved surface doesn't slow down
+    float length = -1;
+    for(size_t crossing=0; crossing<=maxCrossings; ++crossing) {
+        const Vec3f a = bvh.point(triId, 0);
+        const Vec3f b = bvh.point(triId, 1);
+        const Vec3f c = bvh.point(triId, 2);
+        Vec3f faceNormal = cross(b-a, c-a);
+        const float faceNormalLength = faceNormal.length();
+        if(!(faceNormalLength > 0))
+            return false;
+        faceNormal = faceNormal / faceNormalLength;
+        displacement -= faceNormal * displacement.dot(faceNormal);
+        const float projectedLength = displacement.length();
+        if(length>=0 && projectedLength>0)
+            displacement = displacement * (length/projectedLength);
+
+        Vec3f delta;
+        if(!barycentricsDelta(a, b, c, displacement, delta))
+            return false;
+        // Find the edge, which is crossed first. It's opposite to the corner, whose coordinate drops to zero first.
+        float t = 1;
+        ID leavingCorner = ID_NONE;
+        for(ID corner=0; corner<3; ++corner) {
+            if(delta[corner]<0 && barycentrics[corner]+delta[corner]<0) {
+                float cornerT = barycentrics[corner] / -delta[corner];
+                if(cornerT<t) {
+                    t = cornerT;
+                    leavingCorner = corner;
+                }
+            }
+        }
+        barycentrics += delta*t;
+        if(leavingCorner==ID_NONE) {
+            clampBarycentrics(barycentrics);
+            return true;
+        }
+        barycentrics[leavingCorner] = 0;
+        clampBarycentrics(barycentrics);
+
+        ID next = adjacency.neighbour(triId, (leavingCorner+1)%3);
+        if(next==ID_NONE)
+            return true;  // Stop at the border of the mesh
+        // The point is on the shared edge, so only the shared vertices' coordinates need to be transferred
+        const Vec3u& tri = adjacency.triangle(triId);
+        const Vec3u& nextTri = adjacency.triangle(next);
+        Vec3f nextBarycentrics(0, 0, 0);
+        for(ID corner=0; corner<3; ++corner) {
+            for(ID nextCorner=0; nextCorner<3; ++nextCorner) {
+                if(nextTri[nextCorner]==tri[corner])
+                    nextBarycentrics[nextCorner] += barycentrics[corner];
+            }
+        }
+        displacement = displacement * (1-t);
+        length = displacement.length();
+        triId = next;
+        barycentrics = nextBarycentrics;
+    }
+    return false;
+}
+
+}
+
+size_t walkParticles(ParticleData& particles, const BVH& bvh, const MeshAdjacency& adjacency, size_t maxCrossings)
+{
+    if(adjacency.numTriangles()!=bvh.numTriangles())
+        throw std::runtime_error("The mesh adjacency doesn't match the BVH");
+    PAINTICLE_PROFILE_SCOPE("accel.walk_particles");
+    const size_t numParticles = particles.numParticles();
+
+    std::vector<Byte> failed(numParticles, 0);
+    BEGIN_PARALLEL_FOR(i, numParticles) {
+        ID triId = particles.tri_index[i];
+        Vec3f barycentrics = particles.barycentrics[i];
+        bool walked = false;
+        if(triId<adjacency.numTriangles()) {
+            Vec3f start = surfacePoint(bvh, triId, barycentrics);
+            walked = walk(bvh, adjacency, maxCrossings, triId, barycentrics, particles.location[i]-start);
+        }
+        if(walked) {
+            particles.tri_index[i] = triId;
+            particles.barycentrics[i] = barycentrics;
+        } else {
+            failed[i] = 1;
+        }
+    } END_PARALLEL_FOR
+
+    std::vector<ID> failedIds;
+    for(size_t i=0; i<numParticles; ++i) {
+        if(failed[i])
+            failedIds.push_back(static_cast<ID>(i));
+    }
+    BEGIN_PARALLEL_FOR(i, failedIds.size()) {
+        const ID particleId = failedIds[i];
+        const Vec3f& location = particles.location[particleId];
+        BVH::SurfaceInfo info = bvh.closestPoint(location.x, location.y, location.z);
+        particles.tri_index[particleId] = info.tri_index;
+        particles.barycentrics[particleId] = info.barycentrics;
+    } END_PARALLEL_FOR
+
+    BEGIN_PARALLEL_FOR(i, numParticles) {
+        const ID triId = particles.tri_index[i];
+        if(triId!=ID_NONE) {
+            const Vec3f& barycentrics = particles.barycentrics[i];
+            particles.location[i] = surfacePoint(bvh, triId, barycentrics);
+            Vec3f n;
+            if(bvh.hasNormals()) {
+                n = barycentrics[0]*bvh.normal(triId, 0) + barycentrics[1]*bvh.normal(triId, 1) +
+                    barycentrics[2]*bvh.normal(triId, 2);
+            } else {
+                n = cross(bvh.point(triId, 1)-bvh.point(triId, 0), bvh.point(triId, 2)-bvh.point(triId, 0));
+            }
+            n.normalize();
+            particles.normal[i] = n;
+            particles.uv[i] = bvh.interpolateUV(triId, barycentrics);
+            particles.uv_scale[i] = bvh.uvScale(triId);
+            particles.speed[i] -= n * particles.speed[i].dot(n);
+        }
+    } END_PARALLEL_FOR
+    return failedIds.size();
+}
+
+END_PAINTICLE_NAMESPACE
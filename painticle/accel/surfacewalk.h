@@ -0,0 +1,37 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+#pragma once
+
+#include "painticle.h"
+#include "gpubvh.h"
+#include "meshadjacency.h"
+#include "particledata.h"
+
+BEGIN_PAINTICLE_NAMESPACE
+
+//! Move the particles along the surface instead of projecting them back onto it
+/**! Each particle starts at the surface point given by its tri_index and barycentrics and moves by the difference of
+     its location to this point, i.e. the location is expected to be the result of a free space integration step. The
+     movement is projected into the plane of the current triangle and continues in the neighbouring triangle, when it
+     crosses an edge. Border edges stop the movement. Particles without a triangle or not finishing their walk within
+     maxCrossings edge crossings are projected with a closest point query instead.
+     Afterwards location, tri_index, barycentrics, normal, uv and uv_scale are updated and the speed is projected into
+     the surface's tangent plane.
+     @returns the number of particles, which needed a closest point query */
+size_t walkParticles(ParticleData& particles, const BVH& bvh, const MeshAdjacency& adjacency,
+                     size_t maxCrossings = 32);
+
+END_PAINTICLE_NAMESPACE
@@ -0,0 +1,215 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Painting without blender's UI, e.g. on render nodes:
+#   blender --background scene.blend --python scripts/batch_paint.py -- --object Cube --stroke my.stroke \
+#       --output painted.png
+
+import argparse
+import json
+import sys
+import time
+
+import bpy
+import mathutils
+import numpy as np
+
+from . import accel
+from . import headless
+from . import particles
+from . import stroke
+from .interaction import Interactions
+from .utils import Error
+
+
+def parse_args(argv=None):
+    """ Parse the arguments given after blender's "--" separator """
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--")+1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(prog="batch_paint",
+                                     description="Paint a stroke with PAINTicle without blender's user interface.")
+    parser.add_argument("--object", required=True, help="Name of the object to paint on")
+    parser.add_argument("--image-slot", type=int, default=None,
+                        help="Index of the texture paint slot of the active material to paint into")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--stroke", help="A stroke recorded while painting interactively")
+    source.add_argument("--emission", help="A JSON file describing a procedural stroke (see emission_to_stroke)")
+    parser.add_argument("--brush-tree", default=None,
+                        help="Name of the brush node tree to use. By default a stroke's recorded brush is used and " +
+                             "the scene's brush for procedural strokes.")
+    parser.add_argument("--time-step", type=float, default=0.01, help="The fixed simulation time step")
+    parser.add_argument("--resolution", type=int, nargs=2, default=None, metavar=("WIDTH", "HEIGHT"),
+                        help="Scale the image to this resolution before painting")
+    parser.add_argument("--bvh-quality", choices=["low", "medium", "high"], default="high",
+                        help="Build quality of the mesh's acceleration structure. Long batch paints benefit from " +
+                             "faster collision queries of high quality builds.")
+    parser.add_argument("--bvh-threads", type=int, default=0,
+                        help="The number of threads for building the acceleration structure, 0 uses all cores")
+    parser.add_argument("--mesh-cache", default="",
+                        help="Directory of the on-disk mesh cache, speeding up repeated runs on the same file")
+    parser.add_argument("--backend", default=None,
+                        help="moderngl backend for the GL context, use egl on machines without display server")
+    parser.add_argument("--painter", choices=["gpu", "cpu"], default="gpu",
+                        help="Paint on the GPU or on the CPU. The CPU painter doesn't need a GL context and paints " +
+                             "like the texel_gather paint mode.")
+    parser.add_argument("--simulator", choices=["cpu", "gpu"], default="cpu",
+                        help="Simulate on the CPU or with compute shaders. The GPU simulator needs the GPU painter.")
+    parser.add_argument("--output", default=None,
+                        help="Save the painted image to this file. Without it the image is saved in place.")
+    parser.add_argument("--save-blend", default=None, help="Save the resulting .blend file to this path")
+    return parser.parse_args(argv)
+
+
+def emission_to_stroke(spec: dict, settings: dict) -> stroke.Stroke:
+    """ Convert a procedural emission description into a stroke. The spec is a dictionary with the keys
+          path:      list of world space points the brush moves along (required)
+          direction: the direction the brush is pointing to (default [0, 0, -1])
+          distance:  the distance of the brush from the path points along -direction (default 1)
+          duration:  time in seconds to move along the path (default 1)
+          size:      the brush size as angle spread of the emitted rays (default 0.05)
+          pressure:  the pen pressure (default 1)
+          fps:       the number of input frames per second (default 60)
+          seed:      the random seed (default 0) """
+    path = np.array(spec["path"], dtype=np.float64)
+    if path.ndim != 2 or path.shape[1] != 3 or len(path) == 0:
+        raise Error("The emission path needs to be a list of 3D points")
+    direction = mathutils.Vector(spec.get("direction", (0, 0, -1))).normalized()
+    distance = spec.get("distance", 1.0)
+    duration = spec.get("duration", 1.0)
+    num_frames = max(2, int(duration * spec.get("fps", 60)) + 1)
+
+    # Move along the path with constant speed
+    segment_lengths = np.linalg.norm(np.diff(path, axis=0), axis=1)
+    path_length = np.concatenate(([0], np.cumsum(segment_lengths)))
+    param = np.linspace(0, path_length[-1], num_frames)
+    points = np.column_stack([np.interp(param, path_length, path[:, i]) for i in range(3)])
+
+    frames = np.zeros(num_frames, stroke.frame_dtype)
+    frames["time"] = np.linspace(0, duration, num_frames)
+    frames["origin"] = points - distance * np.array(direction)
+    frames["direction"] = direction
+    frames["size"] = spec.get("size", 0.05)
+    frames["pressure"] = spec.get("pressure", 1.0)
+    frames["interactions"] = Interactions.EMIT_PARTICLES.value
+    # Stop emitting at the end of the path, the remaining particles finish their simulation
+    frames["interactions"][-1] = Interactions.NONE.value
+    return stroke.Stroke(spec.get("seed", 0), settings, frames)
+
+
+def setup_object(object_name: str, image_slot: int):
+    obj = bpy.data.objects.get(object_name)
+    if obj is None:
+        raise Error(f"Object {object_name} doesn't exist")
+    bpy.context.view_layer.objects.active = obj
+    obj.select_set(True)
+    # Entering texture paint mode updates the list of paint slots
+    bpy.ops.object.mode_set(mode="TEXTURE_PAINT")
+    if obj.active_material is None:
+        raise Error(f"Object {object_name} doesn't have a material to paint on")
+    if image_slot is not None:
+        if image_slot >= len(obj.active_material.texture_paint_images):
+            raise Error(f"Object {object_name} doesn't have an image slot {image_slot}")
+        obj.active_material.paint_active_slot = image_slot
+    return obj
+
+
+def get_paint_image(obj: bpy.types.Object) -> bpy.types.Image:
+    """ Get the image of the object's active paint slot, like the painters do """
+    material = obj.active_material
+    if material.paint_active_slot >= len(material.texture_paint_images):
+        raise Error(f"Object {obj.name} doesn't have an image to paint on")
+    return material.texture_paint_images[material.paint_active_slot]
+
+
+def ensure_paint_brush(context):
+    image_paint = context.tool_settings.image_paint
+    if image_paint.brush is None:
+        image_paint.brush = bpy.data.brushes.new("PAINTicle batch", mode="TEXTURE_PAINT")
+
+
+def check_output(image: bpy.types.Image, output: str, save_blend: str):
+    """ Fail before painting, if the painted image would be lost """
+    if image.packed_file is not None and output is None and save_blend is None:
+        raise Error(f"Image {image.name} is packed into the .blend file, so painting it in place isn't saved. "
+                    "Please pass --output or --save-blend.")
+
+
+def save_image(image: bpy.types.Image, output: str):
+    if output is None:
+        if image.packed_file is not None:
+            image.pack()
+        else:
+            image.save()
+    else:
+        image.filepath_raw = output
+        image.file_format = image_format_from_filename(output)
+        image.save()
+
+
+def image_format_from_filename(filename: str):
+    formats = {".png": 'PNG', ".jpg": 'JPEG', ".jpeg": 'JPEG', ".tif": 'TIFF', ".tiff": 'TIFF',
+               ".exr": 'OPEN_EXR', ".tga": 'TARGA', ".bmp": 'BMP'}
+    for extension, file_format in formats.items():
+        if filename.lower().endswith(extension):
+            return file_format
+    raise Error(f"Unknown image format of {filename}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    obj = setup_object(args.object, args.image_slot)
+    image = get_paint_image(obj)
+    check_output(image, args.output, args.save_blend)
+    context = headless.HeadlessContext(obj)
+    ensure_paint_brush(context)
+
+    if args.brush_tree is not None:
+        tree = bpy.data.node_groups.get(args.brush_tree)
+        if tree is None:
+            raise Error(f"Brush tree {args.brush_tree} doesn't exist")
+        context.scene.painticle_settings.brush = tree
+    if args.stroke is not None:
+        painted_stroke = stroke.Stroke.read(args.stroke)
+        if args.brush_tree is None:
+            stroke.apply_settings(context, painted_stroke.settings)
+    else:
+        if context.scene.painticle_settings.brush is None:
+            raise Error("The scene doesn't define a PAINTicle brush")
+        with open(args.emission) as f:
+            spec = json.load(f)
+        painted_stroke = emission_to_stroke(spec, stroke.capture_settings(context))
+
+    # The painters size their buffers by the image, so it's scaled before creating them
+    if args.resolution is not None:
+        image.scale(*args.resolution)
+
+    accel.set_embree_threads(args.bvh_threads)
+    glcontext = headless.create_standalone_glcontext(args.backend) if args.painter == "gpu" else None
+    painter_particles = particles.Particles(context, glcontext=glcontext, bvh_quality=args.bvh_quality,
+                                            mesh_cache_directory=args.mesh_cache, painter=args.painter,
+                                            simulator=args.simulator)
+
+    start = time.perf_counter()
+    replayer = stroke.StrokeReplayer(painter_particles, painted_stroke, args.time_step)
+    num_ticks = replayer.run()
+    print("PAINTicle: painted {} time steps ({:.2f}s simulated) in {:.2f}s".format(
+          num_ticks, num_ticks*args.time_step, time.perf_counter()-start))
+
+    save_image(image, args.output)
+    if args.save_blend is not None:
+        bpy.ops.wm.save_as_mainfile(filepath=args.save_blend, copy=True)
+    return 0
@@ -0,0 +1,92 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# An optional on-disk cache of the arrays extracted from meshes. The arrays are stored as .npy files and memory mapped
+# when loaded, so reopening a large asset skips the extraction from blender's data and multiple blender instances
+# share the memory of the same cached mesh.
+
+import hashlib
+import os
+import shutil
+
+import bpy
+import numpy as np
+
+# Increment when the layout or meaning of the cached arrays changes
+CACHE_VERSION = 2
+
+
+def cache_key(mesh: bpy.types.Mesh, sampled_positions: tuple):
+    """ Get the key of the mesh's cache entry or None, if the mesh might differ from the saved file. The key combines
+        the saved file with the mesh's element counts and some vertex positions. Unsaved edits aren't covered by it,
+        so modified files and meshes in edit mode aren't cached at all. """
+    filepath = bpy.data.filepath
+    if not filepath or not os.path.exists(filepath) or bpy.data.is_dirty or mesh.is_editmode:
+        return None
+    identification = (CACHE_VERSION, os.path.abspath(filepath), os.path.getmtime(filepath), mesh.name,
+                      len(mesh.vertices), len(mesh.loops), len(mesh.polygons), mesh.uv_layers.active_index,
+                      sampled_positions)
+    return hashlib.sha1(repr(identification).encode("utf-8")).hexdigest()
+
+
+def load(directory: str, key: str):
+    """ Get the cached arrays as read only memory maps or None, if they aren't cached """
+    if not directory or key is None:
+        return None
+    entry_directory = os.path.join(directory, key)
+    if not os.path.isdir(entry_directory):
+        return None
+    arrays = {}
+    for filename in os.listdir(entry_directory):
+        name, extension = os.path.splitext(filename)
+        if extension == ".npy":
+            arrays[name] = np.load(os.path.join(entry_directory, filename), mmap_mode="r")
+    return arrays
+
+
+def store(directory: str, key: str, arrays: dict):
+    """ Write the arrays into the cache. An existing entry is kept. """
+    if not directory or key is None:
+        return
+    entry_directory = os.path.join(directory, key)
+    if os.path.isdir(entry_directory):
+        return
+    # Write into a temporary directory first, so other blender instances never see a partially written entry
+    temp_directory = "{}.tmp{}".format(entry_directory, os.getpid())
+    os.makedirs(temp_directory, exist_ok=True)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_directory, name + ".npy"), np.ascontiguousarray(array))
+        os.replace(temp_directory, entry_directory)
+    except OSError:
+        # Another instance might have been faster
+        shutil.rmtree(temp_directory, ignore_errors=True)
+
+
+def clear(directory: str):
+    """ Delete all cached entries in the directory """
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        # Only touch directories named like our keys, the directory might contain other data
+        if os.path.isdir(path) and _is_key(name):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _is_key(name: str):
+    return len(name) == 40 and all(c in "0123456789abcdef" for c in name)
@@ -21,42 +21,208 @@ import bpy
 import blf
 
 import os
+import re
 import numpy as np
 import typing
 import subprocess
 
 from . import dependencies
+from .utils import Error
 
 import moderngl
 
 
+_blender_glcontext = None
+
+# The texture dtypes usable for paint buffers, mapped to their GLSL image format and the numpy type of their texels
+PAINT_BUFFER_FORMATS = {
+    "f1": ("rgba8", np.uint8),
+    "f2": ("rgba16f", np.float16),
+    "f4": ("rgba32f", np.float32),
+}
+
+
+def blender_glcontext() -> moderngl.Context:
+    """ Get the moderngl context wrapping blender's GL context. It's only created once, so GPU objects can be shared
+        between paint sessions. """
+    global _blender_glcontext
+    if _blender_glcontext is None:
+        _blender_glcontext = moderngl.create_context()
+    return _blender_glcontext
+
+
+# The number of the first UDIM tile, which is also used for untiled images
+FIRST_TILE = 1001
+
+
+class ImageTile:
+    """ A UDIM tile of an image. Untiled images consist of the single tile FIRST_TILE. """
+    __slots__ = ("number", "size")
+
+    def __init__(self, number: int, size):
+        self.number = number
+        self.size = tuple(size)
+
+    @property
+    def uv_offset(self):
+        """ The uv coordinates of the tile's lower left corner. UDIM tiles are numbered in rows of 10. """
+        index = self.number - FIRST_TILE
+        return float(index % 10), float(index // 10)
+
+    def __eq__(self, other):
+        return isinstance(other, ImageTile) and self.number == other.number and self.size == other.size
+
+    def __hash__(self):
+        return hash((self.number, self.size))
+
+    def __repr__(self):
+        return f"ImageTile({self.number}, {self.size})"
+
+
+def image_tiles(image) -> typing.List[ImageTile]:
+    """ Get the tiles of an image. Blender versions, which don't provide the size of the individual tiles, report the
+        size of the first tile for all of them. """
+    if image is None:
+        return []
+    if image.source != 'TILED':
+        return [ImageTile(FIRST_TILE, image.size)]
+    return [ImageTile(tile.number, getattr(tile, "size", image.size)) for tile in image.tiles]
+
+
+def tile_numbers(uvs: np.ndarray) -> np.ndarray:
+    """ The numbers of the UDIM tiles containing the given (n x 2) uv coordinates """
+    cells = np.floor(uvs).astype(np.int64)
+    # Blender's UDIM tiles have 10 columns, coordinates outside are clamped like blender does
+    np.clip(cells[:, 0], 0, 9, out=cells[:, 0])
+    np.maximum(cells[:, 1], 0, out=cells[:, 1])
+    return FIRST_TILE + cells[:, 0] + 10 * cells[:, 1]
+
+
+def tile_filepath(image, number: int) -> typing.Optional[str]:
+    """ The absolute path of the file of a tiled image's UDIM tile or None, if the tiles aren't stored in files """
+    if image is None or image.source != 'TILED' or image.packed_file is not None or not image.filepath_raw:
+        return None
+    path = bpy.path.abspath(image.filepath_raw, library=image.library)
+    if "<UDIM>" in path:
+        return path.replace("<UDIM>", str(number))
+    # Before blender 3.0 the path names one of the tiles. Like blender, we take the last 4 digit number of the file
+    # name as the tile number.
+    directory, filename = os.path.split(path)
+    matches = list(re.finditer(r"(?<!\d)1\d{3}(?!\d)", filename))
+    if not matches:
+        return None
+    match = matches[-1]
+    return os.path.join(directory, filename[:match.start()] + str(number) + filename[match.end():])
+
+
+def has_tile_pixel_access(image, tile: ImageTile) -> bool:
+    """ Blender's image.pixels only reads and writes the first tile. The other tiles of a tiled image are only
+        accessible through their files. """
+    if tile.number == FIRST_TILE:
+        return True
+    path = tile_filepath(image, tile.number)
+    return path is not None and os.path.exists(path)
+
+
+def read_tile_pixels(image, tile: ImageTile) -> np.ndarray:
+    """ Read the float pixels of an image tile """
+    result = np.empty(tile.size[0]*tile.size[1]*4, dtype=np.float32)
+    if tile.number == FIRST_TILE:
+        image.pixels.foreach_get(result)
+        return result
+    if not has_tile_pixel_access(image, tile):
+        raise Error(f"Tile {tile.number} of image {image.name} isn't stored in a file, so its pixels aren't accessible")
+    tile_image = bpy.data.images.load(tile_filepath(image, tile.number), check_existing=False)
+    try:
+        if tuple(tile_image.size) != tile.size:
+            raise Error(f"The file of tile {tile.number} of image {image.name} doesn't have the tile's size")
+        tile_image.pixels.foreach_get(result)
+    finally:
+        bpy.data.images.remove(tile_image)
+    return result
+
+
+def write_tile_pixels(image, tile: ImageTile, pixels: np.ndarray):
+    """ Write the float pixels of an image tile. The tiles of tiled images stored in files are written into their
+        files, since blender's image.pixels only provides the first tile. """
+    path = tile_filepath(image, tile.number)
+    if path is None:
+        if tile.number != FIRST_TILE:
+            raise Error(f"Tile {tile.number} of image {image.name} isn't stored in a file, so its pixels aren't "
+                        "accessible")
+        image.pixels.foreach_set(pixels)
+        return
+    tile_image = bpy.data.images.new("PAINTicle tile", tile.size[0], tile.size[1], alpha=True,
+                                     float_buffer=image.is_float)
+    try:
+        tile_image.colorspace_settings.name = image.colorspace_settings.name
+        tile_image.pixels.foreach_set(pixels)
+        tile_image.filepath_raw = path
+        tile_image.file_format = image.file_format
+        tile_image.save()
+    finally:
+        bpy.data.images.remove(tile_image)
+    # Reloading shows the new file contents in blender. As it also drops unsaved changes of the first tile, that tile
+    # goes through its file as well.
+    image.reload()
+
+
 def image_sizes(image):
-    """ Thus function shall return all images sizes of all UDIM tiles. However
-        currently blender doesn't allow access to the tiles, except their names.
-        So we can only work with untiles images """
-    return [image.size] if image is not None else [(0, 0)]
+    """ Return the sizes of all UDIM tiles of an image, see image_tiles """
+    tiles = image_tiles(image)
+    return [tile.size for tile in tiles] if tiles else [(0, 0)]
 
 
 def max_image_size(image):
-    """ Thus function shall return the combined maximum images size of all UDIM tiles. However
-        currently blender doesn't allow access to the tiles, except their names.
-        So we can only work with untiles images """
+    """ Return the combined maximum images size of all UDIM tiles """
     sizes = image_sizes(image)
     width = max([s[0] for s in sizes])
     height = max([s[1] for s in sizes])
     return width, height
 
 
-def gpu_framebuffer_for_image(image, glcontext: moderngl.Context):
+def image_dtype(image) -> str:
+    """ The texture dtype storing the pixels of the image without losing precision. 8 bit images use f1, float images
+        f2 or f4 depending on whether they are limited to half precision. """
+    if image is None or not image.is_float:
+        return "f1"
+    return "f2" if getattr(image, "use_half_precision", False) else "f4"
+
+
+def gpu_framebuffer_for_image(image, glcontext: moderngl.Context, dtype: str = None):
+    """ Create a framebuffer of the image's size. If dtype is None, the format is chosen by image_dtype. """
     size = max_image_size(image)
-    return gpu_simple_framebuffer(size, glcontext)
+    return gpu_simple_framebuffer(size, glcontext, dtype if dtype is not None else image_dtype(image))
 
 
-def gpu_simple_framebuffer(size, glcontext: moderngl.Context) -> moderngl.Framebuffer:
-    color_attachment = glcontext.texture(size, components=4, dtype="f4")
+def gpu_simple_framebuffer(size, glcontext: moderngl.Context, dtype: str = "f4") -> moderngl.Framebuffer:
+    color_attachment = glcontext.texture(size, components=4, dtype=dtype)
     return glcontext.framebuffer(color_attachment)
 
 
+def image_format(dtype: str) -> str:
+    """ The GLSL image format for binding a 4 component texture of the given dtype to an image unit """
+    try:
+        return PAINT_BUFFER_FORMATS[dtype][0]
+    except KeyError:
+        raise ValueError(f"Unsupported paint buffer dtype {dtype}")
+
+
+def to_texture_data(pixels: np.ndarray, dtype: str) -> np.ndarray:
+    """ Convert float pixels as provided by blender's images to the texel type of a texture with the given dtype """
+    if dtype == "f1":
+        result = np.clip(pixels, 0, 1) * 255
+        return np.rint(result, out=result).astype(np.uint8)
+    return pixels.astype(PAINT_BUFFER_FORMATS[dtype][1], copy=False)
+
+
+def from_texture_data(data: np.ndarray) -> np.ndarray:
+    """ Convert texels read from a texture to the float pixels needed by blender's images """
+    if data.dtype == np.uint8:
+        return np.multiply(data, np.float32(1 / 255), dtype=np.float32)
+    return data.astype(np.float32, copy=False)
+
+
 def load_shader_file(shader_name: str, stage: str) -> str:
     """ Loads the shader source from the addon's resources directory. Possible stages are
         * 'vert' = vertex shader
@@ -74,8 +240,10 @@ def load_shader_file(shader_name: str, stage: str) -> str:
         return f.read()
 
 
-def _join_shader(definitions_shader, specific_shader, prepend_version=True):
+def _join_shader(definitions_shader, specific_shader, prepend_version=True, defines: dict = None):
     version = "#version 430\n" if prepend_version else ""
+    if prepend_version and defines is not None:
+        version += "".join(f"#define {name} {value}\n" for name, value in defines.items())
     if prepend_version and specific_shader is None:
         # On the last stage of concatenation, if specific shader is None, then also return None
         return None
@@ -85,15 +253,17 @@ def _join_shader(definitions_shader, specific_shader, prepend_version=True):
 
 
 def load_shader_source(shader_name: str, additional_libs: typing.Iterable[str] = None,
-                       src_types: typing.Iterable[str] = ["vert", "frag", "geom"]) -> typing.Union[typing.Tuple, str]:
+                       src_types: typing.Iterable[str] = ["vert", "frag", "geom"],
+                       defines: dict = None) -> typing.Union[typing.Tuple, str]:
     """ Load all shaders for a given shader name and return a tuple with the preprocessed sources. If only a single
-        shader type is being queried, then this string is returned directly. """
+        shader type is being queried, then this string is returned directly. The defines are added as preprocessor
+        definitions in front of the sources. """
     result = [load_shader_file(shader_name, x) for x in src_types]
     definitions_shader = load_shader_file(shader_name, "def")
     if additional_libs is not None:
         for lib in reversed(additional_libs):
             definitions_shader = _join_shader(load_shader_file(lib, "def"), definitions_shader, False)
-    result = [_join_shader(definitions_shader, x) for x in result]
+    result = [_join_shader(definitions_shader, x, defines=defines) for x in result]
     return result[0] if len(result)==1 else result
 
 
@@ -120,9 +290,9 @@ def load_shader(shader_name, glcontext: moderngl.Context,
 
 
 def load_compute_shader(shader_name, glcontext: moderngl.Context,
-                        additional_libs: typing.Iterable[str] = None) -> moderngl.Program:
+                        additional_libs: typing.Iterable[str] = None, defines: dict = None) -> moderngl.Program:
     """ Load all shaders for a given shader name and return a compiled shader program """
-    compute_shader = load_shader_source(shader_name, additional_libs, ["comp"])
+    compute_shader = load_shader_source(shader_name, additional_libs, ["comp"], defines)
     try:
         program = glcontext.compute_shader(compute_shader)
     except moderngl.error.Error as e:
@@ -131,14 +301,16 @@ def load_compute_shader(shader_name, glcontext: moderngl.Context,
     return program
 
 
-def read_pixel_data_from_framebuffer(framebuffer: moderngl.Framebuffer, glcontext: moderngl.Context):
-    """ Read the pixel from the current back buffer """
+def read_pixel_data_from_framebuffer(framebuffer: moderngl.Framebuffer, glcontext: moderngl.Context,
+                                     dtype: str = "f4"):
+    """ Read the pixel from the current back buffer. Reading in the dtype of the color attachment avoids transferring
+        more bytes than stored, the result can be converted with from_texture_data afterwards. """
     scope = glcontext.scope(framebuffer=framebuffer)
     width = framebuffer.width
     height = framebuffer.height
-    buffer = np.empty(width*height*4, np.float32)
+    buffer = np.empty(width*height*4, PAINT_BUFFER_FORMATS[dtype][1])
     with scope:
-        framebuffer.read_into(buffer, viewport=(0, 0, width, height), components=4, dtype='f4')
+        framebuffer.read_into(buffer, viewport=(0, 0, width, height), components=4, dtype=dtype)
     return buffer
 
 
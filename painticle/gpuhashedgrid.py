@@ -0,0 +1,151 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# The hashed grid built by compute shaders
+
+# <pep8 compliant>
+
+from . import gpu_utils
+
+import numpy as np
+import struct
+
+import moderngl
+
+# These need to match the definitions in gridhash_def.glsl
+NUM_HASHED_GRID_ENTRIES = 1000000
+ID_NONE = 0xffffffff
+HEADER_SIZE = 8  # voxel size and number of particles
+CELL_OFFSETS_SIZE = NUM_HASHED_GRID_ENTRIES * 4
+
+
+def num_sort_entries(num_particles: int, local_size: int) -> int:
+    """ The number of entries sorted by the bitonic sort, a power of two and at least one work group """
+    num_entries = local_size
+    while num_entries < num_particles:
+        num_entries *= 2
+    return num_entries
+
+
+class GPUHashedGrid:
+    """ The hashed grid of accel.HashedGrid in the layout of HASHED_GRID_BUFFER, but built on the GPU from the
+        particles in a buffer with the layout of particle_def.glsl. This way the particles don't need to be read back
+        to find their neighbours. The entries are sorted by cell and particle ID, so unlike the CPU grid the order
+        within a cell is deterministic. """
+
+    def __init__(self, glcontext: moderngl.Context, voxel_size: float = 0.001, local_size: int = 64):
+        """ local_size is the work group size of the compute shaders, it needs to be a power of two """
+        if local_size & (local_size-1) != 0:
+            raise ValueError("The local size needs to be a power of two")
+        self.glcontext = glcontext
+        self.local_size = local_size
+        self.voxel_size = voxel_size
+        self.num_particles = 0
+        self.capacity = 0
+        self.buffer = None
+        self.shaders = {}
+
+    def _shader(self, name: str, defines: dict = None) -> moderngl.ComputeShader:
+        key = (name, tuple(defines.items()) if defines else ())
+        shader = self.shaders.get(key)
+        if shader is None:
+            defines = dict(defines or {}, LOCAL_SIZE=self.local_size)
+            shader = gpu_utils.load_compute_shader(name, self.glcontext, ["particle", "gridhash"], defines)
+            self.shaders[key] = shader
+        return shader
+
+    def _run(self, shader: moderngl.ComputeShader, num_invocations: int):
+        shader.run((num_invocations + self.local_size - 1) // self.local_size)
+        # moderngl doesn't expose glMemoryBarrier, so we need to use the less efficient glFinish to synchronize :-(
+        self.glcontext.finish()
+
+    def _reserve(self, num_entries: int):
+        """ Make room for the sorted entries. A new buffer starts with all cells being empty. """
+        if num_entries <= self.capacity:
+            return
+        self.release()
+        data = np.full((HEADER_SIZE + CELL_OFFSETS_SIZE) // 4 + 2 * num_entries, ID_NONE, dtype=np.uint32)
+        data[:2] = 0
+        self.buffer = self.glcontext.buffer(data)
+        self.capacity = num_entries
+        self.num_particles = 0
+
+    def build(self, particles_buffer: moderngl.Buffer, num_particles: int):
+        """ Build the grid from the first num_particles particles of the buffer """
+        num_entries = num_sort_entries(num_particles, self.local_size)
+        self._reserve(num_entries)
+        self.buffer.bind_to_storage_buffer(0)
+        if self.num_particles > 0:
+            self._run(self._shader("gridoffsets", {"CLEAR_OFFSETS": 1}), self.num_particles)
+        self.buffer.write(struct.pack("fI", self.voxel_size, num_particles))
+        self.num_particles = num_particles
+        if num_particles == 0:
+            return
+        particles_buffer.bind_to_storage_buffer(1)
+        build_shader = self._shader("gridbuild")
+        build_shader["numEntries"] = num_entries
+        self._run(build_shader, num_entries)
+        self._sort(num_entries)
+        self._run(self._shader("gridoffsets"), num_particles)
+
+    def _sort(self, num_entries: int):
+        """ Sort the entries with a bitonic sort. The passes with distances below the local size are done in shared
+            memory, only the larger ones need a dispatch per pass. """
+        local_sort = self._shader("gridsort", {"LOCAL_SORT": 1})
+        global_sort = self._shader("gridsort")
+        local_sort["k"] = 0
+        local_sort["j"] = 0
+        self._run(local_sort, num_entries)
+        k = 2 * self.local_size
+        while k <= num_entries:
+            j = k // 2
+            while j >= self.local_size:
+                global_sort["k"] = k
+                global_sort["j"] = j
+                self._run(global_sort, num_entries)
+                j //= 2
+            local_sort["k"] = k
+            local_sort["j"] = j
+            self._run(local_sort, num_entries)
+            k *= 2
+
+    def clear(self):
+        """ Remove all particles from the grid """
+        if self.buffer is not None and self.num_particles > 0:
+            self.buffer.bind_to_storage_buffer(0)
+            self._run(self._shader("gridoffsets", {"CLEAR_OFFSETS": 1}), self.num_particles)
+            self.buffer.write(struct.pack("fI", self.voxel_size, 0))
+        self.num_particles = 0
+
+    @property
+    def cell_offsets(self) -> np.ndarray:
+        """ Read the offsets of the cells' first entries back, e.g. for testing """
+        if self.buffer is None:
+            return np.full(NUM_HASHED_GRID_ENTRIES, ID_NONE, dtype=np.uint32)
+        return np.frombuffer(self.buffer.read(size=CELL_OFFSETS_SIZE, offset=HEADER_SIZE), dtype=np.uint32)
+
+    @property
+    def sorted_particle_ids(self) -> np.ndarray:
+        """ Read the (cell ID, particle ID) pairs of the particles back as (num_particles x 2) array """
+        if self.num_particles == 0:
+            return np.empty((0, 2), dtype=np.uint32)
+        data = self.buffer.read(size=8 * self.num_particles, offset=HEADER_SIZE + CELL_OFFSETS_SIZE)
+        return np.frombuffer(data, dtype=np.uint32).reshape((self.num_particles, 2))
+
+    def release(self):
+        if self.buffer is not None:
+            self.buffer.release()
+        self.buffer = None
+        self.capacity = 0
@@ -0,0 +1,55 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Support for running the simulation and painting without blender's UI
+
+import bpy
+
+import moderngl
+
+
+class HeadlessContext:
+    """ A stand-in for bpy.types.Context, that provides all members PAINTicle reads during simulation and painting.
+        It doesn't reference any area, region or window, so the painter won't try to draw into a viewport. """
+
+    def __init__(self, active_object: bpy.types.Object, scene: bpy.types.Scene = None):
+        self.scene = scene if scene is not None else bpy.context.scene
+        self.object = active_object
+        self.active_object = active_object
+        self.tool_settings = self.scene.tool_settings
+        self.preferences = bpy.context.preferences
+        self.window_manager = bpy.context.window_manager
+        self.window = None
+        self.screen = None
+        self.area = None
+        self.region = None
+        self.region_data = None
+
+
+def is_headless(context) -> bool:
+    """ Returns True, if the given context doesn't provide a 3D view to interact with """
+    return getattr(context, "area", None) is None
+
+
+def create_standalone_glcontext(backend: str = None) -> moderngl.Context:
+    """ Create a GL context, that isn't bound to blender's window. Passing backend="egl" allows creating the context
+        on machines without a display server. Software renderers like Mesa's llvmpipe are picked up, if they're
+        configured through the environment (e.g. LIBGL_ALWAYS_SOFTWARE=1). """
+    settings = {}
+    if backend is not None:
+        settings["backend"] = backend
+    return moderngl.create_context(standalone=True, require=430, **settings)
@@ -20,11 +20,9 @@
 
 
 from . import gpu_utils
+from . import meshdata
 from .utils import Error
 
-import bpy
-import numpy as np
-
 import moderngl
 
 
@@ -46,30 +44,26 @@ class MeshBuffer:
         vao = self.glcontext.vertex_array(shader, buffers, index_buffer=self.indices)
         vao.render(moderngl.vertex_array.TRIANGLES)
 
-    def build_mesh_vbo(self, mesh: bpy.types.Mesh):
-        if mesh is None:
+    def build_mesh_vbo(self, mesh_data: meshdata.MeshData):
+        if mesh_data is None:
             return  # Nothing to do, if we didn't get an active mesh
 
-        if (not mesh.polygons):
-            raise Error("ERROR: Mesh doesn't have polygons")
-
-        v = np.empty((len(mesh.vertices), 3), 'f')
-        mesh.vertices.foreach_get("co", np.reshape(v, len(mesh.vertices)*3))
-
-        uvMap = mesh.uv_layers.active.data
-        uv = np.empty((len(uvMap), 2), 'f')
-        uvMap.foreach_get("uv", np.reshape(uv, len(uvMap)*2))
-
-        vindices = np.empty(len(mesh.loop_triangles)*3, 'i')
-        mesh.loop_triangles.foreach_get("vertices", vindices)
-        indices = np.empty(len(mesh.loop_triangles)*3, 'i')
-        mesh.loop_triangles.foreach_get("loops", indices)
-
-        # We need to shuffle the vertices into the loop indices
-        vert_ind = np.empty(indices.max()+1, 'i')
-        np.put(vert_ind, indices, vindices)
-        vertices = np.take(v, vert_ind, 0)
-
-        gpu_utils.update_vbo(self.vertices, vertices)
-        gpu_utils.update_vbo(self.uv, uv)
-        gpu_utils.update_vbo(self.indices, indices)
+        if mesh_data.uvs is None:
+            raise Error("ERROR: Mesh doesn't have uvs")
+
+        # The GPU vertices are the mesh's loops, so the triangles of loop indices can be used directly
+        self.update_vertices(mesh_data)
+        gpu_utils.update_vbo(self.uv, mesh_data.uvs)
+        gpu_utils.update_vbo(self.indices, mesh_data.triangle_loops)
+
+    def update_vertices(self, mesh_data: meshdata.MeshData):
+        """ Only upload new vertex positions. The topology of the mesh needs to be the same as the one of the mesh
+            passed to build_mesh_vbo. """
+        gpu_utils.update_vbo(self.vertices, mesh_data.loop_points())
+
+    def update_uvs(self, mesh_data: meshdata.MeshData):
+        """ Only upload new uvs. The topology of the mesh needs to be the same as the one of the mesh passed to
+            build_mesh_vbo. """
+        if mesh_data.uvs is None:
+            raise Error("ERROR: Mesh doesn't have uvs")
+        gpu_utils.update_vbo(self.uv, mesh_data.uvs)
@@ -0,0 +1,223 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# A process wide cache of the data derived from the painted meshes. Building the BVH and extracting the GPU buffers
+# is expensive for large meshes, so it's only done again, if the mesh changed between two paint sessions. If only
+# vertices moved, e.g. by sculpting, or uvs were edited, the cached data is refitted instead of rebuilt.
+
+import bpy
+import numpy as np
+
+from . import accel
+from . import diskcache
+from . import meshdata
+from . import trianglemesh
+from . import meshbuffer
+from .utils import Error
+
+# The number of vertex positions compared to detect moved vertices, that the depsgraph handler missed
+NUM_POSITION_SAMPLES = 64
+# The number of loop uvs compared to detect edited uvs, that the depsgraph handler missed
+NUM_UV_SAMPLES = 64
+
+
+class CacheEntry:
+    """ All data derived from one mesh of one object """
+
+    def __init__(self, topology, positions, uvs):
+        self.topology = topology
+        self.positions = positions
+        self.uvs = uvs
+        self.geometry_changed = False  # Set by the depsgraph handler
+        self.mesh_data = None  # The arrays extracted from the mesh, shared by the triangle mesh and the buffers
+        self.triangle_mesh = None
+        self.mesh_buffers = {}  # GPU buffers per id of the moderngl context (the buffers keep their context alive)
+        self.paint_mesh = None  # The accel.PaintMesh of the CPU painter
+
+    def refit(self, mesh: bpy.types.Mesh):
+        """ Move the cached data to the mesh's vertex positions and take its uvs. Returns False, if the topology
+            changed. """
+        if self.mesh_data is None or not self.mesh_data.update_geometry(mesh):
+            return False
+        old_uvs = self.mesh_data.uvs
+        self.mesh_data.update_uvs(mesh)
+        uvs_changed = not np.array_equal(old_uvs, self.mesh_data.uvs)
+        if self.triangle_mesh is not None:
+            self.triangle_mesh.refit()
+            if uvs_changed:
+                self.triangle_mesh.update_uvs()
+        for mesh_buffer in self.mesh_buffers.values():
+            mesh_buffer.update_vertices(self.mesh_data)
+            if uvs_changed:
+                mesh_buffer.update_uvs(self.mesh_data)
+        if uvs_changed:
+            # The paint mesh can't update its uvs, so it's rebuilt on its next use
+            self.paint_mesh = None
+        elif self.paint_mesh is not None:
+            self.paint_mesh.update_points(self.mesh_data.loop_points())
+        return True
+
+    def get_mesh_data(self, mesh: bpy.types.Mesh, disk_cache_directory: str = None) -> meshdata.MeshData:
+        """ Extract the mesh's data once. If a disk cache directory is given, it's loaded from or stored into it. """
+        if self.mesh_data is None:
+            key = diskcache.cache_key(mesh, self.positions) if disk_cache_directory else None
+            arrays = diskcache.load(disk_cache_directory, key)
+            if arrays is not None:
+                self.mesh_data = meshdata.MeshData(arrays)
+            else:
+                self.mesh_data = meshdata.MeshData.extract(mesh)
+                diskcache.store(disk_cache_directory, key, self.mesh_data.arrays)
+        return self.mesh_data
+
+
+_entries = {}
+
+
+def topology_fingerprint(mesh: bpy.types.Mesh):
+    """ A cheap identification of the mesh's topology. It catches e.g. undo steps replacing the mesh. Changes keeping
+        the number of elements are detected, when refitting the cached data. """
+    return (mesh.as_pointer(), len(mesh.vertices), len(mesh.loops), len(mesh.polygons), mesh.uv_layers.active_index)
+
+
+def sample_positions(mesh: bpy.types.Mesh):
+    """ Some vertex positions to detect moved vertices """
+    num_vertices = len(mesh.vertices)
+    samples = np.unique(np.linspace(0, num_vertices-1, min(num_vertices, NUM_POSITION_SAMPLES), dtype=int))
+    return tuple(tuple(mesh.vertices[int(i)].co) for i in samples)
+
+
+def sample_uvs(mesh: bpy.types.Mesh):
+    """ Some uvs of the active uv layer to detect edited uvs """
+    if mesh.uv_layers.active is None:
+        return ()
+    uv_data = mesh.uv_layers.active.data
+    num_loops = len(uv_data)
+    samples = np.unique(np.linspace(0, num_loops-1, min(num_loops, NUM_UV_SAMPLES), dtype=int))
+    return tuple(tuple(uv_data[int(i)].uv) for i in samples)
+
+
+def _key(obj: bpy.types.Object):
+    return obj.name, obj.data.name
+
+
+def _get_entry(obj: bpy.types.Object) -> CacheEntry:
+    key = _key(obj)
+    mesh = obj.data
+    topology = topology_fingerprint(mesh)
+    positions = sample_positions(mesh)
+    uvs = sample_uvs(mesh)
+    entry = _entries.get(key)
+    if entry is not None and entry.topology == topology:
+        if entry.geometry_changed or entry.positions != positions or entry.uvs != uvs:
+            if not entry.refit(mesh):
+                entry = None
+    else:
+        entry = None
+    if entry is None:
+        entry = CacheEntry(topology, positions, uvs)
+        _entries[key] = entry
+    entry.positions = positions
+    entry.uvs = uvs
+    entry.geometry_changed = False
+    return entry
+
+
+def get_triangle_mesh(context, build_quality: accel.BuildQuality = accel.BuildQuality.MEDIUM,
+                      disk_cache_directory: str = None) -> trianglemesh.TriangleMesh:
+    """ Get the triangle mesh of the context's object, reusing the one of a previous paint session if possible. If a
+        disk cache directory is given, the mesh's arrays are loaded from or stored into it. """
+    entry = _get_entry(context.object)
+    if entry.triangle_mesh is None or entry.triangle_mesh.build_quality != build_quality:
+        mesh_data = entry.get_mesh_data(context.object.data, disk_cache_directory)
+        entry.triangle_mesh = trianglemesh.TriangleMesh(context, build_quality, mesh_data)
+    else:
+        # The python objects of blender's data might have been recreated, even if the data is the same
+        entry.triangle_mesh.object = context.object
+        entry.triangle_mesh.mesh = context.object.data
+    return entry.triangle_mesh
+
+
+def get_mesh_buffer(obj: bpy.types.Object, glcontext) -> meshbuffer.MeshBuffer:
+    """ Get the GPU buffers of the object's mesh for the given moderngl context """
+    entry = _get_entry(obj)
+    mesh_buffer = entry.mesh_buffers.get(id(glcontext))
+    if mesh_buffer is None:
+        mesh_buffer = meshbuffer.MeshBuffer(glcontext, None)
+        mesh_buffer.build_mesh_vbo(entry.get_mesh_data(obj.data))
+        entry.mesh_buffers[id(glcontext)] = mesh_buffer
+    return mesh_buffer
+
+
+def get_paint_mesh(obj: bpy.types.Object) -> accel.PaintMesh:
+    """ Get the loop points, uvs and loop triangles of the object's mesh as needed by the CPU painter """
+    entry = _get_entry(obj)
+    if entry.paint_mesh is None:
+        mesh_data = entry.get_mesh_data(obj.data)
+        if mesh_data.uvs is None:
+            raise Error("ERROR: Mesh doesn't have uvs")
+        entry.paint_mesh = accel.build_paint_mesh(mesh_data.loop_points(), mesh_data.uvs, mesh_data.triangle_loops)
+    return entry.paint_mesh
+
+
+def invalidate(object_name: str = None, mesh_name: str = None):
+    """ Forget the cached data of the given object or mesh. Without arguments the whole cache is cleared. """
+    if object_name is None and mesh_name is None:
+        _entries.clear()
+        return
+    for key in list(_entries.keys()):
+        if key[0] == object_name or key[1] == mesh_name:
+            del _entries[key]
+
+
+def num_entries():
+    return len(_entries)
+
+
+def _mark_changed(object_name: str = None, mesh_name: str = None):
+    for key, entry in _entries.items():
+        if key[0] == object_name or key[1] == mesh_name:
+            entry.geometry_changed = True
+
+
+@bpy.app.handlers.persistent
+def _on_depsgraph_update(scene, depsgraph):
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+        updated_id = update.id.original
+        if isinstance(updated_id, bpy.types.Object):
+            _mark_changed(object_name=updated_id.name)
+        elif isinstance(updated_id, bpy.types.Mesh):
+            _mark_changed(mesh_name=updated_id.name)
+
+
+@bpy.app.handlers.persistent
+def _on_load(*args):
+    invalidate()
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+    bpy.app.handlers.load_post.append(_on_load)
+
+
+def unregister():
+    invalidate()
+    if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+    if _on_load in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load)
@@ -0,0 +1,142 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# The data extracted from a blender mesh. The BVH of the simulation and the GPU buffers of the painter are both built
+# from these arrays, so each mesh is only read once from blender.
+
+import bpy
+import numpy as np
+
+from .utils import Error
+
+
+class MeshData:
+    """ The numpy arrays of a mesh:
+          points:         the vertex positions (num_vertices x 3)
+          loop_vertices:  the vertex index of each loop (num_loops)
+          triangle_loops: the loop indices of each loop triangle (num_triangles x 3)
+          split_normals:  the split normals of each triangle corner (num_triangles*3 x 3)
+          uvs:            the active uv layer's coordinates of each loop (num_loops x 2), if the mesh has uvs
+        The arrays might be read only, e.g. when they're memory mapped from the disk cache. """
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+        self._triangle_vertices = None
+
+    @classmethod
+    def extract(cls, mesh: bpy.types.Mesh) -> "MeshData":
+        if (not mesh.polygons):
+            raise Error("ERROR: Mesh doesn't have polygons")
+        mesh.calc_normals_split()
+        mesh.calc_loop_triangles()
+        arrays = {"points": extract_points(mesh),
+                  "loop_vertices": extract_loop_vertices(mesh),
+                  "triangle_loops": extract_triangle_loops(mesh),
+                  "split_normals": extract_split_normals(mesh)}
+        uvs = extract_uvs(mesh)
+        if uvs is not None:
+            arrays["uvs"] = uvs
+        return cls(arrays)
+
+    @property
+    def points(self):
+        return self.arrays["points"]
+
+    @property
+    def loop_vertices(self):
+        return self.arrays["loop_vertices"]
+
+    @property
+    def triangle_loops(self):
+        return self.arrays["triangle_loops"]
+
+    @property
+    def split_normals(self):
+        return self.arrays["split_normals"]
+
+    @property
+    def uvs(self):
+        return self.arrays.get("uvs")
+
+    @property
+    def triangle_vertices(self):
+        """ The vertex indices of each loop triangle (num_triangles x 3) """
+        if self._triangle_vertices is None:
+            self._triangle_vertices = np.take(self.loop_vertices, self.triangle_loops)
+        return self._triangle_vertices
+
+    def loop_points(self):
+        """ The vertex positions expanded to one per loop, as needed by the GPU buffers """
+        return np.take(self.points, self.loop_vertices, axis=0)
+
+    def update_geometry(self, mesh: bpy.types.Mesh) -> bool:
+        """ Take the vertex positions and split normals of the mesh. Returns False without changing anything, if the
+            mesh's topology differs. """
+        if len(mesh.vertices) != len(self.points) or len(mesh.loops) != len(self.loop_vertices):
+            return False
+        mesh.calc_normals_split()
+        mesh.calc_loop_triangles()
+        if (not np.array_equal(extract_triangle_loops(mesh), self.triangle_loops) or
+                not np.array_equal(extract_loop_vertices(mesh), self.loop_vertices)):
+            return False
+        # Replace the arrays instead of writing into them, since they might be read only
+        self.arrays = dict(self.arrays, points=extract_points(mesh), split_normals=extract_split_normals(mesh))
+        return True
+
+    def update_uvs(self, mesh: bpy.types.Mesh):
+        """ Take the uvs of the mesh's active uv layer """
+        uvs = extract_uvs(mesh)
+        self.arrays = dict(self.arrays, uvs=uvs) if uvs is not None else \
+            {name: array for name, array in self.arrays.items() if name != "uvs"}
+
+
+def extract_points(mesh: bpy.types.Mesh):
+    points = np.empty((len(mesh.vertices), 3), np.single)
+    mesh.vertices.foreach_get("co", np.reshape(points, 3*len(mesh.vertices)))
+    return points
+
+
+def extract_loop_vertices(mesh: bpy.types.Mesh):
+    loop_vertices = np.empty(len(mesh.loops), np.uintc)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    return loop_vertices
+
+
+def extract_triangle_loops(mesh: bpy.types.Mesh):
+    """ Needs an up to date mesh.calc_loop_triangles() """
+    num_tris = len(mesh.loop_triangles)
+    triangle_loops = np.empty((num_tris, 3), np.uintc)
+    mesh.loop_triangles.foreach_get("loops", np.reshape(triangle_loops, 3*num_tris))
+    return triangle_loops
+
+
+def extract_split_normals(mesh: bpy.types.Mesh):
+    """ Needs an up to date mesh.calc_normals_split() and mesh.calc_loop_triangles() """
+    num_tris = len(mesh.loop_triangles)
+    normals = np.empty((3*num_tris, 3), np.single)
+    mesh.loop_triangles.foreach_get("split_normals", np.reshape(normals, 9*num_tris))
+    return normals
+
+
+def extract_uvs(mesh: bpy.types.Mesh):
+    """ Get the active uv layer's coordinates or None, if the mesh doesn't have uvs """
+    if mesh.uv_layers.active is None:
+        return None
+    uv_data = mesh.uv_layers.active.data
+    uvs = np.empty((len(uv_data), 2), np.single)
+    uv_data.foreach_get("uv", np.reshape(uvs, 2*len(uv_data)))
+    return uvs
@@ -40,6 +40,62 @@ def to_structured(a, dtype):
     return recfunctions.unstructured_to_structured(a, dtype=dtype)
 
 
+def unstructured_view(a):
+    """ Get an unstructured view of a structured array, whose fields all have the same type and are packed without
+        padding, e.g. a field of the particle data. Unlike unstructured, writing into the result modifies a. """
+    if a.dtype.names is None:
+        return a
+    field_types = {a.dtype.fields[name][0] for name in a.dtype.names}
+    if len(field_types) != 1:
+        raise ValueError("All fields need the same type to get an unstructured view")
+    field_type = field_types.pop()
+    num_fields = len(a.dtype.names)
+    if field_type.itemsize * num_fields != a.dtype.itemsize or a.ndim != 1:
+        raise ValueError("The fields need to be packed in a one dimensional array to get an unstructured view")
+    return a.view((field_type, num_fields))
+
+
+class ScratchBuffers:
+    """ Named temporary arrays, which are reused on every time step instead of being allocated again. Each buffer only
+        grows, so once the number of elements settles, no more memory is allocated. The returned arrays are views into
+        the buffers, which stay valid until the same name is requested again. """
+
+    GROWTH_FACTOR = 1.5
+
+    def __init__(self):
+        self._buffers = {}
+        self.num_allocations = 0
+
+    def get(self, name: str, shape, dtype) -> np.ndarray:
+        """ Get an uninitialized array of the given shape and type """
+        shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.dtype != dtype or len(buffer) < size:
+            capacity = size
+            if buffer is not None and buffer.dtype == dtype:
+                capacity = max(size, int(len(buffer) * self.GROWTH_FACTOR))
+            buffer = np.empty(capacity, dtype)
+            self._buffers[name] = buffer
+            self.num_allocations += 1
+        return buffer[:size].reshape(shape)
+
+    def zeros(self, name: str, shape, dtype) -> np.ndarray:
+        """ Get an array of the given shape and type filled with zeros """
+        result = self.get(name, shape, dtype)
+        result.fill(0)
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def clear(self):
+        """ Release all buffers """
+        self._buffers.clear()
+
+
 def repeated_vec(vec, n, dtype=None):
     """ Repeat the given vector n times and return an array """
     result = np.empty(n, dtype=dtype)
@@ -17,6 +17,7 @@
 
 from bpy.types import NodeSocket
 from ..settings.brushtree import BrushTree
+from .. import utils
 import bpy
 
 
@@ -63,6 +64,20 @@ def create_default_brush_tree():
     bpy.context.scene.painticle_settings.brush = tree
 
 
+def create_brush_tree(name, brush_definition):
+    """ Create a brush tree with a single, active brush from a definition created by
+        BrushTree.get_active_brush_definition """
+    tree = bpy.data.node_groups.new(name, BrushTree.bl_idname)
+    node = None
+    for step_definition in brush_definition:
+        node = _create_next_step(step_definition["node"], node, tree)
+        utils.property_group_from_dict(node.step, step_definition["step"])
+    brush_define = _create_next_step("BrushDefineNode", node, tree)
+    brush_define.label = name
+    tree.active_brush = brush_define.name
+    return tree
+
+
 class CreateDefaultBrushTree(bpy.types.Operator):
     """Create the default brush node tree"""
     bl_idname = "scene.create_default_brush_tree"
@@ -20,11 +20,15 @@ import bpy
 import cProfile
 import pstats
 import io
+import os
 import time
 
 from .createdefaultbrushtree import create_default_brush_tree
 from ..interaction import Interactions
 from .. import particles
+from .. import profiling
+from .. import stroke
+from ..settings import preferences
 
 
 def menu_draw(self, context):
@@ -59,6 +63,7 @@ class PaintOp(bpy.types.Operator):
         self.lastcall = 0
         self.pr = None
         self._interaction_flags = Interactions.NONE
+        self._follows_mesh = True
 
     @classmethod
     def poll(cls, context):
@@ -83,6 +88,10 @@ class PaintOp(bpy.types.Operator):
             currenttime = time.time_ns()
             delta_t = self.calc_time_step(currenttime, settings.physics.max_time_step)
             self.lastcall = currenttime
+            # Follow the mesh, e.g. when it's deformed by an animation playing while painting
+            if not self._particles.follow_mesh(context.evaluated_depsgraph_get()) and self._follows_mesh:
+                self.report({'WARNING'}, "The topology of the painted mesh changed. Restart painting to follow it.")
+                self._follows_mesh = False
             self._particles.move_particles(delta_t, settings)
             self._particles.paint_particles(delta_t)
             if not settings.stop_painting_on_mouse_release and self._interaction_flags == Interactions.NONE:
@@ -97,15 +106,21 @@ class PaintOp(bpy.types.Operator):
                 self._interaction_flags &= ~Interactions.EMIT_PARTICLES
             if self._interaction_flags & Interactions.EMIT_PARTICLES:
                 self._particles.clear_particles()
+                if preferences.get_instance(context).stroke_recording_directory:
+                    self._particles.recorder = stroke.StrokeRecorder(context)
                 self._particles.start_interacting(context, event, self._interaction_flags)
                 self.lastcall = time.time_ns()
-                self.startProfile()
+                self.startProfile(context)
                 self.setTimer(context, True)
             else:
+                # Let the brush know, that it shouldn't emit anymore
+                if self._particles.input_data is not None:
+                    self._particles.interact(context, event, self._interaction_flags)
                 settings = context.scene.painticle_settings
                 if settings.stop_painting_on_mouse_release:
                     self.setTimer(context, False)
-                self.endProfile()
+                self.endProfile(context)
+                self.endRecording(context)
 
             return {'RUNNING_MODAL'}
 
@@ -138,13 +153,17 @@ class PaintOp(bpy.types.Operator):
         else:
             self._timer = None
 
-    def startProfile(self):
-        if self.pr is None:
-            return
+    def startProfile(self, context):
+        profiling.get_profiler().begin_stroke()
+        if self.pr is None and preferences.get_instance(context).use_python_profiler:
             self.pr = cProfile.Profile()
             self.pr.enable()
 
-    def endProfile(self):
+    def endProfile(self, context):
+        report = profiling.get_profiler().end_stroke()
+        export_directory = preferences.get_instance(context).profiling_export_directory
+        if report is not None and export_directory:
+            report.write(bpy.path.abspath(export_directory))
         if self.pr is not None:
             self.pr.disable()
             s = io.StringIO()
@@ -155,6 +174,21 @@ class PaintOp(bpy.types.Operator):
             print(s.getvalue())
             self.pr = None
 
+    def endRecording(self, context):
+        recorder = self._particles.recorder
+        if recorder is not None:
+            self._particles.recorder = None
+            directory = bpy.path.abspath(preferences.get_instance(context).stroke_recording_directory)
+            os.makedirs(directory, exist_ok=True)
+            basename = "painticle_stroke_" + time.strftime("%Y%m%d_%H%M%S")
+            filename = os.path.join(directory, basename + ".stroke")
+            # Multiple strokes might end within the same second
+            counter = 1
+            while os.path.exists(filename):
+                filename = os.path.join(directory, "{}_{}.stroke".format(basename, counter))
+                counter += 1
+            recorder.stop().write(filename)
+
     def invoke(self, context, event):
         if context.space_data.type == 'VIEW_3D':
             # Move out of a potential camera view into normal perspective one, so we
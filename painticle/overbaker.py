@@ -19,36 +19,154 @@
 
 from . import meshbuffer
 from . import gpu_utils
+from .utils import Error
 
 import moderngl
+import numpy as np
+
+# The gutter filling algorithms:
+#   dilate:     grows the uv islands by one texel ring per pass, blending the neighbouring texels
+#   jump_flood: copies the color of the nearest island texel, needing only a logarithmic number of passes
+OVERBAKE_MODES = ("dilate", "jump_flood")
+
+
+def _shifted(a: np.ndarray, dx: int, dy: int, fill) -> np.ndarray:
+    """ Get the values of a at the texel offset (dx, dy) of each texel, fill outside of the image """
+    height, width = a.shape[:2]
+    result = np.full_like(a, fill)
+    if abs(dx) < width and abs(dy) < height:
+        dst = (slice(max(0, -dy), min(height, height - dy)), slice(max(0, -dx), min(width, width - dx)))
+        src = (slice(max(0, dy), min(height, height + dy)), slice(max(0, dx), min(width, width + dx)))
+        result[dst] = a[src]
+    return result
+
+
+def dilate(pixels: np.ndarray, mask: np.ndarray, steps: int) -> np.ndarray:
+    """ A numpy reference of the dilation passes. pixels is a (height x width x components) array and mask a
+        (height x width) array, which is non zero inside the uv islands. Returns a copy, in which each pass gave the
+        texels next to the islands the distance weighted average of their neighbours inside. """
+    pixels = pixels.copy()
+    mask = mask > 0
+    for _ in range(steps):
+        accumulated = np.zeros_like(pixels)
+        weights = np.zeros(mask.shape, pixels.dtype)
+        for y in (-1, 0, 1):
+            for x in (-1, 0, 1):
+                if x == 0 and y == 0:
+                    continue
+                weight = 1 / np.hypot(x, y)
+                neighbour_mask = _shifted(mask, x, y, False)
+                accumulated += np.where(neighbour_mask[..., np.newaxis], weight * _shifted(pixels, x, y, 0), 0)
+                weights += weight * neighbour_mask
+        grow = ~mask & (weights > 0)
+        pixels[grow] = accumulated[grow] / weights[grow][:, np.newaxis]
+        mask |= grow
+    return pixels
+
+
+def jump_flood_jumps(gutter_width: int):
+    """ The jump distances of the jump flood passes reaching gutter_width texels. The last pass of distance 1 is
+        repeated to fix most of the errors of the approximation (JFA+1). """
+    if gutter_width <= 0:
+        return []
+    return [1 << i for i in reversed(range(gutter_width.bit_length()))] + [1]
+
+
+def jump_flood_seeds(mask: np.ndarray, gutter_width: int) -> np.ndarray:
+    """ A numpy reference of the jump flood passes. mask is a (height x width) array, which is non zero inside the
+        uv islands. Returns the (x, y) coordinates of the nearest island texel of each texel as (height x width x 2)
+        array or -1 for texels without a seed. """
+    height, width = mask.shape
+    ys, xs = np.mgrid[0:height, 0:width]
+    coords = np.stack([xs, ys], axis=-1).astype(np.int32)
+    seeds = np.where(mask[..., np.newaxis] > 0, coords, -1).astype(np.int32)
+
+    def squared_distance(s):
+        d = s - coords
+        return np.where(s[..., 0] >= 0, np.sum(d * d, axis=-1), np.iinfo(np.int32).max)
+
+    for jump in jump_flood_jumps(gutter_width):
+        best = seeds.copy()
+        best_distance = squared_distance(best)
+        # Same order of the neighbours as in the shader, so ties are resolved the same way
+        for y in (-1, 0, 1):
+            for x in (-1, 0, 1):
+                neighbour = _shifted(seeds, jump * x, jump * y, -1)
+                distance = squared_distance(neighbour)
+                better = distance < best_distance
+                best[better] = neighbour[better]
+                best_distance[better] = distance[better]
+        seeds = best
+    return seeds
+
+
+def jump_flood_fill(pixels: np.ndarray, mask: np.ndarray, gutter_width: int) -> np.ndarray:
+    """ A numpy reference of the jump flood gutter filling. pixels is a (height x width x components) array. Returns a
+        copy, in which the texels outside the islands and within gutter_width texels take their seed's color. """
+    seeds = jump_flood_seeds(mask, gutter_width)
+    height, width = mask.shape
+    ys, xs = np.mgrid[0:height, 0:width]
+    reach = np.maximum(np.abs(seeds[..., 0] - xs), np.abs(seeds[..., 1] - ys))
+    fill = (mask == 0) & (seeds[..., 0] >= 0) & (reach <= gutter_width)
+    result = pixels.copy()
+    result[fill] = pixels[seeds[fill][:, 1], seeds[fill][:, 0]]
+    return result
 
 
 class Overbaker:
     """ This class provides support for overbaking the painted results. """
 
-    def __init__(self, meshbuffer: meshbuffer.MeshBuffer, glcontext: moderngl.Context):
+    def __init__(self, meshbuffer: meshbuffer.MeshBuffer, glcontext: moderngl.Context, local_size: int = 16):
+        """ local_size is the edge length of the compute shaders' square work groups """
         self.meshbuffer = meshbuffer
         self.glcontext = glcontext
-        self.shader = gpu_utils.load_compute_shader("overbaker", self.glcontext, ["utils"])
+        self.local_size = local_size
+        # The compute shaders by name and dtype of the painted texture, compiled on first use
+        self.shaders = {}
+        self.init_shader = None
         self.mask_texture = None
 
-    def overbake(self, texture: moderngl.Texture, steps: int):
+    def _shader(self, name: str, dtype: str = "f4", additional_libs=None) -> moderngl.ComputeShader:
+        key = (name, dtype)
+        shader = self.shaders.get(key)
+        if shader is None:
+            defines = {"LOCAL_SIZE": self.local_size, "COLOR_FORMAT": gpu_utils.image_format(dtype)}
+            shader = gpu_utils.load_compute_shader(name, self.glcontext, additional_libs, defines)
+            self.shaders[key] = shader
+        return shader
+
+    def _num_groups(self, texture: moderngl.Texture):
+        """ The number of work groups covering all texels of the texture """
+        w, h = texture.size
+        return (w + self.local_size - 1) // self.local_size, (h + self.local_size - 1) // self.local_size
+
+    def overbake(self, texture: moderngl.Texture, steps: int, mode: str = "dilate", uv_offset=(0, 0)):
+        """ Fill a gutter of steps texels around the uv islands using one of the OVERBAKE_MODES. uv_offset is the
+            lower left corner of the UDIM tile stored in the texture. """
         #self.printTexture("INPUT_TEXTURE", texture)
-        self._init_overbake(texture)
-        for i in range(steps):
-            self._overbake_once(texture, i)
+        if mode not in OVERBAKE_MODES:
+            raise Error(f"Unknown overbake mode {mode}")
+        self._init_overbake(texture, uv_offset)
+        if mode == "jump_flood":
+            self._jump_flood(texture, steps)
+        else:
+            self._dilate(texture, steps)
         #self.printTexture("END_MASK", self.mask_texture)
         self._shutdown_overbake(texture)
         #self.printTexture("OUTPUT_TEXTURE", texture)
 
-    def _init_overbake(self, texture: moderngl.Texture):
+    def _init_overbake(self, texture: moderngl.Texture, uv_offset=(0, 0)):
         # Initialize mask
         self.mask_texture = self.glcontext.texture(texture.size, 1, dtype='u1')
         framebuffer = self.glcontext.framebuffer(color_attachments=[self.mask_texture])
-        init_shader = gpu_utils.load_shader("initoverbaker", self.glcontext)
+        if self.init_shader is None:
+            self.init_shader = gpu_utils.load_shader("initoverbaker", self.glcontext)
+        init_shader = self.init_shader
+        init_shader["uv_offset"] = tuple(uv_offset)
         scope = self.glcontext.scope(framebuffer=framebuffer)
         with scope:
             self.meshbuffer.draw(init_shader)
+        framebuffer.release()
         #self.printTexture("MASK:", self.mask_texture)
 
     def printTexture(self, note, texture: moderngl.Texture):
@@ -60,16 +178,62 @@ class Overbaker:
             print("Component", i)
             print(data[:, :, i])
 
-    def _overbake_once(self, texture: moderngl.Texture, step: int):
-        texture.bind_to_image(0, read=True, write=True)
-        self.mask_texture.bind_to_image(1, read=True, write=True)
-        w, h = texture.size
-        nx, ny = int(w/16), int(h/16)
-        # We need to add 2, since 0 is reserved for empty pixels and we initialized our inner mask with 1
-        self.shader['step'] = step+2
-        self.shader.run(nx, ny, 1)
+    def _dilate(self, texture: moderngl.Texture, steps: int):
+        if steps <= 0:
+            return
+        nx, ny = self._num_groups(texture)
+        # Each pass reads the colors and masks written by the last one, then the roles are swapped
+        shader = self._shader("overbaker", texture.dtype, ["utils"])
+        temp_color = self.glcontext.texture(texture.size, 4, dtype=texture.dtype)
+        colors = [texture, temp_color]
+        masks = [self.mask_texture, self.glcontext.texture(texture.size, 1, dtype='u1')]
+        for _ in range(steps):
+            colors[0].bind_to_image(0, read=True, write=False)
+            masks[0].bind_to_image(1, read=True, write=False)
+            colors[1].bind_to_image(2, read=False, write=True)
+            masks[1].bind_to_image(3, read=False, write=True)
+            shader.run(nx, ny, 1)
+            # moderngl doesn't expose glMemoryBarrier, so we need to use the less efficient glFinish to synchronize :-(
+            self.glcontext.finish()
+            colors.reverse()
+            masks.reverse()
+        if colors[0] is temp_color:
+            # An odd number of passes ends in the temporary texture
+            framebuffer = self.glcontext.framebuffer(color_attachments=[temp_color])
+            self.glcontext.copy_framebuffer(texture, framebuffer)
+            framebuffer.release()
+        temp_color.release()
+        masks[1].release()
+        self.mask_texture = masks[0]
+
+    def _jump_flood(self, texture: moderngl.Texture, gutter_width: int):
+        # Only the fill shader touches the colors, the others are the same for all dtypes
+        init_shader = self._shader("jumpfloodinit")
+        flood_shader = self._shader("jumpflood")
+        fill_shader = self._shader("jumpfloodfill", texture.dtype)
+        nx, ny = self._num_groups(texture)
+        # The seeds are read from one texture and written to the other, then the roles are swapped
+        seeds = [self.glcontext.texture(texture.size, 2, dtype='i4') for _ in range(2)]
+        self.mask_texture.bind_to_image(1, read=True, write=False)
+        seeds[0].bind_to_image(2, read=False, write=True)
+        init_shader.run(nx, ny, 1)
         # moderngl doesn't expose glMemoryBarrier, so we need to use the less efficient glFinish to synchronize :-(
         self.glcontext.finish()
+        for jump in jump_flood_jumps(gutter_width):
+            seeds[0].bind_to_image(2, read=True, write=False)
+            seeds[1].bind_to_image(3, read=False, write=True)
+            flood_shader['jump'] = jump
+            flood_shader.run(nx, ny, 1)
+            self.glcontext.finish()
+            seeds.reverse()
+        texture.bind_to_image(0, read=True, write=True)
+        seeds[0].bind_to_image(2, read=True, write=False)
+        fill_shader['gutterWidth'] = gutter_width
+        fill_shader.run(nx, ny, 1)
+        self.glcontext.finish()
+        for seed_texture in seeds:
+            seed_texture.release()
 
     def _shutdown_overbake(self, texture: moderngl.Texture):
+        self.mask_texture.release()
         self.mask_texture = None
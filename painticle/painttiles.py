@@ -0,0 +1,137 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# The paint buffers of the individual UDIM tiles
+
+# <pep8 compliant>
+
+from . import gpu_utils
+
+import numpy as np
+
+import moderngl
+
+
+def touched_tiles(uvs: np.ndarray, radii: np.ndarray) -> set:
+    """ The numbers of the UDIM tiles overlapped by the squares around the given (n x 2) uv coordinates with the given
+        radii in uv space. Radii are expected to be smaller than a tile, so checking the corners is enough. """
+    if len(uvs) == 0:
+        return set()
+    radii = radii.reshape(-1, 1)
+    lower = uvs - radii
+    upper = uvs + radii
+    corners = [lower, upper, np.column_stack((lower[:, 0], upper[:, 1])), np.column_stack((upper[:, 0], lower[:, 1]))]
+    numbers = np.unique(np.concatenate([gpu_utils.tile_numbers(corner) for corner in corners]))
+    return set(numbers.tolist())
+
+
+def downsample_factor(size, max_edge: int) -> int:
+    """ The smallest power of two, that reduces the given size to max_edge texels per edge """
+    factor = 1
+    while max(size) > max(1, max_edge) * factor:
+        factor *= 2
+    return factor
+
+
+def downsampled_tile(tile: gpu_utils.ImageTile, factor: int) -> gpu_utils.ImageTile:
+    """ An image tile with the same number and its size divided by factor """
+    return gpu_utils.ImageTile(tile.number, (max(1, tile.size[0] // factor), max(1, tile.size[1] // factor)))
+
+
+class PaintTile:
+    """ The GPU paint buffer of a single image tile. The painter allocates it, when the first particle lands in the
+        tile, so untouched tiles don't need any GPU memory. """
+
+    def __init__(self, tile: gpu_utils.ImageTile, glcontext: moderngl.Context, dtype: str):
+        self.tile = tile
+        self.glcontext = glcontext
+        self.dtype = dtype
+        self.framebuffer = gpu_utils.gpu_simple_framebuffer(tile.size, glcontext, dtype)
+        self.texture = self.framebuffer.color_attachments[0]
+        self.sampler = glcontext.sampler(texture=self.texture)
+        # The object space position of each texel, used by the uv_splat paint mode
+        self.position_map = None
+        self.position_map_framebuffer = None
+        # The texels before the current stroke painted into this tile, in the texture's dtype
+        self.undoimage = None
+        # A flag if the tile was painted since it was written to blender's image
+        self.changed = False
+
+    @property
+    def number(self) -> int:
+        return self.tile.number
+
+    @property
+    def uv_offset(self):
+        return self.tile.uv_offset
+
+    def fill(self, pixels: np.ndarray):
+        """ Set the texels from float pixels as provided by blender's images """
+        self.texture.write(gpu_utils.to_texture_data(pixels, self.dtype))
+        self.changed = False
+
+    def read_pixels(self) -> np.ndarray:
+        """ Read the texels as float pixels needed by blender's images """
+        data = gpu_utils.read_pixel_data_from_framebuffer(self.framebuffer, self.glcontext, self.dtype)
+        return gpu_utils.from_texture_data(data)
+
+    def fill_downsampled(self, source: "PaintTile", shader: moderngl.Program):
+        """ Set the texels to the box filtered texels of a larger tile. The shader is the downsample shader. """
+        factor = max(source.tile.size[0] // self.tile.size[0], source.tile.size[1] // self.tile.size[1])
+        source.texture.use(location=0)
+        shader["image"] = 0
+        shader["factor"] = factor
+        with self.glcontext.scope(framebuffer=self.framebuffer, enable_only=moderngl.NOTHING):
+            vertex_array = self.glcontext.vertex_array(shader, [])
+            vertex_array.render(moderngl.TRIANGLES, vertices=3)
+            vertex_array.release()
+        self.changed = False
+
+    def capture_undo(self):
+        """ Remember the current texels, unless they were already captured during the current stroke """
+        if self.undoimage is None:
+            self.undoimage = self.texture.read()
+
+    def undo(self) -> bool:
+        """ Restore the texels captured by capture_undo. Returns False, if there was nothing to restore. """
+        if self.undoimage is None:
+            return False
+        self.texture.write(self.undoimage)
+        self.changed = True
+        return True
+
+    def update_position_map(self, mesh_buffer, mesh_shader: moderngl.Program):
+        """ Rasterize the object space positions of the mesh into a texture of the tile's size """
+        self.release_position_map()
+        self.position_map = self.glcontext.texture(self.tile.size, 4, dtype="f4")
+        self.position_map.filter = (moderngl.NEAREST, moderngl.NEAREST)
+        self.position_map_framebuffer = self.glcontext.framebuffer(color_attachments=[self.position_map])
+        mesh_shader["uv_offset"] = self.uv_offset
+        with self.glcontext.scope(framebuffer=self.position_map_framebuffer, enable_only=moderngl.NOTHING):
+            self.position_map_framebuffer.clear(0, 0, 0, 0)
+            mesh_buffer.draw(mesh_shader)
+
+    def release_position_map(self):
+        if self.position_map is not None:
+            self.position_map_framebuffer.release()
+            self.position_map.release()
+        self.position_map = None
+        self.position_map_framebuffer = None
+
+    def release(self):
+        self.release_position_map()
+        self.sampler.release()
+        self.framebuffer.release()
+        self.texture.release()
@@ -0,0 +1,197 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# The particle painter, that's painting on the CPU without any GL context
+# <pep8 compliant>
+
+from . import accel
+from . import gpu_utils
+from . import meshcache
+from . import meshdata
+from . import numpyutils
+from . import overbaker
+from . import painttiles
+from . import particle_painter
+from . import profiling
+from .settings import preferences
+from .sim import particle_simulator
+from .utils import Error
+
+import bpy
+import logging
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class CPUPaintTile:
+    """ The paint buffer of a UDIM tile: a (height x width x 4) float array of the tile's pixels together with the
+        mask of the texels covered by the mesh's uv islands """
+
+    def __init__(self, tile: gpu_utils.ImageTile, pixels: np.ndarray, uv_mask: np.ndarray):
+        self.tile = tile
+        self.pixels = pixels
+        self.uv_mask = uv_mask
+        self.undo_pixels = None  # The pixels before the current stroke painted into the tile
+        self.changed = False  # True, if painted since written to blender's image
+
+
+class ParticlePainterCPU(particle_painter.ParticlePainter):
+    """ This particle painter paints the particles with the rules of the GPU painter's texel_gather paint mode, but
+        on the CPU. It doesn't need a GL context, so batch jobs can paint on machines without a GPU and the GPU
+        painter's results can be compared with it texel by texel. Like the GPU painter it allocates the paint buffers
+        of UDIM tiles, when particles land in them for the first time. """
+
+    def __init__(self, context: bpy.types.Context, simulator: particle_simulator.ParticleSimulator):
+        super().__init__(context, simulator)
+        self.overbake_mode = preferences.get_instance(context).overbake_mode
+        self.gutter_width = preferences.get_instance(context).gutter_width
+        self.paint_buffer_format = preferences.get_instance(context).paint_buffer_format
+        if self.overbake_mode not in overbaker.OVERBAKE_MODES:
+            raise Error(f"Unknown overbake mode {self.overbake_mode}")
+        self.paint_mesh = meshcache.get_paint_mesh(self.get_active_object())
+        # The paint buffers are rounded to the paint buffer's dtype after each paint, to get the same results as the
+        # GPU painter's textures.
+        self.tile_layout = None
+        self.image_tiles = {}  # The tiles of the painted image by their number
+        self.tiles = {}  # The CPUPaintTiles allocated so far by their number
+        self.skipped_tiles = set()
+        self.paintbuffer_dtype = None
+        self.from_new_sim = True  # A flag if we're painting from an new simulation (used to manage undo image)
+        # Offline painting can switch this off and call write_blender_image once at the end
+        self.sync_image_on_draw = True
+        self.update_paintbuffer()
+
+    def shutdown(self):
+        self.tiles = {}
+
+    def is_sim_active(self):
+        """ A simulation is active, if the next draw call is not starting a new sim """
+        return not self.from_new_sim
+
+    def draw(self, particles, time_step):
+        """ Paint the given particles into the paint buffers of the tiles they touch and sync to blender's image """
+        self.update_paintbuffer()
+        if particles.num_particles == 0:
+            if self.paintbuffer_changed:
+                self.write_blender_image()
+            self.from_new_sim = True  # Next paint call will be from an new simulation
+            return  # Nothing to draw
+
+        if self.from_new_sim:
+            for tile in self.tiles.values():
+                tile.undo_pixels = None
+        self.from_new_sim = False
+
+        with profiling.stage("paint.pass"):
+            for number in sorted(self.touched_tiles(particles)):
+                tile = self.get_tile(number)
+                if tile is None:
+                    continue
+                if tile.undo_pixels is None:
+                    tile.undo_pixels = tile.pixels.copy()
+                accel.paint_particles(tile.pixels, self.paint_mesh, self.simulator.hashed_grid, particles,
+                                      self.simulator.settings.brush_strength, time_step,
+                                      self.get_particle_size_age_factor(), tile.tile.uv_offset)
+                tile.pixels[:] = self.round_pixels(tile.pixels)
+                tile.changed = True
+        if self.sync_image_on_draw:
+            self.write_blender_image()
+
+    def touched_tiles(self, particles) -> set:
+        """ The numbers of the UDIM tiles the particles paint into """
+        size_factor = max(1.0, self.get_particle_size_age_factor())
+        radii = numpyutils.unstructured(particles.size) * numpyutils.unstructured(particles.uv_scale) * size_factor
+        return painttiles.touched_tiles(numpyutils.unstructured(particles.uv), radii)
+
+    @property
+    def paintbuffer_changed(self) -> bool:
+        """ True, if a paint buffer was painted since it was written to blender's image """
+        return any(tile.changed for tile in self.tiles.values())
+
+    def round_pixels(self, pixels: np.ndarray) -> np.ndarray:
+        """ Round the pixels to the precision of the paint buffer's dtype """
+        if self.paintbuffer_dtype == "f4":
+            return pixels
+        return gpu_utils.from_texture_data(gpu_utils.to_texture_data(pixels, self.paintbuffer_dtype))
+
+    def get_tile(self, number: int) -> CPUPaintTile:
+        """ Get the paint buffer of a tile. It's allocated and filled with the image's pixels on first use. Returns
+            None for tiles, the image doesn't have or whose pixels aren't accessible. """
+        tile = self.tiles.get(number)
+        if tile is not None:
+            return tile
+        image_tile = self.image_tiles.get(number)
+        if image_tile is None:
+            return None
+        image = self.get_active_image()
+        if not gpu_utils.has_tile_pixel_access(image, image_tile):
+            if number not in self.skipped_tiles:
+                logger.warning("Can't paint into tile %d, it isn't stored in a file and blender only provides the "
+                               "pixels of the first tile", number)
+                self.skipped_tiles.add(number)
+            return None
+        width, height = image_tile.size
+        pixels = gpu_utils.read_tile_pixels(image, image_tile).reshape((height, width, 4))
+        uv_mask = accel.rasterize_uv_mask(self.paint_mesh, width, height, image_tile.uv_offset)
+        tile = CPUPaintTile(image_tile, self.round_pixels(pixels), uv_mask)
+        self.tiles[number] = tile
+        return tile
+
+    def update_paintbuffer(self):
+        """ Drop the paint buffers of all tiles, if the painted image, its tiles or the paint buffer format changed.
+            The buffers of the new image's tiles are allocated lazily by get_tile. """
+        image = self.get_active_image()
+        image_tiles = [tile for tile in gpu_utils.image_tiles(image) if tile.size[0] > 0 and tile.size[1] > 0]
+        dtype = "f4" if self.paint_buffer_format == "float" else gpu_utils.image_dtype(image)
+        layout = (self.get_active_image_slot(), dtype, tuple(image_tiles))
+        if layout == self.tile_layout:
+            return
+        self.tile_layout = layout
+        self.image_tiles = {tile.number: tile for tile in image_tiles}
+        self.tiles = {}
+        self.skipped_tiles = set()
+        self.paintbuffer_dtype = dtype
+
+    def update_mesh(self, mesh_data: meshdata.MeshData):
+        """ Take moved vertex positions of a mesh with unchanged topology """
+        self.paint_mesh.update_points(mesh_data.loop_points())
+
+    def overbake(self, tile: CPUPaintTile):
+        """ Fill the gutter around the uv islands like the GPU painter's overbaker """
+        if self.overbake_mode == "jump_flood":
+            pixels = overbaker.jump_flood_fill(tile.pixels, tile.uv_mask, self.gutter_width)
+        else:
+            pixels = overbaker.dilate(tile.pixels, tile.uv_mask, self.gutter_width)
+        tile.pixels[:] = self.round_pixels(pixels)
+
+    def write_blender_image(self):
+        """ Overbake the tiles painted since the last call and write them to blender's image """
+        for tile in self.tiles.values():
+            if not tile.changed:
+                continue
+            with profiling.stage("paint.overbake"):
+                self.overbake(tile)
+            with profiling.stage("paint.readback"):
+                gpu_utils.write_tile_pixels(self.get_active_image(), tile.tile, tile.pixels.ravel())
+            tile.changed = False
+
+    def undo_last_paint(self):
+        for tile in self.tiles.values():
+            if tile.undo_pixels is not None:
+                tile.pixels[:] = tile.undo_pixels
+                tile.changed = True
+        self.write_blender_image()
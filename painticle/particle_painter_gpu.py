@@ -21,56 +21,119 @@ from . import numpyutils
 from . import particle_painter
 from . import gpu_utils
 from . import dependencies
-from . import accel
+from . import gpuhashedgrid
 from . import utils
-from . import meshbuffer
+from . import meshcache
+from . import meshdata
 from . import overbaker
+from . import painttiles
+from . import headless
+from . import profiling
 from .settings import preferences
 from .sim import particle_simulator
+from .sim import particle_simulator_gpu
 from .utils import Error
 
 import bpy
 import bgl
+import logging
 import numpy as np
-import struct
 
 import moderngl
 
 
+logger = logging.getLogger(__name__)
+
+# The number of time steps recorded during progressive painting, before they're repainted into the full resolution
+# tiles. It bounds the memory of the recorded particles and the time needed to finish a long stroke.
+MAX_PAINTED_STEPS = 32
+
+
+class PaintedStep:
+    """ The data needed to repaint a time step in full resolution after progressive painting """
+    __slots__ = ("particles", "tile_numbers", "time_step", "strength", "size_age_factor", "voxel_size")
+
+    def __init__(self, particles: np.ndarray, tile_numbers: set, time_step: float, strength: float,
+                 size_age_factor: float, voxel_size: float):
+        self.particles = particles
+        self.tile_numbers = tile_numbers
+        self.time_step = time_step
+        self.strength = strength
+        self.size_age_factor = size_age_factor
+        self.voxel_size = voxel_size
+
+
 class ParticlePainterGPU(particle_painter.ParticlePainter):
     """ This particle painter is using the GPU to draw the particles. """
 
     draw_handler = None
     draw_handler_text = None
 
-    def __init__(self, context: bpy.types.Context, simulator: particle_simulator.ParticleSimulator):
+    def __init__(self, context: bpy.types.Context, simulator: particle_simulator.ParticleSimulator,
+                 glcontext: moderngl.Context = None):
+        """ If glcontext is None, the painter attaches to blender's active GL context. Pass a standalone context
+            together with a headless context to paint without a viewport. """
         super().__init__(context, simulator)
+        self.headless = headless.is_headless(context)
         # Fetch preferences:
         # We're using the area of the image as preview threshold, preference specifies the edge length
-        self.preview_threshold = preferences.get_instance(context).preview_threshold_edge
-        self.preview_threshold *= self.preview_threshold
+        self.preview_threshold_edge = preferences.get_instance(context).preview_threshold_edge
+        self.preview_threshold = self.preview_threshold_edge * self.preview_threshold_edge
         self.preview_mode = preferences.get_instance(context).preview_mode
         self.overlay_preview_opacity = preferences.get_instance(context).overlay_preview_opacity
+        self.show_profiling_overlay = preferences.get_instance(context).show_profiling_overlay
+        self.paint_mode = preferences.get_instance(context).paint_mode
+        self.overbake_mode = preferences.get_instance(context).overbake_mode
+        self.gutter_width = preferences.get_instance(context).gutter_width
+        self.paint_buffer_format = preferences.get_instance(context).paint_buffer_format
         # Setup common GL stuff
-        self.glcontext = moderngl.create_context()
-        self.paintbuffer = None
-        self.paintbuffer_sampler = None
-        self.undoimage = None  # Managing own undo, since blender's undo system won't capture image changes correctly
+        self.glcontext = glcontext if glcontext is not None else gpu_utils.blender_glcontext()
+        # The paint buffers of the image's tiles by tile number. They're only allocated for the tiles, that particles
+        # landed in. Each of them manages its own undo image, since blender's undo system won't capture image changes
+        # correctly.
+        self.tiles = {}
+        self.image_tiles = {}
+        self.tile_layout = None
+        self.image_size = (0, 0)
+        self.tiled = False
+        self.paintbuffer_dtype = None
+        # The numbers of the tiles the uploaded particles paint into
+        self.paint_tile_numbers = set()
+        self.skipped_tiles = set()
+        # Progressive painting paints into downsampled copies of the tiles during a stroke and records the painted
+        # steps to repaint them in full resolution, when the stroke ends
+        self.preview_tiles = {}
+        self.painted_steps = []
+        self.uploaded_particles = None
+        self.downsample_shader = None
         self.from_new_sim = True  # A flag if we're painting from an empty simulation (used to manage undo image)
-        self.last_active_image_slot = None
         preview_shader_name = "particle3d" if self.preview_mode == "particles" else "texture_preview"
         self.preview_shader = gpu_utils.load_shader(preview_shader_name, self.glcontext, ["utils", "particle"])
-        self.paint_shader = gpu_utils.load_shader("particle2d", self.glcontext, ["utils", "particle", "gridhash"])
         self.particles_buffer = self.glcontext.buffer(reserve=1)
-        self.paintbuffer_changed = False
-        self.mesh_buffer = meshbuffer.MeshBuffer(self.glcontext, self.paint_shader)
-        self.mesh_buffer.build_mesh_vbo(self.get_active_mesh())
-        # Setup hashed grid and the GPU buffers for it
-        self.hashed_grid_buffer = self.glcontext.buffer(reserve=1)
+        # The buffer the particles are drawn from. It's the particles buffer of a GPU simulator, if the particles
+        # are already on the GPU.
+        self.drawn_particles_buffer = self.particles_buffer
+        self.num_drawn_particles = 0
+        if self.paint_mode == "texel_gather":
+            self.paint_shader = gpu_utils.load_shader("particle2d", self.glcontext, ["utils", "particle", "gridhash"])
+            self.mesh_shader = self.paint_shader
+        elif self.paint_mode == "uv_splat":
+            self.paint_shader = gpu_utils.load_shader("particleuv", self.glcontext, ["utils", "particle"])
+            self.mesh_shader = gpu_utils.load_shader("positionmap", self.glcontext)
+        else:
+            raise Error("Unknown paint_mode!")
+        self.mesh_buffer = meshcache.get_mesh_buffer(self.get_active_object(), self.glcontext)
+        self.baker = overbaker.Overbaker(self.mesh_buffer, self.glcontext)
+        # The hashed grid of the drawn particles is built on the GPU, so the CPU simulator's one doesn't need to be
+        # uploaded on every time step
+        self.hashed_grid = gpuhashedgrid.GPUHashedGrid(self.glcontext)
         # A hack for the update problem
         self.roll_factor = 1
         self.use_preview = False
-        if ParticlePainterGPU.draw_handler_text is None:
+        # Without preview, blender's image is updated after each draw. Offline painting can switch this off and
+        # call write_blender_image once at the end.
+        self.sync_image_on_draw = True
+        if ParticlePainterGPU.draw_handler_text is None and not self.headless:
             self.context.area.tag_redraw()
             ParticlePainterGPU.draw_handler_text = \
                 bpy.types.SpaceView3D.draw_handler_add(ParticlePainterGPU._draw_viewport_text,
@@ -80,6 +143,8 @@ class ParticlePainterGPU(particle_painter.ParticlePainter):
     def shutdown(self):
         # self.write_blender_image()
         self.set_use_preview(False)
+        self.release_tiles()
+        self.hashed_grid.release()
         if ParticlePainterGPU.draw_handler_text is not None:
             bpy.types.SpaceView3D.draw_handler_remove(ParticlePainterGPU.draw_handler_text, "WINDOW")
             ParticlePainterGPU.draw_handler_text = None
@@ -110,10 +175,14 @@ class ParticlePainterGPU(particle_painter.ParticlePainter):
             # We somehow need to recreate the vao every time, since otherwise the vertex buffers are not going to be
             # activated and some other one from blender is the active buffer.
             preview_vertex_array = self.vao_definition_particles(self.preview_shader)
-            preview_vertex_array.render(moderngl.vertex_array.POINTS)
-        elif self.preview_mode == "texture_overlay":
-            self.paintbuffer_sampler.use()
-            self.mesh_buffer.draw(self.preview_shader)
+            preview_vertex_array.render(moderngl.vertex_array.POINTS, vertices=self.num_drawn_particles)
+        elif self.preview_mode in ("texture_overlay", "progressive"):
+            # Untouched tiles aren't drawn, they still show blender's image
+            tiles = self.preview_tiles if self.preview_mode == "progressive" else self.tiles
+            for tile in tiles.values():
+                tile.sampler.use()
+                self.preview_shader["uv_offset"] = tile.uv_offset
+                self.mesh_buffer.draw(self.preview_shader)
         else:
             raise Error("Unknown preview_mode!")
 
@@ -123,6 +192,17 @@ class ParticlePainterGPU(particle_painter.ParticlePainter):
             gpu_utils.draw_text(self.context, 10, 10, 24, "Simulating...", (1, 0.5, 0.5, 0.5))
         else:
             gpu_utils.draw_text(self.context, 10, 10, 24, "PAINTicle active", (0, 0, 0, 0.5))
+        if self.show_profiling_overlay:
+            self._draw_profiling_summary()
+
+    def _draw_profiling_summary(self):
+        """ Draw the average and maximum timings of the recent simulation and painting stages """
+        line_height = 16
+        y = 40
+        for name, mean, maximum in reversed(profiling.get_profiler().summary()):
+            text = "{:28s} {:8.2f} ms  (max {:8.2f} ms)".format(name, 1000*mean, 1000*maximum)
+            gpu_utils.draw_text(self.context, 10, y, 11, text, (1, 1, 1, 0.8))
+            y += line_height
 
     def is_sim_active(self):
         """ A simulation is active, if the next draw call is not starting a new sim """
@@ -135,8 +215,9 @@ class ParticlePainterGPU(particle_painter.ParticlePainter):
 
         num_particles = particles.num_particles
         self.update_paintbuffer()
-        self.update_particles_buffer(particles)
-        self.update_paint_shader_uniforms(time_step)
+        with profiling.stage("paint.upload"):
+            self.update_particles_buffer(particles)
+            self.update_paint_shader_uniforms(time_step)
         if num_particles == 0:
             if self.paintbuffer_changed:
                 self.write_blender_image()
@@ -144,71 +225,201 @@ class ParticlePainterGPU(particle_painter.ParticlePainter):
             return  # Nothing to draw
 
         if self.from_new_sim:
-            # Before drawing the first set of particles capture the internal undo image
-            self.undoimage = self.capture_active_image()
+            # The undo images of a new stroke are captured, when it paints into a tile for the first time
+            for tile in self.tiles.values():
+                tile.undoimage = None
 
         # We're either inside a current particle sim or just started a new one, so it's not from new anymore
         self.from_new_sim = False
 
-        # Draw into the texture paint framebuffer
-        scope = self.glcontext.scope(framebuffer=self.paintbuffer, enable=moderngl.Context.BLEND)
-        with scope:
-            # We already premultiply in shader blending
-            self.glcontext.blend_func = (moderngl.ONE, moderngl.ONE_MINUS_SRC_ALPHA,
-                                         moderngl.ONE, moderngl.ONE)
-            self.paintbuffer_changed = True
-            self.mesh_buffer.draw()
+        # Note, that this only measures issuing the draw calls. The GPU work shows up in the next synchronizing stage.
+        with profiling.stage("paint.pass"):
+            self.paint_pass()
+        if self.is_progressive():
+            self.painted_steps.append(PaintedStep(self.uploaded_particles, self.paint_tile_numbers, time_step,
+                                                  self.simulator.settings.brush_strength,
+                                                  self.get_particle_size_age_factor(),
+                                                  self.simulator.hashed_grid.voxel_size))
+            if len(self.painted_steps) >= MAX_PAINTED_STEPS:
+                self.repaint_painted_steps()
 
         if self.use_preview:
             self.context.area.tag_redraw()
-        else:
+        elif self.sync_image_on_draw:
             self.write_blender_image()
 
-    def capture_active_image(self):
-        result = None
-        source_image = self.get_active_image()
-        if source_image is not None:
-            result = np.empty(source_image.size[0]*source_image.size[1]*4, dtype=np.float32)
-            source_image.pixels.foreach_get(result)
-        return result
-
-    def update_paintbuffer(self):
-        image = self.get_active_image()
-        image_size = gpu_utils.max_image_size(image)
-        if (self.paintbuffer is None or
-                image_size[0] != self.paintbuffer.width or
-                image_size[1] != self.paintbuffer.height):
-            if image_size[0] > 0 and image_size[1] > 0:
-                self.paintbuffer = gpu_utils.gpu_framebuffer_for_image(image, self.glcontext)
-                self.paintbuffer_sampler = self.glcontext.sampler(texture=self.paintbuffer.color_attachments[0])
+    def is_progressive(self) -> bool:
+        """ True, if the strokes are painted in low resolution first """
+        return self.use_preview and self.preview_mode == "progressive"
+
+    def paint_pass(self):
+        """ Draw the particles uploaded to the GPU into the paint buffers of the tiles they landed in. Progressive
+            painting draws into the downsampled tiles instead. """
+        progressive = self.is_progressive()
+        for number in sorted(self.paint_tile_numbers):
+            tile = self.get_tile(number)
+            if tile is None:
+                continue
+            tile.capture_undo()
+            if progressive:
+                tile = self.get_preview_tile(number)
+            tile.changed = True
+            self.paint_tile(tile)
+
+    def paint_tile(self, tile: painttiles.PaintTile):
+        """ Draw the particles uploaded to the GPU into the paint buffer of a tile """
+        self.paint_shader["uv_offset"] = tile.uv_offset
+        scope = self.glcontext.scope(framebuffer=tile.framebuffer, enable=moderngl.Context.BLEND)
+        with scope:
+            # We already premultiply in shader blending
+            self.glcontext.blend_func = (moderngl.ONE, moderngl.ONE_MINUS_SRC_ALPHA,
+                                         moderngl.ONE, moderngl.ONE)
+            if self.paint_mode == "uv_splat":
+                self.paint_shader["image_size"] = tile.tile.size
+                tile.position_map.use(location=0)
+                self.vao_definition_particles(self.paint_shader).render(moderngl.POINTS,
+                                                                        vertices=self.num_drawn_particles)
             else:
-                self.paintbuffer = None
-                self.paintbuffer_sampler = None
-        image_slot = self.get_active_image_slot()
-        if image_slot != self.last_active_image_slot and self.paintbuffer is not None:
-            # Fill the original image into the paintbuffer
+                self.mesh_buffer.draw(self.mesh_shader)
+
+    def get_preview_tile(self, number: int) -> painttiles.PaintTile:
+        """ Get the downsampled paint buffer of a tile for progressive painting. It's created from the full
+            resolution tile on first use. """
+        tile = self.preview_tiles.get(number)
+        if tile is None:
+            source = self.tiles[number]
+            factor = painttiles.downsample_factor(source.tile.size, self.preview_threshold_edge)
+            tile = painttiles.PaintTile(painttiles.downsampled_tile(source.tile, factor), self.glcontext,
+                                        source.dtype)
+            if self.downsample_shader is None:
+                self.downsample_shader = gpu_utils.load_shader("downsample", self.glcontext)
+            tile.fill_downsampled(source, self.downsample_shader)
+            if self.paint_mode == "uv_splat":
+                tile.update_position_map(self.mesh_buffer, self.mesh_shader)
+            self.preview_tiles[number] = tile
+        return tile
+
+    def finish_progressive_painting(self):
+        """ Repaint the remaining recorded steps into the full resolution tiles at the end of a stroke """
+        self.repaint_painted_steps()
+        # The next stroke starts from the full resolution result again
+        self.release_preview_tiles()
+
+    def repaint_painted_steps(self):
+        """ Repaint the steps recorded during progressive painting into the full resolution tiles. The preview tiles
+            keep being painted, so the full resolution tiles are only shown after the stroke. """
+        with profiling.stage("paint.full_resolution"):
+            for step in self.painted_steps:
+                gpu_utils.update_vbo(self.particles_buffer, step.particles)
+                self.drawn_particles_buffer = self.particles_buffer
+                self.num_drawn_particles = len(step.particles)
+                if self.paint_mode == "texel_gather":
+                    self.update_hashed_grid_buffer(step.voxel_size)
+                    self.particles_buffer.bind_to_storage_buffer(1)
+                self.set_paint_shader_uniforms(step.time_step, step.strength, step.size_age_factor)
+                for number in sorted(step.tile_numbers):
+                    tile = self.tiles.get(number)
+                    if tile is not None:
+                        tile.changed = True
+                        self.paint_tile(tile)
+        self.painted_steps = []
+
+    def release_preview_tiles(self):
+        for tile in self.preview_tiles.values():
+            tile.release()
+        self.preview_tiles = {}
+
+    @property
+    def paintbuffer_changed(self) -> bool:
+        """ True, if any tile was painted since it was written to blender's image """
+        return bool(self.painted_steps) or any(tile.changed for tile in self.tiles.values())
+
+    def get_paintbuffer_dtype(self, image):
+        """ The texture dtype of the paint buffer for the given image according to the paint_buffer_format """
+        return "f4" if self.paint_buffer_format == "float" else gpu_utils.image_dtype(image)
+
+    def get_tile(self, number: int) -> painttiles.PaintTile:
+        """ Get the paint buffer of a tile. It's allocated and filled with the image's pixels on first use. Returns
+            None for tiles, the image doesn't have or whose pixels aren't accessible. """
+        tile = self.tiles.get(number)
+        if tile is not None:
+            return tile
+        image_tile = self.image_tiles.get(number)
+        if image_tile is None:
+            return None
+        if not gpu_utils.has_tile_pixel_access(self.get_active_image(), image_tile):
+            if number not in self.skipped_tiles:
+                logger.warning("Can't paint into tile %d, it isn't stored in a file and blender only provides the "
+                               "pixels of the first tile", number)
+                self.skipped_tiles.add(number)
+            return None
+        if not self.headless:
             self.context.window.cursor_modal_set("WAIT")
-            data = self.capture_active_image()
-            self.paintbuffer.color_attachments[0].write(data)
-            self.paintbuffer_changed = False
-            self.last_active_image_slot = image_slot
-            preview_activated = self.paintbuffer.width*self.paintbuffer.height > self.preview_threshold
-            self.set_use_preview(preview_activated)
-            self.undoimage = None
+        tile = painttiles.PaintTile(image_tile, self.glcontext, self.paintbuffer_dtype)
+        tile.fill(gpu_utils.read_tile_pixels(self.get_active_image(), image_tile))
+        if self.paint_mode == "uv_splat":
+            tile.update_position_map(self.mesh_buffer, self.mesh_shader)
+        self.tiles[number] = tile
+        if not self.headless:
             self.context.window.cursor_modal_restore()
+        return tile
+
+    def release_tiles(self):
+        self.release_preview_tiles()
+        self.painted_steps = []
+        for tile in self.tiles.values():
+            tile.release()
+        self.tiles = {}
+
+    def update_paintbuffer(self):
+        """ Drop the paint buffers of all tiles, if the painted image, its tiles or the paint buffer format changed.
+            The buffers of the new image's tiles are allocated lazily by get_tile. """
+        image = self.get_active_image()
+        image_tiles = [tile for tile in gpu_utils.image_tiles(image) if tile.size[0] > 0 and tile.size[1] > 0]
+        dtype = self.get_paintbuffer_dtype(image)
+        layout = (self.get_active_image_slot(), dtype, tuple(image_tiles))
+        if layout == self.tile_layout:
+            return
+        self.release_tiles()
+        self.tile_layout = layout
+        self.image_tiles = {tile.number: tile for tile in image_tiles}
+        self.image_size = gpu_utils.max_image_size(image)
+        self.tiled = image is not None and image.source == 'TILED'
+        self.paintbuffer_dtype = dtype
+        self.skipped_tiles = set()
+        # Without a viewport there's nothing to preview, so we always sync to blender's image
+        preview_activated = (not self.headless and image_tiles and
+                             self.image_size[0]*self.image_size[1] > self.preview_threshold)
+        self.set_use_preview(bool(preview_activated))
+
+    def update_mesh(self, mesh_data: meshdata.MeshData):
+        """ Upload moved vertex positions of a mesh with unchanged topology """
+        self.mesh_buffer.update_vertices(mesh_data)
+        if self.paint_mode == "uv_splat":
+            for tile in list(self.tiles.values()) + list(self.preview_tiles.values()):
+                tile.update_position_map(self.mesh_buffer, self.mesh_shader)
+
+    def route_particles(self, particles):
+        """ Find the tiles the particles paint into by their uv coordinates """
+        size_factor = max(1.0, self.get_particle_size_age_factor())
+        radii = numpyutils.unstructured(particles.size) * numpyutils.unstructured(particles.uv_scale) * size_factor
+        self.paint_tile_numbers = painttiles.touched_tiles(numpyutils.unstructured(particles.uv), radii)
 
     def update_particles_buffer(self, particles):
-        # This list needs to conform to the list of attribute written in vao_definition_particles
-        # The shader library particle_def.glsl also defines these properties.
-        padding = np.empty(particles.age.size, dtype=numpyutils.float32_dtype)
-        coords = np.column_stack((numpyutils.unstructured(particles.location),
-                                  numpyutils.unstructured(particles.size),
-                                  numpyutils.unstructured(particles.uv),
-                                  numpyutils.unstructured(particles.age),
-                                  numpyutils.unstructured(particles.max_age),
-                                  numpyutils.unstructured(particles.color),
-                                  numpyutils.unstructured(padding)))
+        self.num_drawn_particles = particles.num_particles
+        if isinstance(particles, particle_simulator_gpu.GPUParticles):
+            # The GPU simulator's particles are drawn from its buffer. They're only read back to record the painted
+            # steps of progressive painting.
+            self.drawn_particles_buffer = particles.buffer
+            self.uploaded_particles = particles.read_coords().copy() if self.is_progressive() else None
+            self.paint_tile_numbers = particles.touched_tiles(max(1.0, self.get_particle_size_age_factor()))
+            return
+        # The layout needs to conform to the list of attribute written in vao_definition_particles
+        coords = particle_simulator_gpu.pack_particles(particles)
         gpu_utils.update_vbo(self.particles_buffer, coords)
+        self.drawn_particles_buffer = self.particles_buffer
+        self.uploaded_particles = coords
+        self.route_particles(particles)
 
     def vao_definition_particles(self, shader):
         """ Generate a vao definition for the given shader """
@@ -220,7 +431,7 @@ class ParticlePainterGPU(particle_painter.ParticlePainter):
                    ("age", 1),
                    ("max_age", 1),
                    ("color", 3),
-                   ("padding", 1)]
+                   ("uv_scale", 1)]
         sizes = []
         names = []
         for attrib in attribs:
@@ -230,59 +441,69 @@ class ParticlePainterGPU(particle_painter.ParticlePainter):
             else:
                 x = "{}x".format(attrib[1]*4)  # We use floats, so padding is 4 bytes per float
             sizes.append((x))
-        return self.glcontext.vertex_array(shader, [(self.particles_buffer, " ".join(sizes), *names)])
+        return self.glcontext.vertex_array(shader, [(self.drawn_particles_buffer, " ".join(sizes), *names)])
 
     def update_paint_shader_uniforms(self, time_step):
-        self.update_hashed_grid_buffer()
-        self.particles_buffer.bind_to_storage_buffer(1)
-        brush = self.get_active_brush()
-        self.paint_shader["strength"] = brush.strength
+        if self.paint_mode == "uv_splat":
+            # Splatting reads the particles as vertex attributes and doesn't need the hashed grid. The image size is
+            # set per tile by paint_pass.
+            self.paint_shader["position_map"] = 0
+        else:
+            self.update_hashed_grid_buffer()
+            self.drawn_particles_buffer.bind_to_storage_buffer(1)
+        self.set_paint_shader_uniforms(time_step, self.simulator.settings.brush_strength,
+                                       self.get_particle_size_age_factor())
+
+    def set_paint_shader_uniforms(self, time_step: float, strength: float, size_age_factor: float):
+        self.paint_shader["strength"] = strength
         self.paint_shader['time_step'] = time_step
-        self.paint_shader["particle_size_age_factor"] = self.get_particle_size_age_factor()
-
-    def update_hashed_grid_buffer(self):
-        hashed_grid = self.simulator.hashed_grid
-        fixed_struct = struct.pack("fI", hashed_grid.voxel_size, hashed_grid.num_particles)
-        fixed_struct_size = len(fixed_struct)
-        cell_offsets = hashed_grid.cell_offsets
-        cell_offsets_size = len(cell_offsets)*4  # floats have 4 bytes
-        sorted_particle_ids = hashed_grid.sorted_particle_ids
-        sorted_particle_ids_size = len(sorted_particle_ids)*2*4  # 2 unsigned int with each 4 bytes
-        self.hashed_grid_buffer.orphan(fixed_struct_size+cell_offsets_size+sorted_particle_ids_size)
-        self.hashed_grid_buffer.write(fixed_struct, offset=0)
-        self.hashed_grid_buffer.write(cell_offsets, offset=fixed_struct_size)
-        self.hashed_grid_buffer.write(sorted_particle_ids, offset=fixed_struct_size+cell_offsets_size)
-        self.hashed_grid_buffer.bind_to_storage_buffer(0)
+        self.paint_shader["particle_size_age_factor"] = size_age_factor
+
+    def update_hashed_grid_buffer(self, voxel_size: float = None):
+        """ Bind the hashed grid of the drawn particles. The GPU simulator's grid is bound directly, otherwise the grid
+            is built on the GPU from the particles buffer with the given voxel size or the simulator's one. """
+        simulator_grid = self.simulator.hashed_grid
+        if voxel_size is None and isinstance(simulator_grid, gpuhashedgrid.GPUHashedGrid) and \
+                simulator_grid.buffer is not None:
+            simulator_grid.buffer.bind_to_storage_buffer(0)
+            return
+        self.hashed_grid.voxel_size = voxel_size if voxel_size is not None else simulator_grid.voxel_size
+        self.hashed_grid.build(self.drawn_particles_buffer, self.num_drawn_particles)
+        self.hashed_grid.buffer.bind_to_storage_buffer(0)
 
     def update_preview_uniforms(self):
         model_view_projection = self.context.region_data.perspective_matrix @ self.get_active_object().matrix_world
         self.preview_shader["model_view_projection"] = utils.matrix_to_tuple(model_view_projection)
         if self.preview_mode == "particles":
-            height = self.paintbuffer.height
-            self.preview_shader["image_height"] = height
+            self.preview_shader["image_height"] = self.image_size[1]
             self.preview_shader["projection"] = utils.matrix_to_tuple(self.context.region_data.window_matrix)
             self.preview_shader["particle_size_age_factor"] = self.get_particle_size_age_factor()
-        elif self.preview_mode == "texture_overlay":
+        elif self.preview_mode in ("texture_overlay", "progressive"):
             self.preview_shader["opacity"] = self.overlay_preview_opacity
+            self.preview_shader["tiled"] = self.tiled
         else:
             raise Error("Unknown preview_mode!")
 
-    def write_blender_image_pixels(self, pixels):
-        image = self.get_active_image()
-        image.pixels.foreach_set(pixels)
+    def write_blender_image_pixels(self, tile: painttiles.PaintTile, pixels):
+        gpu_utils.write_tile_pixels(self.get_active_image(), tile.tile, pixels)
 
     def write_blender_image(self):
-        baker = overbaker.Overbaker(self.mesh_buffer, self.glcontext)
-        baker.overbake(self.paintbuffer.color_attachments[0], 4)
-        pixels = gpu_utils.read_pixel_data_from_framebuffer(self.paintbuffer, self.glcontext)
-        self.write_blender_image_pixels(pixels)
-        self.paintbuffer_changed = False
+        """ Overbake the tiles painted since the last call and write them to blender's image """
+        if self.painted_steps:
+            self.finish_progressive_painting()
+        for tile in self.tiles.values():
+            if not tile.changed:
+                continue
+            with profiling.stage("paint.overbake"):
+                self.baker.overbake(tile.texture, self.gutter_width, self.overbake_mode, tile.uv_offset)
+            with profiling.stage("paint.readback"):
+                self.write_blender_image_pixels(tile, tile.read_pixels())
+            tile.changed = False
         self.update_blender_viewport()
 
     def undo_last_paint(self):
-        if self.undoimage is not None:
-            self.paintbuffer.color_attachments[0].write(self.undoimage)
-            self.paintbuffer_changed = True
+        undone = [tile.undo() for tile in self.tiles.values()]
+        if any(undone):
             self.write_blender_image()
 
     def update_blender_viewport(self):
@@ -294,6 +515,8 @@ class ParticlePainterGPU(particle_painter.ParticlePainter):
         # we can also remove that variable.
 
         # not working: self.context.area.tag_redraw()
+        if self.headless:
+            return
         self.roll_factor = -1 if self.roll_factor > 0 else 1
         override = {
             'area': self.context.area,
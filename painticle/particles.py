@@ -22,32 +22,100 @@ import bpy
 
 import math
 import random
+import weakref
 
-from . import trianglemesh
+from . import accel
+from . import meshcache
 from .sim import particle_simulator_cpu
+from .sim import particle_simulator_gpu
 from .sim import particle_simulator
 from .interaction import Interactions, SourceInput
+from .settings import preferences
+from .utils import Error
+
+
+# All living Particles objects, so the depsgraph handler can tell them about changes of their mesh
+_instances = weakref.WeakSet()
 
 
 class Particles:
     """ A class managing the particle system for the paint operator """
-    def __init__(self, context: bpy.types.Context, omit_painter=False):
-        """ If omit_painter is True, paint_particles and undo_last_paint may not be called. """
+    def __init__(self, context: bpy.types.Context, omit_painter=False, glcontext=None, bvh_quality: str = None,
+                 mesh_cache_directory: str = None, painter: str = "gpu", simulator: str = None):
+        """ If omit_painter is True, paint_particles and undo_last_paint may not be called. A glcontext can be passed
+            to paint without blender's viewport (see headless.py). bvh_quality is one of "low", "medium" or "high"
+            and mesh_cache_directory the directory of the on-disk mesh cache. Both default to the preferences.
+            painter is "gpu" or "cpu", the latter paints without any GL context. simulator is "cpu" or "gpu" and
+            defaults to the preferences. The GPU simulator shares the GL context with the GPU painter, so it can't
+            be combined with the CPU painter. """
+        from . import particle_painter_cpu
         from . import particle_painter_gpu
         self.context = context
         self.rnd = random.Random()
-        self.paint_mesh = trianglemesh.TriangleMesh(context)
+        if bvh_quality is None:
+            bvh_quality = preferences.get_instance(context).bvh_build_quality
+        if mesh_cache_directory is None:
+            mesh_cache_directory = bpy.path.abspath(preferences.get_instance(context).mesh_cache_directory)
+        self.paint_mesh = meshcache.get_triangle_mesh(context, accel.BuildQuality.__members__[bvh_quality.upper()],
+                                                      mesh_cache_directory)
         self.matrix = self.paint_mesh.object.matrix_world.copy()
-        self.simulator = particle_simulator_cpu.ParticleSimulatorCPU(context)
+        if simulator is None:
+            simulator = preferences.get_instance(context).simulator
+        if simulator == "cpu":
+            lifetime_ordered = preferences.get_instance(context).particle_storage == "lifetime_ordered"
+            self.simulator = particle_simulator_cpu.ParticleSimulatorCPU(context, lifetime_ordered)
+        elif simulator == "gpu":
+            if painter == "cpu" and not omit_painter:
+                raise Error("The CPU painter can't paint the particles of the GPU simulator")
+            self.simulator = particle_simulator_gpu.ParticleSimulatorGPU(context, glcontext)
+        else:
+            raise Error(f"Unknown simulator {simulator}")
         if omit_painter:
             self.painter = None
+        elif painter == "cpu":
+            self.painter = particle_painter_cpu.ParticlePainterCPU(context, self.simulator)
+        elif painter == "gpu":
+            self.painter = particle_painter_gpu.ParticlePainterGPU(context, self.simulator, glcontext)
         else:
-            self.painter = particle_painter_gpu.ParticlePainterGPU(context, self.simulator)
+            raise Error(f"Unknown painter {painter}")
+        self.simulator.painter_needs_hashed_grid = self.painter is not None and painter == "cpu"
         self.input_data = None
+        self.stroke_seed = None
+        self.recorder = None  # A stroke.StrokeRecorder capturing all inputs
+        self.mesh_changed = False  # Set by the depsgraph handler, e.g. when the mesh deforms during an animation
+        _instances.add(self)
 
     def __del__(self):
         if self.painter is not None:
             self.painter.shutdown()
+        self.simulator.shutdown()
+
+    def update_mesh(self, depsgraph: bpy.types.Depsgraph = None) -> bool:
+        """ Follow a deforming mesh, e.g. when painting across animation frames. With a depsgraph the evaluated mesh
+            including shape keys and deforming modifiers is used, otherwise the mesh data itself. The acceleration
+            structures are refitted instead of rebuilt. Returns False, if the topology changed and a new Particles
+            object is needed. """
+        obj = self.paint_mesh.object
+        evaluated = obj.evaluated_get(depsgraph) if depsgraph is not None else None
+        mesh = evaluated.to_mesh() if evaluated is not None else obj.data
+        try:
+            if not self.paint_mesh.update_geometry(mesh):
+                return False
+            self.simulator.update_mesh(self.paint_mesh.mesh_data)
+            if self.painter is not None:
+                self.painter.update_mesh(self.paint_mesh.mesh_data)
+        finally:
+            if evaluated is not None:
+                evaluated.to_mesh_clear()
+        return True
+
+    def follow_mesh(self, depsgraph: bpy.types.Depsgraph) -> bool:
+        """ Update the mesh with update_mesh, if the depsgraph handler reported a change of its geometry since the last
+            call. Returns False, if the topology changed. """
+        if not self.mesh_changed:
+            return True
+        self.mesh_changed = False
+        return self.update_mesh(depsgraph)
 
     def numParticles(self):
         """ Return the number of simulated particles """
@@ -56,24 +124,40 @@ class Particles:
     def interact(self, context: bpy.types.Context, event, interactions: Interactions):
         self.update_input_data(context, event, interactions, False)
 
-    def start_interacting(self, context: bpy.types.Context, event, interactions: Interactions):
+    def start_interacting(self, context: bpy.types.Context, event, interactions: Interactions, seed: int = None):
+        """ Start a new stroke. If no seed is given, a random one is chosen. """
+        self.setup_simulation(seed)
         self.update_input_data(context, event, interactions, True)
+
+    def setup_simulation(self, seed: int = None):
+        """ Prepare the simulation steps of the active brush for a new stroke """
         self.simulator.setup_steps()
+        self.stroke_seed = seed if seed is not None else self.rnd.getrandbits(32)
+        self.simulator.seed(self.stroke_seed)
+        if self.recorder is not None:
+            self.recorder.start(self.stroke_seed)
 
     def update_input_data(self, context: bpy.types.Context, event, interactions: Interactions,
                           reset_input_data: bool):
         brush_size = self.get_brush_size(context)
         origin, direction, size = self.get_ray(context, event.mouse_x, event.mouse_y, brush_size)
-        pressure = event.pressure
+        self.set_input_data(origin, direction, size, interactions, event.pressure, reset_input_data)
+
+    def set_input_data(self, origin, direction, size: float, interactions: Interactions, pressure: float,
+                       reset_input_data: bool):
+        """ Set the brush's ray and state directly, e.g. when replaying a recorded stroke """
         if reset_input_data:
             self.input_data = SourceInput(origin, direction, size, interactions, pressure)
         else:
             self.input_data.updateData(origin, direction, size, interactions, pressure)
+        if self.recorder is not None:
+            self.recorder.add_frame(origin, direction, size, interactions, pressure)
 
     def move_particles(self, deltaT, painticle_settings):
         """ Simulate gravity """
-        emit_settings = self.simulator.emit_settings()
-        sim_data = particle_simulator.SimulationData(deltaT, emit_settings, painticle_settings, self.paint_mesh,
+        self.simulator.update_settings(painticle_settings)
+        settings = self.simulator.settings
+        sim_data = particle_simulator.SimulationData(deltaT, settings.emit, settings.painticle, self.paint_mesh,
                                                      self.context, self.input_data)
         self.simulator.simulate(sim_data)
 
@@ -109,3 +193,23 @@ class Particles:
         ray_origin = view3d_utils.region_2d_to_origin_3d(region, rv3d, coord)
 
         return ray_origin, ray_direction, (ray_direction_brush_border-ray_direction).length
+
+
+@bpy.app.handlers.persistent
+def _on_depsgraph_update(scene, depsgraph):
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+        updated_id = update.id.original
+        for particles in _instances:
+            if updated_id == particles.paint_mesh.object or updated_id == particles.paint_mesh.mesh:
+                particles.mesh_changed = True
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+
+
+def unregister():
+    if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
@@ -0,0 +1,225 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Lightweight, always-on timing of the simulation and painting stages
+
+import contextlib
+import json
+import os
+import time
+
+import numpy as np
+
+from . import accel
+
+# The number of samples kept per stage. At a 100Hz simulation timer this covers the last ~10 seconds.
+RING_BUFFER_CAPACITY = 1024
+
+sample_dtype = np.dtype([("start", np.float64), ("duration", np.float64)])
+
+
+class RingBuffer:
+    """ A fixed size buffer keeping the most recent samples of a stage """
+
+    def __init__(self, capacity: int = RING_BUFFER_CAPACITY):
+        self._samples = np.zeros(capacity, sample_dtype)
+        self._next = 0
+        self._count = 0
+
+    def add(self, start: float, value: float):
+        self._samples[self._next] = (start, value)
+        self._next = (self._next + 1) % len(self._samples)
+        self._count = min(self._count + 1, len(self._samples))
+
+    def samples(self):
+        """ Get the recorded samples ordered from oldest to newest """
+        first = (self._next - self._count) % len(self._samples)
+        return np.roll(self._samples, -first)[:self._count]
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+
+class Profiler:
+    """ Collects the timings of named stages and additional values (e.g. particle counts) into ring buffers.
+        Timings of the native accel module are merged in when they're queried. """
+
+    def __init__(self, capacity: int = RING_BUFFER_CAPACITY):
+        self.capacity = capacity
+        self.enabled = True
+        self._timings = {}
+        self._values = {}
+        self._stroke_start = None
+        # Native timings are taken with a different clock. Remember its offset to perf_counter.
+        self._native_clock_offset = time.perf_counter() - accel.profiling_clock()
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        accel.profiling_set_enabled(enabled)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """ Time the enclosed block as the given stage """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_timing(name, start, time.perf_counter() - start)
+
+    def record_timing(self, name: str, start: float, duration: float):
+        if self.enabled:
+            self._buffer(self._timings, name).add(start, duration)
+
+    def record_value(self, name: str, value: float):
+        """ Record a non-timing value, like the number of simulated particles """
+        if self.enabled:
+            self._buffer(self._values, name).add(time.perf_counter(), value)
+
+    def _buffer(self, buffers: dict, name: str):
+        buffer = buffers.get(name)
+        if buffer is None:
+            buffer = RingBuffer(self.capacity)
+            buffers[name] = buffer
+        return buffer
+
+    def timings(self):
+        """ Get all recorded timings, including the native ones, as dictionary of stage name to samples """
+        result = {name: buffer.samples() for name, buffer in self._timings.items()}
+        for name in accel.profiling_stages():
+            samples = accel.profiling_samples(name)
+            if len(samples) > 0:
+                native = samples.astype(sample_dtype)
+                native["start"] += self._native_clock_offset
+                result[name] = native
+        return result
+
+    def values(self):
+        """ Get all recorded values as dictionary of name to samples """
+        return {name: buffer.samples() for name, buffer in self._values.items()}
+
+    def summary(self, num_samples: int = 100):
+        """ Get (name, mean, max) tuples of the timings of the last num_samples runs of each stage """
+        result = []
+        for name, samples in sorted(self.timings().items()):
+            durations = samples["duration"][-num_samples:]
+            if len(durations) > 0:
+                result.append((name, float(np.mean(durations)), float(np.max(durations))))
+        return result
+
+    def clear(self):
+        for buffer in self._timings.values():
+            buffer.clear()
+        for buffer in self._values.values():
+            buffer.clear()
+        accel.profiling_clear()
+
+    def begin_stroke(self):
+        """ Mark the start of a paint stroke. end_stroke() reports all samples recorded in between. """
+        self._stroke_start = time.perf_counter()
+
+    def end_stroke(self):
+        """ Returns the report of the current stroke or None, if no stroke has been started """
+        if self._stroke_start is None:
+            return None
+        start = self._stroke_start
+        end = time.perf_counter()
+        self._stroke_start = None
+        timings = {name: samples[samples["start"] >= start] for name, samples in self.timings().items()}
+        values = {name: samples[samples["start"] >= start] for name, samples in self.values().items()}
+        return StrokeReport(start, end, timings, values)
+
+
+class StrokeReport:
+    """ All timings and values recorded during one paint stroke. Since samples are kept in ring buffers, very long
+        strokes only report their most recent samples. """
+
+    def __init__(self, start: float, end: float, timings: dict, values: dict):
+        self.start = start
+        self.end = end
+        self.timings = timings
+        self.values = values
+
+    def to_dict(self):
+        stages = {}
+        for name, samples in self.timings.items():
+            durations = samples["duration"]
+            if len(durations) == 0:
+                continue
+            stages[name] = {"count": len(durations),
+                            "total_s": float(np.sum(durations)),
+                            "mean_s": float(np.mean(durations)),
+                            "max_s": float(np.max(durations)),
+                            "samples": [[float(s - self.start), float(d)] for s, d in samples]}
+        values = {name: [[float(s - self.start), float(v)] for s, v in samples]
+                  for name, samples in self.values.items() if len(samples) > 0}
+        return {"duration_s": self.end - self.start, "stages": stages, "values": values}
+
+    def to_chrome_trace(self):
+        """ Convert into the trace event format understood by chrome://tracing and perfetto """
+        events = []
+        for name, samples in self.timings.items():
+            # Native stages are nested into the python ones, so show them on their own track
+            tid = 1 if name.startswith("accel.") else 0
+            for start, duration in samples:
+                events.append({"name": name, "ph": "X", "pid": 0, "tid": tid,
+                               "ts": 1e6 * (start - self.start), "dur": 1e6 * duration})
+        for name, samples in self.values.items():
+            for start, value in samples:
+                events.append({"name": name, "ph": "C", "pid": 0, "ts": 1e6 * (start - self.start),
+                               "args": {name: float(value)}})
+        events.sort(key=lambda e: e["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, directory: str, basename: str = None):
+        """ Write the report as JSON and chrome trace into the given directory. Returns the written file names. """
+        if basename is None:
+            basename = "painticle_stroke_" + time.strftime("%Y%m%d_%H%M%S")
+        os.makedirs(directory, exist_ok=True)
+        json_filename = os.path.join(directory, basename + ".json")
+        trace_filename = os.path.join(directory, basename + ".trace.json")
+        with open(json_filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        with open(trace_filename, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+        return json_filename, trace_filename
+
+
+_profiler = None
+
+
+def get_profiler() -> Profiler:
+    """ Get the process wide profiler instance """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+
+def stage(name: str):
+    """ Time the enclosed block with the process wide profiler, e.g. `with profiling.stage("paint.pass"):` """
+    return get_profiler().stage(name)
+
+
+def record_value(name: str, value: float):
+    get_profiler().record_value(name, value)
@@ -20,6 +20,7 @@ from . import physics
 from . import brushtree
 from . import preferences
 from . import particlecreationsettings
+from . import snapshot
 
 all_settings = [
     brushtree.BrushTree,
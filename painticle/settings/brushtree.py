@@ -20,6 +20,8 @@
 from bpy.props import StringProperty
 from bpy.types import NodeTree
 
+from .. import utils
+
 
 class BrushTree(NodeTree):
     '''A custom node tree type that allows defining PAINTicle particle brushes'''
@@ -75,3 +77,9 @@ class BrushTree(NodeTree):
                 brush_node = None
         nodes.reverse()
         return nodes
+
+    def get_active_brush_definition(self):
+        """ Describe the active brush as a list of node types with their step settings, e.g. to store it in a file.
+            Use ops.createdefaultbrushtree.create_brush_tree to recreate a tree from it. """
+        return [{"node": node.bl_idname, "step": utils.property_group_to_dict(node.step)}
+                for node in self.get_active_brush_nodes()]
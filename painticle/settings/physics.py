@@ -15,6 +15,8 @@
 
 # <pep8 compliant>
 
+from bpy.props import BoolProperty
+from bpy.props import EnumProperty
 from bpy.props import IntProperty
 from bpy.props import FloatProperty
 from bpy.props import FloatVectorProperty
@@ -32,3 +34,45 @@ class Physics(PropertyGroup):
                                description="The number of substeps to perform integration of the movement for the " +
                                            "particles.",
                                default=3, min=1, soft_max=16, options=set())
+
+    adaptive_sub_steps: BoolProperty(name="Adaptive substeps",
+                                     description="Choose the number of substeps on each time step depending on the " +
+                                                 "speed and size of the particles instead of using a fixed number.",
+                                     default=False, options=set())
+
+    min_sub_steps: IntProperty(name="Min. substeps",
+                               description="The minimum number of substeps of the adaptive substeps.",
+                               default=1, min=1, soft_max=16, options=set())
+
+    max_sub_steps: IntProperty(name="Max. substeps",
+                               description="The maximum number of substeps of the adaptive substeps.",
+                               default=16, min=1, soft_max=64, options=set())
+
+    sub_step_courant: FloatProperty(name="Substep distance",
+                                    description="The distance a particle may move within one adaptive substep " +
+                                                "relative to its size. Lower values increase the stability.",
+                                    default=0.5, min=0.01, soft_max=2, options=set())
+
+    surface_walking: BoolProperty(name="Surface walking",
+                                  description="Move the particles across the mesh's triangles instead of projecting " +
+                                              "them back onto the surface after each step. This is faster and keeps " +
+                                              "particles on their side of thin geometry. The GPU simulator always " +
+                                              "walks.",
+                                  default=False, options=set())
+
+    particle_budget: IntProperty(name="Particle budget",
+                                 description="The maximum number of simulated particles. Long strokes with a high " +
+                                             "flow rate otherwise slow down each time step. 0 doesn't limit them.",
+                                 default=0, min=0, soft_max=1000000, options=set())
+
+    budget_mode: EnumProperty(items=[("oldest", "Remove oldest",
+                                      "Remove the particles, that were emitted first", 1),
+                                     ("faintest", "Remove faintest",
+                                      "Remove the particles closest to the end of their lifetime, since they " +
+                                      "paint with the lowest alpha", 2),
+                                     ("merge", "Merge",
+                                      "Merge nearby particles of similar color keeping their mass and covered " +
+                                      "area. If that's not enough, the faintest particles are removed", 3)],
+                              name="Budget mode",
+                              description="How to stay within the particle budget",
+                              default="faintest", options=set())
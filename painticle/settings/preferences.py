@@ -15,7 +15,7 @@
 
 # <pep8 compliant>
 
-from bpy.props import FloatProperty, IntProperty
+from bpy.props import BoolProperty, FloatProperty, IntProperty, StringProperty
 from bpy.types import PropertyGroup
 from bpy.props import EnumProperty
 
@@ -44,12 +44,122 @@ class Preferences(PropertyGroup):
     preview_mode: EnumProperty(items=[("particles", "Particles",
                                        "Show just the particles", 1),
                                       ("texture_overlay", "Texture overlay",
-                                       "Draw the highres texture with an overlay style", 2)],
+                                       "Draw the highres texture with an overlay style", 2),
+                                      ("progressive", "Progressive",
+                                       "Paint into a texture downsampled to the preview threshold during the " +
+                                       "stroke and draw it with an overlay style. The stroke is repainted in full " +
+                                       "resolution, when it ends", 3)],
                                name="Preview mode",
                                description="If the system needs to fallback to preview mode, how should be drawn.",
                                default="particles",
                                options=set())
+    paint_mode: EnumProperty(items=[("texel_gather", "Texel gather",
+                                     "Each texel of the mesh searches the particles around it", 1),
+                                    ("uv_splat", "UV splat",
+                                     "Each particle is drawn as a quad around its uv coordinate. Faster for few " +
+                                     "particles on large textures", 2)],
+                             name="Paint mode",
+                             description="Performance option:\n" +
+                                         "How the particles are painted into the texture.",
+                             default="texel_gather",
+                             options=set())
+    simulator: EnumProperty(items=[("cpu", "CPU",
+                                    "Simulate the particles on the CPU", 1),
+                                   ("gpu", "GPU",
+                                    "Simulate the particles with compute shaders. They stay on the GPU between the " +
+                                    "simulation and painting and always walk across the surface. The emitters, " +
+                                    "the projection of particles that left the surface and the merge budget mode " +
+                                    "run on the CPU", 2)],
+                            name="Simulator",
+                            description="Performance option:\n" +
+                                        "Where the particles are simulated.",
+                            default="cpu",
+                            options=set())
+    particle_storage: EnumProperty(items=[("unordered", "Unordered",
+                                           "Store the particles in any order. Removing the dead particles checks " +
+                                           "all of them", 1),
+                                          ("lifetime_ordered", "Lifetime ordered",
+                                           "Keep the particles sorted by their remaining lifetime, so removing the " +
+                                           "dead ones only looks at the front. New particles are sorted in", 2)],
+                                   name="Particle storage",
+                                   description="Performance option:\n" +
+                                               "How the CPU simulator stores the particles.",
+                                   default="unordered",
+                                   options=set())
+    overbake_mode: EnumProperty(items=[("dilate", "Dilate",
+                                        "Grow the uv islands by one texel per pass, blending the neighbouring " +
+                                        "texels", 1),
+                                       ("jump_flood", "Jump flood",
+                                        "Copy the nearest texel of the uv islands. Wide gutters need only a few " +
+                                        "passes", 2)],
+                                name="Gutter Mode",
+                                description="Performance option:\n" +
+                                            "How the gutter around the uv islands is filled, when the painted " +
+                                            "texture is written back to the image.",
+                                default="dilate",
+                                options=set())
+    gutter_width: IntProperty(name="Gutter Width",
+                              description="The number of texels the painted colors are extended beyond the uv " +
+                                          "islands' borders to avoid seams, e.g. when mipmapping.",
+                              default=4, min=0, soft_max=64,
+                              options=set())
+    paint_buffer_format: EnumProperty(items=[("image", "Match image",
+                                              "Use the precision of the painted image, e.g. 8 bits per channel " +
+                                              "for PNG images", 1),
+                                             ("float", "Float",
+                                              "Always paint into a 32 bit float buffer. Many faint particles " +
+                                              "accumulate more precisely, but need 4 times the memory of 8 bit " +
+                                              "images", 2)],
+                                      name="Paint Buffer Format",
+                                      description="Performance option:\n" +
+                                                  "The format of the GPU texture the particles are painted into. It " +
+                                                  "also determines the memory of the undo image and the amount of " +
+                                                  "data read back from the GPU.",
+                                      default="image",
+                                      options=set())
+    bvh_build_quality: EnumProperty(items=[("low", "Low",
+                                            "Fastest build, but slower collision queries", 1),
+                                           ("medium", "Medium",
+                                            "Balance between build and query time", 2),
+                                           ("high", "High",
+                                            "Slowest build, but fastest collision queries", 3)],
+                                    name="BVH Build Quality",
+                                    description="Performance option:\n" +
+                                                "The quality of the acceleration structure built for the painted " +
+                                                "mesh when a paint session starts. Lower quality starts faster on " +
+                                                "large meshes.",
+                                    default="medium",
+                                    options=set())
+    mesh_cache_directory: StringProperty(name="Mesh Cache Directory",
+                                         description="Performance option:\n" +
+                                                     "If set, the data extracted from painted meshes of saved " +
+                                                     "files is cached in this directory, so reopening large " +
+                                                     "meshes starts painting faster.",
+                                         default="", subtype='DIR_PATH',
+                                         options=set())
     overlay_preview_opacity: FloatProperty(name="Overlay Preview Opacity",
                                            description="Opacity of the overlay, if preview mode is set to this.",
                                            default=0.5, min=0, max=1,
                                            options=set())
+    show_profiling_overlay: BoolProperty(name="Show Profiling Overlay",
+                                         description="Show the timings of the simulation and painting stages in the " +
+                                                     "3D view while painting.",
+                                         default=False,
+                                         options=set())
+    profiling_export_directory: StringProperty(name="Profiling Export Directory",
+                                               description="If set, a JSON report and a chrome trace of the " +
+                                                           "stage timings is written into this directory after each " +
+                                                           "paint stroke.",
+                                               default="", subtype='DIR_PATH',
+                                               options=set())
+    use_python_profiler: BoolProperty(name="Python Profiler",
+                                      description="Run python's cProfile during each paint stroke and print the " +
+                                                  "statistics to the console afterwards.",
+                                      default=False,
+                                      options=set())
+    stroke_recording_directory: StringProperty(name="Stroke Recording Directory",
+                                               description="If set, each paint stroke is recorded into this " +
+                                                           "directory, so it can be replayed later, e.g. for batch " +
+                                                           "painting at a higher resolution.",
+                                               default="", subtype='DIR_PATH',
+                                               options=set())
@@ -0,0 +1,125 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Frozen copies of the settings. Every read of a blender property goes through RNA, which is slow compared to reading
+# a python attribute. The simulation therefore copies its settings into plain objects when a stroke starts and copies
+# them again only after blender reported a change of the scene, a brush tree or a brush.
+
+import bpy
+import mathutils
+
+_snapshot_classes = {}
+_generation = 0
+
+
+class Snapshot:
+    """ The base class of the frozen property groups. Each property group type gets its own subclass with slots
+        for all its properties. """
+    __slots__ = ()
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class SimulationSettings:
+    """ All settings the simulation and the painter read on each time step """
+    __slots__ = ("painticle", "emit", "brush_color", "brush_strength", "generation")
+
+    def __init__(self, painticle, emit, brush_color, brush_strength: float, generation: int):
+        self.painticle = painticle
+        self.emit = emit
+        self.brush_color = brush_color
+        self.brush_strength = brush_strength
+        self.generation = generation
+
+    @property
+    def physics(self):
+        return self.painticle.physics
+
+    def is_outdated(self) -> bool:
+        """ Check if blender reported a change of the settings since this snapshot was taken """
+        return self.generation != _generation
+
+
+def _snapshot_class(rna_identifier: str, names: tuple):
+    key = (rna_identifier, names)
+    cls = _snapshot_classes.get(key)
+    if cls is None:
+        cls = type(rna_identifier + "Snapshot", (Snapshot,), {"__slots__": names})
+        _snapshot_classes[key] = cls
+    return cls
+
+
+def freeze(property_group):
+    """ Copy the values of a property group into a slotted object with the same attribute names. Nested property
+        groups are frozen recursively, vectors and colors are copied. Collections are skipped and ID pointers are kept
+        as they are. """
+    properties = [prop for prop in property_group.bl_rna.properties
+                  if prop.identifier != "rna_type" and prop.type != 'COLLECTION']
+    cls = _snapshot_class(property_group.bl_rna.identifier, tuple(prop.identifier for prop in properties))
+    result = cls()
+    for prop in properties:
+        value = getattr(property_group, prop.identifier)
+        if prop.type == 'POINTER':
+            if value is not None and not isinstance(value, bpy.types.ID):
+                value = freeze(value)
+        elif isinstance(value, (mathutils.Vector, mathutils.Color, mathutils.Euler, mathutils.Quaternion,
+                                mathutils.Matrix)):
+            value = value.copy()
+        elif getattr(prop, "is_array", False):
+            value = tuple(value)
+        setattr(result, prop.identifier, value)
+    return result
+
+
+def capture(context: bpy.types.Context, steps, painticle_settings=None) -> SimulationSettings:
+    """ Take a snapshot of the settings of the given simulation steps and the scene's PAINTicle settings. The steps'
+        values are stored in their frozen attribute. """
+    from ..sim.emitterstep import EmitterStep
+    if painticle_settings is None:
+        painticle_settings = context.scene.painticle_settings
+    emit = None
+    for step in steps:
+        step.frozen = freeze(step)
+        if emit is None and isinstance(step, EmitterStep):
+            emit = step.frozen.creation_settings
+    brush = context.tool_settings.image_paint.brush
+    return SimulationSettings(freeze(painticle_settings), emit, tuple(brush.color), brush.strength, _generation)
+
+
+def invalidate():
+    """ Make all snapshots outdated """
+    global _generation
+    _generation += 1
+
+
+@bpy.app.handlers.persistent
+def _on_depsgraph_update(scene, depsgraph):
+    for update in depsgraph.updates:
+        if isinstance(update.id.original, (bpy.types.Scene, bpy.types.NodeTree, bpy.types.Brush)):
+            invalidate()
+            return
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+
+
+def unregister():
+    if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
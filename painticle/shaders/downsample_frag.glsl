@@ -0,0 +1,39 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+// Box filter a texture into a framebuffer, whose size is the texture's size divided by factor
+
+out vec4 frag_color;
+
+uniform sampler2D image;
+uniform int factor;
+
+void main()
+{
+  ivec2 base = ivec2(gl_FragCoord.xy) * factor;
+  ivec2 size = textureSize(image, 0);
+  vec4 sum = vec4(0);
+  int count = 0;
+  for(int y=0; y<factor; ++y) {
+    for(int x=0; x<factor; ++x) {
+      ivec2 p = base + ivec2(x, y);
+      if(all(lessThan(p, size))) {
+        sum += texelFetch(image, p, 0);
+        ++count;
+      }
+    }
+  }
+  frag_color = count>0 ? sum/count : vec4(0);
+}
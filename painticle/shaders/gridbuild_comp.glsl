@@ -0,0 +1,42 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+// Compute the hashed grid cell of each particle. The entries after the particles up to the padded size of the sort get
+// ID_NONE, so they're sorted to the end.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform uint numEntries;
+
+HASHED_GRID_BUFFER_QUALIFIED(0, hashedGrid, EMPTY);
+
+layout(std430, binding=1) readonly buffer ParticlesBuffer {
+    Particle particles[];
+};
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numEntries)
+        return;
+    if(i<hashedGrid_numParticles)
+        hashedGrid_sortedParticleIDs[i] = IDRelation(hashCoord(particles[i].location, hashedGrid_voxelSize), i);
+    else
+        hashedGrid_sortedParticleIDs[i] = IDRelation(ID_NONE, ID_NONE);
+}
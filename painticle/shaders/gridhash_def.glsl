@@ -59,10 +59,13 @@ struct IDRelation
     uint particleID;
 };
 
-#define HASHED_GRID_BUFFER(BIND_ID, NAME) \
-    layout(std430, binding=BIND_ID) readonly buffer NAME { \
+// The hashed grid as built by accel.HashedGrid or GPUHashedGrid. QUALIFIER is readonly or EMPTY for building it.
+#define HASHED_GRID_BUFFER_QUALIFIED(BIND_ID, NAME, QUALIFIER) \
+    layout(std430, binding=BIND_ID) QUALIFIER buffer NAME { \
         float NAME##_voxelSize; \
         uint NAME##_numParticles; \
         uint NAME##_cellOffsets[NUM_HASHED_GRID_ENTRIES]; \
         IDRelation NAME##_sortedParticleIDs[]; \
     }
+
+#define HASHED_GRID_BUFFER(BIND_ID, NAME) HASHED_GRID_BUFFER_QUALIFIED(BIND_ID, NAME, readonly)
@@ -0,0 +1,40 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+// Store the offset of the first sorted entry of each cell in the hashed grid. With CLEAR_OFFSETS defined, the offsets
+// of the cells of the sorted entries are reset to ID_NONE instead, so a rebuild only touches the cells, which were
+// used before, and not all NUM_HASHED_GRID_ENTRIES.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+HASHED_GRID_BUFFER_QUALIFIED(0, hashedGrid, EMPTY);
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=hashedGrid_numParticles)
+        return;
+    uint cellID = hashedGrid_sortedParticleIDs[i].cellID;
+#ifdef CLEAR_OFFSETS
+    hashedGrid_cellOffsets[cellID] = ID_NONE;
+#else
+    if(i==0u || hashedGrid_sortedParticleIDs[i-1u].cellID!=cellID)
+        hashedGrid_cellOffsets[cellID] = i;
+#endif
+}
@@ -0,0 +1,97 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+// One pass of the bitonic sort of the hashed grid's entries by cell and particle ID. Each invocation compares one pair
+// of entries in distance j of the bitonic sequences of length k. With LOCAL_SORT defined, a work group sorts its
+// entries in shared memory instead: all passes with distances below LOCAL_SIZE of the sequences of length k are done
+// at once. For k==0 the work group's entries are sorted completely.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform uint k;
+uniform uint j;
+
+HASHED_GRID_BUFFER_QUALIFIED(0, hashedGrid, EMPTY);
+
+bool greater(IDRelation a, IDRelation b)
+{
+    return a.cellID>b.cellID || (a.cellID==b.cellID && a.particleID>b.particleID);
+}
+
+#ifdef LOCAL_SORT
+
+shared IDRelation entries[LOCAL_SIZE];
+
+void compareAndSwap(uint sequenceLength, uint distance)
+{
+    uint local = gl_LocalInvocationID.x;
+    uint partner = local ^ distance;
+    if(partner<=local)
+        return;
+    bool ascending = (gl_GlobalInvocationID.x & sequenceLength)==0u;
+    IDRelation a = entries[local];
+    IDRelation b = entries[partner];
+    if(greater(a, b)==ascending) {
+        entries[local] = b;
+        entries[partner] = a;
+    }
+}
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    entries[gl_LocalInvocationID.x] = hashedGrid_sortedParticleIDs[i];
+    memoryBarrierShared();
+    barrier();
+    if(k==0u) {
+        for(uint sequenceLength=2u; sequenceLength<=LOCAL_SIZE; sequenceLength<<=1) {
+            for(uint distance=sequenceLength>>1; distance>0u; distance>>=1) {
+                compareAndSwap(sequenceLength, distance);
+                memoryBarrierShared();
+                barrier();
+            }
+        }
+    } else {
+        for(uint distance=j; distance>0u; distance>>=1) {
+            compareAndSwap(k, distance);
+            memoryBarrierShared();
+            barrier();
+        }
+    }
+    hashedGrid_sortedParticleIDs[i] = entries[gl_LocalInvocationID.x];
+}
+
+#else
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    uint partner = i ^ j;
+    if(partner<=i)
+        return;
+    bool ascending = (i & k)==0u;
+    IDRelation a = hashedGrid_sortedParticleIDs[i];
+    IDRelation b = hashedGrid_sortedParticleIDs[partner];
+    if(greater(a, b)==ascending) {
+        hashedGrid_sortedParticleIDs[i] = b;
+        hashedGrid_sortedParticleIDs[partner] = a;
+    }
+}
+
+#endif
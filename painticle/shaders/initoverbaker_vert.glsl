@@ -15,7 +15,10 @@
 
 in vec2 uv;
 
+// The lower left corner of the UDIM tile being drawn
+uniform vec2 uv_offset;
+
 void main()
 {
-  gl_Position = vec4(2*uv - vec2(1), 0.0f, 1.0f);
+  gl_Position = vec4(2*(uv-uv_offset) - vec2(1), 0.0f, 1.0f);
 }
@@ -0,0 +1,60 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+// One pass of the jump flood: each texel takes the nearest seed known by itself or the texels in jump distance
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 16
+#endif
+
+layout (local_size_x = LOCAL_SIZE, local_size_y = LOCAL_SIZE) in;
+
+uniform int jump;
+
+layout(binding=2, rg32i) uniform readonly iimage2D seedsIn;
+layout(binding=3, rg32i) uniform writeonly iimage2D seedsOut;
+
+int squaredDistance(ivec2 a, ivec2 b)
+{
+    ivec2 d = a-b;
+    return d.x*d.x + d.y*d.y;
+}
+
+void main()
+{
+    ivec2 pixelPos = ivec2(gl_GlobalInvocationID.xy);
+    ivec2 size = imageSize(seedsIn);
+    if(any(greaterThanEqual(pixelPos, size)))
+        return;
+
+    ivec2 best = imageLoad(seedsIn, pixelPos).xy;
+    int bestDistance = best.x<0 ? 0x7fffffff : squaredDistance(best, pixelPos);
+    for(int y=-1; y<=1; ++y) {
+        for(int x=-1; x<=1; ++x) {
+            ivec2 p = pixelPos + jump*ivec2(x,y);
+            if(any(lessThan(p, ivec2(0))) || any(greaterThanEqual(p, size)))
+                continue;
+            ivec2 seed = imageLoad(seedsIn, p).xy;
+            if(seed.x<0)
+                continue;
+            int distance = squaredDistance(seed, pixelPos);
+            if(distance<bestDistance) {
+                best = seed;
+                bestDistance = distance;
+            }
+        }
+    }
+    imageStore(seedsOut, pixelPos, ivec4(best, 0, 0));
+}
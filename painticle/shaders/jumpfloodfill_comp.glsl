@@ -0,0 +1,48 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+// Finish the jump flood: texels outside the uv islands take the color of their seed, if it is within the gutter
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 16
+#endif
+// The image format of the painted texture, matching its dtype
+#ifndef COLOR_FORMAT
+#define COLOR_FORMAT rgba32f
+#endif
+
+layout (local_size_x = LOCAL_SIZE, local_size_y = LOCAL_SIZE) in;
+
+uniform int gutterWidth;
+
+layout(binding=0, COLOR_FORMAT) uniform image2D texture;
+layout(binding=1, r8ui) uniform readonly uimage2D mask;
+layout(binding=2, rg32i) uniform readonly iimage2D seeds;
+
+void main()
+{
+    ivec2 pixelPos = ivec2(gl_GlobalInvocationID.xy);
+    if(any(greaterThanEqual(pixelPos, imageSize(mask))) || imageLoad(mask, pixelPos).r>0)
+        return;
+    ivec2 seed = imageLoad(seeds, pixelPos).xy;
+    if(seed.x<0)
+        return;
+    // The gutter is measured like the dilation's rings to make both modes reach the same texels
+    ivec2 d = abs(seed-pixelPos);
+    if(max(d.x, d.y)>gutterWidth)
+        return;
+    // Seeds are inside the islands, which are never written, so reading and writing the same image is safe
+    imageStore(texture, pixelPos, imageLoad(texture, seed));
+}
@@ -0,0 +1,34 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+// Initialize the jump flood: each texel inside the uv islands is its own seed, all others don't have a seed yet
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 16
+#endif
+
+layout (local_size_x = LOCAL_SIZE, local_size_y = LOCAL_SIZE) in;
+
+layout(binding=1, r8ui) uniform readonly uimage2D mask;
+layout(binding=2, rg32i) uniform writeonly iimage2D seeds;
+
+void main()
+{
+    ivec2 pixelPos = ivec2(gl_GlobalInvocationID.xy);
+    if(any(greaterThanEqual(pixelPos, imageSize(mask))))
+        return;
+    bool inside = imageLoad(mask, pixelPos).r>0;
+    imageStore(seeds, pixelPos, ivec4(inside ? pixelPos : ivec2(-1), 0, 0));
+}
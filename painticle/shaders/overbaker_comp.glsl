@@ -13,41 +13,54 @@
 // You should have received a copy of the GNU General Public License
 // along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
 
-layout (local_size_x = 32, local_size_y = 32) in;
+// One ring of the dilation. The color and mask of the last pass are read from different images than the ones written,
+// so the result doesn't depend on the order, in which the texels are processed.
 
-uniform int step;
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 16
+#endif
+// The image format of the painted texture, matching its dtype
+#ifndef COLOR_FORMAT
+#define COLOR_FORMAT rgba32f
+#endif
 
-layout(binding=0, rgba32f) uniform coherent image2D texture;
-layout(binding=1, r8ui) uniform coherent uimage2D mask;
+layout (local_size_x = LOCAL_SIZE, local_size_y = LOCAL_SIZE) in;
+
+layout(binding=0, COLOR_FORMAT) uniform readonly image2D colorIn;
+layout(binding=1, r8ui) uniform readonly uimage2D maskIn;
+layout(binding=2, COLOR_FORMAT) uniform writeonly image2D colorOut;
+layout(binding=3, r8ui) uniform writeonly uimage2D maskOut;
 
 void main()
 {
-    ivec2 pixelPos = ivec2(gl_GlobalInvocationID.xy);    
-
-    uvec4 centerMaskValue = imageLoad(mask, pixelPos);
+    ivec2 pixelPos = ivec2(gl_GlobalInvocationID.xy);
+    ivec2 size = imageSize(maskIn);
+    if(any(greaterThanEqual(pixelPos, size)))
+        return;
 
-    float numAccumulated = 0.0;
-    vec4 accumulated = vec4(0,0,0,0);
-    if(centerMaskValue.r==0) {
+    uint centerMaskValue = imageLoad(maskIn, pixelPos).r;
+    vec4 color = imageLoad(colorIn, pixelPos);
+    if(centerMaskValue==0) {
+        float numAccumulated = 0.0;
+        vec4 accumulated = vec4(0,0,0,0);
         for(int y=-1; y<=1; ++y) {
             for(int x=-1; x<=1; ++x) {
                 ivec2 offset = ivec2(x,y);
                 ivec2 p = pixelPos + offset;
-                uvec4 maskValue = imageLoad(mask, p);
-                if(maskValue.r>0 && maskValue.r<step) {
-                    float weight = 1.0/length(offset);
-                    accumulated += weight * imageLoad(texture, p);
+                if((x==0 && y==0) || any(lessThan(p, ivec2(0))) || any(greaterThanEqual(p, size)))
+                    continue;
+                if(imageLoad(maskIn, p).r>0) {
+                    float weight = 1.0/length(vec2(offset));
+                    accumulated += weight * imageLoad(colorIn, p);
                     numAccumulated += weight;
                 }
             }
         }
-        accumulated /= numAccumulated;
-    }
-
-    barrier();
-
-    if(numAccumulated>0 && centerMaskValue.r==0) {
-        imageStore(texture, pixelPos, accumulated);
-        imageStore(mask, pixelPos, uvec4(step,1,1,1));
+        if(numAccumulated>0) {
+            color = accumulated / numAccumulated;
+            centerMaskValue = 1;
+        }
     }
-}
\ No newline at end of file
+    imageStore(colorOut, pixelPos, color);
+    imageStore(maskOut, pixelPos, uvec4(centerMaskValue,0,0,0));
+}
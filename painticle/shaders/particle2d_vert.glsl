@@ -17,10 +17,13 @@
 in vec3 vertex;
 in vec2 uv;
 
+// The lower left corner of the UDIM tile being drawn
+uniform vec2 uv_offset;
+
 out vec3 texel_pos;
 
 void main()
 {
-  gl_Position = vec4(2*uv - vec2(1), 0.0f, 1.0f);
+  gl_Position = vec4(2*(uv-uv_offset) - vec2(1), 0.0f, 1.0f);
   texel_pos = vertex;
 }
@@ -28,9 +28,10 @@
     x vec2 uv; \
     x float age; \
     x float max_age; \
-    x vec3 color;
+    x vec3 color; \
+    x float uv_scale;
 
-#define CONSTRUCT_PARTICLE_ARGS location, size, uv, age, max_age, color
+#define CONSTRUCT_PARTICLE_ARGS location, size, uv, age, max_age, color, uv_scale
 
 struct Particle
 {
@@ -0,0 +1,47 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Paint a particle into the texels of its splat, that are within its radius on the surface
+
+flat in Particle p_frag;
+
+out vec4 frag_color;
+
+uniform sampler2D position_map;
+uniform float strength;
+uniform float time_step;
+uniform float particle_size_age_factor;
+
+void main()
+{
+  vec4 texel_pos = texelFetch(position_map, ivec2(gl_FragCoord.xy), 0);
+  // Texels outside of the uv islands don't belong to the surface
+  if(texel_pos.w==0)
+    discard;
+  // Measuring the distance in 3D keeps the brush shape independent of uv stretching and discards texels of other uv
+  // islands, that happen to be close in uv space.
+  float dist = distance(texel_pos.xyz, p_frag.location);
+  float norm_age = p_frag.age/p_frag.max_age;
+  float current_particle_size = particle_size(p_frag, particle_size_age_factor);
+  if(dist>=current_particle_size)
+    discard;
+  float norm_dist = 2*dist/current_particle_size;
+  float factor = (1-norm_age)*smoothstep(1,0, norm_dist);
+  frag_color = factor*vec4(p_frag.color, 1);
+
+  // Default timestep is 1/25th of a second. Normalize the brush strength to that value.
+  frag_color *= 25 * time_step * strength;
+}
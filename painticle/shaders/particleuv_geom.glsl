@@ -0,0 +1,36 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Expand each particle into a quad covering its splat. Unlike points, the quads aren't limited by the maximum point
+// size of the driver and they're clipped instead of culled, when the particle's center leaves the drawn tile.
+
+layout(points) in;
+layout(triangle_strip, max_vertices = 4) out;
+
+flat in Particle p_geom[];
+flat in vec2 splat_extent[];
+flat out Particle p_frag;
+
+void main()
+{
+    for(int i=0; i<4; ++i) {
+        vec2 corner = 2*vec2(i%2, i/2) - vec2(1);
+        p_frag = p_geom[0];
+        gl_Position = gl_in[0].gl_Position + vec4(corner*splat_extent[0], 0.0f, 0.0f);
+        EmitVertex();
+    }
+    EndPrimitive();
+}
@@ -0,0 +1,38 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Place the particles at their uv coordinates. The geometry shader expands them into their splats.
+
+PARTICLE_FIELDS(in)
+flat out Particle p_geom;
+// Half the size of the splat in normalized device coordinates
+flat out vec2 splat_extent;
+
+uniform vec2 image_size;
+// The lower left corner of the UDIM tile being drawn
+uniform vec2 uv_offset;
+uniform float particle_size_age_factor;
+
+void main()
+{
+    p_geom = Particle(CONSTRUCT_PARTICLE_ARGS);
+    gl_Position = vec4(2*(uv-uv_offset) - vec2(1), 0.0f, 1.0f);
+    // uv_scale is the largest stretch of the uv mapping around the particle, so the splat covers the particle in all
+    // directions. The fragment shader removes the excess using the real 3D distance.
+    float radius = particle_size(p_geom, particle_size_age_factor) * uv_scale * max(image_size.x, image_size.y);
+    // Half a texel of margin, so even tiny particles touch the texel they're in. One texel spans 2/image_size.
+    splat_extent = (2*radius + 1) / image_size;
+}
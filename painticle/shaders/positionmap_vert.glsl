@@ -0,0 +1,31 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Rasterize the mesh into uv space and store the object space position of each texel
+
+in vec3 vertex;
+in vec2 uv;
+
+// The lower left corner of the UDIM tile being drawn
+uniform vec2 uv_offset;
+
+out vec3 texel_pos;
+
+void main()
+{
+  gl_Position = vec4(2*(uv-uv_offset) - vec2(1), 0.0f, 1.0f);
+  texel_pos = vertex;
+}
@@ -0,0 +1,47 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Move the living particles to the index counted by simscan and simscanblocks in the compacted buffers
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+PARTICLES_BUFFER(1, particles, readonly);
+DYNAMICS_BUFFER(2, dynamics, readonly);
+
+layout(std430, binding=4) readonly buffer OffsetsBuffer {
+    uint offsets[];
+};
+
+layout(std430, binding=5) readonly buffer BlockSumsBuffer {
+    uint blockSums[];
+};
+
+PARTICLES_BUFFER(6, compactedParticles, writeonly);
+DYNAMICS_BUFFER(7, compactedDynamics, writeonly);
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numParticles || !isAlive(particles[i]))
+        return;
+    uint target = blockSums[gl_WorkGroupID.x] + offsets[i];
+    compactedParticles[target] = particles[i];
+    compactedDynamics[target] = dynamics[i];
+}
@@ -0,0 +1,39 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Slow the particles down by air drag, which grows with the particles' cross section
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+// The drag coefficient divided by the squared average particle size
+uniform float dragFactor;
+
+PARTICLES_BUFFER(1, particles, readonly);
+DYNAMICS_BUFFER(2, dynamics, readonly);
+FORCES_BUFFER(3, EMPTY);
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numParticles)
+        return;
+    float size = particles[i].size;
+    forces[i].xyz -= (size*size*dragFactor)*dynamics[i].speed;
+}
@@ -0,0 +1,47 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Project the forces onto the surface's tangent plane and reduce them by the friction
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform float frictionCoefficient;
+
+DYNAMICS_BUFFER(2, dynamics, readonly);
+FORCES_BUFFER(3, EMPTY);
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numParticles)
+        return;
+    // We don't need to divide by the square length of normal, since this is a normalized vector.
+    vec3 normal = dynamics[i].normal;
+    vec3 force = forces[i].xyz;
+    float factor = dot(normal, force);
+    vec3 planeForce = force - normal*factor;
+    float planeForceLength = length(planeForce);
+    // factor is the inverse of what we need here, since the normal is pointing to the outside of the surface,
+    // but friction only applies if force is applied towards the surface. Hence we use (1+x) instead of (1-x)
+    float friction = 0;
+    if(planeForceLength>0)
+        friction = clamp(1 + frictionCoefficient*factor/planeForceLength, 0.0, 1.0);
+    forces[i].xyz = planeForce*friction;
+}
@@ -0,0 +1,36 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Add the gravitational force to the particles' forces
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform vec3 gravity;
+
+DYNAMICS_BUFFER(2, dynamics, readonly);
+FORCES_BUFFER(3, EMPTY);
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numParticles)
+        return;
+    forces[i].xyz += dynamics[i].mass*gravity;
+}
@@ -0,0 +1,54 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Integrate the forces with the improved Euler (midpoint) method in numSubSteps sub steps and let the particles age.
+// The forces are reset afterwards, so the next time step can accumulate them again.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform float timeStep;
+uniform float halfSubStep;
+uniform uint numSubSteps;
+
+PARTICLES_BUFFER(1, particles, EMPTY);
+DYNAMICS_BUFFER(2, dynamics, EMPTY);
+FORCES_BUFFER(3, EMPTY);
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numParticles)
+        return;
+    vec3 location = particles[i].location;
+    vec3 speed = dynamics[i].speed;
+    vec3 acceleration = dynamics[i].acceleration;
+    vec3 newAcceleration = forces[i].xyz / dynamics[i].mass;
+    for(uint step=0u; step<numSubSteps; ++step) {
+        vec3 newSpeed = speed + halfSubStep*(acceleration+newAcceleration);
+        location += halfSubStep*(speed+newSpeed);
+        acceleration = newAcceleration;
+        speed = newSpeed;
+    }
+    particles[i].location = location;
+    particles[i].age += timeStep;
+    dynamics[i].speed = speed;
+    dynamics[i].acceleration = acceleration;
+    forces[i] = vec4(0);
+}
@@ -0,0 +1,40 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Let the listed particles die, so they're removed with the dead particles afterwards
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform uint numKilled;
+
+PARTICLES_BUFFER(1, particles, EMPTY);
+
+layout(std430, binding=4) readonly buffer KilledParticleIDsBuffer {
+    uint killedParticleIDs[];
+};
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numKilled)
+        return;
+    uint particleID = killedParticleIDs[i];
+    particles[particleID].age = particles[particleID].max_age;
+}
@@ -0,0 +1,52 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// The mesh the particles are simulated on. The points are referenced by the triangles' vertex indices, the normals
+// and uvs are stored per triangle corner like the BVH stores them. The neighbours are the triangles across the edges
+// of each triangle as computed by accel.MeshAdjacency.
+
+layout(std430, binding=3) readonly buffer MeshPointsBuffer {
+    vec4 meshPoints[];
+};
+
+layout(std430, binding=4) readonly buffer MeshTrianglesBuffer {
+    uint meshTriangles[];
+};
+
+layout(std430, binding=5) readonly buffer MeshNormalsBuffer {
+    vec4 meshNormals[];
+};
+
+layout(std430, binding=6) readonly buffer MeshUVsBuffer {
+    vec2 meshUVs[];
+};
+
+layout(std430, binding=7) readonly buffer MeshNeighboursBuffer {
+    uint meshNeighbours[];
+};
+
+uniform uint numTriangles;
+
+vec3 meshPoint(uint triId, uint corner)
+{
+    return meshPoints[meshTriangles[3u*triId+corner]].xyz;
+}
+
+vec3 surfacePoint(uint triId, vec3 barycentrics)
+{
+    return barycentrics[0]*meshPoint(triId, 0u) + barycentrics[1]*meshPoint(triId, 1u) +
+           barycentrics[2]*meshPoint(triId, 2u);
+}
@@ -0,0 +1,53 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+// The state of the particles simulated on the GPU. The fields needed for painting are stored in the Particle layout of
+// particle_def.glsl, so the painter can draw the simulated particles directly. The remaining fields are stored in a
+// second buffer in the ParticleDynamics layout, the accumulated forces in a third one.
+
+struct ParticleDynamics
+{
+    vec3 speed;
+    float mass;
+    vec3 acceleration;
+    uint tri_index;
+    vec3 normal;
+    float pad0;
+    vec3 barycentrics;
+    float pad1;
+};
+
+#define PARTICLES_BUFFER(BIND_ID, NAME, QUALIFIER) \
+    layout(std430, binding=BIND_ID) QUALIFIER buffer NAME##Buffer { \
+        Particle NAME[]; \
+    }
+
+#define DYNAMICS_BUFFER(BIND_ID, NAME, QUALIFIER) \
+    layout(std430, binding=BIND_ID) QUALIFIER buffer NAME##Buffer { \
+        ParticleDynamics NAME[]; \
+    }
+
+#define FORCES_BUFFER(BIND_ID, QUALIFIER) \
+    layout(std430, binding=BIND_ID) QUALIFIER buffer ForcesBuffer { \
+        vec4 forces[]; \
+    }
+
+// The number of simulated particles, the buffers may be larger
+uniform uint numParticles;
+
+bool isAlive(in Particle p)
+{
+    return p.age<p.max_age;
+}
@@ -0,0 +1,86 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Repel the overlapping particles found in the hashed grid with a coulomb like force and mix their colors like
+// accel.repel_forces. The mixed colors are written to a separate buffer, so all invocations read the unmixed colors of
+// their neighbours. simrepelcolors copies them back afterwards.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform float repulsionFactor;
+uniform float timeStep;
+
+HASHED_GRID_BUFFER(0, hashedGrid);
+PARTICLES_BUFFER(1, particles, readonly);
+DYNAMICS_BUFFER(2, dynamics, readonly);
+FORCES_BUFFER(3, EMPTY);
+
+layout(std430, binding=4) writeonly buffer MixedColorsBuffer {
+    vec4 mixedColors[];
+};
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numParticles)
+        return;
+    Particle p = particles[i];
+    float particleMass = dynamics[i].mass;
+    vec3 force = vec3(0);
+    vec3 mixColor = vec3(0);
+    float numInteractions = 0;
+    ivec3 coord = gridCoord(p.location, hashedGrid_voxelSize);
+    for(int x=-1; x<=1; ++x) {
+        for(int y=-1; y<=1; ++y) {
+            for(int z=-1; z<=1; ++z) {
+                uint hash = hashGrid(coord+ivec3(x,y,z));
+                uint offset = hashedGrid_cellOffsets[hash];
+                if(offset==ID_NONE)
+                    continue;
+
+                while(offset<hashedGrid_numParticles && hashedGrid_sortedParticleIDs[offset].cellID == hash) {
+                    uint particleID = hashedGrid_sortedParticleIDs[offset].particleID;
+                    if(particleID!=i) {
+                        Particle other = particles[particleID];
+                        vec3 diff = p.location-other.location;
+                        float distanceSqr = dot(diff, diff);
+                        float maxDist = p.size+other.size;
+                        if(distanceSqr>0 && distanceSqr<maxDist*maxDist) {
+                            vec3 diffNorm = diff / sqrt(distanceSqr);
+                            const float k = 0.001;
+                            float factor = min(10.0*particleMass, k/distanceSqr) * repulsionFactor;
+                            force += factor*diffNorm;
+                            mixColor += factor*other.color;
+                            numInteractions += factor;
+                        }
+                    }
+                    ++offset;
+                }
+            }
+        }
+    }
+    forces[i].xyz += force;
+    vec3 color = p.color;
+    if(numInteractions>0) {
+        float mixFactor = 1 - 1/(timeStep+1);
+        color = (1-mixFactor)*color + (mixFactor/numInteractions)*mixColor;
+    }
+    mixedColors[i] = vec4(color, 0);
+}
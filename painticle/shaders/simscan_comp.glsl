@@ -0,0 +1,60 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// The first pass of removing the dead particles: count the living particles before each particle within its work
+// group and the living particles of each work group. The counts are accumulated over the work groups by
+// simscanblocks, then simcompact moves the living particles to their new index, keeping their order.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+PARTICLES_BUFFER(1, particles, readonly);
+
+layout(std430, binding=4) writeonly buffer OffsetsBuffer {
+    uint offsets[];
+};
+
+layout(std430, binding=5) writeonly buffer BlockSumsBuffer {
+    uint blockSums[];
+};
+
+shared uint sums[LOCAL_SIZE];
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    uint local = gl_LocalInvocationID.x;
+    uint alive = i<numParticles && isAlive(particles[i]) ? 1u : 0u;
+    sums[local] = alive;
+    memoryBarrierShared();
+    barrier();
+    // Inclusive scan of the work group's counts
+    for(uint distance=1u; distance<LOCAL_SIZE; distance<<=1) {
+        uint value = local>=distance ? sums[local-distance] : 0u;
+        memoryBarrierShared();
+        barrier();
+        sums[local] += value;
+        memoryBarrierShared();
+        barrier();
+    }
+    if(i<numParticles)
+        offsets[i] = sums[local] - alive;
+    if(local==LOCAL_SIZE-1u)
+        blockSums[gl_WorkGroupID.x] = sums[local];
+}
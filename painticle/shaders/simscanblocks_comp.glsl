@@ -0,0 +1,63 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Turn the living particles counted per work group by simscan into the number of living particles before each work
+// group. A single work group processes all of them, each invocation a contiguous range. The total number of living
+// particles is stored after the numBlocks counts.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform uint numBlocks;
+
+layout(std430, binding=5) buffer BlockSumsBuffer {
+    uint blockSums[];
+};
+
+shared uint sums[LOCAL_SIZE];
+
+void main()
+{
+    uint local = gl_LocalInvocationID.x;
+    uint blocksPerInvocation = (numBlocks+LOCAL_SIZE-1u) / LOCAL_SIZE;
+    uint begin = min(local*blocksPerInvocation, numBlocks);
+    uint end = min(begin+blocksPerInvocation, numBlocks);
+    uint sum = 0u;
+    for(uint block=begin; block<end; ++block)
+        sum += blockSums[block];
+    sums[local] = sum;
+    memoryBarrierShared();
+    barrier();
+    for(uint distance=1u; distance<LOCAL_SIZE; distance<<=1) {
+        uint value = local>=distance ? sums[local-distance] : 0u;
+        memoryBarrierShared();
+        barrier();
+        sums[local] += value;
+        memoryBarrierShared();
+        barrier();
+    }
+    uint offset = sums[local] - sum;
+    for(uint block=begin; block<end; ++block) {
+        uint count = blockSums[block];
+        blockSums[block] = offset;
+        offset += count;
+    }
+    if(local==LOCAL_SIZE-1u)
+        blockSums[numBlocks] = sums[local];
+}
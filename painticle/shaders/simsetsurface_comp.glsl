@@ -0,0 +1,51 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Set the surface points of the particles found by the CPU, e.g. by closest point queries of the BVH
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform uint numSurfacePoints;
+
+DYNAMICS_BUFFER(2, dynamics, EMPTY);
+
+struct SurfacePoint
+{
+    vec3 barycentrics;
+    uint triIndex;
+};
+
+layout(std430, binding=0) readonly buffer SurfacePointsBuffer {
+    SurfacePoint surfacePoints[];
+};
+
+layout(std430, binding=4) readonly buffer SurfaceParticleIDsBuffer {
+    uint surfaceParticleIDs[];
+};
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numSurfacePoints)
+        return;
+    uint particleID = surfaceParticleIDs[i];
+    dynamics[particleID].tri_index = surfacePoints[i].triIndex;
+    dynamics[particleID].barycentrics = surfacePoints[i].barycentrics;
+}
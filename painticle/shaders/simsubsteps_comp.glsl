@@ -0,0 +1,57 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Find the largest distance a particle moves within a time step relative to courant times its size. This gives the
+// number of sub steps needed, so that no particle moves further than that within one sub step. The movement is
+// positive, so its bits can be compared as unsigned integers.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform float timeStep;
+uniform float courant;
+
+PARTICLES_BUFFER(1, particles, readonly);
+DYNAMICS_BUFFER(2, dynamics, readonly);
+FORCES_BUFFER(3, readonly);
+
+layout(std430, binding=4) buffer MaxMovementBuffer {
+    uint maxMovement;
+};
+
+shared uint localMaxMovement;
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(gl_LocalInvocationID.x==0u)
+        localMaxMovement = 0u;
+    memoryBarrierShared();
+    barrier();
+    if(i<numParticles) {
+        float maxSpeed = length(dynamics[i].speed) + timeStep*length(forces[i].xyz / dynamics[i].mass);
+        // Sizes are clamped to the float epsilon to avoid dividing by zero like the CPU simulator does
+        float movement = timeStep*maxSpeed / (courant*max(particles[i].size, 1.1920929e-07));
+        atomicMax(localMaxMovement, floatBitsToUint(movement));
+    }
+    memoryBarrierShared();
+    barrier();
+    if(gl_LocalInvocationID.x==0u)
+        atomicMax(maxMovement, localMaxMovement);
+}
@@ -0,0 +1,75 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Move the particles onto their surface points and update the values depending on it: the normal, uv and uv scale.
+// The speed is projected onto the tangent plane.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform bool hasNormals;
+uniform bool hasUVs;
+
+PARTICLES_BUFFER(1, particles, EMPTY);
+DYNAMICS_BUFFER(2, dynamics, EMPTY);
+
+// The length in uv space of a unit length in object space like BVH::uvScale. Since the mapping is usually not
+// isotropic, this is the maximum over the triangle's edges.
+float uvScale(uint triId)
+{
+    float scale = 0;
+    for(uint corner=0u; corner<3u; ++corner) {
+        uint next = (corner+1u)%3u;
+        float length3d = distance(meshPoint(triId, corner), meshPoint(triId, next));
+        if(length3d>0)
+            scale = max(scale, distance(meshUVs[3u*triId+corner], meshUVs[3u*triId+next]) / length3d);
+    }
+    return scale;
+}
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numParticles)
+        return;
+    uint triId = dynamics[i].tri_index;
+    if(triId>=numTriangles)
+        return;
+    vec3 barycentrics = dynamics[i].barycentrics;
+    vec3 normal;
+    if(hasNormals) {
+        normal = barycentrics[0]*meshNormals[3u*triId].xyz + barycentrics[1]*meshNormals[3u*triId+1u].xyz +
+                 barycentrics[2]*meshNormals[3u*triId+2u].xyz;
+    } else {
+        normal = cross(meshPoint(triId, 1u)-meshPoint(triId, 0u), meshPoint(triId, 2u)-meshPoint(triId, 0u));
+    }
+    normal = normalize(normal);
+    particles[i].location = surfacePoint(triId, barycentrics);
+    if(hasUVs) {
+        particles[i].uv = barycentrics[0]*meshUVs[3u*triId] + barycentrics[1]*meshUVs[3u*triId+1u] +
+                          barycentrics[2]*meshUVs[3u*triId+2u];
+        particles[i].uv_scale = uvScale(triId);
+    } else {
+        particles[i].uv = vec2(0);
+        particles[i].uv_scale = 0;
+    }
+    vec3 speed = dynamics[i].speed;
+    dynamics[i].normal = normal;
+    dynamics[i].speed = speed - normal*dot(speed, normal);
+}
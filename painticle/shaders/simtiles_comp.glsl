@@ -0,0 +1,73 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Mark the UDIM tiles overlapped by the squares around the particles' uvs like painttiles.touched_tiles, so the
+// painter knows the tiles to paint into without reading the particles back. Tile 1001+i is marked by bit i%32 of
+// touchedTiles[i/32].
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+// The UDIM tiles have 10 columns, only the first MAX_TILE_ROWS rows are tracked
+const int MAX_TILE_ROWS = 100;
+const uint NUM_TILE_MASKS = uint(10*MAX_TILE_ROWS+31) / 32u;
+
+uniform float sizeFactor;
+
+PARTICLES_BUFFER(1, particles, readonly);
+
+layout(std430, binding=4) buffer TouchedTilesBuffer {
+    uint touchedTiles[];
+};
+
+shared uint localTouchedTiles[NUM_TILE_MASKS];
+
+void touch(vec2 uv)
+{
+    // Coordinates outside are clamped like blender does
+    ivec2 cell = ivec2(floor(uv));
+    cell = clamp(cell, ivec2(0), ivec2(9, MAX_TILE_ROWS-1));
+    uint index = uint(cell.x + 10*cell.y);
+    atomicOr(localTouchedTiles[index/32u], 1u<<(index%32u));
+}
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    for(uint mask=gl_LocalInvocationID.x; mask<NUM_TILE_MASKS; mask+=LOCAL_SIZE)
+        localTouchedTiles[mask] = 0u;
+    memoryBarrierShared();
+    barrier();
+    if(i<numParticles) {
+        Particle p = particles[i];
+        float radius = p.size*p.uv_scale*sizeFactor;
+        vec2 lower = p.uv - radius;
+        vec2 upper = p.uv + radius;
+        touch(lower);
+        touch(upper);
+        touch(vec2(lower.x, upper.y));
+        touch(vec2(upper.x, lower.y));
+    }
+    memoryBarrierShared();
+    barrier();
+    for(uint mask=gl_LocalInvocationID.x; mask<NUM_TILE_MASKS; mask+=LOCAL_SIZE) {
+        if(localTouchedTiles[mask]!=0u)
+            atomicOr(touchedTiles[mask], localTouchedTiles[mask]);
+    }
+}
@@ -0,0 +1,155 @@
+// This file is part of PAINTicle.
+//
+// PAINTicle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// PAINTicle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+
+// Walk the particles from their last surface point across the triangles towards their integrated location like
+// accel.walk_particles. Particles, whose walk fails, are appended to the failed particles, so the CPU can project
+// them with a closest point query of the BVH.
+
+#ifndef LOCAL_SIZE
+#define LOCAL_SIZE 64
+#endif
+
+layout (local_size_x = LOCAL_SIZE) in;
+
+uniform uint maxCrossings;
+
+PARTICLES_BUFFER(1, particles, readonly);
+DYNAMICS_BUFFER(2, dynamics, EMPTY);
+
+struct FailedParticle
+{
+    vec3 location;
+    uint particleID;
+};
+
+layout(std430, binding=0) buffer FailedParticlesBuffer {
+    uint numFailed;
+    uint pad0;
+    uint pad1;
+    uint pad2;
+    FailedParticle failedParticles[];
+};
+
+// Remove small negative values caused by rounding and make the coordinates sum up to one
+vec3 clampBarycentrics(vec3 barycentrics)
+{
+    barycentrics = max(barycentrics, vec3(0));
+    float sum = barycentrics[0] + barycentrics[1] + barycentrics[2];
+    return sum>0 ? barycentrics/sum : barycentrics;
+}
+
+// Compute the change of the barycentric coordinates, when moving by a displacement in the triangle's plane.
+// Returns false for degenerated triangles.
+bool barycentricsDelta(vec3 a, vec3 b, vec3 c, vec3 displacement, out vec3 delta)
+{
+    vec3 v0 = b - a;
+    vec3 v1 = c - a;
+    float d00 = dot(v0, v0);
+    float d01 = dot(v0, v1);
+    float d11 = dot(v1, v1);
+    float d20 = dot(displacement, v0);
+    float d21 = dot(displacement, v1);
+    float denom = d00*d11 - d01*d01;
+    delta = vec3(0);
+    // The smallest positive normalized float
+    if(!(abs(denom) > 1.17549435e-38))
+        return false;
+    float v = (d11*d20 - d01*d21) / denom;
+    float w = (d00*d21 - d01*d20) / denom;
+    delta = vec3(-v-w, v, w);
+    return true;
+}
+
+// Walk a single particle from its surface point by the displacement. Returns false, if the walk failed.
+bool walk(inout uint triId, inout vec3 barycentrics, vec3 displacement)
+{
+    // The length is kept when moving onto the next triangle, so walking over a curved surface doesn't slow down
+    float len = -1;
+    for(uint crossing=0u; crossing<=maxCrossings; ++crossing) {
+        vec3 a = meshPoint(triId, 0u);
+        vec3 b = meshPoint(triId, 1u);
+        vec3 c = meshPoint(triId, 2u);
+        vec3 faceNormal = cross(b-a, c-a);
+        float faceNormalLength = length(faceNormal);
+        if(!(faceNormalLength > 0))
+            return false;
+        faceNormal /= faceNormalLength;
+        displacement -= faceNormal * dot(displacement, faceNormal);
+        float projectedLength = length(displacement);
+        if(len>=0 && projectedLength>0)
+            displacement *= len/projectedLength;
+
+        vec3 delta;
+        if(!barycentricsDelta(a, b, c, displacement, delta))
+            return false;
+        // Find the edge, which is crossed first. It's opposite to the corner, whose coordinate drops to zero first.
+        float t = 1;
+        uint leavingCorner = ID_NONE;
+        for(uint corner=0u; corner<3u; ++corner) {
+            if(delta[corner]<0 && barycentrics[corner]+delta[corner]<0) {
+                float cornerT = barycentrics[corner] / -delta[corner];
+                if(cornerT<t) {
+                    t = cornerT;
+                    leavingCorner = corner;
+                }
+            }
+        }
+        barycentrics += delta*t;
+        if(leavingCorner==ID_NONE) {
+            barycentrics = clampBarycentrics(barycentrics);
+            return true;
+        }
+        barycentrics[leavingCorner] = 0;
+        barycentrics = clampBarycentrics(barycentrics);
+
+        uint next = meshNeighbours[3u*triId + (leavingCorner+1u)%3u];
+        if(next==ID_NONE)
+            return true;  // Stop at the border of the mesh
+        // The point is on the shared edge, so only the shared vertices' coordinates need to be transferred
+        vec3 nextBarycentrics = vec3(0);
+        for(uint corner=0u; corner<3u; ++corner) {
+            for(uint nextCorner=0u; nextCorner<3u; ++nextCorner) {
+                if(meshTriangles[3u*next+nextCorner]==meshTriangles[3u*triId+corner])
+                    nextBarycentrics[nextCorner] += barycentrics[corner];
+            }
+        }
+        displacement *= 1-t;
+        len = length(displacement);
+        triId = next;
+        barycentrics = nextBarycentrics;
+    }
+    return false;
+}
+
+void main()
+{
+    uint i = gl_GlobalInvocationID.x;
+    if(i>=numParticles)
+        return;
+    vec3 location = particles[i].location;
+    uint triId = dynamics[i].tri_index;
+    vec3 barycentrics = dynamics[i].barycentrics;
+    bool walked = false;
+    if(triId<numTriangles)
+        walked = walk(triId, barycentrics, location-surfacePoint(triId, barycentrics));
+    if(walked) {
+        dynamics[i].tri_index = triId;
+        dynamics[i].barycentrics = barycentrics;
+    } else {
+        uint failed = atomicAdd(numFailed, 1u);
+        failedParticles[failed] = FailedParticle(location, i);
+    }
+}
@@ -22,9 +22,13 @@ out vec4 fragColor;
 
 uniform float opacity;
 uniform sampler2D image;
+// Tiles only cover their own uv range, while untiled images repeat
+uniform bool tiled;
 
 void main()
 {
+  if(tiled && (any(lessThan(texture_uv, vec2(0))) || any(greaterThanEqual(texture_uv, vec2(1)))))
+    discard;
   fragColor = texture(image, texture_uv);
   fragColor.rgb = srgb_to_linear(fragColor.rgb);
   fragColor.a = opacity;
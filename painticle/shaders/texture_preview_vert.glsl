@@ -14,6 +14,8 @@
 // along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
 
 uniform mat4 model_view_projection;
+// The lower left corner of the UDIM tile being drawn
+uniform vec2 uv_offset;
 
 in vec3 vertex;
 in vec2 uv;
@@ -25,5 +27,5 @@ void main()
   gl_Position = model_view_projection * vec4(vertex, 1.0);
   // Add a little polygon offset, since we draw the overlay directly over the original mesh
   gl_Position.z -= 0.000001;
-  texture_uv = uv;
+  texture_uv = uv - uv_offset;
 }
@@ -33,7 +33,7 @@ class BrushStep(emitterstep.EmitterStep):
         if input.interactions & Interactions.EMIT_PARTICLES and input.pressure > 0.0:
             context = sim_data.context
             delta_t = sim_data.timestep
-            time_between_particles = 1/(self.creation_settings.flow_rate * input.pressure)
+            time_between_particles = 1/(self.frozen.creation_settings.flow_rate * input.pressure)
             self.last_shoot_time += delta_t
             num_particles_to_shoot = int(self.last_shoot_time / time_between_particles)
             ray_origins, ray_directions = self.create_ray_data(num_particles_to_shoot, context, input)
@@ -35,10 +35,14 @@ class DragStep(simulationstep.SimulationStep):
 
     def simulate(self, sim_data: simulationstep.SimulationData, particles: simulationstep.ParticleData,
                  forces: simulationstep.Forces, new_particles: simulationstep.ParticleData):
-        uspeed = numpyutils.unstructured(particles.speed)
+        uspeed = numpyutils.unstructured_view(particles.speed)
         usize = numpyutils.unstructured(particles.size)
         avg_particle_size = sim_data.emit_settings.particle_size
         avg_particle_size_sqr = avg_particle_size * avg_particle_size
-        usize_sqr = usize * usize / avg_particle_size_sqr
-        factor = self.drag_coefficient * usize_sqr
-        return forces - factor[:, np.newaxis] * uspeed
+        factor = sim_data.scratch.get("drag_factor", len(usize), forces.dtype)
+        np.multiply(usize, usize, out=factor)
+        factor *= self.frozen.drag_coefficient / avg_particle_size_sqr
+        drag_forces = sim_data.scratch.get("drag_forces", forces.shape, forces.dtype)
+        np.multiply(factor[:, np.newaxis], uspeed, out=drag_forces)
+        forces -= drag_forces
+        return forces
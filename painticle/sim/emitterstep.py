@@ -41,12 +41,16 @@ class EmitterStep(simulationstep.SimulationStep):
         self.last_shoot_time = 0
         self.rnd = random.Random()
 
+    def seed(self, seed: int):
+        """ Seed the random number generator to emit reproducible particle distributions """
+        self.rnd.seed(seed)
+
     def create_particles(self, ray_origins, ray_directions, sim_data: simulationstep.SimulationData,
                          new_particles: simulationstep.ParticleData):
         """ ray_origins and ray_directions need to be given in world space """
         object_transform = sim_data.paint_mesh.object.matrix_world.copy()
-        emit_settings = self.creation_settings
-        brush_color = sim_data.context.tool_settings.image_paint.brush.color
+        emit_settings = self.frozen.creation_settings
+        brush_color = sim_data.brush_color
         bvh = sim_data.paint_mesh.bvh
         matrix_inv = utils.matrix_to_tuple(object_transform.inverted())
         speed = emit_settings.initial_speed
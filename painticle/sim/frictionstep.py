@@ -36,12 +36,24 @@ class FrictionStep(simulationstep.SimulationStep):
         # Friction calculation
         # Project forces onto normal vector
         # We don't need to divide by the square length of normal, since this is a normalized vector.
-        unormal = numpyutils.unstructured(particles.normal)
-        factor = numpyutils.vec_dot(unormal, forces)
-        ortho_force = unormal * factor[:, np.newaxis]
+        scratch = sim_data.scratch
+        unormal = numpyutils.unstructured_view(particles.normal)
+        factor = scratch.get("friction_factor", len(forces), forces.dtype)
+        np.einsum('ij,ij->i', unormal, forces, out=factor)
+        ortho_force = scratch.get("friction_ortho_force", forces.shape, forces.dtype)
+        np.multiply(unormal, factor[:, np.newaxis], out=ortho_force)
         # The force on the plane is then just simple vector subtraction
-        plane_force = forces - ortho_force
+        plane_force = forces
+        plane_force -= ortho_force
+        plane_force_length = scratch.get("friction_plane_force_length", len(forces), forces.dtype)
+        np.einsum('ij,ij->i', plane_force, plane_force, out=plane_force_length)
+        np.sqrt(plane_force_length, out=plane_force_length)
         # factor is the inverse of what we need here, since the normal is pointing to the outside of the surface,
         # but friction only applies if force is applied towards the surface. Hence we use (1+x) instead of (1-x)
-        friction = np.clip(1+self.friction_coefficient*factor/numpyutils.vec_length(plane_force), 0, 1)
-        return plane_force * friction[:, np.newaxis]
+        friction = factor
+        friction *= self.frozen.friction_coefficient
+        friction /= plane_force_length
+        friction += 1
+        np.clip(friction, 0, 1, out=friction)
+        plane_force *= friction[:, np.newaxis]
+        return plane_force
@@ -36,6 +36,9 @@ class GravityStep(simulationstep.SimulationStep):
 
     def simulate(self, sim_data: simulationstep.SimulationData, particles: simulationstep.ParticleData,
                  forces: simulationstep.Forces, new_particles: simulationstep.ParticleData) -> simulationstep.Forces:
-        gravity = np.array(self.gravity)
+        gravity = np.array(self.frozen.gravity, numpyutils.float32_dtype)
         mass = numpyutils.unstructured(particles.mass)
-        return forces + mass[:, np.newaxis] * gravity[np.newaxis, :]
+        gravity_forces = sim_data.scratch.get("gravity_forces", forces.shape, forces.dtype)
+        np.multiply(mass[:, np.newaxis], gravity[np.newaxis, :], out=gravity_forces)
+        forces += gravity_forces
+        return forces
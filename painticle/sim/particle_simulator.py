@@ -24,8 +24,12 @@ import bpy
 import bpy_types
 
 from ..interaction import SourceInput
+from .. import accel
+from .. import utils
+from .. import meshdata
 from .. import trianglemesh
 from .. import settings
+from ..settings import snapshot
 
 
 class SimulationData:
@@ -39,6 +43,8 @@ class SimulationData:
         self.paint_mesh = paint_mesh
         self.source_input = source_input
         self.hashed_grid = None
+        self.scratch = None
+        self.brush_color = None
         self.context = context
 
 
@@ -52,6 +58,10 @@ class ParticleSimulator(ABC):
 
     def __init__(self, context: bpy.types.Context):
         self.context = context
+        self._physics_steps = None
+        self.settings = None
+        # The CPU painter reads the simulator's hashed grid, the GPU painter builds its own one on the GPU
+        self.painter_needs_hashed_grid = True
 
     @abstractmethod
     def shutdown(self):
@@ -62,10 +72,73 @@ class ParticleSimulator(ABC):
     def clear_particles(self):
         pass
 
-    @abstractmethod
+    def setup_steps(self):
+        self._physics_steps = self.context.scene.painticle_settings.brush.get_active_brush_steps()
+        self.refresh_settings()
+
+    def refresh_settings(self, painticle_settings=None):
+        """ Take a new snapshot of the settings. The simulation steps, the simulator and the painter read the
+            snapshot instead of the blender properties. """
+        self.settings = snapshot.capture(self.context, self._physics_steps, painticle_settings)
+
+    def update_settings(self, painticle_settings=None):
+        """ Refresh the settings snapshot, if blender reported changes since it was taken """
+        if self.settings is None or self.settings.is_outdated():
+            self.refresh_settings(painticle_settings)
+
     def emit_settings(self):
+        """ The snapshot of the first emitter's creation settings """
+        return self.settings.emit
+
+    def seed(self, seed: int):
+        """ Seed all random number generators used by the simulation steps to get reproducible results """
+        from .emitterstep import EmitterStep
+        accel.ParticleData.seed_random(seed & 0xffffffff)
+        for i, step in enumerate(self._physics_steps):
+            if isinstance(step, EmitterStep):
+                step.seed(seed + i)
+
+    def update_mesh(self, mesh_data: meshdata.MeshData):
+        """ Take moved vertex positions of the simulated mesh with unchanged topology """
         pass
 
     @abstractmethod
     def simulate(self, sim_data: SimulationData):
         pass
+
+    @abstractmethod
+    def append_particles(self, particles: accel.ParticleData):
+        """ Add the given particles to the simulated ones """
+        pass
+
+    @abstractmethod
+    def update_hashed_grid(self):
+        pass
+
+    def hashed_grid_voxel_size(self) -> float:
+        """ The cell size of the hashed grid, large enough for the biggest particles """
+        settings = self.emit_settings()
+        age_size_factor = max(1, settings.particle_size_age_factor)
+        return (settings.particle_size + settings.particle_size_random) * age_size_factor
+
+    def add_test_particles(self, ray_origins, ray_directions, bvh, object_transform, brush_color,
+                           painticle_settings):
+        """ ray_origins and ray_directions need to be given in world space """
+        matrix_inv = utils.matrix_to_tuple(object_transform.inverted())
+        emit_settings = self.emit_settings()
+        speed = emit_settings.initial_speed
+        speed_random = 0.5 * emit_settings.initial_speed * emit_settings.initial_speed_random
+        size_min = emit_settings.particle_size - emit_settings.particle_size_random
+        size_max = emit_settings.particle_size + emit_settings.particle_size_random
+        mass_min = emit_settings.mass - emit_settings.mass_random
+        mass_max = emit_settings.mass + emit_settings.mass_random
+        max_age_min = emit_settings.max_age - emit_settings.max_age_random
+        max_age_max = emit_settings.max_age + emit_settings.max_age_random
+        new_particles = accel.ParticleData()
+        new_particles.add_particles_from_rays(ray_origins, ray_directions, matrix_inv, bvh,
+                                              [speed, speed], [speed_random, speed_random, speed_random],
+                                              [size_min, size_max], [mass_min, mass_max],
+                                              [max_age_min, max_age_max],
+                                              brush_color[:], emit_settings.color_random.hsv)
+        self.append_particles(new_particles)
+        self.update_hashed_grid()
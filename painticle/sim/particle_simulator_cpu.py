@@ -17,11 +17,11 @@
 
 # <pep8 compliant>
 
-from painticle.sim.emitterstep import EmitterStep
 from . import particle_simulator
-from .. import utils
+from . import particlebudget
 from .. import numpyutils
 from .. import accel
+from .. import profiling
 from . import brushstep, rainstep, gravitystep, windstep, repelstep, dragstep, frictionstep
 import bpy
 import numpy as np
@@ -36,6 +36,9 @@ particle_dtype = np.dtype([('location', vec3_dtype),
                            ('speed', vec3_dtype),
                            ('normal', vec3_dtype),
                            ('uv', vec2_dtype),
+                           ('uv_scale', float32_dtype),
+                           ('tri_index', np.uintc),
+                           ('barycentrics', vec3_dtype),
                            ('size', float32_dtype),
                            ('mass', float32_dtype),
                            ('age', float32_dtype),
@@ -44,21 +47,37 @@ particle_dtype = np.dtype([('location', vec3_dtype),
                           align=True)
 
 
+def adaptive_sub_steps(speed: np.ndarray, acceleration: np.ndarray, size: np.ndarray, timestep: float,
+                       courant: float, min_steps: int, max_steps: int) -> int:
+    """ Get the number of substeps, so that no particle moves further than courant times its size within one substep.
+        speed and acceleration are unstructured arrays of 3d vectors. """
+    if len(size) == 0:
+        return min_steps
+    max_speed = np.linalg.norm(speed, axis=1) + timestep * np.linalg.norm(acceleration, axis=1)
+    movement = timestep * max_speed / (courant * np.maximum(size, np.finfo(np.float32).eps))
+    num_steps = int(np.ceil(np.max(movement)))
+    return max(min_steps, min(num_steps, max_steps))
+
+
 class ParticleSimulatorCPU(particle_simulator.ParticleSimulator):
     """ This particle simulator is using the CPU to simulate the particles. """
 
-    def __init__(self, context: bpy.types.Context):
+    def __init__(self, context: bpy.types.Context, lifetime_ordered: bool = False):
+        """ lifetime_ordered keeps the particles sorted by their remaining lifetime, so removing the dead particles
+            doesn't need to look at the living ones """
         super().__init__(context)
         self._particles = accel.ParticleData()
-        self._physics_steps = None
+        if lifetime_ordered:
+            self._particles.storage_mode = accel.StorageMode.LIFETIME_ORDERED
         self.hashed_grid = accel.HashedGrid(0.001)
+        # Temporaries of each time step are kept, so the steady state of a stroke doesn't allocate any arrays
+        self.scratch = numpyutils.ScratchBuffers()
+        self._new_particles = accel.ParticleData()
+        self._steps_need_hashed_grid = False
 
     def shutdown(self):
         pass
 
-    def setup_steps(self):
-        self._physics_steps = self.context.scene.painticle_settings.brush.get_active_brush_steps()
-
     @property
     def num_particles(self):
         return self._particles.num_particles
@@ -66,79 +85,132 @@ class ParticleSimulatorCPU(particle_simulator.ParticleSimulator):
     def clear_particles(self):
         self._particles.resize(0)
         self.hashed_grid.clear()
+        self.scratch.clear()
 
-    def emit_settings(self):
-        for x in self._physics_steps:
-            if isinstance(x, EmitterStep):
-                return x.creation_settings
+    def setup_steps(self):
+        super().setup_steps()
+        self._steps_need_hashed_grid = any(isinstance(step, repelstep.RepelStep) for step in self._physics_steps)
 
+    @property
+    def needs_hashed_grid(self) -> bool:
+        """ The hashed grid is only built, if the simulation steps or the painter read it on the CPU """
+        return self._steps_need_hashed_grid or self.painter_needs_hashed_grid
 
     def simulate(self, sim_data: particle_simulator.SimulationData):
         # Data initialization
         # -------------------
         p = self._particles
-        assert p.num_particles == self.hashed_grid.num_particles
-        forces = np.zeros((p.num_particles, 3), float32_dtype)
-        new_particles = accel.ParticleData()
+        if self.needs_hashed_grid and p.num_particles != self.hashed_grid.num_particles:
+            # The steps of the previous stroke didn't need the grid
+            self.update_hashed_grid()
+        forces = self.scratch.zeros("forces", (p.num_particles, 3), float32_dtype)
+        new_particles = self._new_particles
+        new_particles.resize(0)
         sim_data.hashed_grid = self.hashed_grid
+        sim_data.scratch = self.scratch
+        sim_data.brush_color = self.settings.brush_color
         # Apply simulation steps
         # ----------------------
         for step in self._physics_steps:
-            forces = step.simulate(sim_data, p, forces, new_particles)
+            with profiling.stage("sim."+type(step).__name__):
+                forces = step.simulate(sim_data, p, forces, new_particles)
         # Perform simulation integration
         # ------------------------------
         if self.num_particles > 0:
-            num_substeps = sim_data.settings.physics.sim_sub_steps
-            for _ in range(num_substeps):
-                # Improved Euler (midpoint) integration step
-                # ------------------------------------------
-                ulocation = numpyutils.unstructured(p.location)
-                uspeed = numpyutils.unstructured(p.speed)
-                uacceleration = numpyutils.unstructured(p.acceleration)
-                new_acceleration = forces / p.mass[:, np.newaxis]
-                half_timestep = 0.5 * sim_data.timestep / num_substeps
-                new_speed = uspeed + half_timestep * (uacceleration + new_acceleration)
-                new_location = ulocation + half_timestep * (uspeed + new_speed)
-                p.acceleration = numpyutils.to_structured(new_acceleration, vec3_dtype)
-                p.speed = numpyutils.to_structured(new_speed, vec3_dtype)
-                p.location = numpyutils.to_structured(new_location, vec3_dtype)
+            with profiling.stage("sim.integrate"):
+                self._integrate(sim_data, forces)
             # Last step assign the new computed values
             p.age += sim_data.timestep
             self._particles.del_dead()
         if new_particles is not None:
             self._particles.append(new_particles)
-        self._update_location_dependent_variables(sim_data.paint_mesh)
+        with profiling.stage("sim.project_to_surface"):
+            self._update_location_dependent_variables(sim_data.paint_mesh, sim_data.settings.physics.surface_walking)
+        with profiling.stage("sim.budget"):
+            self._enforce_budget(sim_data.settings.physics)
         self.update_hashed_grid()
+        profiling.record_value("particles", self.num_particles)
+        profiling.record_value("sim.scratch_allocations", self.scratch.num_allocations)
+
+    def _num_substeps(self, sim_data: particle_simulator.SimulationData, forces):
+        physics = sim_data.settings.physics
+        if not physics.adaptive_sub_steps:
+            return physics.sim_sub_steps
+        p = self._particles
+        acceleration = self.scratch.get("acceleration", forces.shape, forces.dtype)
+        np.divide(forces, p.mass[:, np.newaxis], out=acceleration)
+        return adaptive_sub_steps(numpyutils.unstructured_view(p.speed), acceleration, p.size,
+                                  sim_data.timestep, physics.sub_step_courant, physics.min_sub_steps,
+                                  physics.max_sub_steps)
+
+    def _integrate(self, sim_data: particle_simulator.SimulationData, forces):
+        p = self._particles
+        num_substeps = self._num_substeps(sim_data, forces)
+        profiling.record_value("sim.sub_steps", num_substeps)
+        # The particle fields are written through views, the intermediate results go to scratch buffers
+        ulocation = numpyutils.unstructured_view(p.location)
+        uspeed = numpyutils.unstructured_view(p.speed)
+        uacceleration = numpyutils.unstructured_view(p.acceleration)
+        new_acceleration = self.scratch.get("new_acceleration", forces.shape, forces.dtype)
+        new_speed = self.scratch.get("new_speed", forces.shape, forces.dtype)
+        movement = self.scratch.get("movement", forces.shape, forces.dtype)
+        np.divide(forces, p.mass[:, np.newaxis], out=new_acceleration)
+        half_timestep = 0.5 * sim_data.timestep / num_substeps
+        for _ in range(num_substeps):
+            # Improved Euler (midpoint) integration step
+            # ------------------------------------------
+            # new_speed = speed + half_timestep * (acceleration + new_acceleration)
+            np.add(uacceleration, new_acceleration, out=new_speed)
+            new_speed *= half_timestep
+            new_speed += uspeed
+            # location += half_timestep * (speed + new_speed)
+            np.add(uspeed, new_speed, out=movement)
+            movement *= half_timestep
+            ulocation += movement
+            uacceleration[...] = new_acceleration
+            uspeed[...] = new_speed
+
+    def _enforce_budget(self, physics):
+        if 0 < physics.particle_budget < self.num_particles:
+            self.hashed_grid.voxel_size = self.hashed_grid_voxel_size()
+            num_removed = particlebudget.enforce_budget(self._particles, physics.particle_budget, physics.budget_mode,
+                                                        self.hashed_grid)
+            profiling.record_value("sim.budget_removed", num_removed)
 
     def update_hashed_grid(self):
-        settings = self.emit_settings()
-        age_size_factor = max(1, settings.particle_size_age_factor)
-        self.hashed_grid.voxel_size = (settings.particle_size + settings.particle_size_random) * age_size_factor
-        self.hashed_grid.build(numpyutils.unstructured(self._particles.location))
-
-    def _update_location_dependent_variables(self, paint_mesh: trianglemesh.TriangleMesh):
-        result = paint_mesh.bvh.closest_points(self._particles.location)
-        self._particles.location = result['location']
-        self._particles.normal = result['normal']
-        projected_speed = numpyutils.project_vector_onto_plane(self._particles.speed, self._particles.normal)
-        self._particles.speed = numpyutils.to_structured(projected_speed, numpyutils.vec3_dtype)
-
-    def add_test_particles(self, ray_origins, ray_directions, bvh, object_transform, brush_color,
-                           painticle_settings):
-        """ ray_origins and ray_directions need to be given in world space """
-        matrix_inv = utils.matrix_to_tuple(object_transform.inverted())
-        emit_settings = self.emit_settings()
-        speed = emit_settings.initial_speed
-        speed_random = 0.5 * emit_settings.initial_speed * emit_settings.initial_speed_random
-        size_min = emit_settings.particle_size - emit_settings.particle_size_random
-        size_max = emit_settings.particle_size + emit_settings.particle_size_random
-        mass_min = emit_settings.mass - emit_settings.mass_random
-        mass_max = emit_settings.mass + emit_settings.mass_random
-        max_age_min = emit_settings.max_age - emit_settings.max_age_random
-        max_age_max = emit_settings.max_age + emit_settings.max_age_random
-        self._particles.add_particles_from_rays(ray_origins, ray_directions, matrix_inv, bvh,
-                                                [speed, speed], [speed_random, speed_random, speed_random],
-                                                [size_min, size_max], [mass_min, mass_max],
-                                                [max_age_min, max_age_max],
-                                                brush_color[:], emit_settings.color_random.hsv)
-        self.update_hashed_grid()
+        self.hashed_grid.voxel_size = self.hashed_grid_voxel_size()
+        if self.needs_hashed_grid:
+            self.hashed_grid.build(numpyutils.unstructured_view(self._particles.location))
+        elif self.hashed_grid.num_particles > 0:
+            self.hashed_grid.clear()
+
+    def _update_location_dependent_variables(self, paint_mesh: trianglemesh.TriangleMesh,
+                                             surface_walking: bool = False):
+        if paint_mesh.mesh.uv_layers.active is not None:
+            # Picks up changes of the active uv layer
+            paint_mesh.get_active_uvs()
+        if surface_walking:
+            # Particles move from their last surface point across the triangles, only lost ones are projected
+            num_projected = accel.walk_particles(self._particles, paint_mesh.bvh, paint_mesh.adjacency)
+            profiling.record_value("sim.walk_fallbacks", num_projected)
+            return
+        p = self._particles
+        n = p.num_particles
+        result = self.scratch.get("surface_infos", n, accel.surface_info_dtype)
+        paint_mesh.bvh.closest_points(p.location, out=result)
+        p.location = result['location']
+        p.normal = result['normal']
+        p.tri_index = result['tri_index']
+        p.barycentrics = result['barycentrics']
+        paint_mesh.bvh.texture_coordinates(result, out=(numpyutils.unstructured_view(p.uv), p.uv_scale))
+        # Project the speed onto the tangent plane. The normals are normalized, so no division by their length.
+        uspeed = numpyutils.unstructured_view(p.speed)
+        unormal = numpyutils.unstructured_view(p.normal)
+        factor = self.scratch.get("speed_factor", n, float32_dtype)
+        np.einsum('ij,ij->i', uspeed, unormal, out=factor)
+        ortho_speed = self.scratch.get("ortho_speed", (n, 3), float32_dtype)
+        np.multiply(factor[:, np.newaxis], unormal, out=ortho_speed)
+        uspeed -= ortho_speed
+
+    def append_particles(self, particles: accel.ParticleData):
+        self._particles.append(particles)
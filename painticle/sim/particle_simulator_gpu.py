@@ -0,0 +1,602 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# The particle simulator, that's using compute shaders
+
+# <pep8 compliant>
+
+from . import particle_simulator
+from . import particlebudget
+from . import dragstep, frictionstep, gravitystep, repelstep, windstep
+from .emitterstep import EmitterStep
+from .. import accel
+from .. import gpu_utils
+from .. import gpuhashedgrid
+from .. import meshdata
+from .. import numpyutils
+from .. import profiling
+from .. import trianglemesh
+from ..numpyutils import float32_dtype, vec2_dtype, vec3_dtype, col_dtype
+from ..utils import Error
+
+import bpy
+import numpy as np
+import struct
+
+import moderngl
+
+# The sizes of Particle in particle_def.glsl and ParticleDynamics in simparticle_def.glsl
+PARTICLE_SIZE = 48
+DYNAMICS_SIZE = 64
+# The binding points of the buffers used by all simulation shaders
+GRID_BINDING = 0
+PARTICLES_BINDING = 1
+DYNAMICS_BINDING = 2
+FORCES_BINDING = 3
+# The UDIM tiles tracked by simtiles_comp.glsl
+MAX_TILE_ROWS = 100
+
+
+def pack_particles(particles: accel.ParticleData) -> np.ndarray:
+    """ The fields of the particles needed for painting as (n x 12) float array in the layout of particle_def.glsl """
+    return np.column_stack((numpyutils.unstructured(particles.location),
+                            numpyutils.unstructured(particles.size),
+                            numpyutils.unstructured(particles.uv),
+                            numpyutils.unstructured(particles.age),
+                            numpyutils.unstructured(particles.max_age),
+                            numpyutils.unstructured(particles.color),
+                            numpyutils.unstructured(particles.uv_scale)))
+
+
+def pack_dynamics(particles: accel.ParticleData) -> np.ndarray:
+    """ The remaining fields of the particles as (n x 16) float array in the layout of simparticle_def.glsl. The
+        triangle indices are stored bitwise. """
+    result = np.zeros((particles.num_particles, 16), dtype=float32_dtype)
+    result[:, 0:3] = numpyutils.unstructured(particles.speed)
+    result[:, 3] = particles.mass
+    result[:, 4:7] = numpyutils.unstructured(particles.acceleration)
+    result.view(np.uint32)[:, 7] = particles.tri_index
+    result[:, 8:11] = numpyutils.unstructured(particles.normal)
+    result[:, 12:15] = numpyutils.unstructured(particles.barycentrics)
+    return result
+
+
+def unpack_particles(coords: np.ndarray, dynamics: np.ndarray) -> accel.ParticleData:
+    """ Create particle data from the arrays returned by pack_particles and pack_dynamics """
+    result = accel.ParticleData()
+    result.resize(len(coords))
+    result.location = numpyutils.to_structured(coords[:, 0:3], vec3_dtype)
+    result.size = np.ascontiguousarray(coords[:, 3])
+    result.uv = numpyutils.to_structured(coords[:, 4:6], vec2_dtype)
+    result.age = np.ascontiguousarray(coords[:, 6])
+    result.max_age = np.ascontiguousarray(coords[:, 7])
+    result.color = numpyutils.to_structured(coords[:, 8:11], col_dtype)
+    result.uv_scale = np.ascontiguousarray(coords[:, 11])
+    result.speed = numpyutils.to_structured(dynamics[:, 0:3], vec3_dtype)
+    result.mass = np.ascontiguousarray(dynamics[:, 3])
+    result.acceleration = numpyutils.to_structured(dynamics[:, 4:7], vec3_dtype)
+    result.tri_index = np.ascontiguousarray(dynamics.view(np.uint32)[:, 7])
+    result.normal = numpyutils.to_structured(dynamics[:, 8:11], vec3_dtype)
+    result.barycentrics = numpyutils.to_structured(dynamics[:, 12:15], vec3_dtype)
+    return result
+
+
+class ComputeShaders:
+    """ The compute shaders of the simulation by name, compiled on first use """
+
+    def __init__(self, glcontext: moderngl.Context, local_size: int):
+        self.glcontext = glcontext
+        self.local_size = local_size
+        self.shaders = {}
+
+    def get(self, name: str) -> moderngl.ComputeShader:
+        shader = self.shaders.get(name)
+        if shader is None:
+            libs = ["particle", "gridhash", "simparticle"]
+            if name in ("simwalk", "simsurface"):
+                libs.append("simmesh")
+            shader = gpu_utils.load_compute_shader(name, self.glcontext, libs, {"LOCAL_SIZE": self.local_size})
+            self.shaders[name] = shader
+        return shader
+
+    def run(self, name: str, num_invocations: int, **uniforms):
+        """ Run the shader with one invocation per element and set its uniforms, numParticles defaults to the number
+            of invocations """
+        shader = self.get(name)
+        uniforms.setdefault("numParticles", num_invocations)
+        for uniform, value in uniforms.items():
+            if shader.get(uniform, None) is not None:
+                shader[uniform] = value
+        shader.run(max(1, (num_invocations + self.local_size - 1) // self.local_size))
+        # moderngl doesn't expose glMemoryBarrier, so we need to use the less efficient glFinish to synchronize :-(
+        self.glcontext.finish()
+
+    def release(self):
+        for shader in self.shaders.values():
+            shader.release()
+        self.shaders = {}
+
+
+class ScratchGPUBuffers:
+    """ Named temporary GPU buffers, which only grow like numpyutils.ScratchBuffers """
+
+    def __init__(self, glcontext: moderngl.Context):
+        self.glcontext = glcontext
+        self.buffers = {}
+
+    def get(self, name: str, size: int) -> moderngl.Buffer:
+        """ Get a buffer with at least size bytes of undefined content """
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.size < size:
+            capacity = max(size, 2 * buffer.size if buffer is not None else 0, 16)
+            if buffer is not None:
+                buffer.release()
+            buffer = self.glcontext.buffer(reserve=capacity)
+            self.buffers[name] = buffer
+        return buffer
+
+    def upload(self, name: str, data: np.ndarray) -> moderngl.Buffer:
+        buffer = self.get(name, data.nbytes)
+        if data.nbytes > 0:
+            buffer.write(data.tobytes())
+        return buffer
+
+    def release(self):
+        for buffer in self.buffers.values():
+            buffer.release()
+        self.buffers = {}
+
+
+class GPUParticles:
+    """ The particles of the GPU simulator. The fields needed for painting are stored in buffer in the layout of
+        particle_def.glsl, so painters can draw them without reading them back. The other fields are stored in the
+        dynamics buffer, the forces accumulated during a time step in the forces buffer. """
+
+    def __init__(self, glcontext: moderngl.Context, shaders: ComputeShaders, capacity: int = 1024):
+        self.glcontext = glcontext
+        self.shaders = shaders
+        self.num_particles = 0
+        self.capacity = 0
+        self.buffer = None
+        self.dynamics = None
+        self.forces = None
+        # The targets of removing the dead particles, which are swapped with buffer and dynamics afterwards
+        self.compacted_buffer = None
+        self.compacted_dynamics = None
+        self.touched_tiles_buffer = None
+        self.reserve(capacity)
+
+    def reserve(self, num_particles: int):
+        """ Make room for the given number of particles keeping the current ones """
+        if num_particles <= self.capacity:
+            return
+        capacity = max(num_particles, 2 * self.capacity)
+        buffers = []
+        for old, element_size in ((self.buffer, PARTICLE_SIZE), (self.dynamics, DYNAMICS_SIZE), (self.forces, 16)):
+            new = self.glcontext.buffer(reserve=capacity * element_size)
+            if old is not None:
+                if self.num_particles > 0:
+                    self.glcontext.copy_buffer(new, old, self.num_particles * element_size)
+                old.release()
+            buffers.append(new)
+        self.buffer, self.dynamics, self.forces = buffers
+        # The shaders add to the forces, integration resets them
+        self.forces.clear()
+        self.release_compacted()
+        self.compacted_buffer = self.glcontext.buffer(reserve=capacity * PARTICLE_SIZE)
+        self.compacted_dynamics = self.glcontext.buffer(reserve=capacity * DYNAMICS_SIZE)
+        self.capacity = capacity
+
+    def bind(self):
+        self.buffer.bind_to_storage_buffer(PARTICLES_BINDING)
+        self.dynamics.bind_to_storage_buffer(DYNAMICS_BINDING)
+        self.forces.bind_to_storage_buffer(FORCES_BINDING)
+
+    def append(self, particles: accel.ParticleData):
+        num_new = particles.num_particles
+        if num_new == 0:
+            return
+        self.reserve(self.num_particles + num_new)
+        self.buffer.write(pack_particles(particles).astype(float32_dtype).tobytes(),
+                          offset=self.num_particles * PARTICLE_SIZE)
+        self.dynamics.write(pack_dynamics(particles).tobytes(), offset=self.num_particles * DYNAMICS_SIZE)
+        self.num_particles += num_new
+
+    def swap_compacted(self, num_particles: int):
+        """ Take the particles written into the compacted buffers """
+        self.buffer, self.compacted_buffer = self.compacted_buffer, self.buffer
+        self.dynamics, self.compacted_dynamics = self.compacted_dynamics, self.dynamics
+        self.num_particles = num_particles
+
+    def read_coords(self) -> np.ndarray:
+        """ Read the fields needed for painting back as (n x 12) array like pack_particles returns them """
+        if self.num_particles == 0:
+            return np.empty((0, 12), dtype=float32_dtype)
+        data = self.buffer.read(size=self.num_particles * PARTICLE_SIZE)
+        return np.frombuffer(data, dtype=float32_dtype).reshape((self.num_particles, 12))
+
+    def read_dynamics(self) -> np.ndarray:
+        if self.num_particles == 0:
+            return np.empty((0, 16), dtype=float32_dtype)
+        data = self.dynamics.read(size=self.num_particles * DYNAMICS_SIZE)
+        return np.frombuffer(data, dtype=float32_dtype).reshape((self.num_particles, 16))
+
+    def download(self) -> accel.ParticleData:
+        """ Read the particles back, e.g. for testing or to hand them over to the CPU """
+        return unpack_particles(self.read_coords(), self.read_dynamics())
+
+    def touched_tiles(self, size_factor: float) -> set:
+        """ The numbers of the UDIM tiles the particles paint into like painttiles.touched_tiles, but computed on the
+            GPU, so only a bit per tile is read back """
+        if self.num_particles == 0:
+            return set()
+        num_masks = (10 * MAX_TILE_ROWS + 31) // 32
+        if self.touched_tiles_buffer is None:
+            self.touched_tiles_buffer = self.glcontext.buffer(reserve=4 * num_masks)
+        self.touched_tiles_buffer.clear()
+        self.buffer.bind_to_storage_buffer(PARTICLES_BINDING)
+        self.touched_tiles_buffer.bind_to_storage_buffer(4)
+        self.shaders.run("simtiles", self.num_particles, sizeFactor=size_factor)
+        masks = np.frombuffer(self.touched_tiles_buffer.read(), dtype=np.uint32)
+        indices = np.flatnonzero(np.unpackbits(masks.view(np.uint8), bitorder="little"))
+        return set((gpu_utils.FIRST_TILE + indices).tolist())
+
+    def release_compacted(self):
+        for buffer in (self.compacted_buffer, self.compacted_dynamics):
+            if buffer is not None:
+                buffer.release()
+        self.compacted_buffer = None
+        self.compacted_dynamics = None
+
+    def release(self):
+        self.release_compacted()
+        for buffer in (self.buffer, self.dynamics, self.forces, self.touched_tiles_buffer):
+            if buffer is not None:
+                buffer.release()
+        self.buffer = None
+        self.dynamics = None
+        self.forces = None
+        self.touched_tiles_buffer = None
+        self.num_particles = 0
+        self.capacity = 0
+
+
+class GPUMesh:
+    """ The buffers of the mesh the particles are simulated on in the layout of simmesh_def.glsl """
+
+    def __init__(self, glcontext: moderngl.Context, paint_mesh: trianglemesh.TriangleMesh):
+        self.glcontext = glcontext
+        self.paint_mesh = paint_mesh
+        triangles = np.ascontiguousarray(paint_mesh.triangle_vertices, dtype=np.uint32)
+        self.num_triangles = len(triangles)
+        self.triangles = glcontext.buffer(triangles)
+        self.points = None
+        self.normals = None
+        self.uvs = None
+        self.neighbours = None
+        self.uv_layer_index = None
+        self.update_geometry()
+        self.update_uvs()
+
+    @property
+    def has_normals(self) -> bool:
+        return self.normals is not None
+
+    @property
+    def has_uvs(self) -> bool:
+        return self.uvs is not None
+
+    def _write(self, buffer: moderngl.Buffer, data: np.ndarray) -> moderngl.Buffer:
+        """ Write the data into the buffer, if it has the same size, or into a new one """
+        data = np.ascontiguousarray(data)
+        if buffer is not None and buffer.size == max(1, data.nbytes):
+            buffer.write(data.tobytes())
+            return buffer
+        if buffer is not None:
+            buffer.release()
+        return self.glcontext.buffer(data.tobytes() if data.nbytes > 0 else b"\0")
+
+    @staticmethod
+    def _vec4(a: np.ndarray) -> np.ndarray:
+        result = np.zeros((len(a), 4), dtype=float32_dtype)
+        result[:, 0:3] = a
+        return result
+
+    def update_geometry(self):
+        """ Upload the points and normals of the mesh data """
+        mesh_data = self.paint_mesh.mesh_data
+        self.points = self._write(self.points, self._vec4(np.reshape(mesh_data.points, (-1, 3))))
+        normals = mesh_data.split_normals
+        if normals is not None and len(normals) > 0:
+            self.normals = self._write(self.normals, self._vec4(np.reshape(normals, (-1, 3))))
+
+    def update_uvs(self):
+        """ Upload the uvs of the active uv layer per triangle corner like the BVH stores them """
+        self.uv_layer_index = self.paint_mesh.cached_uv_layer_index
+        uvs = self.paint_mesh.cached_uv_layer
+        if uvs is None:
+            return
+        corner_uvs = np.take(np.reshape(uvs, (-1, 2)), self.paint_mesh.triangles, axis=0).astype(float32_dtype)
+        self.uvs = self._write(self.uvs, corner_uvs)
+
+    def bind(self, dummy: moderngl.Buffer):
+        """ Bind the mesh's buffers, the dummy buffer replaces the missing ones """
+        if self.neighbours is None:
+            neighbours = np.ascontiguousarray(self.paint_mesh.adjacency.neighbours, dtype=np.uint32)
+            self.neighbours = self.glcontext.buffer(neighbours)
+        self.points.bind_to_storage_buffer(3)
+        self.triangles.bind_to_storage_buffer(4)
+        (self.normals if self.has_normals else dummy).bind_to_storage_buffer(5)
+        (self.uvs if self.has_uvs else dummy).bind_to_storage_buffer(6)
+        self.neighbours.bind_to_storage_buffer(7)
+
+    def release(self):
+        for buffer in (self.triangles, self.points, self.normals, self.uvs, self.neighbours):
+            if buffer is not None:
+                buffer.release()
+        self.triangles = None
+        self.points = None
+        self.normals = None
+        self.uvs = None
+        self.neighbours = None
+
+
+class ParticleSimulatorGPU(particle_simulator.ParticleSimulator):
+    """ This particle simulator is using compute shaders to simulate the particles. The particles stay in GPU buffers,
+        which the GPU painter draws directly. Only the emitters run on the CPU and the closest point queries of the
+        projection onto the surface, since there's no BVH on the GPU. """
+
+    def __init__(self, context: bpy.types.Context, glcontext: moderngl.Context = None, local_size: int = 64):
+        """ If glcontext is None, the simulator uses blender's GL context. It needs to be the painter's context.
+            local_size is the work group size of the compute shaders, it needs to be a power of two. """
+        super().__init__(context)
+        self.glcontext = glcontext if glcontext is not None else gpu_utils.blender_glcontext()
+        self.shaders = ComputeShaders(self.glcontext, local_size)
+        self.scratch_buffers = ScratchGPUBuffers(self.glcontext)
+        self._particles = GPUParticles(self.glcontext, self.shaders)
+        self.hashed_grid = gpuhashedgrid.GPUHashedGrid(self.glcontext, 0.001, local_size)
+        self.scratch = numpyutils.ScratchBuffers()
+        self._new_particles = accel.ParticleData()
+        # The emitters only write the new particles, they get empty arrays for the simulated particles
+        self._no_particles = accel.ParticleData()
+        self._no_forces = np.zeros((0, 3), dtype=float32_dtype)
+        self.mesh = None
+        self._step_shaders = {
+            gravitystep.GravityStep: self._gravity,
+            dragstep.DragStep: self._drag,
+            frictionstep.FrictionStep: self._friction,
+            windstep.WindStep: self._wind,
+            repelstep.RepelStep: self._repel,
+        }
+
+    def shutdown(self):
+        self._particles.release()
+        self.hashed_grid.release()
+        if self.mesh is not None:
+            self.mesh.release()
+        self.mesh = None
+        self.scratch_buffers.release()
+        self.shaders.release()
+
+    @property
+    def num_particles(self):
+        return self._particles.num_particles
+
+    def clear_particles(self):
+        self._particles.num_particles = 0
+        self.hashed_grid.clear()
+        self.scratch.clear()
+
+    def append_particles(self, particles: accel.ParticleData):
+        self._particles.append(particles)
+
+    def update_mesh(self, mesh_data: meshdata.MeshData):
+        if self.mesh is not None:
+            self.mesh.update_geometry()
+
+    def setup_steps(self):
+        super().setup_steps()
+        for step in self._physics_steps:
+            if not isinstance(step, EmitterStep) and type(step) not in self._step_shaders:
+                raise Error(f"The GPU simulator doesn't support {type(step).__name__}")
+
+    def simulate(self, sim_data: particle_simulator.SimulationData):
+        # Data initialization
+        # -------------------
+        p = self._particles
+        assert p.num_particles == self.hashed_grid.num_particles
+        new_particles = self._new_particles
+        new_particles.resize(0)
+        sim_data.hashed_grid = self.hashed_grid
+        sim_data.scratch = self.scratch
+        sim_data.brush_color = self.settings.brush_color
+        # Apply simulation steps
+        # ----------------------
+        for step in self._physics_steps:
+            with profiling.stage("sim."+type(step).__name__):
+                if isinstance(step, EmitterStep):
+                    step.simulate(sim_data, self._no_particles, self._no_forces, new_particles)
+                elif p.num_particles > 0:
+                    p.bind()
+                    self._step_shaders[type(step)](step, sim_data)
+        # Perform simulation integration
+        # ------------------------------
+        if p.num_particles > 0:
+            with profiling.stage("sim.integrate"):
+                self._integrate(sim_data)
+                self._del_dead()
+        p.append(new_particles)
+        with profiling.stage("sim.project_to_surface"):
+            self._update_location_dependent_variables(sim_data.paint_mesh)
+        with profiling.stage("sim.budget"):
+            self._enforce_budget(sim_data.settings.physics)
+        self.update_hashed_grid()
+        profiling.record_value("particles", self.num_particles)
+
+    def _gravity(self, step: gravitystep.GravityStep, sim_data: particle_simulator.SimulationData):
+        self.shaders.run("simgravity", self.num_particles, gravity=tuple(step.frozen.gravity))
+
+    def _drag(self, step: dragstep.DragStep, sim_data: particle_simulator.SimulationData):
+        avg_particle_size = sim_data.emit_settings.particle_size
+        drag_factor = step.frozen.drag_coefficient / (avg_particle_size * avg_particle_size)
+        self.shaders.run("simdrag", self.num_particles, dragFactor=drag_factor)
+
+    def _friction(self, step: frictionstep.FrictionStep, sim_data: particle_simulator.SimulationData):
+        self.shaders.run("simfriction", self.num_particles, frictionCoefficient=step.frozen.friction_coefficient)
+
+    def _wind(self, step: windstep.WindStep, sim_data: particle_simulator.SimulationData):
+        if sim_data.source_input is not None:
+            input = sim_data.source_input
+            wind_force = 10*(input.frame.direction - input.start_frame.direction)
+            self.shaders.run("simwind", self.num_particles, force=tuple(wind_force))
+
+    def _repel(self, step: repelstep.RepelStep, sim_data: particle_simulator.SimulationData):
+        n = self.num_particles
+        self.hashed_grid.buffer.bind_to_storage_buffer(GRID_BINDING)
+        self.scratch_buffers.get("mixed_colors", n * 16).bind_to_storage_buffer(4)
+        self.shaders.run("simrepel", n, repulsionFactor=step.frozen.repulsion_factor, timeStep=sim_data.timestep)
+        self.shaders.run("simrepelcolors", n)
+
+    def _num_substeps(self, sim_data: particle_simulator.SimulationData) -> int:
+        physics = sim_data.settings.physics
+        if not physics.adaptive_sub_steps:
+            return physics.sim_sub_steps
+        max_movement = self.scratch_buffers.get("max_movement", 4)
+        max_movement.write(struct.pack("I", 0))
+        max_movement.bind_to_storage_buffer(4)
+        self.shaders.run("simsubsteps", self.num_particles, timeStep=sim_data.timestep,
+                         courant=physics.sub_step_courant)
+        movement = struct.unpack("f", max_movement.read(size=4))[0]
+        num_steps = int(np.ceil(movement))
+        return max(physics.min_sub_steps, min(num_steps, physics.max_sub_steps))
+
+    def _integrate(self, sim_data: particle_simulator.SimulationData):
+        self._particles.bind()
+        num_substeps = self._num_substeps(sim_data)
+        profiling.record_value("sim.sub_steps", num_substeps)
+        self.shaders.run("simintegrate", self.num_particles, timeStep=sim_data.timestep,
+                         halfSubStep=0.5 * sim_data.timestep / num_substeps, numSubSteps=num_substeps)
+
+    def _del_dead(self):
+        """ Remove the dead particles keeping the order of the living ones """
+        p = self._particles
+        n = p.num_particles
+        local_size = self.shaders.local_size
+        num_blocks = (n + local_size - 1) // local_size
+        block_sums = self.scratch_buffers.get("block_sums", 4 * (num_blocks + 1))
+        self.scratch_buffers.get("offsets", 4 * n).bind_to_storage_buffer(4)
+        block_sums.bind_to_storage_buffer(5)
+        p.buffer.bind_to_storage_buffer(PARTICLES_BINDING)
+        self.shaders.run("simscan", n)
+        self.shaders.run("simscanblocks", 1, numBlocks=num_blocks)
+        num_alive = struct.unpack("I", block_sums.read(size=4, offset=4 * num_blocks))[0]
+        if num_alive == n:
+            return
+        p.bind()
+        p.compacted_buffer.bind_to_storage_buffer(6)
+        p.compacted_dynamics.bind_to_storage_buffer(7)
+        self.shaders.run("simcompact", n)
+        p.swap_compacted(num_alive)
+
+    def _enforce_budget(self, physics):
+        budget = physics.particle_budget
+        if not 0 < budget < self.num_particles:
+            return
+        p = self._particles
+        if physics.budget_mode == "merge":
+            # Merging needs all fields of the particles, so they're merged on the CPU and uploaded again
+            particles = p.download()
+            num_removed = particlebudget.enforce_budget(particles, budget, physics.budget_mode,
+                                                        accel.HashedGrid(self.hashed_grid_voxel_size()))
+            p.num_particles = 0
+            p.append(particles)
+        else:
+            # Only the ages are needed to select the evicted particles, which are killed and removed on the GPU
+            coords = p.read_coords()
+            evicted = particlebudget.eviction_candidates(coords[:, 6], coords[:, 7], self.num_particles - budget,
+                                                         physics.budget_mode)
+            num_removed = len(evicted)
+            ids = np.ascontiguousarray(evicted, dtype=np.uint32)
+            self.scratch_buffers.upload("killed_particle_ids", ids).bind_to_storage_buffer(4)
+            p.buffer.bind_to_storage_buffer(PARTICLES_BINDING)
+            self.shaders.run("simkill", num_removed, numKilled=num_removed)
+            self._del_dead()
+        profiling.record_value("sim.budget_removed", num_removed)
+
+    def update_hashed_grid(self):
+        self.hashed_grid.voxel_size = self.hashed_grid_voxel_size()
+        self.hashed_grid.build(self._particles.buffer, self._particles.num_particles)
+
+    def _gpu_mesh(self, paint_mesh: trianglemesh.TriangleMesh) -> GPUMesh:
+        """ The buffers of the paint mesh, uploaded again if the mesh or its active uv layer changed """
+        if self.mesh is None or self.mesh.paint_mesh is not paint_mesh:
+            if self.mesh is not None:
+                self.mesh.release()
+            self.mesh = GPUMesh(self.glcontext, paint_mesh)
+        elif self.mesh.uv_layer_index != paint_mesh.cached_uv_layer_index:
+            self.mesh.update_uvs()
+        return self.mesh
+
+    def _bind_mesh(self, mesh: GPUMesh):
+        mesh.bind(self.scratch_buffers.get("dummy", 16))
+
+    def _walk(self, mesh: GPUMesh):
+        """ Walk the particles across the surface. Returns the IDs and locations of the particles, which need a closest
+            point query. """
+        n = self.num_particles
+        failed = self.scratch_buffers.get("failed", 16 * (n + 1))
+        failed.write(bytes(16))
+        failed.bind_to_storage_buffer(0)
+        self._particles.bind()
+        self._bind_mesh(mesh)
+        self.shaders.run("simwalk", n, maxCrossings=32, numTriangles=mesh.num_triangles)
+        num_failed = struct.unpack("I", failed.read(size=4))[0]
+        if num_failed == 0:
+            return np.empty(0, dtype=np.uint32), np.empty((0, 3), dtype=float32_dtype)
+        data = np.frombuffer(failed.read(size=16 * num_failed, offset=16), dtype=float32_dtype).reshape((-1, 4))
+        return data.view(np.uint32)[:, 3], data[:, 0:3]
+
+    def _set_surface_points(self, particle_ids: np.ndarray, surface_infos: np.ndarray):
+        """ Upload the triangles and barycentric coordinates of the closest point queries """
+        num_points = len(particle_ids)
+        surface_points = np.empty((num_points, 4), dtype=float32_dtype)
+        surface_points[:, 0:3] = numpyutils.unstructured(surface_infos['barycentrics'])
+        surface_points.view(np.uint32)[:, 3] = surface_infos['tri_index']
+        self.scratch_buffers.upload("surface_points", surface_points).bind_to_storage_buffer(0)
+        ids = np.ascontiguousarray(particle_ids, dtype=np.uint32)
+        self.scratch_buffers.upload("surface_particle_ids", ids).bind_to_storage_buffer(4)
+        self._particles.dynamics.bind_to_storage_buffer(DYNAMICS_BINDING)
+        self.shaders.run("simsetsurface", num_points, numSurfacePoints=num_points)
+
+    def _update_location_dependent_variables(self, paint_mesh: trianglemesh.TriangleMesh):
+        """ The particles always walk across the surface on the GPU, independent of the surface walking setting.
+            Projecting all of them would read back their locations on every time step. """
+        if paint_mesh.mesh.uv_layers.active is not None:
+            # Picks up changes of the active uv layer
+            paint_mesh.get_active_uvs()
+        mesh = self._gpu_mesh(paint_mesh)
+        if self.num_particles == 0:
+            return
+        # Particles move from their last surface point across the triangles, only lost ones are projected on the CPU
+        particle_ids, locations = self._walk(mesh)
+        profiling.record_value("sim.walk_fallbacks", len(particle_ids))
+        if len(particle_ids) > 0:
+            result = self.scratch.get("surface_infos", len(locations), accel.surface_info_dtype)
+            paint_mesh.bvh.closest_points(numpyutils.to_structured(locations, vec3_dtype), out=result)
+            self._set_surface_points(particle_ids, result)
+        self._particles.bind()
+        self._bind_mesh(mesh)
+        self.shaders.run("simsurface", self.num_particles, numTriangles=mesh.num_triangles,
+                         hasNormals=mesh.has_normals, hasUVs=mesh.has_uvs)
@@ -0,0 +1,135 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# Limiting the number of simulated particles, so the time of a simulation step doesn't grow with the stroke length
+
+# <pep8 compliant>
+
+from .. import accel
+from .. import numpyutils
+from ..utils import Error
+
+import numpy as np
+
+BUDGET_MODES = ("oldest", "faintest", "merge")
+
+# The largest distance in RGB space of the colors of particles, that are merged
+MERGE_COLOR_TOLERANCE = 0.1
+
+
+def eviction_candidates(age: np.ndarray, max_age: np.ndarray, num_evicted: int, mode: str) -> np.ndarray:
+    """ The indices of the num_evicted particles to remove first. "oldest" removes the particles with the highest age,
+        "faintest" the ones with the highest age relative to their lifetime, since they paint with the lowest alpha.
+        Just emitted particles are removed last. """
+    if mode == "oldest":
+        priority = age
+    elif mode in ("faintest", "merge"):
+        priority = age / max_age
+    else:
+        raise Error(f"Unknown budget mode {mode}")
+    num_evicted = min(num_evicted, len(priority))
+    if num_evicted <= 0:
+        return np.empty(0, dtype=np.intp)
+    return np.argpartition(-priority, num_evicted-1)[:num_evicted]
+
+
+def merge_pairs(sorted_particle_ids: np.ndarray, locations: np.ndarray, colors: np.ndarray, num_merged: int,
+                max_distance: float):
+    """ Pair particles sharing a cell of the hashed grid, which are closer than max_distance and whose colors differ
+        by less than MERGE_COLOR_TOLERANCE. The distance is checked, since distant cells may share a hash.
+        sorted_particle_ids are the entries of the grid, locations and colors unstructured (n x 3) arrays. Returns
+        the indices of at most num_merged pairs as two arrays, preferring the pairs with the most similar colors. """
+    cells = sorted_particle_ids['cellID']
+    ids = sorted_particle_ids['particleID'].astype(np.intp)
+    # The entries of a cell are consecutive, so pairing neighbouring entries pairs the particles of each cell. Each
+    # particle belongs to at most one pair.
+    first_in_cell = np.ones(len(cells), dtype=bool)
+    first_in_cell[1:] = cells[1:] != cells[:-1]
+    cell_starts = np.flatnonzero(first_in_cell)
+    rank_in_cell = np.arange(len(cells)) - np.repeat(cell_starts, np.diff(np.append(cell_starts, len(cells))))
+    firsts = np.flatnonzero((rank_in_cell % 2 == 0) & np.append(cells[1:] == cells[:-1], False))
+    first_ids = ids[firsts]
+    second_ids = ids[firsts+1]
+    color_distances = np.linalg.norm(colors[first_ids] - colors[second_ids], axis=1)
+    distances = np.linalg.norm(locations[first_ids] - locations[second_ids], axis=1)
+    similar = (color_distances < MERGE_COLOR_TOLERANCE) & (distances < max_distance)
+    first_ids = first_ids[similar]
+    second_ids = second_ids[similar]
+    if len(first_ids) > num_merged:
+        most_similar = np.argsort(color_distances[similar], kind="stable")[:max(0, num_merged)]
+        first_ids = first_ids[most_similar]
+        second_ids = second_ids[most_similar]
+    return first_ids, second_ids
+
+
+def merge_particles(particles: accel.ParticleData, first_ids: np.ndarray, second_ids: np.ndarray) -> np.ndarray:
+    """ Merge each pair of particles into its heavier particle, which keeps its surface point. The mass and the
+        momentum are conserved, as is the area the particles cover, which grows with the squared size. Colors, ages
+        and lifetimes are averaged weighted by mass. Returns the indices of the lighter particles, which need to be
+        removed. """
+    mass = particles.mass
+    swap = mass[second_ids] > mass[first_ids]
+    keep = np.where(swap, second_ids, first_ids)
+    remove = np.where(swap, first_ids, second_ids)
+    keep_mass = mass[keep]
+    remove_mass = mass[remove]
+    total_mass = keep_mass + remove_mass
+    keep_weight = (keep_mass / total_mass)[:, np.newaxis]
+    remove_weight = (remove_mass / total_mass)[:, np.newaxis]
+    for field in ("speed", "acceleration", "color"):
+        values = numpyutils.unstructured_view(getattr(particles, field))
+        values[keep] = keep_weight*values[keep] + remove_weight*values[remove]
+    for field in ("age", "max_age"):
+        values = getattr(particles, field)
+        values[keep] = keep_weight[:, 0]*values[keep] + remove_weight[:, 0]*values[remove]
+    size = particles.size
+    size[keep] = np.sqrt(size[keep]*size[keep] + size[remove]*size[remove])
+    mass[keep] = total_mass
+    return remove
+
+
+def remove_particles(particles: accel.ParticleData, indices: np.ndarray):
+    """ Remove the given particles by letting them die """
+    particles.age[indices] = particles.max_age[indices]
+    if particles.storage_mode == accel.StorageMode.LIFETIME_ORDERED:
+        # Only the dead particles at the front are removed
+        particles.sort_by_lifetime()
+    particles.del_dead()
+
+
+def enforce_budget(particles: accel.ParticleData, budget: int, mode: str, hashed_grid: accel.HashedGrid) -> int:
+    """ Reduce the particles to the budget, if there are more. In "merge" mode nearby particles of similar color sharing
+        a cell of the hashed grid are merged first, which is rebuilt from the particles' locations for this. If that
+        isn't enough, the faintest particles are removed. Returns the number of removed particles. """
+    num_excess = particles.num_particles - budget
+    if budget <= 0 or num_excess <= 0:
+        return 0
+    if mode not in BUDGET_MODES:
+        raise Error(f"Unknown budget mode {mode}")
+    num_removed = 0
+    if mode == "merge":
+        hashed_grid.build(numpyutils.unstructured_view(particles.location))
+        first_ids, second_ids = merge_pairs(hashed_grid.sorted_particle_ids,
+                                            numpyutils.unstructured_view(particles.location),
+                                            numpyutils.unstructured_view(particles.color), num_excess,
+                                            hashed_grid.voxel_size)
+        if len(first_ids) > 0:
+            remove_particles(particles, merge_particles(particles, first_ids, second_ids))
+            num_removed = len(first_ids)
+            num_excess -= num_removed
+    if num_excess > 0:
+        remove_particles(particles, eviction_candidates(particles.age, particles.max_age, num_excess, mode))
+        num_removed += num_excess
+    return num_removed
@@ -34,7 +34,9 @@ class RepelStep(simulationstep.SimulationStep):
 
     def simulate(self, sim_data: simulationstep.SimulationData, particles: simulationstep.ParticleData,
                  forces: simulationstep.Forces, new_particles: simulationstep.ParticleData) -> simulationstep.Forces:
-        repel_forces = accel.repel_forces(sim_data.hashed_grid, particles, self.repulsion_factor, sim_data.timestep)
-        urepel_forces = numpyutils.unstructured(repel_forces)
+        repel_forces = sim_data.scratch.get("repel_forces", forces.shape, forces.dtype)
+        accel.repel_forces(sim_data.hashed_grid, particles, self.frozen.repulsion_factor, sim_data.timestep,
+                           out=repel_forces)
         uforces = numpyutils.unstructured(forces)
-        return uforces + urepel_forces
+        uforces += repel_forces
+        return uforces
@@ -0,0 +1,187 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+# Recording and replay of paint strokes with a fixed simulation time step
+
+import json
+import struct
+import time
+
+import bpy
+import mathutils
+import numpy as np
+
+from . import utils
+from .interaction import Interactions
+from .utils import Error
+
+# The file starts with the magic, the format version, the random seed and the size of the JSON encoded settings.
+# The settings and the array of frames follow.
+STROKE_MAGIC = b"PTSTROKE"
+STROKE_VERSION = 1
+_header = struct.Struct("<8sIQI")
+
+frame_dtype = np.dtype([("time", "<f8"),
+                        ("origin", "<f4", 3),
+                        ("direction", "<f4", 3),
+                        ("size", "<f4"),
+                        ("pressure", "<f4"),
+                        ("interactions", "<u4")])
+
+
+class Stroke:
+    """ A recorded paint stroke: the timestamped brush rays together with everything needed to reproduce the
+        simulation, i.e. the brush settings and the random seed """
+
+    def __init__(self, seed: int, settings: dict, frames: np.ndarray):
+        self.seed = seed
+        self.settings = settings
+        self.frames = frames
+
+    @property
+    def duration(self):
+        return float(self.frames["time"][-1]) if len(self.frames) > 0 else 0.0
+
+    def write(self, filename: str):
+        settings = json.dumps(self.settings).encode("utf-8")
+        with open(filename, "wb") as f:
+            f.write(_header.pack(STROKE_MAGIC, STROKE_VERSION, self.seed, len(settings)))
+            f.write(settings)
+            f.write(self.frames.astype(frame_dtype).tobytes())
+
+    @classmethod
+    def read(cls, filename: str):
+        with open(filename, "rb") as f:
+            data = f.read()
+        if len(data) < _header.size:
+            raise Error(f"{filename} is not a PAINTicle stroke")
+        magic, version, seed, settings_size = _header.unpack_from(data)
+        if magic != STROKE_MAGIC:
+            raise Error(f"{filename} is not a PAINTicle stroke")
+        if version != STROKE_VERSION:
+            raise Error(f"Unsupported stroke version {version} in {filename}")
+        settings_end = _header.size + settings_size
+        settings = json.loads(data[_header.size:settings_end].decode("utf-8"))
+        frames = np.frombuffer(data, dtype=frame_dtype, offset=settings_end).copy()
+        return cls(seed, settings, frames)
+
+
+def capture_settings(context: bpy.types.Context):
+    """ Capture all settings influencing the simulation and painting of a stroke """
+    painticle_settings = context.scene.painticle_settings
+    brush = context.tool_settings.image_paint.brush
+    return {"brush_tree": painticle_settings.brush.get_active_brush_definition(),
+            "physics": utils.property_group_to_dict(painticle_settings.physics),
+            "brush_color": list(brush.color),
+            "brush_strength": brush.strength}
+
+
+def apply_settings(context: bpy.types.Context, settings: dict, tree_name: str = "Recorded Stroke"):
+    """ Make the settings captured with a stroke the active ones. This creates a new brush tree. """
+    from .ops.createdefaultbrushtree import create_brush_tree
+    painticle_settings = context.scene.painticle_settings
+    painticle_settings.brush = create_brush_tree(tree_name, settings["brush_tree"])
+    utils.property_group_from_dict(painticle_settings.physics, settings["physics"])
+    brush = context.tool_settings.image_paint.brush
+    brush.color = settings["brush_color"]
+    brush.strength = settings["brush_strength"]
+
+
+class StrokeRecorder:
+    """ Records the inputs of Particles.set_input_data. Assign it to Particles.recorder before starting a stroke. """
+
+    def __init__(self, context: bpy.types.Context):
+        self.context = context
+        self.seed = 0
+        self.settings = None
+        self.frames = []
+        self.start_time = None
+
+    def start(self, seed: int):
+        self.seed = seed
+        self.settings = capture_settings(self.context)
+        self.frames = []
+        self.start_time = time.perf_counter()
+
+    def add_frame(self, origin, direction, size: float, interactions: Interactions, pressure: float):
+        if self.start_time is None:
+            return
+        self.frames.append((time.perf_counter() - self.start_time, tuple(origin), tuple(direction), size, pressure,
+                            interactions.value))
+
+    def stop(self) -> Stroke:
+        """ Finish recording and return the stroke """
+        stroke = Stroke(self.seed, self.settings, np.array(self.frames, dtype=frame_dtype))
+        self.start_time = None
+        return stroke
+
+
+class StrokeReplayer:
+    """ Drives the simulation and painting of a Particles object from a recorded stroke using a fixed time step.
+        Since there's no waiting for the wall clock, replaying usually is much faster than real time. """
+
+    def __init__(self, particles, stroke: Stroke, time_step: float = 0.01, max_tail_time: float = 10.0):
+        """ After the last frame, the simulation continues until all particles died, but at most max_tail_time
+            seconds. """
+        self.particles = particles
+        self.stroke = stroke
+        self.time_step = time_step
+        self.max_tail_time = max_tail_time
+
+    def _apply_frame(self, index: int, reset_input_data: bool):
+        frame = self.stroke.frames[index]
+        self.particles.set_input_data(mathutils.Vector(frame["origin"]), mathutils.Vector(frame["direction"]),
+                                      float(frame["size"]), Interactions(int(frame["interactions"])),
+                                      float(frame["pressure"]), reset_input_data)
+
+    def run(self, paint: bool = True, on_tick=None):
+        """ Replay the whole stroke. on_tick is called after each simulated time step with the simulation time.
+            Returns the number of simulated time steps. """
+        if len(self.stroke.frames) == 0:
+            return 0
+        particles = self.particles
+        settings = particles.context.scene.painticle_settings
+        painter = particles.painter if paint else None
+        if painter is not None:
+            painter.sync_image_on_draw = False
+        particles.clear_particles()
+        particles.setup_simulation(self.stroke.seed)
+        self._apply_frame(0, True)
+        next_frame = 1
+        frame_times = self.stroke.frames["time"]
+        end_time = self.stroke.duration + self.max_tail_time
+        sim_time = 0.0
+        num_ticks = 0
+        while True:
+            sim_time += self.time_step
+            while next_frame < len(frame_times) and frame_times[next_frame] <= sim_time:
+                self._apply_frame(next_frame, False)
+                next_frame += 1
+            particles.move_particles(self.time_step, settings)
+            if painter is not None:
+                particles.paint_particles(self.time_step)
+            num_ticks += 1
+            if on_tick is not None:
+                on_tick(sim_time)
+            stroke_done = next_frame >= len(frame_times) and sim_time >= self.stroke.duration
+            if stroke_done and (particles.numParticles() == 0 or sim_time >= end_time):
+                break
+        if painter is not None:
+            if painter.paintbuffer_changed:
+                painter.write_blender_image()
+            painter.sync_image_on_draw = True
+        return num_ticks
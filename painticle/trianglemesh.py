@@ -17,51 +17,87 @@
 
 # A mesh helper class, that allows easy acccess to triangles of polys
 
+import bpy
 import mathutils
 
 import numpy as np
 
 from .utils import Error
 from . import accel
+from . import meshdata
 
 
 class TriangleMesh:
     """ A class providing additional mesh operations as blende does. It supports e.g. efficient finding of the triangle
         if only a point and polygon id is being given. """
 
-    def __init__(self, context):
+    def __init__(self, context, build_quality: accel.BuildQuality = accel.BuildQuality.MEDIUM,
+                 mesh_data: meshdata.MeshData = None):
+        """ mesh_data is the data extracted from this mesh, e.g. shared with the GPU buffers or loaded from the disk
+            cache. If not given, it's extracted from the mesh. """
         self.object = context.object
+        self.build_quality = build_quality
         mesh = self.object.data
         if (not mesh.polygons):
             raise Error("ERROR: Mesh doesn't have polygons")
         self.mesh = mesh
-        self.mesh.calc_normals_split()
-        self.mesh.calc_loop_triangles()
-        self._build_numpy_tris()
+        self.mesh_data = mesh_data if mesh_data is not None else meshdata.MeshData.extract(mesh)
+        self.cached_uv_layer_index = mesh.uv_layers.active_index if self.mesh_data.uvs is not None else None
+        self._adjacency = None
         self._build_bvh()
-        self.cached_uv_layer = None
-        self.cached_uv_layer_index = None
+
+    @property
+    def triangles(self):
+        """ The loop indices of each triangle """
+        return self.mesh_data.triangle_loops
+
+    @property
+    def triangle_vertices(self):
+        return self.mesh_data.triangle_vertices
+
+    @property
+    def adjacency(self) -> accel.MeshAdjacency:
+        """ The connectivity of the triangles. It's built on first use and stays valid, when the BVH is refitted. """
+        if self._adjacency is None:
+            self._adjacency = accel.build_mesh_adjacency(self.triangle_vertices, len(self.mesh_data.points))
+        return self._adjacency
+
+    @property
+    def cached_uv_layer(self):
+        return self.mesh_data.uvs
 
     def get_active_uvs(self):
         active_uv_index = self.mesh.uv_layers.active_index
         if self.cached_uv_layer_index != active_uv_index:
-            uv_data = self.mesh.uv_layers.active.data
-            num_uvs = len(uv_data)
-            self.cached_uv_layer = np.empty((num_uvs, 2), 'f')
-            uv_data.foreach_get("uv", np.reshape(self.cached_uv_layer, 2*num_uvs))
+            self.mesh_data.update_uvs(self.mesh)
             self.cached_uv_layer_index = active_uv_index
-        return self.cached_uv_layer
+            self.update_uvs()
+        return self.mesh_data.uvs
+
+    def update_uvs(self):
+        """ Pass the uvs of the mesh data to the BVH, e.g. after they have been updated by its owner """
+        if self.mesh_data.uvs is not None:
+            self._set_bvh_uvs()
+
+    def _set_bvh_uvs(self):
+        # The BVH needs the uvs per triangle corner to compute the particles' uvs
+        self.bvh.set_uvs(np.take(self.mesh_data.uvs, self.triangles, axis=0))
+
+    def update_geometry(self, mesh: bpy.types.Mesh = None) -> bool:
+        """ Move the vertices to the positions of the given mesh, e.g. the evaluated version of a deformed mesh or
+            this mesh after sculpting. The BVH is refitted instead of rebuilt. Returns False without changing anything,
+            if the topology differs, so a new TriangleMesh needs to be created. """
+        if not self.mesh_data.update_geometry(mesh if mesh is not None else self.mesh):
+            return False
+        self.refit()
+        return True
 
-    def _build_numpy_tris(self):
-        num_tris = len(self.mesh.loop_triangles)
-        self.triangles = np.empty((num_tris, 3), np.uintc)
-        self.mesh.loop_triangles.foreach_get("loops", np.reshape(self.triangles, 3*num_tris))
+    def refit(self):
+        """ Refit the BVH to the current positions of the mesh data, e.g. after it has been updated by its owner """
+        self.bvh.update_geometry(self.mesh_data.points, self.mesh_data.split_normals)
 
     def _build_bvh(self):
-        points = np.empty((len(self.mesh.vertices), 3), dtype=np.single)
-        self.mesh.vertices.foreach_get("co", np.reshape(points, len(self.mesh.vertices)*3))
-        triangles = np.empty(len(self.mesh.loop_triangles)*3, dtype=np.uintc)
-        self.mesh.loop_triangles.foreach_get("vertices", triangles)
-        normals = np.empty(len(self.mesh.loop_triangles)*9, dtype=np.single)
-        self.mesh.loop_triangles.foreach_get("split_normals", normals)
-        self.bvh = accel.build_bvh(points, triangles, normals)
+        self.bvh = accel.build_bvh(self.mesh_data.points, self.triangle_vertices, self.mesh_data.split_normals,
+                                   self.build_quality)
+        if self.mesh_data.uvs is not None:
+            self._set_bvh_uvs()
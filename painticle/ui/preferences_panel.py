@@ -37,5 +37,18 @@ class PreferencesPanel(bpy.types.AddonPreferences):
         layout.prop(self.painticle, "preview_threshold_edge")
         layout.prop(self.painticle, "preview_mode")
         layout.prop(self.painticle, "overlay_preview_opacity")
+        layout.prop(self.painticle, "paint_mode")
+        layout.prop(self.painticle, "simulator")
+        if self.painticle.simulator == "cpu":
+            layout.prop(self.painticle, "particle_storage")
+        layout.prop(self.painticle, "overbake_mode")
+        layout.prop(self.painticle, "gutter_width")
+        layout.prop(self.painticle, "paint_buffer_format")
+        layout.prop(self.painticle, "bvh_build_quality")
+        layout.prop(self.painticle, "mesh_cache_directory")
+        layout.prop(self.painticle, "show_profiling_overlay")
+        layout.prop(self.painticle, "profiling_export_directory")
+        layout.prop(self.painticle, "use_python_profiler")
+        layout.prop(self.painticle, "stroke_recording_directory")
         layout.label(text="Version: "+utils.get_deployment_version())
         dependencies.draw_property(self, 'install_dependencies')
@@ -101,7 +101,17 @@ class PAINTiclePhysicsPanel(PAINTiclePanel, bpy.types.Panel):
         layout.use_property_split = True
         physics = context.scene.painticle_settings.physics
         layout.prop(physics, "max_time_step")
-        layout.prop(physics, "sim_sub_steps")
+        layout.prop(physics, "adaptive_sub_steps")
+        if physics.adaptive_sub_steps:
+            layout.prop(physics, "min_sub_steps")
+            layout.prop(physics, "max_sub_steps")
+            layout.prop(physics, "sub_step_courant")
+        else:
+            layout.prop(physics, "sim_sub_steps")
+        layout.prop(physics, "surface_walking")
+        layout.prop(physics, "particle_budget")
+        if physics.particle_budget > 0:
+            layout.prop(physics, "budget_mode")
 
 
 class PAINTicleBrushMenu(bpy.types.Menu):
@@ -19,6 +19,7 @@
 
 import os
 
+import bpy
 import mathutils
 
 
@@ -58,6 +59,42 @@ def orthogonalize(x: mathutils.Vector):
     return u, v, w
 
 
+def property_group_to_dict(property_group):
+    """ Convert the values of a blender property group into a JSON compatible dictionary. Nested property groups are
+        converted recursively, collections and ID pointers are skipped. """
+    result = {}
+    for prop in property_group.bl_rna.properties:
+        if prop.identifier == "rna_type" or (prop.is_readonly and prop.type != 'POINTER'):
+            continue
+        value = getattr(property_group, prop.identifier)
+        if prop.type == 'POINTER':
+            if value is not None and not isinstance(value, bpy.types.ID):
+                result[prop.identifier] = property_group_to_dict(value)
+        elif prop.type == 'COLLECTION':
+            continue
+        elif prop.type == 'ENUM' and prop.is_enum_flag:
+            result[prop.identifier] = sorted(value)
+        elif getattr(prop, "is_array", False):
+            result[prop.identifier] = list(value)
+        else:
+            result[prop.identifier] = value
+    return result
+
+
+def property_group_from_dict(property_group, values: dict):
+    """ Assign the values of a dictionary created by property_group_to_dict. Unknown keys are ignored to keep old
+        data readable after properties got removed. """
+    for key, value in values.items():
+        if key not in property_group.bl_rna.properties:
+            continue
+        if isinstance(value, dict):
+            property_group_from_dict(getattr(property_group, key), value)
+        elif isinstance(value, list) and property_group.bl_rna.properties[key].type == 'ENUM':
+            setattr(property_group, key, set(value))
+        else:
+            setattr(property_group, key, value)
+
+
 # We cache the git version, so we don't need to touch everytime the preferences panel draws down to the file-system
 _cached_deployment_version = None
 
@@ -0,0 +1,28 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# Entry point for painting in background mode. Run it with an installed PAINTicle add-on like
+#   blender --background scene.blend --python scripts/batch_paint.py -- --object Cube --stroke my.stroke
+# Use --help after the "--" to see all options.
+
+import sys
+
+import addon_utils
+
+addon_utils.enable("painticle", default_set=True)
+
+from painticle import batch  # noqa: E402 The add-on needs to be enabled first
+
+sys.exit(batch.main())
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import sys
+
+import argparse
+
+parser = argparse.ArgumentParser(description='Benchmark starter for painticle blender addon. All arguments after '
+                                             '"--" are passed on to benchmarks/run.py')
+parser.add_argument('--blender', help="Path to the blender executable (default=blender)", default="blender")
+parser.add_argument('--software-gl', help="Use mesa's software renderer for the GPU stages",
+                    action='store_true')
+args, benchmark_args = parser.parse_known_args()
+if benchmark_args and benchmark_args[0] == "--":
+    benchmark_args = benchmark_args[1:]
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+run_script = os.path.join(script_dir, "..", "benchmarks", "run.py")
+addon_dir = os.path.join(script_dir, "..", "build", "out")
+
+env = dict(os.environ)
+# Let blender find the add-on in the build directory without installing it into the user's configuration
+env['BLENDER_USER_SCRIPTS'] = os.path.join(script_dir, "..", "build", "benchmark_scripts")
+addons_dir = os.path.join(env['BLENDER_USER_SCRIPTS'], "addons")
+if not os.path.exists(addons_dir):
+    os.makedirs(addons_dir)
+addon_link = os.path.join(addons_dir, "painticle")
+if not os.path.exists(addon_link):
+    os.symlink(os.path.abspath(os.path.join(addon_dir, "painticle")), addon_link, target_is_directory=True)
+
+if args.software_gl:
+    env['LIBGL_ALWAYS_SOFTWARE'] = "1"
+    env['MESA_GL_VERSION_OVERRIDE'] = "4.3"
+
+command = [args.blender, "--background", "--factory-startup", "--python-exit-code", "1",
+           "--python", os.path.abspath(run_script), "--"] + benchmark_args
+sys.exit(subprocess.run(command, env=env).returncode)
@@ -0,0 +1,74 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+import types
+
+import pytest
+import numpy as np
+
+from painticle import batch
+from painticle.interaction import Interactions
+from painticle.utils import Error
+
+
+def test_parse_args():
+    args = batch.parse_args(["--object", "Cube", "--stroke", "my.stroke", "--resolution", "4096", "2048"])
+    assert args.object == "Cube"
+    assert args.stroke == "my.stroke"
+    assert args.emission is None
+    assert args.resolution == [4096, 2048]
+    assert args.bvh_quality == "high"
+    with pytest.raises(SystemExit):
+        batch.parse_args(["--object", "Cube", "--stroke", "my.stroke", "--emission", "spec.json"])
+
+
+def test_emission_to_stroke():
+    spec = {"path": [[0, 0, 0], [1, 0, 0], [1, 2, 0]],
+            "distance": 2, "duration": 0.5, "fps": 10, "pressure": 0.5, "seed": 7}
+    stroke = batch.emission_to_stroke(spec, {})
+    frames = stroke.frames
+    assert stroke.seed == 7
+    assert len(frames) == 6
+    assert stroke.duration == pytest.approx(0.5)
+    # The brush starts and ends above the end points of the path looking down
+    assert np.allclose(frames["origin"][0], [0, 0, 2])
+    assert np.allclose(frames["origin"][-1], [1, 2, 2])
+    assert np.allclose(frames["direction"], [0, 0, -1])
+    # Constant speed along the path of length 3
+    assert np.allclose(frames["origin"][2], [1, 0.2, 2])
+    assert np.all(frames["pressure"] == 0.5)
+    assert np.all(frames["interactions"][:-1] == Interactions.EMIT_PARTICLES.value)
+    assert frames["interactions"][-1] == Interactions.NONE.value
+
+    with pytest.raises(Error):
+        batch.emission_to_stroke({"path": [1, 2, 3]}, {})
+
+
+def test_image_format_from_filename():
+    assert batch.image_format_from_filename("/tmp/out.PNG") == 'PNG'
+    assert batch.image_format_from_filename("out.exr") == 'OPEN_EXR'
+    with pytest.raises(Error):
+        batch.image_format_from_filename("out.unknown")
+
+
+def test_check_output():
+    packed = types.SimpleNamespace(name="packed", packed_file=object())
+    with pytest.raises(Error):
+        batch.check_output(packed, None, None)
+    batch.check_output(packed, "/tmp/out.png", None)
+    batch.check_output(packed, None, "/tmp/out.blend")
+    batch.check_output(types.SimpleNamespace(name="file", packed_file=None), None, None)
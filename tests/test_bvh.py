@@ -18,10 +18,11 @@
 # <pep8 compliant>
 
 import numpy as np
+import pytest
 
 import math
 
-from painticle import accel
+from painticle import accel, numpyutils
 
 from . import tstutils
 
@@ -114,3 +115,65 @@ def test_bvh_intersection():
     assert tstutils.is_close_vec(surface_info.location, [0.1, 0.7, 0], min_tol)
     check_normal = normalize([5.15, 6.15, 0.0])
     assert tstutils.is_close_vec(surface_info.normal, check_normal, min_tol)
+
+
+def test_bvh_texture_coordinates():
+    points = np.array([-1, -1, 0,
+                       +1, -1, 0,
+                       +1, +1, 0,
+                       -1, +1, 0], dtype=np.single)
+    triangles = np.array([0, 1, 2,    0, 2, 3], dtype=np.uintc)
+    normals = np.array([], dtype=np.single)
+    # The uv layout maps the quad onto [0,0.5]x[0,1], so it's stretched along x
+    uvs = np.array([0, 0,   0.5, 0,   0.5, 1,
+                    0, 0,   0.5, 1,   0, 1], dtype=np.single)
+
+    x = accel.build_bvh(points, triangles, normals)
+    assert not x.has_uvs
+    x.set_uvs(uvs)
+    assert x.has_uvs
+    surface_infos = x.closest_points(np.array([(0.1, 0.7, 1), (0.5, -0.5, 0)], dtype=numpyutils.vec3_dtype))
+    result_uvs, uv_scales = x.texture_coordinates(surface_infos)
+    assert tstutils.is_close_vec(result_uvs[0], [0.275, 0.85], min_tol)
+    assert tstutils.is_close_vec(result_uvs[1], [0.375, 0.25], min_tol)
+    assert tstutils.is_close(uv_scales[0], 0.5, min_tol)
+    assert tstutils.is_close(uv_scales[1], 0.5, min_tol)
+
+
+def test_bvh_build_quality():
+    points = np.array([-1, -1, 0,
+                       +1, -1, 0,
+                       +1, +1, 0,
+                       -1, +1, 0], dtype=np.single)
+    triangles = np.array([0, 1, 2,    0, 2, 3], dtype=np.uintc)
+    normals = np.array([], dtype=np.single)
+
+    num_users = accel.embree_device_users()
+    bvhs = [accel.build_bvh(points, triangles, normals, quality, compact=True, robust=True)
+            for quality in (accel.BuildQuality.LOW, accel.BuildQuality.MEDIUM, accel.BuildQuality.HIGH)]
+    # All BVHs share one embree device
+    assert accel.embree_device_users() == num_users + 3
+    for x in bvhs:
+        surface_info = x.closest_point(0.1, 0.7, 1)
+        assert tstutils.is_close_vec(surface_info.location, [0.1, 0.7, 0], min_tol)
+        assert surface_info.tri_index == 1
+    del bvhs
+    assert accel.embree_device_users() == num_users
+
+
+def test_bvh_refit():
+    points = np.array([-1, -1, 0,
+                       +1, -1, 0,
+                       +1, +1, 0,
+                       -1, +1, 0], dtype=np.single)
+    triangles = np.array([0, 1, 2,    0, 2, 3], dtype=np.uintc)
+    normals = np.array([], dtype=np.single)
+
+    x = accel.build_bvh(points, triangles, normals)
+    moved_points = points + np.array([0, 0, 2]*4, dtype=np.single)
+    x.update_geometry(moved_points, normals)
+    surface_info = x.closest_point(0.1, 0.7, 1)
+    assert tstutils.is_close_vec(surface_info.location, [0.1, 0.7, 2], min_tol)
+    assert tstutils.is_close_vec(surface_info.barycentrics, [0.15, 0.55, 0.3], min_tol)
+    with pytest.raises(RuntimeError):
+        x.update_geometry(moved_points[:6], normals)
@@ -17,6 +17,7 @@
 
 # <pep8 compliant>
 
+import pytest
 import numpy as np
 import mathutils
 
@@ -59,6 +60,16 @@ def test_rgb2hsv():
         assert tstutils.is_close_vec(comp, ref, min_tol)
 
 
+def test_rgb2hsv_out():
+    out = np.empty((len(rgb_ref), 3), dtype=numpyutils.float32_dtype)
+    result = accel.rgb2hsv(rgb_ref, out=out)
+    assert np.shares_memory(result, out)
+    for comp, ref in zip(out, hsv_ref):
+        assert tstutils.is_close_vec(comp, ref, min_tol)
+    with pytest.raises(RuntimeError):
+        accel.rgb2hsv(rgb_ref, out=out[1:])
+
+
 def test_hsv2rgb():
     rgb = accel.hsv2rgb(hsv_ref)
     for comp, ref in zip(rgb, rgb_ref):
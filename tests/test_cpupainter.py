@@ -0,0 +1,170 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# Testing the CPU painter
+
+# <pep8 compliant>
+
+import numpy as np
+import pytest
+
+import bpy
+
+import painticle
+from painticle import accel, particle_painter_cpu, particle_painter_gpu
+from painticle.interaction import Interactions
+from painticle.ops.createdefaultbrushtree import create_default_brush_tree
+
+from . import tstutils
+
+
+def quad_mesh():
+    """ The unit square in uv space, tilted in object space to cover several cells of the hashed grid """
+    loop_points = np.array([[0, 0, 0], [1, 0, 0.1], [1, 1, 0.1], [0, 1, 0]], dtype=np.float32)
+    uvs = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float32)
+    triangle_loops = np.array([[0, 1, 2], [0, 3, 2]], dtype=np.uintc)
+    return accel.build_paint_mesh(loop_points, uvs, triangle_loops)
+
+
+def make_particles():
+    particles = accel.ParticleData()
+    particles.resize(3)
+    particles.location = np.array([(0.3, 0.3, 0.03), (0.6, 0.5, 0.06), (0.62, 0.55, 0.062)],
+                                  dtype=particles.location.dtype)
+    particles.size = np.array([0.2, 0.25, 0.3], dtype=np.float32)
+    particles.age = np.array([0, 0.1, 0.2], dtype=np.float32)
+    particles.max_age = np.ones(3, dtype=np.float32)
+    particles.color = np.array([(1, 0, 0), (0, 1, 0), (0, 0, 1)], dtype=particles.color.dtype)
+    return particles
+
+
+def smoothstep(edge0, edge1, x):
+    t = np.clip((x-edge0) / (edge1-edge0), 0, 1)
+    return t*t*(3-2*t)
+
+
+def reference_paint(image, particles, voxel_size, strength, time_step, size_age_factor):
+    """ The rules of particle2d_frag.glsl for the quad mesh. None of the test particles share a grid cell. """
+    height, width = image.shape[:2]
+    locations = np.array(particles.location.tolist(), dtype=np.float32)
+    colors = np.array(particles.color.tolist(), dtype=np.float32)
+    cells = np.floor(locations / voxel_size).astype(int)
+    result = image.copy()
+    for y in range(height):
+        for x in range(width):
+            u = (x+0.5) / width
+            v = (y+0.5) / height
+            position = np.array([u, v, 0.1*u], dtype=np.float32)
+            texel_cell = np.floor(position / voxel_size).astype(int)
+            color = np.zeros(4)
+            num_found = 0
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for dz in (-1, 0, 1):
+                        for i in np.flatnonzero((cells == texel_cell + (dx, dy, dz)).all(axis=1)):
+                            distance = np.linalg.norm(position - locations[i])
+                            norm_age = particles.age[i] / particles.max_age[i]
+                            size = particles.size[i] * ((1-norm_age) + size_age_factor*norm_age)
+                            if distance < size:
+                                factor = (1-norm_age) * smoothstep(1, 0, 2*distance/size)
+                                color = (1-factor)*color + factor*np.append(colors[i], 1)
+                                num_found += 1
+            if num_found > 0:
+                color *= 25 * time_step * strength
+                result[y, x, :3] = color[:3] + result[y, x, :3]*(1-color[3])
+                result[y, x, 3] = color[3] + result[y, x, 3]
+    return result
+
+
+def test_rasterize_uv_mask():
+    mesh = quad_mesh()
+    assert mesh.num_loops == 4
+    assert mesh.num_triangles == 2
+    # Texels on the shared diagonal are covered by exactly one of the triangles
+    assert np.all(accel.rasterize_uv_mask(mesh, 16, 16) == 255)
+    assert np.all(accel.rasterize_uv_mask(mesh, 7, 5) == 255)
+    # Other tiles don't overlap the unit square
+    assert np.all(accel.rasterize_uv_mask(mesh, 16, 16, (1, 0)) == 0)
+    # Only the lower right triangle, the texels on the diagonal belong to its left edge
+    half = accel.build_paint_mesh(np.zeros((3, 3), dtype=np.float32),
+                                  np.array([[0, 0], [1, 0], [1, 1]], dtype=np.float32),
+                                  np.array([[0, 1, 2]], dtype=np.uintc))
+    mask = accel.rasterize_uv_mask(half, 8, 8)
+    ys, xs = np.mgrid[0:8, 0:8]
+    assert np.array_equal(mask == 255, xs >= ys)
+
+
+def test_paint_particles():
+    mesh = quad_mesh()
+    particles = make_particles()
+    grid = accel.HashedGrid(0.25)
+    grid.build(np.array(particles.location.tolist(), dtype=np.float32))
+    image = np.full((12, 16, 4), 0.1, dtype=np.float32)
+    expected = reference_paint(image, particles, 0.25, 0.8, 0.04, 0.5)
+    accel.paint_particles(image, mesh, grid, particles, strength=0.8, time_step=0.04, particle_size_age_factor=0.5)
+    assert np.allclose(image, expected, atol=1e-6)
+    assert np.any(image != 0.1)
+    # Tiles the mesh doesn't overlap stay untouched
+    untouched = np.full((12, 16, 4), 0.1, dtype=np.float32)
+    accel.paint_particles(untouched, mesh, grid, particles, 0.8, 0.04, 0.5, uv_offset=(1, 0))
+    assert np.all(untouched == 0.1)
+
+
+def test_paint_particles_errors():
+    mesh = quad_mesh()
+    particles = make_particles()
+    grid = accel.HashedGrid(0.25)
+    with pytest.raises(RuntimeError):
+        # The grid wasn't built from the particles
+        accel.paint_particles(np.zeros((4, 4, 4), dtype=np.float32), mesh, grid, particles, 1, 0.04, 1)
+    grid.build(np.array(particles.location.tolist(), dtype=np.float32))
+    with pytest.raises(RuntimeError):
+        accel.paint_particles(np.zeros((4, 4, 3), dtype=np.float32), mesh, grid, particles, 1, 0.04, 1)
+    with pytest.raises(TypeError):
+        # Painting into a converted copy would silently lose the result
+        accel.paint_particles(np.zeros((4, 4, 4)), mesh, grid, particles, 1, 0.04, 1)
+    with pytest.raises(RuntimeError):
+        mesh.update_points(np.zeros((3, 3), dtype=np.float32))
+
+
+@pytest.mark.skipif(tstutils.no_ui(), reason="requires UI")
+def test_cpu_painter_matches_gpu_painter():
+    tstutils.open_file("benchmark_particles.blend")
+    bpy.ops.object.mode_set(mode="TEXTURE_PAINT")
+    test_object = bpy.data.objects['test_object']
+    context = tstutils.get_default_context(test_object)
+    create_default_brush_tree()
+    painticle_settings = bpy.context.scene.painticle_settings
+    particles = painticle.particles.Particles(context, painter="cpu")
+    assert isinstance(particles.painter, particle_painter_cpu.ParticlePainterCPU)
+    gpu_painter = particle_painter_gpu.ParticlePainterGPU(context, particles.simulator)
+    gpu_painter.set_use_preview(False)
+    particles.painter.sync_image_on_draw = False
+    gpu_painter.sync_image_on_draw = False
+    event = tstutils.get_fake_event(x=context.region.width//2, y=context.region.height//2)
+    particles.start_interacting(context, event, Interactions.EMIT_PARTICLES, seed=1)
+    for _ in range(20):
+        particles.interact(context, event, Interactions.EMIT_PARTICLES)
+        particles.move_particles(0.01, painticle_settings)
+        particles.paint_particles(0.01)
+        gpu_painter.draw(particles.simulator._particles, 0.01)
+    cpu_tile = particles.painter.tiles[1001]
+    cpu_pixels = cpu_tile.pixels
+    gpu_pixels = gpu_painter.tiles[1001].read_pixels().reshape(cpu_pixels.shape)
+    assert np.any(cpu_pixels != cpu_tile.undo_pixels)
+    # Texels on the uv islands' borders may be rasterized differently, all others match
+    differs = np.any(np.abs(cpu_pixels - gpu_pixels) > 1.5/255, axis=2)
+    assert np.mean(differs) < 0.001
+    gpu_painter.shutdown()
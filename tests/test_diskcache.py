@@ -0,0 +1,68 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+import os
+
+import bpy
+import numpy as np
+import pytest
+
+from painticle import diskcache
+
+from . import tstutils
+
+KEY = "0123456789abcdef0123456789abcdef01234567"
+
+
+def test_store_and_load(tmp_path):
+    directory = str(tmp_path)
+    arrays = {"points": np.arange(12, dtype=np.float32).reshape(4, 3),
+              "triangle_loops": np.array([[0, 1, 2], [2, 1, 3]], dtype=np.int32)}
+    assert diskcache.load(directory, KEY) is None
+    diskcache.store(directory, KEY, arrays)
+    loaded = diskcache.load(directory, KEY)
+    assert set(loaded.keys()) == set(arrays.keys())
+    for name, array in arrays.items():
+        assert np.array_equal(loaded[name], array)
+        assert loaded[name].dtype == array.dtype
+    # Cached arrays are shared between processes, so they must not be writable
+    with pytest.raises(ValueError):
+        loaded["points"][0, 0] = 1
+    assert diskcache.load(directory, None) is None
+    assert diskcache.load("", KEY) is None
+
+
+def test_clear(tmp_path):
+    directory = str(tmp_path)
+    diskcache.store(directory, KEY, {"points": np.zeros((1, 3), np.float32)})
+    os.makedirs(os.path.join(directory, "other_data"))
+    diskcache.clear(directory)
+    assert diskcache.load(directory, KEY) is None
+    assert os.path.isdir(os.path.join(directory, "other_data"))
+
+
+def test_cache_key():
+    tstutils.open_file("particle_test.blend")
+    test_object = bpy.data.objects['test_object']
+    key = diskcache.cache_key(test_object.data, ())
+    assert key is not None
+    assert diskcache.cache_key(test_object.data, ()) == key
+    # The mesh in edit mode differs from the saved one, so it isn't cached
+    bpy.context.view_layer.objects.active = test_object
+    bpy.ops.object.mode_set(mode='EDIT')
+    assert diskcache.cache_key(test_object.data, ()) is None
+    bpy.ops.object.mode_set(mode='OBJECT')
@@ -20,6 +20,10 @@
 import pytest
 import bpy
 import moderngl
+import os
+import shutil
+
+import numpy as np
 
 from painticle import gpu_utils
 
@@ -65,3 +69,72 @@ def test_offscreen_creation_from_image(test_mesh):
     buffer = gpu_utils.gpu_framebuffer_for_image(image, glcontext)
     assert buffer.width == 1024
     assert buffer.height == 512
+    assert buffer.color_attachments[0].dtype == gpu_utils.image_dtype(image)
+
+
+def test_image_dtype():
+    image = bpy.data.images.new("byte_image", 4, 4, alpha=True)
+    float_image = bpy.data.images.new("float_image", 4, 4, alpha=True, float_buffer=True)
+    try:
+        assert gpu_utils.image_dtype(None) == "f1"
+        assert gpu_utils.image_dtype(image) == "f1"
+        assert gpu_utils.image_dtype(float_image) in ("f2", "f4")
+    finally:
+        bpy.data.images.remove(image)
+        bpy.data.images.remove(float_image)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("f1", 0.5/255), ("f2", 1e-3), ("f4", 0)])
+def test_texture_data_conversion(dtype, tolerance):
+    pixels = np.linspace(-0.5, 1.5, 1001, dtype=np.float32)
+    data = gpu_utils.to_texture_data(pixels, dtype)
+    assert data.dtype == gpu_utils.PAINT_BUFFER_FORMATS[dtype][1]
+    result = gpu_utils.from_texture_data(data)
+    assert result.dtype == np.float32
+    expected = np.clip(pixels, 0, 1) if dtype == "f1" else pixels
+    assert np.allclose(result, expected, rtol=0, atol=tolerance + 1e-7)
+    with pytest.raises(ValueError):
+        gpu_utils.image_format("u1")
+
+
+def test_image_tiles_untiled(test_mesh):
+    image = test_mesh.active_material.node_tree.nodes['myUntiledImage'].image
+    tiles = gpu_utils.image_tiles(image)
+    assert tiles == [gpu_utils.ImageTile(1001, (1024, 512))]
+    assert tiles[0].uv_offset == (0, 0)
+    assert gpu_utils.has_tile_pixel_access(image, tiles[0])
+    assert gpu_utils.tile_filepath(image, 1001) is None
+    assert gpu_utils.image_tiles(None) == []
+
+
+def test_image_tiles_udim(test_mesh):
+    image = test_mesh.active_material.node_tree.nodes['myUDIM'].image
+    tiles = gpu_utils.image_tiles(image)
+    assert [tile.number for tile in tiles] == [tile.number for tile in image.tiles]
+    # Only the first tile is accessible through blender's api, the others are read from and written to their files
+    for tile in tiles:
+        path = gpu_utils.tile_filepath(image, tile.number)
+        assert os.path.basename(path) == f"myUDIM.{tile.number}.png"
+        assert gpu_utils.has_tile_pixel_access(image, tile) == os.path.exists(path)
+    assert not gpu_utils.has_tile_pixel_access(image, gpu_utils.ImageTile(1003, (4, 4)))
+
+
+def test_udim_tile_pixels(test_mesh, tmp_path):
+    image = test_mesh.active_material.node_tree.nodes['myUDIM'].image
+    tile = next(tile for tile in gpu_utils.image_tiles(image) if tile.number == 1002)
+    # Work on a copy of the tile files, since writing a tile changes them
+    for number in (1001, 1002):
+        shutil.copy(gpu_utils.tile_filepath(image, number), str(tmp_path))
+    image.filepath_raw = os.path.join(str(tmp_path), "myUDIM.1001.png")
+    pixels = gpu_utils.read_tile_pixels(image, tile)
+    assert pixels.shape == (tile.size[0]*tile.size[1]*4,)
+    painted = np.full(pixels.shape, 0.5, dtype=np.float32)
+    gpu_utils.write_tile_pixels(image, tile, painted)
+    assert np.allclose(gpu_utils.read_tile_pixels(image, tile), painted, atol=1/255)
+
+
+def test_tile_numbers():
+    uvs = np.array([[0.5, 0.5], [1.5, 0.5], [0.5, 1.5], [9.5, 2.5], [12, 0.5], [-0.5, -0.5]], dtype=np.float32)
+    assert gpu_utils.tile_numbers(uvs).tolist() == [1001, 1002, 1011, 1030, 1010, 1001]
+    assert gpu_utils.ImageTile(1012, (4, 4)).uv_offset == (1, 1)
+    assert gpu_utils.ImageTile(1030, (4, 4)).uv_offset == (9, 2)
@@ -21,7 +21,7 @@ import gpu
 import gpu_extras.batch
 import numpy as np
 
-from painticle import accel, gpu_utils, numpyutils
+from painticle import accel, gpu_utils, gpuhashedgrid, headless, numpyutils
 
 from . import tstutils
 
@@ -186,3 +186,32 @@ def test_build():
     grid = accel.HashedGrid(1)
     points = np.array([[x/10, 0, 0] for x in range(500)], dtype=numpyutils.float32_dtype)
     grid.build(points)
+
+
+@pytest.fixture
+def glcontext():
+    try:
+        return headless.create_standalone_glcontext()
+    except Exception:
+        pytest.skip("requires an OpenGL 4.3 context")
+
+
+def test_gpu_build_matches_cpu_build(glcontext):
+    rng = np.random.default_rng(0)
+    grid = gpuhashedgrid.GPUHashedGrid(glcontext, 0.1)
+    # Shrinking the number of particles needs to clear the cells of the previous build
+    for num_particles in (3000, 1000, 65, 1, 0):
+        points = rng.uniform(-1, 1, (num_particles, 3)).astype(np.float32)
+        # Only the locations are read, the other fields of the particles' layout are arbitrary
+        particles = np.zeros((num_particles, 12), dtype=np.float32)
+        particles[:, 0:3] = points
+        grid.build(glcontext.buffer(particles.tobytes() if num_particles > 0 else b"\0"), num_particles)
+        cpu_grid = accel.HashedGrid(0.1)
+        cpu_grid.build(points)
+        assert grid.num_particles == cpu_grid.num_particles
+        assert np.array_equal(grid.cell_offsets, np.array(cpu_grid.cell_offsets, dtype=np.uint32))
+        # The CPU grid's order within a cell is arbitrary, the GPU grid's one is sorted by particle ID
+        cpu_ids = np.array(cpu_grid.sorted_particle_ids.tolist(), dtype=np.uint32).reshape(-1, 2)
+        cpu_ids = cpu_ids[np.lexsort((cpu_ids[:, 1], cpu_ids[:, 0]))]
+        assert np.array_equal(grid.sorted_particle_ids, cpu_ids)
+    grid.release()
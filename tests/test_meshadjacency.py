@@ -0,0 +1,62 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+import numpy as np
+import pytest
+
+from painticle import accel
+
+
+def create_fan():
+    """ Three triangles around vertex 0 and a separate triangle not connected to them """
+    triangles = np.array([0, 1, 2,
+                          0, 2, 3,
+                          0, 3, 4,
+                          5, 6, 7], dtype=np.uintc)
+    return accel.build_mesh_adjacency(triangles, 9)
+
+
+def test_vertex_triangles():
+    adjacency = create_fan()
+    assert adjacency.num_triangles == 4
+    assert adjacency.num_points == 9
+    assert list(adjacency.vertex_triangles(0)) == [0, 1, 2]
+    assert list(adjacency.vertex_triangles(2)) == [0, 1]
+    assert list(adjacency.vertex_triangles(6)) == [3]
+    # Unused vertices don't have any triangles
+    assert len(adjacency.vertex_triangles(8)) == 0
+    offsets = adjacency.vertex_offsets
+    assert len(offsets) == 10
+    assert offsets[-1] == len(adjacency.vertex_triangle_ids) == 12
+    with pytest.raises(IndexError):
+        adjacency.vertex_triangles(9)
+
+
+def test_neighbours():
+    adjacency = create_fan()
+    # Edge 2 of triangle 1 connects vertices 3 and 0, which is shared with triangle 2
+    assert adjacency.neighbour(1, 2) == 2
+    assert adjacency.neighbour(1, 0) == 0
+    assert adjacency.neighbour(1, 1) == accel.id_none
+    assert np.all(adjacency.neighbours[9:] == accel.id_none)
+    assert list(adjacency.triangle_ring(1)) == [0, 2]
+    assert len(adjacency.triangle_ring(3)) == 0
+
+
+def test_invalid_triangles():
+    with pytest.raises(RuntimeError):
+        accel.build_mesh_adjacency(np.array([0, 1, 5], dtype=np.uintc), 3)
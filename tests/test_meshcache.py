@@ -0,0 +1,63 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+import bpy
+import numpy as np
+
+from painticle import meshcache
+from painticle import numpyutils
+
+from . import tstutils
+
+
+def test_mesh_cache():
+    tstutils.open_file("particle_test.blend")
+    test_object = bpy.data.objects['test_object']
+    context = tstutils.get_default_context(test_object)
+    meshcache.invalidate()
+    first = meshcache.get_triangle_mesh(context)
+    assert meshcache.get_triangle_mesh(context) is first
+    assert meshcache.num_entries() == 1
+
+    # Moving vertices refits the cached triangle mesh
+    test_object.data.vertices[0].co.x += 1
+    moved = test_object.data.vertices[0].co
+    assert meshcache.get_triangle_mesh(context) is first
+    surface_info = first.bvh.closest_point(moved.x, moved.y, moved.z)
+    assert tstutils.is_close_vec(surface_info.location, moved, 1e-5)
+
+    # Editing uvs keeping the topology updates the cached uvs
+    uv_data = test_object.data.uv_layers.active.data
+    uv_data[0].uv = (0.25, 0.75)
+    assert meshcache.get_triangle_mesh(context) is first
+    assert tstutils.is_close_vec(first.get_active_uvs()[0], (0.25, 0.75), 1e-6)
+    # The center of a triangle using the edited loop maps to the center of its uvs
+    loops = next(loops for loops in first.triangles if 0 in loops)
+    center = np.mean([test_object.data.vertices[test_object.data.loops[i].vertex_index].co for i in loops], axis=0)
+    surface_infos = first.bvh.closest_points(np.array([tuple(center)], dtype=numpyutils.vec3_dtype))
+    uvs, _ = first.bvh.texture_coordinates(surface_infos)
+    assert tstutils.is_close_vec(uvs[0], np.mean([uv_data[i].uv for i in loops], axis=0), 1e-5)
+
+    # Changing the topology needs to create a new triangle mesh
+    test_object.data.vertices.add(1)
+    second = meshcache.get_triangle_mesh(context)
+    assert second is not first
+    assert meshcache.get_triangle_mesh(context) is second
+
+    meshcache.invalidate(object_name=test_object.name)
+    assert meshcache.num_entries() == 0
+    assert meshcache.get_triangle_mesh(context) is not second
@@ -0,0 +1,45 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+import bpy
+import numpy as np
+
+from painticle import meshdata
+
+from . import tstutils
+
+
+def test_mesh_data():
+    tstutils.open_file('trianglemesh_test.blend')
+    mesh = bpy.data.objects['test_cube'].data
+    data = meshdata.MeshData.extract(mesh)
+    assert data.points.shape == (len(mesh.vertices), 3)
+    assert data.loop_vertices.shape == (len(mesh.loops),)
+    assert data.triangle_loops.shape == (len(mesh.loop_triangles), 3)
+    assert data.split_normals.shape == (3*len(mesh.loop_triangles), 3)
+    # The vertices of the triangles are derived from the loops instead of extracted separately
+    for triangle, vertices in zip(mesh.loop_triangles, data.triangle_vertices):
+        assert list(triangle.vertices) == list(vertices)
+    loop_points = data.loop_points()
+    for loop in mesh.loops:
+        assert np.allclose(loop_points[loop.index], mesh.vertices[loop.vertex_index].co)
+
+    mesh.vertices[0].co.x += 1
+    assert data.update_geometry(mesh)
+    assert data.points[0][0] == mesh.vertices[0].co.x
+    mesh.vertices.add(1)
+    assert not data.update_geometry(mesh)
@@ -58,3 +58,39 @@ def test_project_vector_onto_plane():
     ref = [[0.,  2.,  3.], [ 1.,  0.,  3.],  [ 1.,  2.,  0.],  [-1.,  0.,  1.]]
     for i, r in enumerate(ref):
         assert tstutils.is_close_vec(r, x[i], min_tol), f"on element i={i}"
+
+
+def test_unstructured_view():
+    x = numpyutils.repeated_vec((1, 2, 3), 4, dtype=vec3_dtype)
+    view = numpyutils.unstructured_view(x)
+    assert view.shape == (4, 3)
+    view[2] = (4, 5, 6)
+    assert tstutils.is_close_vec(x[2], (4, 5, 6), min_tol)
+    s = np.zeros(3, dtype=struct_dtype)
+    numpyutils.unstructured_view(s['b'])[:, 1] = 7
+    assert s['b'][1]['y'] == 7
+    assert s['a'][1]['y'] == 0
+    with pytest.raises(ValueError):
+        numpyutils.unstructured_view(s)
+
+
+def test_scratch_buffers():
+    scratch = numpyutils.ScratchBuffers()
+    a = scratch.zeros("a", (10, 3), np.single)
+    assert a.shape == (10, 3)
+    assert np.all(a == 0)
+    assert scratch.num_allocations == 1
+    # Smaller requests reuse the buffer
+    b = scratch.get("a", (8, 3), np.single)
+    assert np.shares_memory(a, b)
+    assert scratch.num_allocations == 1
+    # Growing allocates geometrically, so growing by few elements doesn't allocate on every request
+    scratch.get("a", (11, 3), np.single)
+    assert scratch.num_allocations == 2
+    scratch.get("a", (12, 3), np.single)
+    assert scratch.num_allocations == 2
+    scratch.get("b", 5, vec3_dtype)
+    assert scratch.num_allocations == 3
+    assert scratch.nbytes > 0
+    scratch.clear()
+    assert scratch.nbytes == 0
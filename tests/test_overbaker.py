@@ -20,7 +20,7 @@ import moderngl
 import numpy as np
 import pytest
 
-from painticle import gpu_utils, meshbuffer, overbaker
+from painticle import gpu_utils, meshbuffer, meshdata, overbaker
 
 from . import tstutils
 
@@ -29,10 +29,7 @@ from . import tstutils
 def test_mesh():
     tstutils.open_file('overbaker_test.blend')
     obj = bpy.data.objects['BakeGeo']
-    mesh = obj.data
-    mesh.calc_normals_split()
-    mesh.calc_loop_triangles()
-    return mesh
+    return meshdata.MeshData.extract(obj.data)
 
 
 @pytest.mark.skipif(tstutils.no_validator(), reason="requires GLSL validator")
@@ -85,4 +82,107 @@ def test_overbaker(test_mesh):
     for i in range(len(overbaked)):
         assert len(overbaked[i]) == len(overbaked_ref[i])
         assert tstutils.is_close_vec(overbaked[i], overbaked_ref[i], 0.01), f'on scanline {i}'
-    
\ No newline at end of file
+    
+
+@pytest.mark.skipif(tstutils.no_validator(), reason="requires GLSL validator")
+def test_glsl_validation_jump_flood():
+    for name in ("jumpfloodinit", "jumpflood", "jumpfloodfill"):
+        comp = gpu_utils.load_shader_source(name, None, ['comp'])
+        assert gpu_utils.validate_glsl_shaders(comp, "comp"), name
+
+
+def test_jump_flood_reference():
+    mask = np.zeros((40, 50), dtype=np.uint8)
+    mask[5:12, 6:15] = 1
+    mask[25:35, 30:45] = 1
+    mask[20, 10] = 1
+    assert overbaker.jump_flood_jumps(0) == []
+    assert overbaker.jump_flood_jumps(5) == [4, 2, 1, 1]
+    seeds = overbaker.jump_flood_seeds(mask, 64)
+    inside = np.argwhere(mask > 0)
+    for y in range(mask.shape[0]):
+        for x in range(mask.shape[1]):
+            nearest = np.min((inside[:, 0]-y)**2 + (inside[:, 1]-x)**2)
+            seed_x, seed_y = seeds[y, x]
+            assert (seed_x-x)**2 + (seed_y-y)**2 == nearest, f"on texel {x}, {y}"
+    pixels = np.random.default_rng(1).random((40, 50, 4)).astype(np.float32)
+    filled = overbaker.jump_flood_fill(pixels, mask, 2)
+    assert np.array_equal(filled[mask > 0], pixels[mask > 0])
+    # The islands grow by 2 texels in each direction
+    assert np.array_equal(filled[3, 8], pixels[5, 8])
+    assert np.array_equal(filled[2, 8], pixels[2, 8])
+
+
+@pytest.mark.skipif(tstutils.no_ui(), reason="requires UI")
+def test_overbaker_jump_flood(test_mesh):
+    glcontext = moderngl.create_context()
+    mesh_buffer = meshbuffer.MeshBuffer(glcontext, None)
+    mesh_buffer.build_mesh_vbo(test_mesh)
+    baker = overbaker.Overbaker(mesh_buffer, glcontext)
+    testshape = (16, 16, 4)
+    tex_data = np.zeros(testshape, dtype='f4')
+    tex_data[4:12, 4:12, 0] = np.arange(8)+1
+    texture = glcontext.texture((16, 16), data=tex_data, components=4, dtype='f4')
+    baker._init_overbake(texture)
+    mask = np.frombuffer(baker.mask_texture.read(), dtype='u1').reshape((16, 16))
+    baker._shutdown_overbake(texture)
+    baker.overbake(texture, 3, "jump_flood")
+    overbaked = np.frombuffer(texture.read(), dtype="f4").reshape(testshape)
+    assert np.allclose(overbaked, overbaker.jump_flood_fill(tex_data, mask, 3))
+
+
+def test_dilate_reference():
+    mask = np.zeros((5, 6), dtype=np.uint8)
+    mask[2, 2] = 1
+    pixels = np.zeros((5, 6, 4), dtype=np.float32)
+    pixels[2, 2] = (1, 2, 3, 4)
+    assert np.array_equal(overbaker.dilate(pixels, mask, 0), pixels)
+    dilated = overbaker.dilate(pixels, mask, 1)
+    assert np.allclose(dilated[1:4, 1:4], (1, 2, 3, 4))
+    assert np.all(dilated[0] == 0)
+    assert np.allclose(overbaker.dilate(pixels, mask, 2)[0, 0:5], (1, 2, 3, 4))
+
+
+@pytest.mark.skipif(tstutils.no_ui(), reason="requires UI")
+@pytest.mark.parametrize("local_size", [8, 16, 32])
+def test_overbaker_odd_size(test_mesh, local_size):
+    """ Sizes, that aren't a multiple of the work group size, need to be covered completely """
+    glcontext = moderngl.create_context()
+    mesh_buffer = meshbuffer.MeshBuffer(glcontext, None)
+    mesh_buffer.build_mesh_vbo(test_mesh)
+    baker = overbaker.Overbaker(mesh_buffer, glcontext, local_size)
+    testshape = (37, 21, 4)
+    tex_data = np.random.default_rng(0).random(testshape).astype('f4')
+    texture = glcontext.texture((21, 37), data=tex_data, components=4, dtype='f4')
+    baker._init_overbake(texture)
+    mask = np.frombuffer(baker.mask_texture.read(), dtype='u1').reshape((37, 21))
+    baker._shutdown_overbake(texture)
+    baker.overbake(texture, 3)
+    overbaked = np.frombuffer(texture.read(), dtype="f4").reshape(testshape)
+    assert np.allclose(overbaked, overbaker.dilate(tex_data, mask, 3), atol=1e-5)
+
+
+@pytest.mark.skipif(tstutils.no_ui(), reason="requires UI")
+@pytest.mark.parametrize("mode", overbaker.OVERBAKE_MODES)
+@pytest.mark.parametrize("dtype", ["f1", "f2"])
+def test_overbaker_dtypes(test_mesh, mode, dtype):
+    """ Paint buffers of 8 bit and half float images are overbaked in their own format """
+    glcontext = moderngl.create_context()
+    mesh_buffer = meshbuffer.MeshBuffer(glcontext, None)
+    mesh_buffer.build_mesh_vbo(test_mesh)
+    baker = overbaker.Overbaker(mesh_buffer, glcontext)
+    testshape = (16, 16, 4)
+    tex_data = np.zeros(testshape, dtype='f4')
+    tex_data[4:12, 4:12] = np.linspace(0, 1, 8)[:, np.newaxis]
+    texture = glcontext.texture((16, 16), data=gpu_utils.to_texture_data(tex_data, dtype), components=4, dtype=dtype)
+    baker._init_overbake(texture)
+    mask = np.frombuffer(baker.mask_texture.read(), dtype='u1').reshape((16, 16))
+    baker._shutdown_overbake(texture)
+    baker.overbake(texture, 3, mode)
+    data = np.frombuffer(texture.read(), dtype=gpu_utils.PAINT_BUFFER_FORMATS[dtype][1]).reshape(testshape)
+    if mode == "jump_flood":
+        expected = overbaker.jump_flood_fill(tex_data, mask, 3)
+    else:
+        expected = overbaker.dilate(tex_data, mask, 3)
+    # Each dilation pass rounds to the texture's precision
+    assert np.allclose(gpu_utils.from_texture_data(data), expected, atol=3 / 255)
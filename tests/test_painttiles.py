@@ -0,0 +1,85 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# Testing the paint buffers of the UDIM tiles
+
+# <pep8 compliant>
+
+import moderngl
+import numpy as np
+import pytest
+
+from painticle import gpu_utils, painttiles
+
+from . import tstutils
+
+
+def test_touched_tiles():
+    uvs = np.array([[0.5, 0.5], [1.5, 0.5], [1.5, 0.6]], dtype=np.float32)
+    radii = np.full(3, 0.1, dtype=np.float32)
+    assert painttiles.touched_tiles(uvs, radii) == {1001, 1002}
+    # Particles close to a border paint into the neighbouring tiles as well
+    assert painttiles.touched_tiles(np.array([[0.95, 0.95]]), np.array([0.1])) == {1001, 1002, 1011, 1012}
+    assert painttiles.touched_tiles(np.empty((0, 2)), np.empty(0)) == set()
+
+
+@pytest.mark.skipif(tstutils.no_ui(), reason="requires UI")
+@pytest.mark.parametrize("dtype", ["f1", "f2", "f4"])
+def test_paint_tile(dtype):
+    glcontext = moderngl.create_context()
+    tile = painttiles.PaintTile(gpu_utils.ImageTile(1002, (8, 4)), glcontext, dtype)
+    assert tile.texture.size == (8, 4)
+    assert tile.uv_offset == (1, 0)
+    pixels = np.linspace(0, 1, 8*4*4, dtype=np.float32)
+    tile.fill(pixels)
+    assert not tile.changed
+    assert np.allclose(tile.read_pixels(), pixels, atol=1/255)
+    tile.capture_undo()
+    tile.fill(np.zeros_like(pixels))
+    # Only the first capture of a stroke is kept
+    tile.capture_undo()
+    assert tile.undo()
+    assert tile.changed
+    assert np.allclose(tile.read_pixels(), pixels, atol=1/255)
+    tile.release()
+
+
+def test_downsample_factor():
+    assert painttiles.downsample_factor((1024, 512), 1024) == 1
+    assert painttiles.downsample_factor((4096, 1024), 1024) == 4
+    assert painttiles.downsample_factor((3000, 3000), 1024) == 4
+    tile = painttiles.downsampled_tile(gpu_utils.ImageTile(1002, (4096, 1024)), 4)
+    assert tile == gpu_utils.ImageTile(1002, (1024, 256))
+
+
+@pytest.mark.skipif(tstutils.no_validator(), reason="requires GLSL validator")
+def test_glsl_validation_downsample():
+    vert, frag = gpu_utils.load_shader_source("downsample", src_types=["vert", "frag"])
+    assert gpu_utils.validate_glsl_shaders(vert, "vert")
+    assert gpu_utils.validate_glsl_shaders(frag, "frag")
+
+
+@pytest.mark.skipif(tstutils.no_ui(), reason="requires UI")
+def test_paint_tile_downsampled():
+    glcontext = moderngl.create_context()
+    source = painttiles.PaintTile(gpu_utils.ImageTile(1001, (8, 4)), glcontext, "f4")
+    pixels = np.random.default_rng(0).random((4, 8, 4)).astype(np.float32)
+    source.fill(pixels.reshape(-1))
+    tile = painttiles.PaintTile(painttiles.downsampled_tile(source.tile, 2), glcontext, "f4")
+    tile.fill_downsampled(source, gpu_utils.load_shader("downsample", glcontext))
+    expected = pixels.reshape(2, 2, 4, 2, 4).mean(axis=(1, 3))
+    assert np.allclose(tile.read_pixels().reshape(2, 4, 4), expected, atol=1e-6)
+    tile.release()
+    source.release()
@@ -44,7 +44,7 @@ def test_particle_creation(test_mesh):
     create_default_brush_tree()
     simulator.setup_steps()
     emit_settings = simulator.emit_settings()
-    emit_settings.color_random = (0,0,0)
+    emit_settings.color_random = mathutils.Color((0, 0, 0))
     painticle_settings = context.scene.painticle_settings
     # Add one particle
     simulator.add_test_particles(np.array([(2, 0.2, 0.3)], dtype=numpyutils.float32_dtype),
@@ -57,7 +57,9 @@ def test_particle_creation(test_mesh):
     assert tstutils.is_close_vec(p.acceleration[0], (0, 0, 0), min_tol)
     assert tstutils.is_close_vec(p.speed[0], (0, 0, 0), min_tol)
     assert tstutils.is_close_vec(p.normal[0], (1, 0, 0), min_tol)
-    assert tstutils.is_close_vec(p.uv[0], (0, 0), min_tol)
+    uvs, uv_scales = paint_mesh.bvh.texture_coordinates(paint_mesh.bvh.closest_points(p.location))
+    assert tstutils.is_close_vec(p.uv[0], uvs[0], min_tol)
+    assert tstutils.is_close(p.uv_scale[0], uv_scales[0], min_tol)
     assert tstutils.is_close(p.size[0], emit_settings.particle_size, emit_settings.particle_size_random)
     assert tstutils.is_close(p.mass[0], emit_settings.mass, emit_settings.mass_random)
     assert tstutils.is_close(p.age[0], 0, min_tol)
@@ -93,3 +95,61 @@ def test_particle_simulation(test_mesh):
     simulator.simulate(sim_data)
     assert tstutils.is_close_vec(simulator._particles.location[0], (1, 0.2, 0.26457503), min_tol)
     assert tstutils.is_close(simulator._particles.age[0], sim_data.timestep, min_tol)
+
+
+def test_simulation_reuses_scratch_buffers(test_mesh):
+    context = tstutils.get_default_context(test_mesh)
+    paint_mesh = trianglemesh.TriangleMesh(context)
+    simulator = particle_simulator_cpu.ParticleSimulatorCPU(context)
+    create_default_brush_tree()
+    simulator.setup_steps()
+    painticle_settings = context.scene.painticle_settings
+    simulator.add_test_particles(np.array([(2, 0.2, 0.3), (2, 0.3, 0.3)], dtype=numpyutils.float32_dtype),
+                                 np.array([(-1, 0, 0), (-1, 0, 0)], dtype=numpyutils.float32_dtype),
+                                 paint_mesh.bvh, mathutils.Matrix.Identity(4), (0.1, 0.2, 0.3), painticle_settings)
+    input = particle_simulator.SourceInput()
+    emit_settings = simulator.emit_settings()
+    sim_data = particle_simulator.SimulationData(0.01, emit_settings, painticle_settings, paint_mesh, context, input)
+    simulator.simulate(sim_data)
+    num_allocations = simulator.scratch.num_allocations
+    assert num_allocations > 0
+    simulator.simulate(sim_data)
+    assert simulator.num_particles == 2
+    assert simulator.scratch.num_allocations == num_allocations
+
+
+def test_hashed_grid_only_built_if_needed(test_mesh):
+    context = tstutils.get_default_context(test_mesh)
+    paint_mesh = trianglemesh.TriangleMesh(context)
+    simulator = particle_simulator_cpu.ParticleSimulatorCPU(context)
+    create_default_brush_tree()
+    simulator.setup_steps()
+    painticle_settings = context.scene.painticle_settings
+    simulator.add_test_particles(np.array([(2, 0.2, 0.3), (2, 0.3, 0.3)], dtype=numpyutils.float32_dtype),
+                                 np.array([(-1, 0, 0), (-1, 0, 0)], dtype=numpyutils.float32_dtype),
+                                 paint_mesh.bvh, mathutils.Matrix.Identity(4), (0.1, 0.2, 0.3), painticle_settings)
+    assert simulator.hashed_grid.num_particles == 2
+    # The default brush repels the particles, so the grid is still needed without a painter reading it
+    simulator.painter_needs_hashed_grid = False
+    assert simulator.needs_hashed_grid
+    simulator._steps_need_hashed_grid = False
+    simulator.update_hashed_grid()
+    assert simulator.hashed_grid.num_particles == 0
+    assert simulator.hashed_grid.voxel_size > 0
+    # Switching to steps reading the grid rebuilds it before simulating
+    simulator._steps_need_hashed_grid = True
+    input = particle_simulator.SourceInput()
+    sim_data = particle_simulator.SimulationData(0.01, simulator.emit_settings(), painticle_settings, paint_mesh,
+                                                 context, input)
+    simulator.simulate(sim_data)
+    assert simulator.hashed_grid.num_particles == simulator.num_particles
+
+def test_adaptive_sub_steps():
+    speed = np.array([[1, 0, 0], [0, 0.1, 0]], dtype=numpyutils.float32_dtype)
+    acceleration = np.zeros((2, 3), dtype=numpyutils.float32_dtype)
+    size = np.array([0.01, 0.01], dtype=numpyutils.float32_dtype)
+    # The fastest particle moves 0.01 per time step, which is twice the allowed distance of half its size
+    assert particle_simulator_cpu.adaptive_sub_steps(speed, acceleration, size, 0.01, 0.5, 1, 16) == 2
+    assert particle_simulator_cpu.adaptive_sub_steps(speed, acceleration, size, 0.01, 0.5, 3, 16) == 3
+    assert particle_simulator_cpu.adaptive_sub_steps(speed, acceleration, size, 1, 0.5, 1, 16) == 16
+    assert particle_simulator_cpu.adaptive_sub_steps(speed[:0], acceleration[:0], size[:0], 1, 0.5, 1, 16) == 1
@@ -0,0 +1,137 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# Testing the compute shader simulation against the CPU simulation
+
+# <pep8 compliant>
+
+import pytest
+import bpy
+import mathutils
+import numpy as np
+
+from . import tstutils
+
+from painticle.ops.createdefaultbrushtree import create_default_brush_tree
+from painticle.sim import particle_simulator, particle_simulator_cpu, particle_simulator_gpu
+from painticle import accel, headless, numpyutils, painttiles, trianglemesh
+
+
+@pytest.fixture
+def glcontext():
+    try:
+        return headless.create_standalone_glcontext()
+    except Exception:
+        pytest.skip("requires an OpenGL 4.3 context")
+
+
+@pytest.fixture
+def test_mesh():
+    tstutils.open_file("particle_test.blend")
+    return bpy.data.objects['test_object']
+
+
+def random_particles(n, seed=1):
+    rng = np.random.default_rng(seed)
+    particles = accel.ParticleData()
+    particles.resize(n)
+    particles.location = numpyutils.to_structured(rng.random((n, 3)), numpyutils.vec3_dtype)
+    particles.speed = numpyutils.to_structured(rng.random((n, 3))-0.5, numpyutils.vec3_dtype)
+    particles.normal = numpyutils.to_structured(np.tile([0, 0, 1], (n, 1)), numpyutils.vec3_dtype)
+    particles.uv = numpyutils.to_structured(3*rng.random((n, 2)), numpyutils.vec2_dtype)
+    particles.uv_scale = rng.random(n).astype(np.float32) + 0.5
+    particles.tri_index = rng.integers(0, 100, n).astype(np.uintc)
+    particles.size = 0.05*rng.random(n).astype(np.float32) + 0.01
+    particles.mass = rng.random(n).astype(np.float32) + 0.5
+    particles.age = rng.random(n).astype(np.float32)
+    # Unique lifetimes identify the particles after the simulators reordered them
+    particles.max_age = np.linspace(0.5, 1.5, n, dtype=np.float32)
+    particles.color = numpyutils.to_structured(rng.random((n, 3)), numpyutils.col_dtype)
+    return particles
+
+
+def fields(particles):
+    return {name: numpyutils.unstructured(getattr(particles, name))
+            for name in ("location", "speed", "normal", "uv", "uv_scale", "tri_index", "size", "mass", "age",
+                         "max_age", "color")}
+
+
+def test_upload_download(glcontext):
+    simulator = particle_simulator_gpu.ParticleSimulatorGPU(None, glcontext)
+    particles = random_particles(100)
+    simulator.append_particles(random_particles(0))
+    simulator.append_particles(particles)
+    simulator.append_particles(random_particles(2000, seed=2))
+    assert simulator.num_particles == 2100
+    downloaded = fields(simulator._particles.download())
+    for name, expected in fields(particles).items():
+        assert np.array_equal(downloaded[name][:100], expected), name
+    simulator.shutdown()
+
+
+def test_del_dead_keeps_order(glcontext):
+    simulator = particle_simulator_gpu.ParticleSimulatorGPU(None, glcontext)
+    particles = random_particles(1000)
+    simulator.append_particles(particles)
+    simulator._del_dead()
+    alive = particles.age < particles.max_age
+    assert 0 < np.count_nonzero(alive) < 1000
+    assert simulator.num_particles == np.count_nonzero(alive)
+    downloaded = fields(simulator._particles.download())
+    for name, expected in fields(particles).items():
+        assert np.array_equal(downloaded[name], expected[alive]), name
+    simulator.shutdown()
+
+
+def test_touched_tiles(glcontext):
+    simulator = particle_simulator_gpu.ParticleSimulatorGPU(None, glcontext)
+    assert simulator._particles.touched_tiles(1) == set()
+    particles = random_particles(500)
+    simulator.append_particles(particles)
+    radii = particles.size * particles.uv_scale * 2
+    expected = painttiles.touched_tiles(numpyutils.unstructured(particles.uv), radii)
+    assert simulator._particles.touched_tiles(2) == expected
+    simulator.shutdown()
+
+
+def test_gpu_simulation_matches_cpu_simulation(test_mesh, glcontext):
+    context = tstutils.get_default_context(test_mesh)
+    paint_mesh = trianglemesh.TriangleMesh(context)
+    create_default_brush_tree()
+    painticle_settings = context.scene.painticle_settings
+    ray_origins = np.array([(2, 0.1*i, 0.3) for i in range(8)], dtype=numpyutils.float32_dtype)
+    ray_directions = np.tile(np.array([-1, 0, 0], dtype=numpyutils.float32_dtype), (8, 1))
+    results = []
+    for simulator in (particle_simulator_cpu.ParticleSimulatorCPU(context),
+                      particle_simulator_gpu.ParticleSimulatorGPU(context, glcontext)):
+        simulator.setup_steps()
+        simulator.seed(3)
+        simulator.add_test_particles(ray_origins, ray_directions, paint_mesh.bvh, mathutils.Matrix.Identity(4),
+                                     (0.1, 0.2, 0.3), painticle_settings)
+        sim_data = particle_simulator.SimulationData(0.01, simulator.emit_settings(), painticle_settings, paint_mesh,
+                                                     context, particle_simulator.SourceInput())
+        for _ in range(5):
+            simulator.simulate(sim_data)
+        particles = simulator._particles
+        if isinstance(simulator, particle_simulator_gpu.ParticleSimulatorGPU):
+            particles = particles.download()
+        order = np.argsort(particles.max_age)
+        results.append({name: value[order] for name, value in fields(particles).items()})
+        simulator.shutdown()
+    cpu, gpu = results
+    assert len(cpu["location"]) == 8
+    for name in ("location", "speed", "normal", "uv", "uv_scale", "age"):
+        assert np.allclose(cpu[name], gpu[name], atol=1e-4), name
+    assert np.array_equal(cpu["tri_index"], gpu["tri_index"])
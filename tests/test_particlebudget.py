@@ -0,0 +1,114 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# Testing limiting the number of simulated particles
+
+# <pep8 compliant>
+
+import numpy as np
+import pytest
+
+from painticle import accel, numpyutils
+from painticle.sim import particlebudget
+from painticle.utils import Error
+
+
+def make_particles(n, seed=1):
+    rng = np.random.default_rng(seed)
+    particles = accel.ParticleData()
+    particles.resize(n)
+    particles.location = numpyutils.to_structured(rng.random((n, 3)), numpyutils.vec3_dtype)
+    particles.speed = numpyutils.to_structured(rng.random((n, 3))-0.5, numpyutils.vec3_dtype)
+    particles.size = 0.05*rng.random(n).astype(np.float32) + 0.01
+    particles.mass = rng.random(n).astype(np.float32) + 0.5
+    particles.max_age = rng.random(n).astype(np.float32) + 0.5
+    particles.age = particles.max_age * 0.99 * rng.random(n).astype(np.float32)
+    # Colors similar enough to be merged
+    particles.color = numpyutils.to_structured(0.5 + 0.02*rng.random((n, 3)), numpyutils.col_dtype)
+    return particles
+
+
+@pytest.mark.parametrize("mode", ["oldest", "faintest"])
+def test_eviction_order(mode):
+    particles = make_particles(1000)
+    priority = particles.age.copy() if mode == "oldest" else particles.age / particles.max_age
+    kept_max_ages = np.sort(particles.max_age[np.argsort(priority)[:800]])
+    assert particlebudget.enforce_budget(particles, 800, mode, accel.HashedGrid(0.1)) == 200
+    assert particles.num_particles == 800
+    assert np.array_equal(np.sort(particles.max_age), kept_max_ages)
+
+
+def test_within_budget():
+    particles = make_particles(100)
+    grid = accel.HashedGrid(0.1)
+    assert particlebudget.enforce_budget(particles, 100, "merge", grid) == 0
+    assert particlebudget.enforce_budget(particles, 0, "oldest", grid) == 0
+    assert particles.num_particles == 100
+    with pytest.raises(Error):
+        particlebudget.enforce_budget(particles, 10, "unknown", grid)
+
+
+def test_merge_conserves_mass_and_area():
+    particles = make_particles(2000)
+    mass = np.sum(particles.mass, dtype=np.float64)
+    area = np.sum(particles.size.astype(np.float64)**2)
+    momentum = np.sum(numpyutils.unstructured(particles.speed) * particles.mass[:, np.newaxis], axis=0)
+    color = np.sum(numpyutils.unstructured(particles.color) * particles.mass[:, np.newaxis], axis=0)
+    assert particlebudget.enforce_budget(particles, 1990, "merge", accel.HashedGrid(0.2)) == 10
+    assert particles.num_particles == 1990
+    assert np.isclose(np.sum(particles.mass, dtype=np.float64), mass, rtol=1e-5)
+    assert np.isclose(np.sum(particles.size.astype(np.float64)**2), area, rtol=1e-5)
+    assert np.allclose(np.sum(numpyutils.unstructured(particles.speed) * particles.mass[:, np.newaxis], axis=0),
+                       momentum, atol=1e-3)
+    assert np.allclose(np.sum(numpyutils.unstructured(particles.color) * particles.mass[:, np.newaxis], axis=0),
+                       color, rtol=1e-5)
+
+
+def test_merge_pairs_keeps_colors_apart():
+    sorted_particle_ids = np.array([(1, 0), (1, 1), (1, 2), (2, 3), (2, 4), (3, 5)],
+                                   dtype=[('cellID', np.uint32), ('particleID', np.uint32)])
+    locations = np.zeros((6, 3), dtype=np.float32)
+    colors = np.array([[0, 0, 0], [0.01, 0, 0], [0, 0, 0], [1, 1, 1], [0, 0, 0], [0, 0, 0]], dtype=np.float32)
+    first_ids, second_ids = particlebudget.merge_pairs(sorted_particle_ids, locations, colors, 10, 0.1)
+    assert first_ids.tolist() == [0]
+    assert second_ids.tolist() == [1]
+
+
+def test_merge_keeps_colliding_cells_apart():
+    # The grid cells (1 17 0) and (1 80 0) share a hash, so their particles share an entry of the hashed grid
+    particles = make_particles(2)
+    particles.location = numpyutils.to_structured(np.array([[0.15, 1.75, 0.05], [0.15, 8.05, 0.05]]),
+                                                  numpyutils.vec3_dtype)
+    masses = particles.mass.tolist()
+    grid = accel.HashedGrid(0.1)
+    grid.build(numpyutils.unstructured_view(particles.location))
+    cells = grid.sorted_particle_ids['cellID']
+    assert cells[0] == cells[1]
+    first_ids, second_ids = particlebudget.merge_pairs(grid.sorted_particle_ids,
+                                                       numpyutils.unstructured_view(particles.location),
+                                                       numpyutils.unstructured_view(particles.color), 1, 0.1)
+    assert len(first_ids) == 0 and len(second_ids) == 0
+    # Without a pair to merge, a particle is removed instead
+    assert particlebudget.enforce_budget(particles, 1, "merge", grid) == 1
+    assert particles.mass[0] in masses
+
+
+def test_lifetime_ordered_budget():
+    particles = make_particles(1000)
+    particles.storage_mode = accel.StorageMode.LIFETIME_ORDERED
+    assert particlebudget.enforce_budget(particles, 900, "merge", accel.HashedGrid(0.2)) == 100
+    assert particles.num_particles == 900
+    assert np.all(particles.age < particles.max_age)
+    assert np.all(np.diff(particles.max_age - particles.age) >= 0)
@@ -0,0 +1,88 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# Testing the storage modes of the particle data
+
+# <pep8 compliant>
+
+import numpy as np
+
+from painticle import accel, numpyutils
+
+
+def make_particles(n, rng, age_factor=0.99):
+    particles = accel.ParticleData()
+    particles.resize(n)
+    particles.location = numpyutils.to_structured(rng.random((n, 3)), numpyutils.vec3_dtype)
+    particles.max_age = rng.random(n).astype(np.float32) + 0.5
+    particles.age = particles.max_age * age_factor * rng.random(n).astype(np.float32)
+    return particles
+
+
+def identify(particles, first_id):
+    """ Use the mass to follow the particles through reordering """
+    particles.mass = np.arange(first_id, first_id+particles.num_particles, dtype=np.float32)
+
+
+def is_lifetime_ordered(particles):
+    return np.all(np.diff(particles.max_age - particles.age) >= 0)
+
+
+def test_lifetime_ordered_del_dead():
+    rng = np.random.default_rng(1)
+    particles = make_particles(1000, rng)
+    identify(particles, 0)
+    ids = particles.mass.copy()
+    particles.storage_mode = accel.StorageMode.LIFETIME_ORDERED
+    assert is_lifetime_ordered(particles)
+    assert sorted(particles.mass.tolist()) == ids.tolist()
+    num_ids = 1000
+    for step in range(100):
+        particles.age += 0.02
+        ids = particles.mass.copy()
+        alive = particles.age < particles.max_age
+        assert particles.del_dead() == np.count_nonzero(~alive)
+        assert np.all(particles.age < particles.max_age)
+        # The living particles keep their order
+        assert np.array_equal(particles.mass, ids[alive])
+        new_particles = make_particles(step % 20, rng, age_factor=0)
+        identify(new_particles, num_ids)
+        num_ids += new_particles.num_particles
+        ids = particles.mass.copy()
+        particles.append(new_particles)
+        assert is_lifetime_ordered(particles)
+        assert sorted(particles.mass.tolist()) == sorted(ids.tolist() + new_particles.mass.tolist())
+    assert 0 < particles.num_particles < num_ids
+
+
+def test_append_lifetime_ordered_source():
+    rng = np.random.default_rng(2)
+    source = make_particles(500, rng)
+    identify(source, 0)
+    source.storage_mode = accel.StorageMode.LIFETIME_ORDERED
+    # Only a few particles die, so the source keeps their memory in front of the living ones
+    source.age += 0.1
+    num_dead = source.del_dead()
+    assert 0 < num_dead < source.num_particles
+    for storage_mode in (accel.StorageMode.UNORDERED, accel.StorageMode.LIFETIME_ORDERED):
+        particles = make_particles(10, rng)
+        identify(particles, 1000)
+        particles.storage_mode = storage_mode
+        ids = particles.mass.copy()
+        particles.append(source)
+        assert particles.num_particles == 10 + source.num_particles
+        assert np.all(particles.age < particles.max_age)
+        assert sorted(particles.mass.tolist()) == sorted(ids.tolist() + source.mass.tolist())
+    assert is_lifetime_ordered(particles)
@@ -76,3 +76,26 @@ def test_benchmark_no_painting_sim(benchmark, sim_setup):
 @pytest.mark.skipif(tstutils.no_ui(), reason="requires UI")
 def test_benchmark_painting_sim(benchmark, sim_setup):
     benchmark.pedantic(sim_and_paint, args=(sim_setup,), rounds=1)
+
+
+def test_particles_follow_mesh():
+    tstutils.open_file("particle_test.blend")
+    test_mesh = bpy.data.objects['test_object']
+    context = tstutils.get_default_context(test_mesh)
+    create_default_brush_tree()
+    particles = painticle.particles.Particles(context, omit_painter=True, simulator="cpu")
+    if painticle.particles._on_depsgraph_update not in bpy.app.handlers.depsgraph_update_post:
+        painticle.particles.register()
+    assert not particles.mesh_changed
+    assert particles.follow_mesh(bpy.context.evaluated_depsgraph_get())
+
+    # Moving a vertex is reported by the depsgraph handler like a deforming animation
+    test_mesh.data.vertices[0].co.x += 1
+    test_mesh.data.update()
+    bpy.context.view_layer.update()
+    assert particles.mesh_changed
+    assert particles.follow_mesh(bpy.context.evaluated_depsgraph_get())
+    assert not particles.mesh_changed
+    moved = test_mesh.data.vertices[0].co
+    surface_info = particles.paint_mesh.bvh.closest_point(moved.x, moved.y, moved.z)
+    assert tstutils.is_close_vec(surface_info.location, moved, 1e-5)
@@ -52,3 +52,16 @@ def test_glsl_validation_particle3d():
     assert gpu_utils.validate_glsl_shaders(vert, "vert")
     assert gpu_utils.validate_glsl_shaders(frag, "frag")
     assert gpu_utils.validate_glsl_shaders(geom, "geom")
+
+
+@pytest.mark.skipif(tstutils.no_validator(), reason="requires GLSL validator")
+def test_glsl_validation_particleuv():
+    vert, frag, geom = gpu_utils.load_shader_source("particleuv", ["utils", "particle"])
+    assert gpu_utils.validate_glsl_shaders(vert, "vert")
+    assert gpu_utils.validate_glsl_shaders(frag, "frag")
+    # The splats are drawn as quads, since points are limited in size and culled at the tile border
+    assert geom is not None
+    assert gpu_utils.validate_glsl_shaders(geom, "geom")
+    vert, frag = gpu_utils.load_shader_source("positionmap", src_types=["vert", "frag"])
+    assert gpu_utils.validate_glsl_shaders(vert, "vert")
+    assert gpu_utils.validate_glsl_shaders(frag, "frag")
@@ -0,0 +1,89 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+import json
+
+import numpy as np
+
+from painticle import accel, profiling
+
+
+def test_ring_buffer():
+    buffer = profiling.RingBuffer(4)
+    assert len(buffer) == 0
+    for i in range(6):
+        buffer.add(i, 10*i)
+    assert len(buffer) == 4
+    samples = buffer.samples()
+    assert list(samples["start"]) == [2, 3, 4, 5]
+    assert list(samples["duration"]) == [20, 30, 40, 50]
+    buffer.clear()
+    assert len(buffer.samples()) == 0
+
+
+def test_stage_timings():
+    profiler = profiling.Profiler(capacity=8)
+    for _ in range(3):
+        with profiler.stage("test.stage"):
+            pass
+    samples = profiler.timings()["test.stage"]
+    assert len(samples) == 3
+    assert np.all(samples["duration"] >= 0)
+    summary = dict((name, (mean, maximum)) for name, mean, maximum in profiler.summary())
+    assert "test.stage" in summary
+    profiler.set_enabled(False)
+    with profiler.stage("test.stage"):
+        pass
+    profiler.set_enabled(True)
+    assert len(profiler.timings()["test.stage"]) == 3
+
+
+def test_native_timings():
+    profiler = profiling.Profiler()
+    profiler.clear()
+    grid = accel.HashedGrid(0.1)
+    grid.build(np.random.default_rng(0).uniform(-1, 1, (100, 3)).astype(np.float32))
+    assert "accel.hashed_grid_build" in accel.profiling_stages()
+    samples = profiler.timings()["accel.hashed_grid_build"]
+    assert len(samples) == 1
+    # Native timings need to be mapped onto the python clock
+    assert abs(samples["start"][0] - profiling.time.perf_counter()) < 10
+
+
+def test_stroke_report(tmp_path):
+    profiler = profiling.Profiler()
+    with profiler.stage("before.stroke"):
+        pass
+    profiler.begin_stroke()
+    with profiler.stage("paint.pass"):
+        pass
+    profiler.record_value("particles", 42)
+    report = profiler.end_stroke()
+    assert profiler.end_stroke() is None
+
+    report_dict = report.to_dict()
+    assert "paint.pass" in report_dict["stages"]
+    assert "before.stroke" not in report_dict["stages"]
+    assert report_dict["values"]["particles"][0][1] == 42
+
+    json_filename, trace_filename = report.write(str(tmp_path), "stroke")
+    with open(json_filename) as f:
+        assert json.load(f)["stages"]["paint.pass"]["count"] == 1
+    with open(trace_filename) as f:
+        events = json.load(f)["traceEvents"]
+    assert any(e["name"] == "paint.pass" and e["ph"] == "X" for e in events)
+    assert any(e["name"] == "particles" and e["ph"] == "C" for e in events)
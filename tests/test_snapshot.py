@@ -0,0 +1,61 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+import pytest
+import bpy
+
+from painticle.ops.createdefaultbrushtree import create_default_brush_tree
+from painticle.settings import snapshot
+from painticle.sim import particle_simulator_cpu
+
+from . import tstutils
+
+
+def test_freeze():
+    tstutils.open_file("particle_test.blend")
+    painticle_settings = bpy.context.scene.painticle_settings
+    painticle_settings.physics.sim_sub_steps = 5
+    frozen = snapshot.freeze(painticle_settings)
+    assert frozen.physics.sim_sub_steps == 5
+    assert frozen.stop_painting_on_mouse_release == painticle_settings.stop_painting_on_mouse_release
+    # The snapshot is independent of the blender properties
+    painticle_settings.physics.sim_sub_steps = 7
+    assert frozen.physics.sim_sub_steps == 5
+    # Only the properties of the property group can be set
+    with pytest.raises(AttributeError):
+        frozen.physics.unknown = 1
+    assert type(snapshot.freeze(painticle_settings.physics)) is type(frozen.physics)
+
+
+def test_simulator_settings():
+    tstutils.open_file("particle_test.blend")
+    context = tstutils.get_default_context(bpy.data.objects['test_object'])
+    create_default_brush_tree()
+    simulator = particle_simulator_cpu.ParticleSimulatorCPU(context)
+    simulator.setup_steps()
+    settings = simulator.settings
+    emit_settings = context.scene.painticle_settings.brush.get_active_brush_steps()[0].creation_settings
+    assert simulator.emit_settings().particle_size == pytest.approx(emit_settings.particle_size)
+    assert settings.brush_strength == pytest.approx(context.tool_settings.image_paint.brush.strength)
+    # The snapshot is kept until blender reports a change
+    simulator.update_settings()
+    assert simulator.settings is settings
+    snapshot.invalidate()
+    assert settings.is_outdated()
+    simulator.update_settings()
+    assert simulator.settings is not settings
+    assert not simulator.settings.is_outdated()
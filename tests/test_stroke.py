@@ -0,0 +1,89 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+import pytest
+import bpy
+import mathutils
+import numpy as np
+
+import painticle
+from painticle import headless, numpyutils, stroke
+from painticle.interaction import Interactions
+from painticle.ops.createdefaultbrushtree import create_default_brush_tree
+
+from . import tstutils
+
+
+def create_test_stroke(target: mathutils.Vector, num_frames: int = 20):
+    frames = np.zeros(num_frames, stroke.frame_dtype)
+    frames["time"] = np.linspace(0, 0.2, num_frames)
+    frames["origin"] = target + mathutils.Vector((0, 0, 10))
+    frames["direction"] = (0, 0, -1)
+    frames["size"] = 0.05
+    frames["pressure"] = 1
+    frames["interactions"] = Interactions.EMIT_PARTICLES.value
+    frames["interactions"][-1] = Interactions.NONE.value
+    return frames
+
+
+def test_stroke_file_roundtrip(tmp_path):
+    frames = create_test_stroke(mathutils.Vector((1, 2, 3)))
+    settings = {"brush_tree": [{"node": "BrushNode", "step": {"enabled": True}}], "brush_strength": 0.5}
+    filename = str(tmp_path / "test.stroke")
+    stroke.Stroke(1234, settings, frames).write(filename)
+    loaded = stroke.Stroke.read(filename)
+    assert loaded.seed == 1234
+    assert loaded.settings == settings
+    assert np.array_equal(loaded.frames, frames)
+    assert loaded.duration == pytest.approx(0.2)
+
+
+def test_invalid_stroke_file(tmp_path):
+    filename = str(tmp_path / "invalid.stroke")
+    with open(filename, "wb") as f:
+        f.write(b"no stroke data at all")
+    with pytest.raises(painticle.utils.Error):
+        stroke.Stroke.read(filename)
+
+
+def replay(context, recorded_stroke):
+    particles = painticle.particles.Particles(context, omit_painter=True)
+    stroke.StrokeReplayer(particles, recorded_stroke, max_tail_time=0).run(paint=False)
+    return particles
+
+
+def test_deterministic_replay():
+    tstutils.open_file("benchmark_particles.blend")
+    test_mesh = bpy.data.objects['test_object']
+    context = headless.HeadlessContext(test_mesh)
+    create_default_brush_tree()
+    target = test_mesh.matrix_world @ (sum((mathutils.Vector(x) for x in test_mesh.bound_box),
+                                           mathutils.Vector()) / 8)
+    recorded_stroke = stroke.Stroke(42, stroke.capture_settings(context), create_test_stroke(target))
+
+    first = replay(context, recorded_stroke)
+    second = replay(context, recorded_stroke)
+    assert first.numParticles() > 0
+    assert first.numParticles() == second.numParticles()
+    assert np.array_equal(numpyutils.unstructured(first.simulator._particles.location),
+                          numpyutils.unstructured(second.simulator._particles.location))
+
+    # Recreating the settings from the stroke needs to give the same result
+    stroke.apply_settings(context, recorded_stroke.settings)
+    third = replay(context, recorded_stroke)
+    assert np.array_equal(numpyutils.unstructured(first.simulator._particles.location),
+                          numpyutils.unstructured(third.simulator._particles.location))
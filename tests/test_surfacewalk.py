@@ -0,0 +1,77 @@
+# This file is part of PAINTicle.
+#
+# PAINTicle is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PAINTicle is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with PAINTicle.  If not, see <http://www.gnu.org/licenses/>.
+
+# <pep8 compliant>
+
+import math
+
+import numpy as np
+
+from painticle import accel, numpyutils
+
+from . import tstutils
+
+min_tol = 0.00001
+
+
+def create_folded_mesh():
+    """ A flat quad for x<0 and a quad rising with 45 degrees for x>0 """
+    points = np.array([-1, -1, 0,
+                       +0, -1, 0,
+                       +0, +1, 0,
+                       -1, +1, 0,
+                       +1, -1, 1,
+                       +1, +1, 1], dtype=np.single)
+    triangles = np.array([0, 1, 2,    0, 2, 3,    1, 4, 5,    1, 5, 2], dtype=np.uintc)
+    bvh = accel.build_bvh(points, triangles, np.array([], dtype=np.single))
+    adjacency = accel.build_mesh_adjacency(triangles, 6)
+    return bvh, adjacency
+
+
+def create_particle(location, speed):
+    particles = accel.ParticleData()
+    particles.resize(1)
+    particles.location = numpyutils.to_structured(np.array([location], dtype=np.single), numpyutils.vec3_dtype)
+    particles.speed = numpyutils.to_structured(np.array([speed], dtype=np.single), numpyutils.vec3_dtype)
+    return particles
+
+
+def test_walk_across_fold():
+    bvh, adjacency = create_folded_mesh()
+    particles = create_particle((-0.25, 0, 0.5), (1, 0, 0))
+    # Without a triangle the particle needs to be projected
+    assert accel.walk_particles(particles, bvh, adjacency) == 1
+    assert particles.tri_index[0] == 0
+    assert tstutils.is_close_vec(particles.location[0], (-0.25, 0, 0), min_tol)
+
+    # Moving by 0.5 in x direction walks 0.25 on the flat part and the remaining distance up the slope
+    particles.location = numpyutils.to_structured(np.array([(0.25, 0, 0)], dtype=np.single), numpyutils.vec3_dtype)
+    assert accel.walk_particles(particles, bvh, adjacency) == 0
+    assert particles.tri_index[0] in (2, 3)
+    distance = 0.25 / math.sqrt(2)
+    assert tstutils.is_close_vec(particles.location[0], (distance, 0, distance), min_tol)
+    normal = (-1/math.sqrt(2), 0, 1/math.sqrt(2))
+    assert tstutils.is_close_vec(particles.normal[0], normal, min_tol)
+    # The speed is kept in the tangent plane of the slope
+    assert abs(np.dot(numpyutils.unstructured(particles.speed)[0], normal)) < min_tol
+
+
+def test_walk_stops_at_border():
+    bvh, adjacency = create_folded_mesh()
+    particles = create_particle((-0.5, -0.5, 0), (0, 0, 0))
+    accel.walk_particles(particles, bvh, adjacency)
+    particles.location = numpyutils.to_structured(np.array([(-0.5, -3, 0)], dtype=np.single), numpyutils.vec3_dtype)
+    assert accel.walk_particles(particles, bvh, adjacency) == 0
+    assert tstutils.is_close_vec(particles.location[0], (-0.5, -1, 0), min_tol)